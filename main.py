@@ -1,6 +1,556 @@
-def main():
-    print("Hello from nmsml!")
+#!/usr/bin/env python3
+"""
+NMSML Command Line
+Entry point for the data and analysis steps: fetch, pull (a streamed,
+filtered part of the full dataset), index, dedup, subset,
+extract, analyze, stability (effect sizes over repeated subsampling), power
+(Monte Carlo power over study designs), bench,
+run (the fingerprinted pipeline), serve (the local feature service) and
+stream (incremental pitch/formant tracking).
+
+Subcommand modules are imported only when their subcommand runs, so startup
+stays fast regardless of how heavy the analysis stack is.
+"""
+
+import argparse
+import contextlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_overrides(assignments: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse "stage.param=value" overrides; values are read as JSON where possible.
+
+    :param assignments: Override strings
+    :return: Overrides keyed by stage name
+    """
+    overrides: Dict[str, Dict[str, Any]] = {}
+    for assignment in assignments:
+        key, sep, raw_value = assignment.partition('=')
+        stage, dot, param = key.partition('.')
+        if not sep or not dot:
+            raise argparse.ArgumentTypeError(f"Expected stage.param=value, got: {assignment}")
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            value = raw_value
+        overrides.setdefault(stage, {})[param] = value
+    return overrides
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a byte size such as "512M", "8G" or "1073741824".
+
+    :param text: Size with an optional K/M/G/T suffix
+    :return: Size in bytes
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def apply_memory_limit(limit_bytes: int) -> None:
+    """
+    Cap the address space (RLIMIT_AS) of this process.
+
+    Worker processes inherit the limit, but each gets its own: with --jobs N
+    the run as a whole can use up to N + 1 times the limit.
+
+    :param limit_bytes: Address-space limit per process in bytes
+    :return: None
+    """
+    try:
+        import resource
+    except ImportError:
+        print("Warning: --max-memory is not supported on this platform and is ignored", file=sys.stderr)
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit_bytes = min(limit_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, hard))
+
+
+def metadata_index_path(args: argparse.Namespace) -> Optional[str]:
+    """
+    SQLite metadata index of the data root, unless disabled with --no-index.
+
+    :param args: Parsed arguments
+    :return: Index path or None
+    """
+    return None if args.no_index else str(Path(args.data_root) / 'data' / 'metadata_index.sqlite')
+
+
+def cmd_fetch(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Download the pre-created subset from Google Drive.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts import populate_repo
+
+    code = populate_repo.main(base_dir=args.data_root, drive_url=args.url or populate_repo.GDRIVE_URL)
+    return code, {'data_root': args.data_root}
+
+
+def cmd_pull(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Stream a filtered part of the DogSpeak dataset from the Hugging Face Hub (or a local copy).
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.get_data import pull_from_args
+
+    raw = Path(args.data_root) / 'data' / 'raw'
+    output_dir = args.output or str(raw / ('subset' if args.layout == 'subset' else 'DogSpeak_Dataset'))
+    return 0, {'output': output_dir, **pull_from_args(args, output_dir)}
+
+
+def cmd_index(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Summarize the full dataset metadata by breed, sex and dog.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.analyze_metadata import analyze_dogspeak_metadata
+
+    metadata = args.metadata or str(Path(args.data_root) / 'data' / 'raw' / 'DogSpeak_Dataset' / 'metadata.csv')
+    index_path = metadata_index_path(args)
+    if index_path and args.verify:
+        from scripts.metadata_index import MetadataIndex
+
+        with MetadataIndex(Path(index_path)) as index:
+            index.update_metadata(Path(metadata), Path(metadata).parent, verify=True, threads=max(args.jobs, 8))
+    return 0, {'metadata': metadata, 'breeds': analyze_dogspeak_metadata(metadata, index_path)}
+
+
+def cmd_dedup(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Find exact and near-duplicate recordings in the full dataset.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.fingerprint import DUPLICATES_FILE, FINGERPRINT_STORE_FILE, detect_duplicates
+
+    dataset = Path(args.data_root) / 'data' / 'raw' / 'DogSpeak_Dataset'
+    summary = detect_duplicates(
+        str(dataset / 'metadata.csv'), str(dataset),
+        str(Path(args.data_root) / 'data' / 'exploration' / DUPLICATES_FILE),
+        store_path=Path(args.cache_dir) / FINGERPRINT_STORE_FILE,
+        jobs=args.jobs,
+        threshold=args.threshold,
+        min_matches=args.min_matches,
+        index_path=metadata_index_path(args)
+    )
+    return 0, summary
+
+
+def cmd_subset(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Create the balanced breed x sex subset.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.create_subset import create_balanced_subset
+    from scripts.fingerprint import DUPLICATES_FILE
+
+    raw_dir = Path(args.data_root) / 'data' / 'raw'
+    exploration_dir = Path(args.data_root) / 'data' / 'exploration'
+    duplicates = exploration_dir / DUPLICATES_FILE
+    if args.exclude_duplicates and not duplicates.exists():
+        raise FileNotFoundError(f"{duplicates} not found; run `python main.py dedup` first")
+    exploration_dir.mkdir(parents=True, exist_ok=True)
+    results = create_balanced_subset(
+        metadata_path=str(raw_dir / 'DogSpeak_Dataset' / 'metadata.csv'),
+        audio_dir=str(raw_dir / 'DogSpeak_Dataset'),
+        output_dir=str(raw_dir / 'subset'),
+        dogs_per_sex=args.dogs_per_sex,
+        files_per_dog=args.files_per_dog,
+        random_seed=args.seed,
+        exploration_dir=str(exploration_dir),
+        index_path=metadata_index_path(args),
+        seconds_per_dog=args.seconds_per_dog,
+        duplicates_path=str(duplicates) if args.exclude_duplicates else None
+    )
+    return 0, {key: value for key, value in results.items() if key != 'breed_summary'}
+
+
+def cmd_extract(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Extract F0, F1 and F2 from the subset recordings.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.extract_features import EXTRACTION_CACHE_FILE, run_extraction, run_sharded_extraction
+    from scripts.fingerprint import DUPLICATES_FILE
+
+    base = Path(args.data_root) / 'data'
+    input_directory = args.input or str(base / 'raw' / 'subset')
+    output_file = args.output or str(base / 'features' / 'feature_extraction_results.csv')
+    cache_path = str(Path(args.cache_dir) / EXTRACTION_CACHE_FILE)
+    duplicates_path = args.duplicates
+    if duplicates_path is None and (base / 'exploration' / DUPLICATES_FILE).exists():
+        duplicates_path = str(base / 'exploration' / DUPLICATES_FILE)
+    if args.queue:
+        options = {'pitch_algorithm': args.pitch_algorithm, 'readers': args.readers,
+                   'prefetch_depth': args.prefetch_depth,
+                   'duplicates_path': duplicates_path} if args.engine == 'python' else {}
+        features = run_sharded_extraction(input_directory, output_file, args.queue, engine=args.engine,
+                                          workers=args.jobs, shard_size=args.shard_size, metadata_path=args.file_list,
+                                          index_path=metadata_index_path(args), cache_path=cache_path,
+                                          stale_after=args.stale_after, **options)
+        return 0, {'features': str(features)}
+    options = {'jobs': args.jobs, 'pitch_algorithm': args.pitch_algorithm, 'index_path': metadata_index_path(args),
+               'cache_path': cache_path, 'readers': args.readers, 'prefetch_depth': args.prefetch_depth,
+               'duplicates_path': duplicates_path} if args.engine == 'python' else {}
+    options.update(checkpoint_every=args.checkpoint_every, resume=not args.no_resume)
+    return 0, {'features': str(run_extraction(input_directory, output_file, engine=args.engine, **options))}
+
+
+def cmd_analyze(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run the statistical analysis and write the report and figures.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.statistical_analysis import main as run_statistical_analysis
+
+    base = Path(args.data_root) / 'data'
+    input_path = Path(args.input) if args.input else base / 'features' / 'feature_extraction_results.csv'
+    output_dir = Path(args.output) if args.output else base / 'statistical_analysis'
+    lme_options = {'engine': args.lme_engine, 'formula': args.formula, 'random_effects': args.random_effects}
+    formats = [fmt for fmt in args.render if fmt != 'none']
+    return run_statistical_analysis(input_path, output_dir, lme_options, formats), {'output_dir': str(output_dir)}
+
+
+def cmd_stability(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Recompute the effect sizes over many balanced subsets drawn from the feature table.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.stability import STABILITY_CSV, STABILITY_REPORT, run_stability
+
+    base = Path(args.data_root) / 'data'
+    input_path = Path(args.input) if args.input else base / 'features' / 'feature_extraction_results.csv'
+    output_dir = Path(args.output) if args.output else base / 'statistical_analysis'
+    run_stability(input_path, output_dir, n_draws=args.draws, dogs_per_sex=args.dogs_per_sex,
+                  files_per_dog=args.files_per_dog, seed=args.seed, lme_draws=args.lme_draws, jobs=args.jobs)
+    return 0, {'summary': str(output_dir / STABILITY_CSV), 'report': str(output_dir / STABILITY_REPORT)}
+
+
+def cmd_power(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Estimate power for a grid of dogs per sex x files per dog from the current feature table.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.power_analysis import POWER_CSV, POWER_REPORT, run_power_analysis
+
+    base = Path(args.data_root) / 'data'
+    input_path = Path(args.input) if args.input else base / 'features' / 'feature_extraction_results.csv'
+    output_dir = Path(args.output) if args.output else base / 'statistical_analysis'
+    run_power_analysis(input_path, output_dir, dogs_per_sex=args.dogs_per_sex, files_per_dog=args.files_per_dog,
+                       n_simulations=args.simulations, alpha=args.alpha, seed=args.seed, jobs=args.jobs)
+    return 0, {'table': str(output_dir / POWER_CSV), 'report': str(output_dir / POWER_REPORT)}
+
+
+def cmd_bench(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run the benchmark suite on a synthetic corpus.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.benchmark import BENCHMARKS, DEFAULT_HISTORY, run_benchmarks
+
+    records = run_benchmarks(
+        args.cases or list(BENCHMARKS), n_files=args.files, jobs=args.jobs, engine=args.engine,
+        repeat=args.repeat, work_dir=Path(args.cache_dir) / 'benchmarks',
+        history_path=Path(args.data_root) / DEFAULT_HISTORY,
+        reference_csv=Path(args.data_root) / 'data' / 'features' / 'feature_extraction_results.csv',
+        reference_audio=Path(args.data_root) / 'data' / 'raw' / 'subset'
+    )
+    return 0, {'benchmarks': records}
+
+
+def cmd_serve(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Serve feature measurements and reference-norm scores until interrupted.
+
+    :param args: Parsed arguments
+    :return: Exit code and result summary
+    """
+    from scripts.feature_service import serve
+
+    features = Path(args.features) if args.features else \
+        Path(args.data_root) / 'data' / 'features' / 'feature_extraction_results.csv'
+    serve(features, host=args.host, port=args.port, socket_path=args.socket,
+          pitch_algorithm=args.pitch_algorithm, verbose=args.verbose)
+    return 0, {}
+
+
+def cmd_stream(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Track pitch and formants incrementally over a WAV file or raw PCM on stdin.
+
+    :param args: Parsed arguments
+    :return: Exit code and the running summary at the end of the stream
+    """
+    import math
+
+    from scripts.stream_tracker import raw_chunks, track_file, track_stream
+
+    def report(tracker, update) -> None:
+        if args.frames:
+            for time, f0 in zip(update.pitch_times, update.f0):
+                if math.isfinite(f0):
+                    print(f"{time:.3f}\t{f0:.1f}")
+
+    options = {'pitch_algorithm': args.pitch_algorithm}
+    if args.source == '-':
+        chunks = raw_chunks(sys.stdin.buffer, args.dtype, args.channels, args.chunk_size)
+        tracker = track_stream(chunks, args.sample_rate, report, **options)
+    else:
+        tracker = track_file(Path(args.source), args.chunk_size, report, **options)
+    summary = tracker.summary()
+    if args.format == 'text':
+        print(f"Latency: {1000 * tracker.latency:.0f} ms")
+        for name, value in summary.items():
+            print(f"   {name}: {value:.1f}")
+    return 0, {'latency_s': tracker.latency, 'summary': summary}
+
+
+def cmd_run(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    Run the analysis pipeline, re-executing only stages whose inputs or parameters changed.
+
+    :param args: Parsed arguments
+    :return: Exit code and per-stage status
+    """
+    from scripts.pipeline import build_default_pipeline
+
+    pipeline = build_default_pipeline(
+        Path(args.data_root),
+        cache_dir=Path(args.cache_dir),
+        overrides=parse_overrides(args.overrides)
+    )
+    status = pipeline.run(args.targets, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    if args.format == 'text':
+        print("\nPipeline summary:")
+        for name, state in status.items():
+            print(f"   {name}: {state}")
+    return 0, {'stages': status}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the argument parser with the shared options on every subcommand.
+
+    :return: Argument parser
+    """
+    from scripts.get_data import add_pull_arguments
+
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument('--data-root', default='.', help="Data root containing data/ (default: .)")
+    shared.add_argument('--jobs', type=int, default=1, help="Worker processes / concurrent stages")
+    shared.add_argument('--cache-dir', default=None, help="Cache and state directory (default: <data-root>/.cache)")
+    shared.add_argument('--max-memory', type=parse_size, default=None, metavar='SIZE',
+                        help="Address-space limit of each process (main and every worker), e.g. 8G")
+    shared.add_argument('--format', choices=['text', 'json'], default='text',
+                        help="Result output; with json, progress goes to stderr and the result to stdout")
+    shared.add_argument('--trace', default=None, metavar='PATH',
+                        help="Write per-stage timing/memory/throughput as a Chrome trace JSON file")
+    shared.add_argument('--trace-memory', action='store_true', help="Also track Python allocation peaks (slower)")
+    shared.add_argument('--no-index', action='store_true',
+                        help="Read metadata.csv and scan folders instead of using <data-root>/data/metadata_index.sqlite")
+
+    parser = argparse.ArgumentParser(description="NMSML vocal dimorphism pipeline")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    fetch = commands.add_parser('fetch', parents=[shared], help="Download the pre-created subset")
+    fetch.add_argument('--url', default=None, help="Google Drive sharing URL (default: the published subset)")
+    fetch.set_defaults(handler=cmd_fetch)
+
+    pull = commands.add_parser('pull', parents=[shared], help="Stream a filtered part of the full dataset")
+    pull.add_argument('--output', default=None,
+                      help="Output directory (default: <data-root>/data/raw/DogSpeak_Dataset, or .../subset "
+                           "with --layout subset)")
+    add_pull_arguments(pull)
+    pull.set_defaults(handler=cmd_pull)
+
+    index = commands.add_parser('index', parents=[shared], help="Summarize the full dataset metadata")
+    index.add_argument('--metadata', default=None,
+                       help="metadata.csv (default: <data-root>/data/raw/DogSpeak_Dataset/metadata.csv)")
+    index.add_argument('--verify', action='store_true',
+                       help="Probe every recording and re-hash the ones whose size or time changed")
+    index.set_defaults(handler=cmd_index)
+
+    dedup = commands.add_parser('dedup', parents=[shared], help="Find duplicate recordings in the full dataset")
+    dedup.add_argument('--threshold', type=float, default=0.15,
+                       help="Minimum fraction of matching spectral landmarks for a near-duplicate")
+    dedup.add_argument('--min-matches', type=int, default=16,
+                       help="Minimum number of matching spectral landmarks for a near-duplicate")
+    dedup.set_defaults(handler=cmd_dedup)
+
+    subset = commands.add_parser('subset', parents=[shared], help="Create the balanced subset")
+    subset.add_argument('--dogs-per-sex', type=int, default=10)
+    subset.add_argument('--files-per-dog', type=int, default=3)
+    subset.add_argument('--seed', type=int, default=42)
+    subset.add_argument('--seconds-per-dog', type=float, default=None,
+                        help="Balance on audio time: select files until each dog has this many seconds")
+    subset.add_argument('--exclude-duplicates', action='store_true',
+                        help="Leave out the duplicates found by `dedup` (data/exploration/duplicates.csv)")
+    subset.set_defaults(handler=cmd_subset)
+
+    extract = commands.add_parser('extract', parents=[shared], help="Extract F0, F1 and F2")
+    extract.add_argument('--input', default=None, help="Subset directory (default: <data-root>/data/raw/subset)")
+    extract.add_argument('--output', default=None, help="Feature CSV (default: <data-root>/data/features/...)")
+    extract.add_argument('--engine', choices=['praat', 'python'], default='praat', help="Extraction engine")
+    extract.add_argument('--pitch-algorithm', choices=['ac', 'yin'], default='ac',
+                         help="Pitch algorithm of the python engine")
+    extract.add_argument('--readers', type=int, default=4,
+                         help="Threads reading recordings ahead of the analysis (python engine)")
+    extract.add_argument('--prefetch-depth', type=int, default=16,
+                         help="Recordings read but not yet analyzed at most (python engine)")
+    extract.add_argument('--duplicates', default=None, metavar='CSV',
+                         help="duplicates.csv from dedup; near-duplicates reuse the result of their kept copy "
+                              "(python engine; default: <data-root>/data/exploration/duplicates.csv if present)")
+    extract.add_argument('--checkpoint-every', type=int, default=200,
+                         help="Recordings per committed batch; an interrupted run resumes after the last one")
+    extract.add_argument('--no-resume', action='store_true',
+                         help="Discard the checkpoint of an interrupted run and start over")
+    extract.add_argument('--queue', default=None, metavar='DIR',
+                         help="Work queue directory on a shared filesystem; run the same command on every node")
+    extract.add_argument('--shard-size', type=int, default=200, help="Recordings per work queue shard")
+    extract.add_argument('--file-list', default=None, metavar='CSV',
+                         help="metadata_subset.csv listing the recordings to queue (default: scan --input)")
+    extract.add_argument('--stale-after', type=float, default=120.0,
+                         help="Seconds without heartbeat before a claimed shard is re-queued")
+    extract.set_defaults(handler=cmd_extract)
+
+    analyze = commands.add_parser('analyze', parents=[shared], help="Run the statistical analysis")
+    analyze.add_argument('--input', default=None, help="Feature CSV (default: <data-root>/data/features/...)")
+    analyze.add_argument('--output', default=None,
+                         help="Report directory (default: <data-root>/data/statistical_analysis)")
+    analyze.add_argument('--lme-engine', choices=['auto', 'sparse'], default='auto',
+                         help="auto: closed form or statsmodels for a per-dog intercept; sparse: any random effects")
+    analyze.add_argument('--formula', default="Sex * Breed", help="Fixed-effects formula right-hand side")
+    analyze.add_argument('--random-effects', nargs='+', default=None,
+                         help="Random-effect terms, e.g. '1 | dog_id' '1 + Sex | Breed' (default: '1 | dog_id')")
+    analyze.add_argument('--render', nargs='+', choices=['markdown', 'html', 'console', 'none'],
+                         default=['markdown', 'html', 'console'],
+                         help="Report formats rendered from the stored results ('none' only stores the results)")
+    analyze.set_defaults(handler=cmd_analyze)
+
+    stability = commands.add_parser('stability', parents=[shared],
+                                    help="Effect size stability over repeated balanced subsampling")
+    stability.add_argument('--input', default=None, help="Feature CSV (default: <data-root>/data/features/...)")
+    stability.add_argument('--output', default=None,
+                           help="Report directory (default: <data-root>/data/statistical_analysis)")
+    stability.add_argument('--draws', type=int, default=1000)
+    stability.add_argument('--dogs-per-sex', type=int, default=10)
+    stability.add_argument('--files-per-dog', type=int, default=3)
+    stability.add_argument('--seed', type=int, default=42)
+    stability.add_argument('--lme-draws', type=int, default=0,
+                           help="Also refit the LME interaction terms on this many draws (in --jobs processes)")
+    stability.set_defaults(handler=cmd_stability)
+
+    power = commands.add_parser('power', parents=[shared],
+                                help="Monte Carlo power over dogs per sex x files per dog")
+    power.add_argument('--input', default=None, help="Feature CSV to fit the variance components on")
+    power.add_argument('--output', default=None,
+                       help="Report directory (default: <data-root>/data/statistical_analysis)")
+    power.add_argument('--dogs-per-sex', type=int, nargs='+', default=[5, 10, 15, 20, 30, 40])
+    power.add_argument('--files-per-dog', type=int, nargs='+', default=[1, 2, 3, 5, 8])
+    power.add_argument('--simulations', type=int, default=2000, help="Synthetic datasets per design")
+    power.add_argument('--alpha', type=float, default=0.05)
+    power.add_argument('--seed', type=int, default=42)
+    power.set_defaults(handler=cmd_power)
+
+    bench = commands.add_parser('bench', parents=[shared], help="Benchmark on a synthetic corpus")
+    bench.add_argument('cases', nargs='*', help="Benchmarks to run (default: all)")
+    bench.add_argument('--files', type=int, default=1000, help="Synthetic corpus size")
+    bench.add_argument('--engine', default='praat', help="Feature extraction engine")
+    bench.add_argument('--repeat', type=int, default=1)
+    bench.set_defaults(handler=cmd_bench)
+
+    run = commands.add_parser('run', parents=[shared], help="Run the fingerprinted pipeline")
+    run.add_argument('targets', nargs='*', help="Stages to build (default: the full report)")
+    run.add_argument('--set', dest='overrides', action='append', default=[], metavar='STAGE.PARAM=VALUE',
+                     help="Override a stage parameter, e.g. subset.dogs_per_sex=5")
+    run.add_argument('--force', action='store_true', help="Re-run all required stages")
+    run.add_argument('--dry-run', action='store_true', help="Only show which stages would run")
+    run.set_defaults(handler=cmd_run)
+
+    serve = commands.add_parser('serve', parents=[shared], help="Run the local feature service")
+    serve.add_argument('--features', default=None, help="Feature table for the reference norms")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--socket', default=None, help="Listen on this Unix socket instead of TCP")
+    serve.add_argument('--pitch-algorithm', default='ac', choices=['ac', 'yin'])
+    serve.add_argument('--verbose', action='store_true', help="Log every request")
+    serve.set_defaults(handler=cmd_serve)
+
+    stream = commands.add_parser('stream', parents=[shared], help="Track pitch and formants over a stream")
+    stream.add_argument('source', help="WAV file, or - for raw PCM on stdin")
+    stream.add_argument('--sample-rate', type=int, default=44100, help="Sample rate of raw PCM input")
+    stream.add_argument('--dtype', default='int16', help="Sample type of raw PCM input")
+    stream.add_argument('--channels', type=int, default=1, help="Channels of raw PCM input")
+    stream.add_argument('--chunk-size', type=int, default=4096, help="Samples read at a time")
+    stream.add_argument('--pitch-algorithm', default='ac', choices=['ac', 'yin'])
+    stream.add_argument('--frames', action='store_true', help="Print every voiced frame")
+    stream.set_defaults(handler=cmd_stream)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line and run one subcommand.
+
+    :param argv: Command line arguments (default: sys.argv)
+    :return: Exit code
+    """
+    args = build_parser().parse_args(argv)
+    if args.cache_dir is None:
+        args.cache_dir = str(Path(args.data_root) / '.cache')
+    if args.max_memory is not None:
+        apply_memory_limit(args.max_memory)
+    if args.trace:
+        from scripts.instrumentation import configure_tracing
+        configure_tracing(Path(args.trace), track_memory=args.trace_memory)
+
+    handler: Callable[[argparse.Namespace], Tuple[int, Dict[str, Any]]] = args.handler
+    # In json mode the scripts' progress output must not mix with the result on stdout
+    progress = sys.stderr if args.format == 'json' else sys.stdout
+    try:
+        with contextlib.redirect_stdout(progress):
+            code, result = handler(args)
+    except Exception as e:
+        print(f"Error during {args.command}: {e}", file=sys.stderr)
+        code, result = 1, {'error': str(e)}
+
+    if args.format == 'json':
+        print(json.dumps({'command': args.command, 'exit_code': code, **result}, indent=2, default=str))
+    return code
 
 
 if __name__ == "__main__":
-    main()
+    exit(main())
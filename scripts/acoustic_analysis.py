@@ -0,0 +1,935 @@
+#!/usr/bin/env python3
+"""
+Acoustic Analysis
+Python implementation of the F0/F1/F2 measurements made by
+extract_features.praat, built around a per-recording analysis context.
+
+Recordings are first split into bark segments by an energy/spectral-flux
+activity detector, and pitch and formants are measured on those segments
+only, so silence and background noise cost no analysis time and undefined
+measurements stay NaN.
+
+The context computes each framing, windowing, resampling and spectrum once
+and hands the cached arrays to every analysis that asks for the same
+parameters, so pitch, formants and any further spectral features share the
+DSP work instead of each repeating it. Windows, resampling filters and
+pre-emphasis coefficients depend only on (sample rate, frame parameters) and
+are memoized across recordings.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy import signal
+from scipy.io import wavfile
+
+# Praat "To Pitch (ac)" settings used by extract_features.praat
+PITCH_FLOOR = 75.0
+PITCH_CEILING = 800.0
+MAX_PITCH_CANDIDATES = 15
+SILENCE_THRESHOLD = 0.03
+VOICING_THRESHOLD = 0.45
+OCTAVE_COST = 0.01
+OCTAVE_JUMP_COST = 0.35
+VOICED_UNVOICED_COST = 0.14
+YIN_THRESHOLD = 0.1
+
+# Praat "To Formant (burg)" settings used by extract_features.praat
+MAX_FORMANTS = 5
+MAX_FORMANT_FREQUENCY = 5500.0
+FORMANT_WINDOW_LENGTH = 0.025
+PREEMPHASIS_FROM = 50.0
+FORMANT_MARGIN = 50.0
+
+# Bark segmentation (activity detection) settings
+SEGMENT_FRAME_LENGTH = 0.025
+SEGMENT_TIME_STEP = 0.01
+ENERGY_MARGIN_DB = 12.0
+NOISE_FLOOR_PERCENTILE = 10.0
+FLUX_RATIO = 3.0
+MIN_SEGMENT_DURATION = 0.03
+MAX_SEGMENT_GAP = 0.05
+SEGMENT_PADDING = 0.5 / PITCH_FLOOR
+
+# Feature bank settings
+N_MFCC = 12
+N_MELS = 40
+ROLLOFF_FRACTION = 0.85
+MAX_PERIOD_FACTOR = 1.3
+DISPERSION_FORMANTS = 4
+CORE_FEATURES = ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']
+FEATURE_BANK_COLUMNS = (['HNR_mean', 'jitter_local', 'shimmer_local', 'spectral_centroid_mean',
+                         'spectral_rolloff_mean', 'formant_dispersion']
+                        + [f'MFCC{i}_mean' for i in range(1, N_MFCC + 1)])
+
+
+@lru_cache(maxsize=None)
+def get_window(name: str, length: int) -> np.ndarray:
+    """
+    Window function of a given length, memoized and read-only.
+
+    :param name: "hann" or "gaussian" (Praat's Gaussian analysis window)
+    :param length: Window length in samples
+    :return: Window array
+    """
+    if name == 'gaussian':
+        edge = np.exp(-12.0)
+        t = (np.arange(length) + 0.5) / length
+        window = (np.exp(-48.0 * (t - 0.5) ** 2) - edge) / (1.0 - edge)
+    else:
+        window = signal.get_window(name, length, fftbins=False)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=None)
+def fft_length(n: int) -> int:
+    """
+    Fast FFT length for zero-padded (linear) correlation of n samples.
+
+    :param n: Frame length in samples
+    :return: FFT length >= 2n
+    """
+    return sp_fft.next_fast_len(2 * n, real=True)
+
+
+@lru_cache(maxsize=None)
+def window_autocorrelation(name: str, length: int) -> np.ndarray:
+    """
+    Normalized autocorrelation of a window, used to undo the window's taper in pitch analysis.
+
+    :param name: Window name
+    :param length: Window length in samples
+    :return: Autocorrelation for lags 0..length-1, 1 at lag 0
+    """
+    n_fft = fft_length(length)
+    spectrum = sp_fft.rfft(get_window(name, length), n_fft)
+    autocorrelation = sp_fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft)[:length]
+    autocorrelation = autocorrelation / autocorrelation[0]
+    autocorrelation.flags.writeable = False
+    return autocorrelation
+
+
+@lru_cache(maxsize=None)
+def resampling_filter(source_rate: int, target_rate: int) -> Tuple[int, int, np.ndarray]:
+    """
+    Polyphase resampling factors and anti-aliasing FIR for a pair of sample rates.
+
+    :param source_rate: Original sample rate
+    :param target_rate: Target sample rate
+    :return: (up, down, FIR coefficients)
+    """
+    divisor = np.gcd(int(source_rate), int(target_rate))
+    up, down = int(target_rate) // divisor, int(source_rate) // divisor
+    max_rate = max(up, down)
+    # Same design as scipy.signal.resample_poly's default, computed once per rate pair
+    coefficients = signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+    coefficients.flags.writeable = False
+    return up, down, coefficients
+
+
+@lru_cache(maxsize=None)
+def mel_filterbank(sample_rate: int, n_fft: int, n_mels: int = N_MELS) -> np.ndarray:
+    """
+    Triangular mel filterbank for power spectra of a given FFT length.
+
+    :param sample_rate: Sample rate
+    :param n_fft: FFT length
+    :param n_mels: Number of mel bands between 0 Hz and the Nyquist frequency
+    :return: Filterbank, shape (n_mels, n_fft // 2 + 1)
+    """
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+    edges = 700.0 * (10.0 ** (np.linspace(0.0, hz_to_mel(sample_rate / 2.0), n_mels + 2) / 2595.0) - 1.0)
+    freqs = sp_fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs[None, :] - lower) / (centre - lower)
+    falling = (upper - freqs[None, :]) / (upper - centre)
+    filterbank = np.maximum(0.0, np.minimum(rising, falling))
+    filterbank.flags.writeable = False
+    return filterbank
+
+
+@lru_cache(maxsize=None)
+def preemphasis_coefficient(sample_rate: float, from_hz: float) -> float:
+    """
+    First-order pre-emphasis coefficient as used by Praat.
+
+    :param sample_rate: Sample rate
+    :param from_hz: Frequency above which the spectrum is boosted by 6 dB/octave
+    :return: Filter coefficient
+    """
+    return float(np.exp(-2.0 * np.pi * from_hz / sample_rate))
+
+
+def as_mono_float(samples: np.ndarray) -> np.ndarray:
+    """
+    Samples as contiguous float64 mono, with integer PCM scaled to [-1, 1].
+
+    :param samples: Mono or multi-channel samples (channels last)
+    :return: Mono float samples
+    """
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples / float(np.iinfo(samples.dtype).max)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float64)
+
+
+def frame_grid(n_samples: int, sample_rate: float, frame_length: int, step: int) -> Tuple[int, int]:
+    """
+    Number of frames and first frame start, with frames centred in the signal as in Praat.
+
+    :param n_samples: Signal length in samples
+    :param sample_rate: Sample rate
+    :param frame_length: Frame length in samples
+    :param step: Frame step in samples
+    :return: (number of frames, start sample of the first frame)
+    """
+    if n_samples < frame_length:
+        return 0, 0
+    n_frames = (n_samples - frame_length) // step + 1
+    first = (n_samples - frame_length - (n_frames - 1) * step) // 2
+    return int(n_frames), int(first)
+
+
+class AnalysisContext:
+    """
+    Per-recording cache of derived signals and framed representations.
+
+    Every accessor is keyed by its parameters, so analyses asking for the same
+    resampling, framing, window or spectrum get the already computed arrays.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, reference_peak: Optional[float] = None) -> None:
+        """
+        Create an analysis context.
+
+        :param samples: Mono or multi-channel samples (channels last)
+        :param sample_rate: Sample rate in Hz
+        :param reference_peak: Peak amplitude that silence thresholds are relative to
+                               (default: the peak of these samples)
+        """
+        self.samples = as_mono_float(samples)
+        self.sample_rate = int(sample_rate)
+        if reference_peak is None:
+            reference_peak = float(np.abs(self.samples).max()) if len(self.samples) else 0.0
+        self.reference_peak = reference_peak
+        self._cache: Dict[tuple, object] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'AnalysisContext':
+        """
+        Load a WAV file into an analysis context.
+
+        :param path: Path to the WAV file
+        :return: Analysis context
+        """
+        sample_rate, samples = wavfile.read(path)
+        return cls(samples, sample_rate)
+
+    @property
+    def duration(self) -> float:
+        """
+        Recording duration in seconds.
+
+        :return: Duration
+        """
+        return len(self.samples) / self.sample_rate
+
+    def segment(self, start: float, end: float) -> 'AnalysisContext':
+        """
+        Context for a time range of this recording (a view, sharing the reference peak).
+
+        :param start: Start time in seconds
+        :param end: End time in seconds
+        :return: Analysis context for the range
+        """
+        first = max(int(round(start * self.sample_rate)), 0)
+        last = min(int(round(end * self.sample_rate)), len(self.samples))
+        return AnalysisContext(self.samples[first:last], self.sample_rate, self.reference_peak)
+
+    def _cached(self, key: tuple, compute):
+        """
+        Return a cached value, computing it on first use.
+
+        :param key: Cache key
+        :param compute: Zero-argument function producing the value
+        :return: Cached value
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def resampled(self, target_rate: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """
+        The signal at a lower sample rate (never upsampled).
+
+        :param target_rate: Desired sample rate (None keeps the original)
+        :return: (samples, sample rate)
+        """
+        if target_rate is None or int(target_rate) >= self.sample_rate:
+            return self.samples, self.sample_rate
+        target_rate = int(target_rate)
+
+        def compute() -> np.ndarray:
+            up, down, coefficients = resampling_filter(self.sample_rate, target_rate)
+            return signal.resample_poly(self.samples, up, down, window=coefficients)
+
+        return self._cached(('resampled', target_rate), compute), target_rate
+
+    def preemphasized(self, target_rate: Optional[float] = None,
+                      from_hz: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """
+        The (resampled) signal with first-order pre-emphasis.
+
+        :param target_rate: Sample rate, see resampled()
+        :param from_hz: Pre-emphasis frequency (None for no pre-emphasis)
+        :return: (samples, sample rate)
+        """
+        samples, rate = self.resampled(target_rate)
+        if from_hz is None:
+            return samples, rate
+
+        def compute() -> np.ndarray:
+            emphasized = samples.copy()
+            emphasized[1:] -= preemphasis_coefficient(rate, from_hz) * samples[:-1]
+            return emphasized
+
+        return self._cached(('preemphasized', rate, from_hz), compute), rate
+
+    def frames(self, frame_length: float, time_step: float, target_rate: Optional[float] = None,
+               preemphasis_from: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overlapping frames of the signal as a (frames, samples) view.
+
+        :param frame_length: Frame length in seconds
+        :param time_step: Frame step in seconds
+        :param target_rate: Sample rate, see resampled()
+        :param preemphasis_from: Pre-emphasis frequency, see preemphasized()
+        :return: (frame centre times in seconds, frames)
+        """
+        samples, rate = self.preemphasized(target_rate, preemphasis_from)
+        length = int(round(frame_length * rate))
+        step = max(int(round(time_step * rate)), 1)
+
+        def compute() -> Tuple[np.ndarray, np.ndarray]:
+            n_frames, first = frame_grid(len(samples), rate, length, step)
+            if n_frames == 0:
+                return np.empty(0), np.empty((0, length))
+            view = np.lib.stride_tricks.sliding_window_view(samples[first:], length)[::step][:n_frames]
+            times = (first + np.arange(n_frames) * step + length / 2) / rate
+            return times, view
+
+        return self._cached(('frames', rate, preemphasis_from, length, step), compute)
+
+    def windowed_frames(self, frame_length: float, time_step: float, window: str = 'hann',
+                        target_rate: Optional[float] = None,
+                        preemphasis_from: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Frames multiplied by an analysis window.
+
+        :param frame_length: Frame length in seconds
+        :param time_step: Frame step in seconds
+        :param window: Window name, see get_window()
+        :param target_rate: Sample rate, see resampled()
+        :param preemphasis_from: Pre-emphasis frequency, see preemphasized()
+        :return: (frame centre times in seconds, windowed frames)
+        """
+        times, frames = self.frames(frame_length, time_step, target_rate, preemphasis_from)
+        key = ('windowed', window, frame_length, time_step, target_rate, preemphasis_from)
+        return times, self._cached(key, lambda: frames * get_window(window, frames.shape[1]))
+
+    def power_spectrum(self, frame_length: float, time_step: float, window: str = 'hann',
+                       target_rate: Optional[float] = None,
+                       preemphasis_from: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Power spectra of the windowed frames, zero-padded to fft_length(frame length).
+
+        The padding makes the spectra usable for linear autocorrelation as well
+        as spectral features.
+
+        :param frame_length: Frame length in seconds
+        :param time_step: Frame step in seconds
+        :param window: Window name, see get_window()
+        :param target_rate: Sample rate, see resampled()
+        :param preemphasis_from: Pre-emphasis frequency, see preemphasized()
+        :return: (frame centre times in seconds, power spectra)
+        """
+        times, windowed = self.windowed_frames(frame_length, time_step, window, target_rate, preemphasis_from)
+
+        def compute() -> np.ndarray:
+            spectrum = sp_fft.rfft(windowed, fft_length(windowed.shape[1]), axis=1)
+            return spectrum.real ** 2 + spectrum.imag ** 2
+
+        key = ('power', window, frame_length, time_step, target_rate, preemphasis_from)
+        return times, self._cached(key, compute)
+
+
+def pitch_candidates(ctx: AnalysisContext, floor: float = PITCH_FLOOR, ceiling: float = PITCH_CEILING,
+                     max_candidates: int = MAX_PITCH_CANDIDATES, silence_threshold: float = SILENCE_THRESHOLD,
+                     voicing_threshold: float = VOICING_THRESHOLD,
+                     octave_cost: float = OCTAVE_COST) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-frame pitch candidates following Praat's "To Pitch (ac)".
+
+    Frames span three periods of the pitch floor; the windowed autocorrelation
+    is divided by the window's own autocorrelation and its strongest peaks
+    (with Praat's octave cost) become the voiced candidates. Candidate 0 of
+    every frame is the unvoiced candidate, whose strength grows in quiet frames.
+
+    :param ctx: Analysis context
+    :param floor: Pitch floor in Hz
+    :param ceiling: Pitch ceiling in Hz
+    :param max_candidates: Maximum candidates per frame, including the unvoiced one
+    :param silence_threshold: Relative frame peak below which a frame counts as silent
+    :param voicing_threshold: Normalized autocorrelation needed for a voiced candidate to win
+    :param octave_cost: Preference for higher pitch per octave
+    :return: (frame times, candidate frequencies (0 = unvoiced), candidate strengths (-inf = none))
+    """
+    frame_length, time_step = 3.0 / floor, 0.75 / floor
+    times, power = ctx.power_spectrum(frame_length, time_step, 'hann')
+    _, frames = ctx.frames(frame_length, time_step)
+    n_frames = len(times)
+    frequencies = np.zeros((n_frames, max_candidates))
+    strengths = np.full((n_frames, max_candidates), -np.inf)
+    if n_frames == 0:
+        return times, frequencies, strengths
+
+    length = frames.shape[1]
+    rate = ctx.sample_rate
+    autocorrelation = sp_fft.irfft(power, fft_length(length), axis=1)[:, :length]
+    energy = autocorrelation[:, :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = autocorrelation / np.where(energy > 0, energy, np.nan) / window_autocorrelation('hann', length)
+    normalized = np.nan_to_num(normalized, nan=0.0)
+
+    # Unvoiced candidate: strong in frames that are quiet relative to the recording
+    local_peak = np.abs(frames).max(axis=1)
+    global_peak = ctx.reference_peak
+    relative_peak = local_peak / global_peak if global_peak > 0 else np.zeros(n_frames)
+    strengths[:, 0] = voicing_threshold + np.maximum(
+        0.0, 2.0 - relative_peak / (silence_threshold / (1.0 + voicing_threshold)))
+
+    min_lag = max(int(np.ceil(rate / ceiling)), 2)
+    max_lag = min(int(np.floor(rate / floor)), length // 2)
+    if max_lag <= min_lag:
+        return times, frequencies, strengths
+    lags = np.arange(min_lag, max_lag + 1)
+    peaks = normalized[:, min_lag:max_lag + 1]
+    is_peak = ((peaks > normalized[:, min_lag - 1:max_lag]) & (peaks >= normalized[:, min_lag + 1:max_lag + 2])
+               & (peaks > 0.5 * voicing_threshold))
+
+    # Strongest local maxima per frame, refined by parabolic interpolation
+    n_voiced = min(max_candidates - 1, len(lags))
+    ranking = np.where(is_peak, peaks, -np.inf)
+    best = np.argpartition(-ranking, n_voiced - 1, axis=1)[:, :n_voiced]
+    lag = lags[best]
+    rows = np.arange(n_frames)[:, None]
+    y0, y1, y2 = normalized[rows, lag - 1], normalized[rows, lag], normalized[rows, lag + 1]
+    curvature = y0 - 2.0 * y1 + y2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(curvature < 0, np.clip(0.5 * (y0 - y2) / curvature, -0.5, 0.5), 0.0)
+    peak_value = y1 - 0.25 * (y0 - y2) * offset
+    true_lag = (lag + offset) / rate
+    present = np.isfinite(ranking[rows, best])
+    frequencies[:, 1:n_voiced + 1] = np.where(present, 1.0 / true_lag, 0.0)
+    strengths[:, 1:n_voiced + 1] = np.where(present, peak_value - octave_cost * np.log2(floor * true_lag), -np.inf)
+    return times, frequencies, strengths
+
+
+def pitch_transition_cost(previous: np.ndarray, current: np.ndarray, time_step: float,
+                          octave_jump_cost: float = OCTAVE_JUMP_COST,
+                          voiced_unvoiced_cost: float = VOICED_UNVOICED_COST) -> np.ndarray:
+    """
+    Viterbi transition costs between the candidates of two consecutive frames.
+
+    :param previous: Candidate frequencies of the previous frame, 0 = unvoiced
+    :param current: Candidate frequencies of the current frame, 0 = unvoiced
+    :param time_step: Frame step in seconds (costs are scaled to a 10 ms step)
+    :param octave_jump_cost: Cost per octave between consecutive voiced frames
+    :param voiced_unvoiced_cost: Cost of a voicing change
+    :return: Cost matrix (previous candidates, current candidates)
+    """
+    previous_voiced, current_voiced = previous > 0, current > 0
+    log_previous = np.log2(np.where(previous_voiced, previous, 1.0))
+    log_current = np.log2(np.where(current_voiced, current, 1.0))
+    cost = np.where(previous_voiced[:, None] & current_voiced[None, :],
+                    octave_jump_cost * np.abs(log_previous[:, None] - log_current[None, :]),
+                    np.where(previous_voiced[:, None] != current_voiced[None, :], voiced_unvoiced_cost, 0.0))
+    return cost * (0.01 / time_step)
+
+
+def pitch_path(frequencies: np.ndarray, strengths: np.ndarray, time_step: float,
+               octave_jump_cost: float = OCTAVE_JUMP_COST,
+               voiced_unvoiced_cost: float = VOICED_UNVOICED_COST) -> np.ndarray:
+    """
+    Choose one candidate per frame with Praat's Viterbi path search.
+
+    Transitions are penalized per octave jumped between voiced frames and per
+    voicing change, which removes isolated octave errors.
+
+    :param frequencies: Candidate frequencies (frames, candidates), 0 = unvoiced
+    :param strengths: Candidate strengths, -inf for missing candidates
+    :param time_step: Frame step in seconds (costs are scaled to a 10 ms step)
+    :param octave_jump_cost: Cost per octave between consecutive voiced frames
+    :param voiced_unvoiced_cost: Cost of a voicing change
+    :return: Index of the chosen candidate per frame
+    """
+    n_frames = len(frequencies)
+    if n_frames == 0:
+        return np.empty(0, dtype=np.intp)
+
+    delta = strengths[0].copy()
+    backpointers = np.zeros(frequencies.shape, dtype=np.intp)
+    for t in range(1, n_frames):
+        cost = pitch_transition_cost(frequencies[t - 1], frequencies[t], time_step,
+                                     octave_jump_cost, voiced_unvoiced_cost)
+        total = delta[:, None] - cost
+        backpointers[t] = np.argmax(total, axis=0)
+        delta = total[backpointers[t], np.arange(total.shape[1])] + strengths[t]
+
+    path = np.empty(n_frames, dtype=np.intp)
+    path[-1] = int(np.argmax(delta))
+    for t in range(n_frames - 1, 0, -1):
+        path[t - 1] = backpointers[t, path[t]]
+    return path
+
+
+def pitch_analysis(ctx: AnalysisContext, floor: float = PITCH_FLOOR,
+                   ceiling: float = PITCH_CEILING) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pitch track plus the normalized autocorrelation at the chosen period.
+
+    :param ctx: Analysis context
+    :param floor: Pitch floor in Hz
+    :param ceiling: Pitch ceiling in Hz
+    :return: (frame times, F0 in Hz, autocorrelation at F0; NaN for unvoiced frames)
+    """
+    times, frequencies, strengths = pitch_candidates(ctx, floor, ceiling)
+    rows = np.arange(len(times))
+    path = pitch_path(frequencies, strengths, 0.75 / floor)
+    chosen = frequencies[rows, path]
+    f0 = np.where(chosen > 0, chosen, np.nan)
+    # Undo the octave cost to recover the autocorrelation peak itself
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = strengths[rows, path] + OCTAVE_COST * np.log2(floor / f0)
+    return times, f0, correlation
+
+
+def pitch_track(ctx: AnalysisContext, floor: float = PITCH_FLOOR,
+                ceiling: float = PITCH_CEILING) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Autocorrelation pitch track equivalent to the Praat script's "To Pitch (ac)" call.
+
+    :param ctx: Analysis context
+    :param floor: Pitch floor in Hz
+    :param ceiling: Pitch ceiling in Hz
+    :return: (frame times, F0 in Hz with NaN for unvoiced frames)
+    """
+    times, f0, _ = pitch_analysis(ctx, floor, ceiling)
+    return times, f0
+
+
+def yin_analysis(ctx: AnalysisContext, floor: float = PITCH_FLOOR, ceiling: float = PITCH_CEILING,
+                 threshold: float = YIN_THRESHOLD,
+                 silence_threshold: float = SILENCE_THRESHOLD) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    YIN pitch track with the difference function computed for all frames at once.
+
+    Each frame holds an integration window of one pitch-floor period followed
+    by the lags; the difference function comes from one batched FFT
+    cross-correlation plus cumulative energies, and its cumulative mean
+    normalized form is searched for the first dip below the threshold.
+    Frames with no dip, or quieter than silence_threshold of the recording
+    peak, are unvoiced.
+
+    :param ctx: Analysis context
+    :param floor: Pitch floor in Hz
+    :param ceiling: Pitch ceiling in Hz
+    :param threshold: Absolute threshold on the normalized difference
+    :param silence_threshold: Relative frame peak below which a frame is silent
+    :return: (frame times, F0 in Hz, periodicity 1 - d'(T0); NaN for unvoiced frames)
+    """
+    rate = ctx.sample_rate
+    max_lag = int(np.ceil(rate / floor))
+    min_lag = max(int(np.floor(rate / ceiling)), 2)
+    times, frames = ctx.frames((2 * max_lag + 2) / rate, 0.75 / floor)
+    n_frames = len(times)
+    if n_frames == 0 or frames.shape[1] < 2 * max_lag + 2:
+        return times, np.full(n_frames, np.nan), np.full(n_frames, np.nan)
+
+    # d(tau) = e(0) + e(tau) - 2 r(tau) over an integration window of max_lag samples
+    n_fft = fft_length(frames.shape[1])
+    cross = sp_fft.irfft(sp_fft.rfft(frames, n_fft, axis=1)
+                         * np.conj(sp_fft.rfft(frames[:, :max_lag], n_fft, axis=1)), n_fft, axis=1)[:, :max_lag + 2]
+    energy = np.concatenate((np.zeros((n_frames, 1)), np.cumsum(frames ** 2, axis=1)), axis=1)
+    lags = np.arange(max_lag + 2)
+    window_energy = energy[:, lags + max_lag] - energy[:, lags]
+    difference = np.maximum(window_energy[:, :1] + window_energy - 2.0 * cross, 0.0)
+
+    cumulative = np.cumsum(difference[:, 1:], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.ones_like(difference)
+        normalized[:, 1:] = np.where(cumulative > 0, difference[:, 1:] * lags[1:] / cumulative, 1.0)
+
+    # First dip below the threshold, followed down to its local minimum
+    search = normalized[:, min_lag:max_lag + 1]
+    below = search < threshold
+    has_dip = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+    rising = normalized[:, min_lag + 1:max_lag + 2] >= search
+    offsets = np.arange(search.shape[1])
+    best = np.argmax(rising & (offsets >= first[:, None]), axis=1)
+    lag = min_lag + best
+
+    rows = np.arange(n_frames)
+    y0, y1, y2 = normalized[rows, lag - 1], normalized[rows, lag], normalized[rows, lag + 1]
+    curvature = y0 - 2.0 * y1 + y2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(curvature > 0, np.clip(0.5 * (y0 - y2) / curvature, -0.5, 0.5), 0.0)
+    minimum = y1 - 0.25 * (y0 - y2) * shift
+
+    voiced = has_dip & (np.abs(frames).max(axis=1) > silence_threshold * ctx.reference_peak)
+    f0 = np.where(voiced, rate / (lag + shift), np.nan)
+    periodicity = np.where(voiced, 1.0 - minimum, np.nan)
+    return times, f0, periodicity
+
+
+# Pitch algorithms: name -> callable(ctx, floor, ceiling) -> (times, F0, periodicity)
+PITCH_ALGORITHMS: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {
+    'ac': pitch_analysis,
+    'yin': yin_analysis,
+}
+
+
+def burg_lpc(frames: np.ndarray, order: int) -> np.ndarray:
+    """
+    Burg linear prediction coefficients for every frame at once.
+
+    :param frames: Windowed frames, shape (frames, samples)
+    :param order: Prediction order
+    :return: Coefficients a[0..order] per frame with a[0] = 1 (NaN rows for silent frames)
+    """
+    n_frames = frames.shape[0]
+    coefficients = np.zeros((n_frames, order + 1))
+    coefficients[:, 0] = 1.0
+    forward = frames[:, 1:].copy()
+    backward = frames[:, :-1].copy()
+    for m in range(order):
+        denominator = np.einsum('ij,ij->i', forward, forward) + np.einsum('ij,ij->i', backward, backward)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reflection = -2.0 * np.einsum('ij,ij->i', forward, backward) / denominator
+        reflection = reflection[:, None]
+        coefficients[:, :m + 2] = coefficients[:, :m + 2] + reflection * coefficients[:, m + 1::-1]
+        forward, backward = forward[:, 1:] + reflection * backward[:, 1:], backward[:, :-1] + reflection * forward[:, :-1]
+    return coefficients
+
+
+def lpc_formants(coefficients: np.ndarray, sample_rate: float, max_formants: int = MAX_FORMANTS) -> np.ndarray:
+    """
+    Formant frequencies from prediction polynomials, as in Praat's "To Formant (burg)".
+
+    :param coefficients: Prediction coefficients per frame (see burg_lpc)
+    :param sample_rate: Sample rate of the analyzed frames
+    :param max_formants: Number of formants to keep
+    :return: Formant frequencies (frames, max_formants) with NaN where undefined
+    """
+    order = coefficients.shape[1] - 1
+    formants = np.full((len(coefficients), max_formants), np.nan)
+    valid = np.isfinite(coefficients).all(axis=1)
+    if not valid.any():
+        return formants
+
+    # Roots of all prediction polynomials at once via batched companion matrices
+    companion = np.zeros((int(valid.sum()), order, order))
+    companion[:, 0, :] = -coefficients[valid, 1:]
+    companion[:, np.arange(1, order), np.arange(order - 1)] = 1.0
+    roots = np.linalg.eigvals(companion)
+    frequencies = np.angle(roots) * sample_rate / (2.0 * np.pi)
+    usable = ((roots.imag > 0) & (frequencies > FORMANT_MARGIN)
+              & (frequencies < sample_rate / 2.0 - FORMANT_MARGIN))
+    frequencies = np.sort(np.where(usable, frequencies, np.nan), axis=1)[:, :max_formants]
+    formants[valid, :frequencies.shape[1]] = frequencies
+    return formants
+
+
+def formant_track(ctx: AnalysisContext, max_formants: int = MAX_FORMANTS,
+                  max_frequency: float = MAX_FORMANT_FREQUENCY, window_length: float = FORMANT_WINDOW_LENGTH,
+                  preemphasis_from: float = PREEMPHASIS_FROM) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Formant track following Praat's "To Formant (burg)".
+
+    The signal is resampled to twice the maximum formant frequency and
+    pre-emphasized; Gaussian-windowed frames of twice the window length are
+    fitted with Burg LPC of order 2 * max_formants, and formants are the
+    polynomial roots between 50 Hz and the Nyquist frequency minus 50 Hz.
+
+    :param ctx: Analysis context
+    :param max_formants: Number of formants to look for
+    :param max_frequency: Maximum formant frequency in Hz
+    :param window_length: Effective window length in seconds
+    :param preemphasis_from: Pre-emphasis frequency in Hz
+    :return: (frame times, formant frequencies (frames, max_formants) with NaN where undefined)
+    """
+    target_rate = 2.0 * max_frequency
+    times, windowed = ctx.windowed_frames(2.0 * window_length, window_length / 4.0, 'gaussian',
+                                          target_rate, preemphasis_from)
+    _, rate = ctx.resampled(target_rate)
+    return times, lpc_formants(burg_lpc(windowed, 2 * max_formants), rate, max_formants)
+
+
+def _summary(values: np.ndarray, reducer) -> float:
+    """
+    Reduce the defined values of a track.
+
+    :param values: Track values with NaN where undefined
+    :param reducer: numpy reduction
+    :return: Reduced value, NaN if nothing is defined
+    """
+    defined = values[np.isfinite(values)]
+    return float(reducer(defined)) if len(defined) else float('nan')
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Start and end (exclusive) indices of the True runs in a boolean array.
+
+    :param mask: Boolean array
+    :return: (starts, ends)
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_segments(ctx: AnalysisContext, margin_db: float = ENERGY_MARGIN_DB, flux_ratio: float = FLUX_RATIO,
+                    min_duration: float = MIN_SEGMENT_DURATION, max_gap: float = MAX_SEGMENT_GAP,
+                    padding: float = SEGMENT_PADDING) -> np.ndarray:
+    """
+    Find bark segments with an energy and spectral-flux activity detector.
+
+    A frame is active when its energy is margin_db above the noise floor
+    (a low percentile of the frame energies), or when it is an onset (spectral
+    flux above flux_ratio times the median) at least half that margin above the
+    floor. The threshold never exceeds the loudest frame minus margin_db, so
+    clips without silence stay active. Active runs separated by less than
+    max_gap are merged, runs shorter than min_duration dropped, and segments
+    padded so pitch frames centred on the edges still fit.
+
+    :param ctx: Analysis context
+    :param margin_db: Energy above the noise floor that counts as activity
+    :param flux_ratio: Spectral flux (relative to its median) that marks an onset
+    :param min_duration: Shortest segment kept, in seconds
+    :param max_gap: Longest pause bridged inside a segment, in seconds
+    :param padding: Padding added on both sides of a segment, in seconds
+    :return: Segment (start, end) times in seconds, shape (segments, 2)
+    """
+    times, power = ctx.power_spectrum(SEGMENT_FRAME_LENGTH, SEGMENT_TIME_STEP, 'hann')
+    if len(times) == 0 or ctx.reference_peak == 0:
+        return np.empty((0, 2))
+
+    energy_db = 10.0 * np.log10(power.sum(axis=1) + 1e-20)
+    noise_floor = np.percentile(energy_db, NOISE_FLOOR_PERCENTILE)
+    threshold = min(noise_floor + margin_db, energy_db.max() - margin_db)
+
+    magnitude = np.log1p(np.sqrt(power))
+    flux = np.concatenate(([0.0], np.maximum(np.diff(magnitude, axis=0), 0.0).mean(axis=1)))
+    onset = flux > flux_ratio * max(np.median(flux), 1e-12)
+    active = (energy_db > threshold) | (onset & (energy_db > threshold - margin_db / 2.0))
+
+    starts, ends = _runs(active)
+    if len(starts) == 0:
+        return np.empty((0, 2))
+    half_step = SEGMENT_TIME_STEP / 2.0
+    segment_starts, segment_ends = times[starts] - half_step, times[ends - 1] + half_step
+
+    # Bridge short pauses, then drop blips
+    keep_break = np.concatenate(([True], segment_starts[1:] - segment_ends[:-1] > max_gap))
+    segment_starts = segment_starts[keep_break]
+    segment_ends = np.maximum.reduceat(segment_ends, np.flatnonzero(keep_break))
+    long_enough = segment_ends - segment_starts >= min_duration
+    segment_starts, segment_ends = segment_starts[long_enough], segment_ends[long_enough]
+    if len(segment_starts) == 0:
+        return np.empty((0, 2))
+
+    # Pad, clip to the recording and merge segments the padding made overlap
+    segment_starts = np.maximum(segment_starts - padding, 0.0)
+    segment_ends = np.minimum(segment_ends + padding, ctx.duration)
+    new_segment = np.concatenate(([True], segment_starts[1:] > segment_ends[:-1]))
+    segment_ends = np.maximum.reduceat(segment_ends, np.flatnonzero(new_segment))
+    return np.column_stack((segment_starts[new_segment], segment_ends))
+
+
+def segment_mask(times: np.ndarray, segments: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Which frames lie inside any of the segments.
+
+    :param times: Frame centre times
+    :param segments: (start, end) times (None for all frames)
+    :return: Boolean mask per frame
+    """
+    if segments is None:
+        return np.ones(len(times), dtype=bool)
+    if len(segments) == 0:
+        return np.zeros(len(times), dtype=bool)
+    return ((times[:, None] >= segments[None, :, 0]) & (times[:, None] <= segments[None, :, 1])).any(axis=1)
+
+
+def spectral_features(ctx: AnalysisContext, segments: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """
+    Spectral centroid, 85% rolloff and MFCC means over the frames inside the segments.
+
+    Uses the same framed power spectra as detect_segments(), so the spectra are
+    computed once per recording.
+
+    :param ctx: Analysis context
+    :param segments: (start, end) times (None for the whole recording)
+    :return: spectral_centroid_mean, spectral_rolloff_mean and MFCC<i>_mean
+    """
+    times, power = ctx.power_spectrum(SEGMENT_FRAME_LENGTH, SEGMENT_TIME_STEP, 'hann')
+    power = power[segment_mask(times, segments)]
+    total = power.sum(axis=1)
+    power = power[total > 0]
+    total = total[total > 0]
+    features = {f'MFCC{i}_mean': float('nan') for i in range(1, N_MFCC + 1)}
+    if len(power) == 0:
+        return {'spectral_centroid_mean': float('nan'), 'spectral_rolloff_mean': float('nan'), **features}
+
+    n_fft = 2 * (power.shape[1] - 1)
+    freqs = sp_fft.rfftfreq(n_fft, 1.0 / ctx.sample_rate)
+    centroid = power @ freqs / total
+    rolloff = freqs[np.argmax(np.cumsum(power, axis=1) >= ROLLOFF_FRACTION * total[:, None], axis=1)]
+    log_mel = np.log(power @ mel_filterbank(ctx.sample_rate, n_fft).T + 1e-10)
+    mfcc = sp_fft.dct(log_mel, type=2, norm='ortho', axis=1)[:, 1:N_MFCC + 1]
+    features.update({f'MFCC{i}_mean': float(value) for i, value in enumerate(mfcc.mean(axis=0), start=1)})
+    return {'spectral_centroid_mean': float(centroid.mean()), 'spectral_rolloff_mean': float(rolloff.mean()),
+            **features}
+
+
+def glottal_cycles(ctx: AnalysisContext, times: np.ndarray, f0: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cycle periods and peak amplitudes from waveform peaks in voiced frames.
+
+    A peak-picking approximation of Praat's pulse detection: one peak per
+    period is found with a minimum distance of 0.7 times the shortest expected
+    period, and only cycles within MAX_PERIOD_FACTOR of the local pitch
+    period are kept.
+
+    :param ctx: Analysis context
+    :param times: Pitch frame times
+    :param f0: F0 per frame (NaN when unvoiced)
+    :return: (periods in seconds, amplitude of the peak ending each period)
+    """
+    voiced = np.isfinite(f0)
+    if voiced.sum() < 2:
+        return np.empty(0), np.empty(0)
+    rate = ctx.sample_rate
+    peaks, _ = signal.find_peaks(ctx.samples, distance=max(1, int(0.7 * rate / np.nanmax(f0))))
+    if len(peaks) < 3:
+        return np.empty(0), np.empty(0)
+
+    peak_times = peaks / rate
+    nearest = np.clip(np.searchsorted(times, peak_times), 0, len(times) - 1)
+    expected = 1.0 / np.interp(peak_times, times[voiced], f0[voiced])
+    periods = np.diff(peak_times)
+    plausible = (voiced[nearest[1:]] & voiced[nearest[:-1]]
+                 & (periods < expected[1:] * MAX_PERIOD_FACTOR) & (periods > expected[1:] / MAX_PERIOD_FACTOR))
+    return np.where(plausible, periods, np.nan), np.where(plausible, ctx.samples[peaks[1:]], np.nan)
+
+
+def _relative_perturbation(values: np.ndarray) -> float:
+    """
+    Mean absolute difference of consecutive defined values over their mean (Praat's "local" measures).
+
+    :param values: Per-cycle values with NaN breaks between voiced stretches
+    :return: Relative perturbation, NaN with fewer than two consecutive cycles
+    """
+    differences = np.abs(np.diff(values))
+    differences = differences[np.isfinite(differences)]
+    defined = values[np.isfinite(values)]
+    if len(differences) == 0 or defined.mean() == 0:
+        return float('nan')
+    return float(differences.mean() / np.abs(defined).mean())
+
+
+def analyze_recording(ctx: AnalysisContext, segments: Optional[np.ndarray] = None,
+                      feature_bank: bool = False, pitch_algorithm: str = 'ac') -> Dict[str, float]:
+    """
+    Measure the extract_features.praat feature set from one analysis context.
+
+    With feature_bank, also measure FEATURE_BANK_COLUMNS from the same
+    pitch, formant and spectral representations.
+
+    :param ctx: Analysis context
+    :param segments: (start, end) times to analyze (None for the whole recording)
+    :param feature_bank: Also compute the additional features
+    :param pitch_algorithm: Pitch algorithm from PITCH_ALGORITHMS
+    :return: F0_mean, F0_min, F0_max, F1_mean, F2_mean (+ feature bank), NaN where undefined
+    """
+    if pitch_algorithm not in PITCH_ALGORITHMS:
+        raise ValueError(f"Unknown pitch algorithm: {pitch_algorithm} (choose from {sorted(PITCH_ALGORITHMS)})")
+    parts = [ctx] if segments is None else [ctx.segment(start, end) for start, end in segments]
+    pitch = [PITCH_ALGORITHMS[pitch_algorithm](part) for part in parts]
+    f0 = np.concatenate([track[1] for track in pitch] or [np.empty(0)])
+    formants = np.concatenate([formant_track(part)[1] for part in parts] or [np.empty((0, MAX_FORMANTS))])
+    features = {
+        'F0_mean': _summary(f0, np.mean),
+        'F0_min': _summary(f0, np.min),
+        'F0_max': _summary(f0, np.max),
+        'F1_mean': _summary(formants[:, 0], np.mean),
+        'F2_mean': _summary(formants[:, 1], np.mean),
+    }
+    if not feature_bank:
+        return features
+
+    periodicity = np.clip(np.concatenate([track[2] for track in pitch] or [np.empty(0)]), 1e-6, 1.0 - 1e-6)
+    cycles = [glottal_cycles(part, times, part_f0) for part, (times, part_f0, _) in zip(parts, pitch)]
+    # NaN between segments so no cycle pair spans a segment boundary
+    periods = np.concatenate([np.append(c[0], np.nan) for c in cycles] or [np.empty(0)])
+    amplitudes = np.concatenate([np.append(c[1], np.nan) for c in cycles] or [np.empty(0)])
+    features.update({
+        'HNR_mean': _summary(10.0 * np.log10(periodicity / (1.0 - periodicity)), np.mean),
+        'jitter_local': _relative_perturbation(periods),
+        'shimmer_local': _relative_perturbation(amplitudes),
+        'formant_dispersion': _summary((formants[:, DISPERSION_FORMANTS - 1] - formants[:, 0])
+                                       / (DISPERSION_FORMANTS - 1), np.mean),
+    })
+    features.update(spectral_features(ctx, segments))
+    return features
+
+
+def analyze_file(path: Path, segment: bool = True, feature_bank: bool = False,
+                 pitch_algorithm: str = 'ac') -> Tuple[Dict[str, float], np.ndarray]:
+    """
+    Measure the extract_features.praat feature set for one WAV file.
+
+    :param path: Path to the WAV file
+    :param segment: Analyze only the detected bark segments
+    :param feature_bank: Also compute FEATURE_BANK_COLUMNS
+    :param pitch_algorithm: Pitch algorithm from PITCH_ALGORITHMS
+    :return: (feature values with NaN where undefined, analyzed (start, end) segments in seconds)
+    """
+    sample_rate, samples = wavfile.read(path)
+    return analyze_samples(samples, sample_rate, segment, feature_bank, pitch_algorithm)
+
+
+def analyze_samples(samples: np.ndarray, sample_rate: int, segment: bool = True, feature_bank: bool = False,
+                    pitch_algorithm: str = 'ac') -> Tuple[Dict[str, float], np.ndarray]:
+    """
+    Measure the extract_features.praat feature set for a recording already read into memory.
+
+    :param samples: Samples as returned by wavfile.read
+    :param sample_rate: Sample rate in Hz
+    :param segment: Analyze only the detected bark segments
+    :param feature_bank: Also compute FEATURE_BANK_COLUMNS
+    :param pitch_algorithm: Pitch algorithm from PITCH_ALGORITHMS
+    :return: (feature values with NaN where undefined, analyzed (start, end) segments in seconds)
+    """
+    ctx = AnalysisContext(samples, sample_rate)
+    segments = detect_segments(ctx) if segment else np.array([[0.0, ctx.duration]])
+    return analyze_recording(ctx, segments, feature_bank, pitch_algorithm), segments
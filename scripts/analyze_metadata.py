@@ -7,13 +7,72 @@ Analyzes the metadata.csv file to provide statistics on dog barks by breed and s
 import pandas as pd
 import os
 from collections import defaultdict
+from pathlib import Path
+from scripts.ingest import read_metadata
+from scripts.instrumentation import add_counters, traced
 
-def analyze_dogspeak_metadata(csv_path):
+def _summarize_csv(csv_path):
+    """
+    Summarize metadata.csv by loading it with pandas.
+
+    Args:
+        csv_path (str): Path to the metadata.csv file
+
+    Returns:
+        dict: Columns, breed x sex table, files per dog, dog totals and sample filenames
+    """
+    df = read_metadata(csv_path)
+    add_counters(files=1, bytes=os.path.getsize(csv_path), rows=len(df))
+    breed_sex = (df.groupby(['breed', 'sex'], sort=False, observed=True)
+                 .agg(files=('filename', 'size'), dogs=('dog_id', 'nunique')).reset_index()
+                 .astype({'breed': str, 'sex': str}))
+    return {
+        'columns': df.columns.tolist(),
+        'breed_sex': breed_sex,
+        'dog_counts': df['dog_id'].value_counts(),
+        'total_dogs': df['dog_id'].nunique(),
+        'sex_dogs': df.groupby('sex', observed=True)['dog_id'].nunique().to_dict(),
+        'sample_files': df['filename'].head(5).tolist(),
+    }
+
+
+def _summarize_index(csv_path, index_path):
+    """
+    Summarize metadata.csv with queries on the metadata index (refreshed if the CSV changed).
+
+    Args:
+        csv_path (str): Path to the metadata.csv file
+        index_path (str): Path to the SQLite metadata index
+
+    Returns:
+        dict: Same structure as _summarize_csv
+    """
+    from scripts.metadata_index import DATASET_COLLECTION, MetadataIndex
+
+    with MetadataIndex(Path(index_path)) as index:
+        index.update_metadata(Path(csv_path), Path(csv_path).parent, probe=False)
+        rows = index.breed_sex_summary(DATASET_COLLECTION)
+        sample = index.query(
+            "SELECT filename FROM recordings WHERE collection = ? ORDER BY id LIMIT 5", (DATASET_COLLECTION,))
+        return {
+            'columns': index.columns(DATASET_COLLECTION),
+            'breed_sex': pd.DataFrame(rows, columns=['breed', 'sex', 'files', 'dogs']),
+            'dog_counts': pd.Series(index.dog_file_counts(DATASET_COLLECTION)),
+            'total_dogs': index.distinct_dogs(DATASET_COLLECTION),
+            'sex_dogs': {sex: index.distinct_dogs(DATASET_COLLECTION, sex) for sex in ('male', 'female')},
+            'sample_files': [row['filename'] for row in sample],
+        }
+
+
+@traced('analyze_metadata')
+def analyze_dogspeak_metadata(csv_path, index_path=None):
     """
     Analyze the DogSpeak dataset metadata and provide comprehensive statistics.
     
     Args:
         csv_path (str): Path to the metadata.csv file
+        index_path (str): Optional SQLite metadata index to answer the queries from
+                          instead of loading the whole CSV
     
     Returns:
         dict: Analysis results
@@ -28,35 +87,38 @@ def analyze_dogspeak_metadata(csv_path):
     
     # Load the metadata
     print("Loading metadata...")
-    df = pd.read_csv(csv_path)
+    summary = _summarize_index(csv_path, index_path) if index_path else _summarize_csv(csv_path)
+    breed_sex = summary['breed_sex']
+    total_files = int(breed_sex['files'].sum())
     
     # Basic dataset info
     print(f"\n📊 Dataset Overview:")
-    print(f"   Total audio files: {len(df):,}")
-    print(f"   Columns: {', '.join(df.columns.tolist())}")
+    print(f"   Total audio files: {total_files:,}")
+    print(f"   Columns: {', '.join(summary['columns'])}")
     
     # Breed analysis
     print(f"\n🐕‍🦺 Breed Distribution:")
-    breed_counts = df['breed'].value_counts()
+    breed_counts = breed_sex.groupby('breed', sort=False)['files'].sum().sort_values(ascending=False, kind='stable')
     for breed, count in breed_counts.items():
-        percentage = (count / len(df)) * 100
+        percentage = (count / total_files) * 100
         print(f"   {breed.capitalize()}: {count:,} files ({percentage:.1f}%)")
     
     # Sex analysis
     print(f"\n♂️♀️ Sex Distribution:")
-    sex_counts = df['sex'].value_counts()
+    sex_counts = breed_sex.groupby('sex', sort=False)['files'].sum().sort_values(ascending=False, kind='stable')
     for sex, count in sex_counts.items():
-        percentage = (count / len(df)) * 100
+        percentage = (count / total_files) * 100
         print(f"   {sex.capitalize()}: {count:,} files ({percentage:.1f}%)")
     
     # Breed x Sex cross-tabulation
     print(f"\n📈 Breed × Sex Breakdown:")
-    breed_sex_crosstab = pd.crosstab(df['breed'], df['sex'], margins=True)
+    breed_sex_crosstab = breed_sex.pivot_table(index='breed', columns='sex', values='files', aggfunc='sum',
+                                               fill_value=0, margins=True)
     print(breed_sex_crosstab)
     
     # Individual dog analysis
     print(f"\n🐕 Individual Dogs:")
-    dog_counts = df['dog_id'].value_counts()
+    dog_counts = summary['dog_counts']
     print(f"   Total unique dogs: {len(dog_counts)}")
     print(f"   Files per dog (min/max/avg): {dog_counts.min()}/{dog_counts.max()}/{dog_counts.mean():.1f}")
     
@@ -64,14 +126,14 @@ def analyze_dogspeak_metadata(csv_path):
     print(f"\n🔍 Detailed Breed × Sex Analysis:")
     results = {}
     
-    for breed in df['breed'].unique():
-        breed_data = df[df['breed'] == breed]
-        male_count = len(breed_data[breed_data['sex'] == 'male'])
-        female_count = len(breed_data[breed_data['sex'] == 'female'])
+    for breed in breed_sex['breed'].unique():
+        breed_data = breed_sex[breed_sex['breed'] == breed].set_index('sex')
+        male_count = int(breed_data['files'].get('male', 0))
+        female_count = int(breed_data['files'].get('female', 0))
         
         # Count unique dogs
-        male_dogs = len(breed_data[breed_data['sex'] == 'male']['dog_id'].unique())
-        female_dogs = len(breed_data[breed_data['sex'] == 'female']['dog_id'].unique())
+        male_dogs = int(breed_data['dogs'].get('male', 0))
+        female_dogs = int(breed_data['dogs'].get('female', 0))
         
         results[breed] = {
             'male_files': male_count,
@@ -89,41 +151,47 @@ def analyze_dogspeak_metadata(csv_path):
     
     # File naming pattern analysis
     print(f"\n📁 File Naming Patterns:")
-    sample_files = df['filename'].head(5).tolist()
     print(f"   Sample filenames:")
-    for filename in sample_files:
+    for filename in summary['sample_files']:
         print(f"   • {filename}")
     
     # Summary statistics
     print(f"\n📋 Summary Statistics:")
-    total_dogs = len(df['dog_id'].unique())
-    total_male_dogs = len(df[df['sex'] == 'male']['dog_id'].unique())
-    total_female_dogs = len(df[df['sex'] == 'female']['dog_id'].unique())
+    total_dogs = summary['total_dogs']
+    total_male_dogs = summary['sex_dogs'].get('male', 0)
+    total_female_dogs = summary['sex_dogs'].get('female', 0)
+    breeds = breed_sex['breed'].unique()
     
-    print(f"   • Total recordings: {len(df):,}")
+    print(f"   • Total recordings: {total_files:,}")
     print(f"   • Total dogs: {total_dogs}")
     print(f"   • Male dogs: {total_male_dogs}")
     print(f"   • Female dogs: {total_female_dogs}")
-    print(f"   • Breeds: {len(df['breed'].unique())} ({', '.join(sorted(df['breed'].unique()))})")
-    print(f"   • Average recordings per dog: {len(df) / total_dogs:.1f}")
+    print(f"   • Breeds: {len(breeds)} ({', '.join(sorted(breeds))})")
+    print(f"   • Average recordings per dog: {total_files / total_dogs:.1f}")
     
     return results
 
-def main():
-    """Main function to run the analysis."""
-    
-    # Path to metadata file
-    metadata_path = "/Users/nika/Downloads/NMSML/DogSpeak_Dataset/metadata.csv"
+def main(metadata_path="DogSpeak_Dataset/metadata.csv", summary_path="dataset_summary.txt", index_path=None):
+    """
+    Main function to run the analysis.
+
+    Args:
+        metadata_path (str): Path to the metadata.csv file
+        summary_path (str): Path of the text summary to write
+        index_path (str): Optional SQLite metadata index to query instead of loading the CSV
+
+    Returns:
+        int: Exit code
+    """
     
     try:
         # Run analysis
-        results = analyze_dogspeak_metadata(metadata_path)
+        results = analyze_dogspeak_metadata(metadata_path, index_path)
         
         print(f"\n✅ Analysis completed successfully!")
         print(f"📈 Results saved in analysis results dictionary")
         
         # Optional: Save results to a summary file
-        summary_path = "/Users/nika/Downloads/NMSML/dataset_summary.txt"
         print(f"\n💾 Saving summary to: {summary_path}")
         
         with open(summary_path, 'w') as f:
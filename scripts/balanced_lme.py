@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Closed-Form Random-Intercept Models
+Fits feature ~ Sex * Breed + (1 | dog_id) without iterative REML when the
+design allows it.
+
+Sex and breed are properties of the dog, so the fixed effects only see the
+dog means. With equal recordings per dog the variance components have
+closed-form ANOVA estimates: the residual variance from the spread within
+dogs, the dog variance from the spread of the dog means around their
+least-squares fit. The fixed effects then follow from GLS on the dog means,
+weighted by 1 / (dog variance + residual variance / recordings). With equal
+recordings per dog this is exactly the REML fit statsmodels converges to.
+When recordings per dog differ (e.g. after recordings without a defined F0
+are dropped), the ANOVA estimate is only the starting point for a
+one-dimensional search of the exact profiled REML likelihood, which also
+needs nothing but the dog means. Rank-deficient designs and predictors that
+vary within a dog fall back to statsmodels.
+
+A RandomInterceptDesign is built once per frame and reused for every
+feature (and every resample of the same rows), so a fit is a handful of
+NumPy calls on a few hundred dog means.
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FORMULA = "Sex * Breed"
+
+
+@dataclass
+class RandomInterceptResult:
+    """
+    Closed-form fit of one feature, with the attributes the reports read from statsmodels results.
+    """
+    dependent_var: str
+    exog_names: List[str]
+    coefficients: np.ndarray
+    covariance: np.ndarray = field(repr=False)
+    dog_variance: float
+    scale: float
+    nobs: int
+    group_sizes: np.ndarray = field(repr=False)
+    converged: bool = True
+    method: str = 'REML (closed form)'
+
+    @property
+    def fe_params(self) -> pd.Series:
+        return pd.Series(self.coefficients, index=self.exog_names)
+
+    @property
+    def params(self) -> pd.Series:
+        return self.fe_params
+
+    @property
+    def bse(self) -> pd.Series:
+        return pd.Series(np.sqrt(np.diag(self.covariance)), index=self.exog_names)
+
+    @property
+    def tvalues(self) -> pd.Series:
+        return self.fe_params / self.bse
+
+    @property
+    def pvalues(self) -> pd.Series:
+        from scipy import stats
+
+        return pd.Series(2.0 * stats.norm.sf(np.abs(self.tvalues.to_numpy())), index=self.exog_names)
+
+    @property
+    def cov_re(self) -> pd.DataFrame:
+        return pd.DataFrame([[self.dog_variance]], index=['Group'], columns=['Group'])
+
+    def summary(self) -> str:
+        """
+        Text summary laid out like the statsmodels MixedLM summary.
+
+        :return: Summary table
+        """
+        return format_summary(self.dependent_var, self.method, self.nobs, self.group_sizes, self.scale,
+                              self.exog_names, self.coefficients, self.bse.to_numpy(),
+                              [('Group Var', self.dog_variance)])
+
+
+def format_summary(dependent_var: str, method: str, nobs: int, group_sizes: np.ndarray, scale: float,
+                   names: List[str], coefficients: np.ndarray, bse: np.ndarray,
+                   variance_components: List[Tuple[str, float]], converged: bool = True) -> str:
+    """
+    Lay out a mixed model fit like the statsmodels MixedLM summary.
+
+    :param dependent_var: Response name
+    :param method: Estimation method label
+    :param nobs: Number of observations
+    :param group_sizes: Observations per level of the (first) grouping factor
+    :param scale: Residual variance
+    :param names: Fixed-effect names
+    :param coefficients: Fixed-effect estimates
+    :param bse: Fixed-effect standard errors
+    :param variance_components: (name, value) rows listed below the fixed effects
+    :param converged: Whether the fit converged
+    :return: Summary table
+    """
+    from scipy import stats
+
+    z = stats.norm.ppf(0.975)
+    tvalues = coefficients / bse
+    pvalues = 2.0 * stats.norm.sf(np.abs(tvalues))
+    width = max(len(name) for name in list(names) + [name for name, _ in variance_components])
+    # Every numeric column is preceded by a space, so wide values never run together
+    columns = [('Coef.', 9), ('Std.Err.', 9), ('z', 8), ('P>|z|', 7), ('[0.025', 9), ('0.975]', 9)]
+    total = width + sum(size + 1 for _, size in columns)
+    header = [("Model:", "MixedLM", "Dependent Variable:", dependent_var),
+              ("No. Observations:", str(nobs), "Method:", method),
+              ("No. Groups:", str(len(group_sizes)), "Scale:", f"{scale:.4f}"),
+              ("Min. group size:", str(int(group_sizes.min())), "Converged:", "Yes" if converged else "No"),
+              ("Max. group size:", str(int(group_sizes.max())), "", ""),
+              ("Mean group size:", f"{group_sizes.mean():.1f}", "", "")]
+    lines = ["Mixed Linear Model Regression Results".center(total), "=" * total]
+    lines += [f"{a:<20}{b:<{max(total - 56, 8)}}{c:<20}{d}".rstrip() for a, b, c, d in header]
+    lines += ["-" * total, f"{'':<{width}}" + "".join(f" {label:>{size}}" for label, size in columns), "-" * total]
+    for name, coef, se, t, p in zip(names, coefficients, bse, tvalues, pvalues):
+        values = [coef, se, t, p, coef - z * se, coef + z * se]
+        lines.append(f"{name:<{width}}" + "".join(f" {value:>{size}.3f}" for value, (_, size) in zip(values, columns)))
+    lines += [f"{name:<{width}} {value:>9.3f}" for name, value in variance_components]
+    lines.append("=" * total)
+    return "\n".join(lines)
+
+
+class RandomInterceptDesign:
+    """
+    Dog-level design of a model frame, shared by all features fitted on it.
+
+    :param exog: dogs x parameters fixed-effects design (one row per dog)
+    :param exog_names: Parameter names as patsy/statsmodels name them
+    :param groups: Dog index of every row of the frame
+    """
+
+    def __init__(self, exog: np.ndarray, exog_names: List[str], groups: np.ndarray):
+        self.exog = exog
+        self.exog_names = exog_names
+        self.groups = groups
+        self.n_groups = len(exog)
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, formula: str = DEFAULT_FORMULA,
+                   groups: str = 'dog_id') -> Optional['RandomInterceptDesign']:
+        """
+        Build the dog-level design of a model frame.
+
+        :param data: Model frame
+        :param formula: Right-hand side of the fixed-effects formula
+        :param groups: Grouping column
+        :return: The design, or None when a predictor or group is missing or a predictor varies within a group
+        """
+        from patsy import PatsyError, dmatrix
+
+        codes, _ = pd.factorize(data[groups], sort=True)
+        try:
+            exog = dmatrix(formula, data, return_type='dataframe', NA_action='raise')
+        except PatsyError:
+            return None
+        if (codes < 0).any():
+            return None
+        matrix = exog.to_numpy(dtype=float)
+        first_rows = np.unique(codes, return_index=True)[1]
+        dog_exog = matrix[first_rows]
+        if not np.array_equal(matrix, dog_exog[codes]):
+            return None
+        return cls(dog_exog, list(exog.columns), codes)
+
+    def fit(self, y: np.ndarray, dependent_var: str = 'y') -> Optional[RandomInterceptResult]:
+        """
+        Fit one response in closed form; missing values drop their rows.
+
+        :param y: Response per row of the frame
+        :param dependent_var: Response name for the summary
+        :return: The fit, or None when the design is outside the closed-form case
+        """
+        y = np.asarray(y, dtype=float)
+        valid = ~np.isnan(y)
+        groups = self.groups[valid]
+        values = y[valid]
+        counts = np.bincount(groups, minlength=self.n_groups)
+        kept = counts > 0
+        counts = counts[kept]
+        n_obs, n_dogs, n_params = len(values), len(counts), self.exog.shape[1]
+        if n_dogs <= n_params or n_obs <= n_dogs:
+            return None
+        exog = self.exog[kept]
+        q, r = np.linalg.qr(exog)
+        if np.abs(np.diag(r)).min() <= 1e-10 * np.abs(np.diag(r)).max():
+            return None
+
+        # Within-dog spread (centered to keep the sums of squares accurate)
+        center = values.mean()
+        sums = np.bincount(groups, values - center, minlength=self.n_groups)[kept]
+        squares = np.bincount(groups, (values - center) ** 2, minlength=self.n_groups)[kept]
+        within = squares.sum() - (sums ** 2 / counts).sum()
+        means = sums / counts + center
+        scale = within / (n_obs - n_dogs)
+
+        # Spread of the dog means around their least-squares fit: E = sum (1 - h_i) (dog var + scale / n_i)
+        residuals = means - q @ (q.T @ means)
+        leverage = (q ** 2).sum(axis=1)
+        dog_variance = ((residuals ** 2).sum() - scale * ((1.0 - leverage) / counts).sum()) / (n_dogs - n_params)
+        ratio = max(dog_variance, 0.0) / scale if scale > 0 else 0.0
+        if counts.min() != counts.max():
+            ratio = _refine_ratio(ratio, exog, means, counts, within, n_obs)
+
+        # GLS on the dog means; at the REML optimum the pooled scale equals the ANOVA estimate
+        weights = 1.0 / (ratio + 1.0 / counts)
+        information = exog.T @ (weights[:, None] * exog)
+        inverse = np.linalg.inv(information)
+        coefficients = inverse @ (exog.T @ (weights * means))
+        fitted = exog @ coefficients
+        scale = (within + (weights * (means - fitted) ** 2).sum()) / (n_obs - n_params)
+        return RandomInterceptResult(dependent_var, self.exog_names, coefficients, scale * inverse,
+                                     float(ratio * scale), float(scale), n_obs, counts)
+
+
+def _profiled_reml(ratio: float, exog: np.ndarray, means: np.ndarray, counts: np.ndarray, within: float,
+                   n_obs: int) -> float:
+    """
+    -2 x REML log-likelihood (up to a constant) with the scale profiled out, from dog-level statistics.
+
+    :param ratio: Dog variance / residual variance
+    :param exog: Dog-level design
+    :param means: Dog means
+    :param counts: Recordings per dog
+    :param within: Within-dog sum of squares
+    :param n_obs: Number of recordings
+    :return: Profiled deviance
+    """
+    variances = ratio + 1.0 / counts
+    weights = 1.0 / variances
+    information = exog.T @ (weights[:, None] * exog)
+    coefficients = np.linalg.solve(information, exog.T @ (weights * means))
+    quadratic = (weights * (means - exog @ coefficients) ** 2).sum()
+    n_free = n_obs - exog.shape[1]
+    return (n_free * np.log((within + quadratic) / n_free) + np.log(variances).sum()
+            + np.linalg.slogdet(information)[1])
+
+
+def _refine_ratio(start: float, exog: np.ndarray, means: np.ndarray, counts: np.ndarray, within: float,
+                  n_obs: int) -> float:
+    """
+    Optimize the variance ratio on the profiled REML likelihood, starting from the ANOVA estimate.
+
+    :param start: ANOVA estimate of the variance ratio
+    :param exog: Dog-level design
+    :param means: Dog means
+    :param counts: Recordings per dog
+    :param within: Within-dog sum of squares
+    :param n_obs: Number of recordings
+    :return: REML variance ratio
+    """
+    from scipy.optimize import minimize_scalar
+
+    arguments = (exog, means, counts, within, n_obs)
+    upper = 4.0 * (start + 1.0 / counts.min())
+    while True:
+        result = minimize_scalar(_profiled_reml, bounds=(0.0, upper), args=arguments, method='bounded',
+                                 options={'xatol': 1e-10 * upper})
+        # The ANOVA start can be far off for very unequal group sizes; widen until the optimum is inside
+        if result.x < 0.99 * upper or upper > 1e12:
+            break
+        upper *= 16.0
+    if _profiled_reml(0.0, *arguments) <= result.fun:
+        return 0.0
+    return float(result.x)
+
+
+def fit_random_intercept(data: pd.DataFrame, dependent_var: str, design: Optional[RandomInterceptDesign] = None,
+                         formula: str = DEFAULT_FORMULA, groups: str = 'dog_id') -> Any:
+    """
+    Fit dependent_var ~ formula + (1 | groups), in closed form when the design allows it.
+
+    Rows with a missing response are left out either way.
+
+    :param data: Model frame
+    :param dependent_var: Response column
+    :param design: Design of data built by RandomInterceptDesign.from_frame() (built here when None)
+    :param formula: Right-hand side of the fixed-effects formula
+    :param groups: Grouping column
+    :return: A RandomInterceptResult, or the statsmodels MixedLM result when falling back
+    """
+    if design is None:
+        design = RandomInterceptDesign.from_frame(data, formula, groups)
+    if design is not None:
+        result = design.fit(data[dependent_var].to_numpy(dtype=float), dependent_var)
+        if result is not None:
+            return result
+    from statsmodels.formula.api import mixedlm
+
+    data = data.dropna(subset=[dependent_var])
+    return mixedlm(f"{dependent_var} ~ {formula}", data=data, groups=data[groups]).fit()
+
+
+def compare_with_statsmodels(df_model: pd.DataFrame, features: List[str]) -> pd.DataFrame:
+    """
+    Fit every feature both ways and report the largest differences.
+
+    :param df_model: Model frame
+    :param features: Features to compare
+    :return: One row per feature with maximum absolute differences and fit times
+    """
+    from statsmodels.formula.api import mixedlm
+
+    design = RandomInterceptDesign.from_frame(df_model)
+    rows = []
+    for feature in features:
+        start = time.perf_counter()
+        fast = design.fit(df_model[feature].to_numpy(dtype=float), feature) if design is not None else None
+        fast_seconds = time.perf_counter() - start
+        if fast is None:
+            rows.append({'feature': feature, 'closed_form': False})
+            continue
+        data = df_model.dropna(subset=[feature])
+        start = time.perf_counter()
+        reference = mixedlm(f"{feature} ~ {DEFAULT_FORMULA}", data=data, groups=data['dog_id']).fit()
+        reference_seconds = time.perf_counter() - start
+        rows.append({'feature': feature, 'closed_form': True, 'statsmodels_converged': bool(reference.converged),
+                     'max_param_diff': float((fast.fe_params - reference.fe_params).abs().max()),
+                     'max_se_diff': float((fast.bse - reference.bse[fast.exog_names]).abs().max()),
+                     'max_p_diff': float((fast.pvalues - reference.pvalues[fast.exog_names]).abs().max()),
+                     'dog_variance_diff': fast.dog_variance - float(reference.cov_re.iloc[0, 0]),
+                     'scale_diff': fast.scale - float(reference.scale),
+                     'closed_form_ms': fast_seconds * 1e3, 'statsmodels_ms': reference_seconds * 1e3})
+    return pd.DataFrame(rows)
+
+
+def main() -> int:
+    """
+    Main function to validate the closed-form fits against statsmodels on a feature table.
+
+    :return: Exit code
+    """
+    from scripts.statistical_analysis import INPUT_PATH, analysis_features, load_features, to_model_frame
+
+    parser = argparse.ArgumentParser(description="Compare closed-form random-intercept fits with statsmodels")
+    parser.add_argument('--input', default=str(INPUT_PATH), help="Feature CSV")
+    args = parser.parse_args()
+
+    try:
+        df, df_clean = load_features(Path(args.input))
+        comparison = compare_with_statsmodels(to_model_frame(df_clean), analysis_features(df_clean))
+    except Exception as e:
+        print(f"Error during comparison: {e}")
+        return 1
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(comparison.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Times the pipeline stages on a synthetic corpus of configurable size and
+records the results over time in a JSON-lines history file.
+
+Benchmarks:
+- analyze_metadata: analyze_dogspeak_metadata on the corpus metadata.csv
+- create_subset: create_balanced_subset on the dataset-layout corpus
+- extract: feature extraction with a registered engine, plus its accuracy
+  against the synthetic ground truth
+- pitch: speed and accuracy of every pitch algorithm of the Python engine,
+  against the synthetic ground truth and against an existing feature CSV
+- lme: the Sex * Breed mixed-model fits on the ground-truth feature table
+- report: the full statistical analysis report on the ground-truth table
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.extract_features import EXTRACTION_ENGINES, run_extraction
+from scripts.instrumentation import trace_stage
+
+DEFAULT_WORK_DIR = Path('data/benchmarks/work')
+DEFAULT_HISTORY = Path('data/benchmarks/history.jsonl')
+FEATURE_COLUMNS = ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']
+PITCH_FEATURES = ['F0_mean', 'F0_min', 'F0_max']
+GROSS_ERROR = 0.2
+
+
+@dataclass
+class BenchmarkContext:
+    """
+    Inputs shared by all benchmarks in one run.
+    """
+    work_dir: Path
+    n_files: int
+    jobs: int
+    engine: str
+    reference_csv: Optional[Path] = None
+    reference_audio: Optional[Path] = None
+
+    def corpus(self, layout: str) -> Path:
+        """
+        Return a synthetic corpus of the run's size, generating it on first use.
+
+        :param layout: "subset" or "dataset"
+        :return: Corpus root directory
+        """
+        from scripts.synthesize_corpus import generate_corpus
+
+        root = self.work_dir / f"corpus_{layout}_{self.n_files}"
+        if not (root / 'ground_truth.csv').exists():
+            if root.exists():
+                shutil.rmtree(root)
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_corpus(str(root), n_files=self.n_files, layout=layout, jobs=self.jobs)
+        return root
+
+
+def extraction_accuracy(features_csv: Path, ground_truth_csv: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Compare extracted features with ground truth, matched on File.
+
+    Zero or missing estimates count as undefined and are excluded from the error metrics.
+
+    :param features_csv: Extracted feature table
+    :param ground_truth_csv: Ground-truth table in the same schema
+    :return: Per feature: MAE (Hz), median relative error, share within 5%, undefined share
+    """
+    extracted = pd.read_csv(features_csv)
+    truth = pd.read_csv(ground_truth_csv)
+    merged = truth.merge(extracted, on='File', suffixes=('_true', '_est'))
+    accuracy = {}
+    for feature in FEATURE_COLUMNS:
+        if f'{feature}_est' not in merged:
+            continue
+        true = merged[f'{feature}_true'].to_numpy(dtype=float)
+        est = merged[f'{feature}_est'].to_numpy(dtype=float)
+        defined = np.isfinite(est) & (est > 0)
+        rel_error = np.abs(est[defined] - true[defined]) / true[defined]
+        accuracy[feature] = {
+            'mae_hz': float(np.mean(np.abs(est[defined] - true[defined]))) if defined.any() else float('nan'),
+            'median_rel_error': float(np.median(rel_error)) if defined.any() else float('nan'),
+            'within_5pct': float(np.mean(rel_error <= 0.05)) if defined.any() else float('nan'),
+            'undefined_share': float(1.0 - defined.mean()) if len(defined) else float('nan'),
+        }
+    return accuracy
+
+
+def bench_analyze_metadata(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark analyze_dogspeak_metadata.
+
+    :param ctx: Benchmark context
+    :return: Counters for throughput
+    """
+    from scripts.analyze_metadata import analyze_dogspeak_metadata
+
+    metadata = ctx.corpus('dataset') / 'metadata.csv'
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_dogspeak_metadata(str(metadata))
+    return {'rows': ctx.n_files}
+
+
+def bench_create_subset(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark create_balanced_subset (including copying the selected files).
+
+    :param ctx: Benchmark context
+    :return: Counters for throughput
+    """
+    from scripts.create_subset import create_balanced_subset
+
+    corpus = ctx.corpus('dataset')
+    output_dir = ctx.work_dir / 'subset_output'
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = create_balanced_subset(str(corpus / 'metadata.csv'), str(corpus), str(output_dir / 'audio'),
+                                        exploration_dir=str(output_dir))
+    return {'rows': ctx.n_files, 'files': result['total_files']}
+
+
+def bench_extract(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark feature extraction with the selected engine and score it against ground truth.
+
+    :param ctx: Benchmark context
+    :return: Counters and accuracy metrics
+    """
+    corpus = ctx.corpus('subset')
+    output_csv = ctx.work_dir / f'features_{ctx.engine}_{ctx.n_files}.csv'
+    options = {'jobs': ctx.jobs} if ctx.engine == 'python' else {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_extraction(str(corpus), str(output_csv), engine=ctx.engine, **options)
+    return {'files': ctx.n_files, 'engine': ctx.engine,
+            'accuracy': extraction_accuracy(output_csv, corpus / 'ground_truth.csv')}
+
+
+def compare_pitch_algorithms(audio_dir: Path, truth_csv: Path, algorithms: Optional[List[str]] = None,
+                             limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Time every pitch algorithm per file and score its F0 statistics against a reference table.
+
+    Each file is loaded, segmented and pitch-tracked; latency covers all three.
+    Reference rows without F0 (0 or empty) are skipped.
+
+    :param audio_dir: Subset-layout directory with the recordings
+    :param truth_csv: Reference feature table (ground truth or an earlier extraction)
+    :param algorithms: Algorithm names (default: all of PITCH_ALGORITHMS)
+    :param limit: Only use the first files of the reference table
+    :return: One row per algorithm and breed (plus "all"): latency, throughput and errors
+    """
+    from scripts.acoustic_analysis import PITCH_ALGORITHMS, AnalysisContext, detect_segments
+
+    truth = pd.read_csv(truth_csv)
+    truth = truth[truth['F0_mean'] > 0].head(limit)
+    paths = [Path(audio_dir) / folder / file for folder, file in zip(truth['Folder'], truth['File'])]
+    rows = []
+    for name in algorithms or list(PITCH_ALGORITHMS):
+        algorithm = PITCH_ALGORITHMS[name]
+        latencies, estimates = [], []
+        for path in paths:
+            start = time.perf_counter()
+            ctx = AnalysisContext.from_file(path)
+            f0 = np.concatenate([algorithm(ctx.segment(a, b))[1] for a, b in detect_segments(ctx)] or [np.empty(0)])
+            latencies.append(time.perf_counter() - start)
+            f0 = f0[np.isfinite(f0)]
+            estimates.append((f0.mean(), f0.min(), f0.max()) if len(f0) else (np.nan,) * 3)
+
+        result = truth[['Breed']].copy()
+        result['latency'] = latencies
+        for column, values in zip(PITCH_FEATURES, np.array(estimates).T):
+            result[f'{column}_error'] = np.abs(values - truth[column].to_numpy()) / truth[column].to_numpy()
+        for breed, group in [('all', result)] + list(result.groupby('Breed')):
+            error = group['F0_mean_error']
+            rows.append({
+                'algorithm': name,
+                'breed': breed,
+                'files': len(group),
+                'latency_ms_median': 1000 * group['latency'].median(),
+                'latency_ms_p95': 1000 * group['latency'].quantile(0.95),
+                'files_per_s': len(group) / group['latency'].sum(),
+                **{f'{column}_median_rel_error': group[f'{column}_error'].median() for column in PITCH_FEATURES},
+                'F0_mean_within_5pct': (error <= 0.05).mean(),
+                'F0_mean_gross_error_rate': (error > GROSS_ERROR).mean(),
+                'undefined_share': error.isna().mean(),
+            })
+    return pd.DataFrame(rows)
+
+
+def bench_pitch(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark the pitch algorithms against the synthetic ground truth and, when
+    available, against an existing feature CSV of real recordings.
+
+    :param ctx: Benchmark context
+    :return: Counters and the comparison tables
+    """
+    corpus = ctx.corpus('subset')
+    tables = {'synthetic': compare_pitch_algorithms(corpus, corpus / 'ground_truth.csv')}
+    if ctx.reference_csv and ctx.reference_audio and Path(ctx.reference_csv).exists():
+        tables['reference'] = compare_pitch_algorithms(ctx.reference_audio, ctx.reference_csv)
+    for name, table in tables.items():
+        print(f"\nPitch algorithms vs {name}:")
+        print(table[table['breed'] == 'all'].to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    return {'files': ctx.n_files, 'pitch': {name: table.to_dict('records') for name, table in tables.items()}}
+
+
+def bench_lme(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark the Sex * Breed mixed-model fits on the ground-truth features.
+
+    :param ctx: Benchmark context
+    :return: Counters for throughput
+    """
+    from scripts.statistical_analysis import fit_lme_model, load_features, to_model_frame
+
+    _, df_clean = load_features(ctx.corpus('subset') / 'ground_truth.csv')
+    df_model = to_model_frame(df_clean)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for feature in FEATURE_COLUMNS:
+            fit_lme_model(df_model, feature)
+    return {'rows': len(df_model), 'fits': len(FEATURE_COLUMNS)}
+
+
+def bench_report(ctx: BenchmarkContext) -> Dict[str, Any]:
+    """
+    Benchmark rendering the full statistical analysis report and figures.
+
+    :param ctx: Benchmark context
+    :return: Counters for throughput
+    """
+    from scripts.statistical_analysis import main as run_statistical_analysis
+
+    output_dir = ctx.work_dir / 'report_output'
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_statistical_analysis(ctx.corpus('subset') / 'ground_truth.csv', output_dir)
+    return {'rows': ctx.n_files}
+
+
+BENCHMARKS: Dict[str, Callable[[BenchmarkContext], Dict[str, Any]]] = {
+    'analyze_metadata': bench_analyze_metadata,
+    'create_subset': bench_create_subset,
+    'extract': bench_extract,
+    'pitch': bench_pitch,
+    'lme': bench_lme,
+    'report': bench_report,
+}
+
+
+def _git_commit() -> Optional[str]:
+    """
+    Current git commit, if available.
+
+    :return: Short commit hash or None
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases: List[str], n_files: int = 1000, jobs: int = 1, engine: str = 'praat',
+                   repeat: int = 1, work_dir: Path = DEFAULT_WORK_DIR,
+                   history_path: Optional[Path] = DEFAULT_HISTORY, reference_csv: Optional[Path] = None,
+                   reference_audio: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Run benchmarks and append their results to the history file.
+
+    Corpus generation is not timed; each corpus is generated once per size and reused.
+
+    :param cases: Benchmark names from BENCHMARKS
+    :param n_files: Synthetic corpus size
+    :param jobs: Worker processes for corpus generation
+    :param engine: Extraction engine from EXTRACTION_ENGINES
+    :param repeat: Timed repetitions per benchmark (the best is kept)
+    :param work_dir: Directory for corpora and benchmark outputs
+    :param history_path: JSON-lines file to append results to (None to skip)
+    :param reference_csv: Existing feature CSV for the pitch benchmark (e.g. the Praat results)
+    :param reference_audio: Subset directory with the recordings of reference_csv
+    :return: List of result records
+    """
+    unknown = [case for case in cases if case not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {unknown}")
+    if engine not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine}")
+
+    ctx = BenchmarkContext(work_dir=Path(work_dir), n_files=n_files, jobs=jobs, engine=engine,
+                           reference_csv=reference_csv, reference_audio=reference_audio)
+    ctx.work_dir.mkdir(parents=True, exist_ok=True)
+    run_info = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+
+    records = []
+    for case in cases:
+        # Generate the corpus outside the timed region
+        ctx.corpus('subset' if case in ('extract', 'pitch', 'lme', 'report') else 'dataset')
+        best = None
+        for _ in range(repeat):
+            with trace_stage(f'benchmark.{case}', n_files=n_files):
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                try:
+                    info = BENCHMARKS[case](ctx)
+                    status = 'ok'
+                except FileNotFoundError as e:
+                    info, status = {'error': str(e)}, 'skipped'
+                wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            if best is None or (status == 'ok' and wall < best['wall_s']):
+                best = {'wall_s': wall, 'cpu_s': cpu, 'status': status, **info}
+            if status != 'ok':
+                break
+
+        record = {**run_info, 'benchmark': case, 'n_files': n_files, **best}
+        for counter in ('rows', 'files'):
+            if counter in record and record['wall_s'] > 0:
+                record[f'{counter}_per_s'] = record[counter] / record['wall_s']
+        records.append(record)
+        print(f"   {case:<18} {record['status']:<8} {record['wall_s']:8.3f}s wall {record['cpu_s']:8.3f}s cpu")
+
+    if history_path is not None:
+        history_path = Path(history_path)
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(history_path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record, default=float) + '\n')
+        print(f"Results appended to: {history_path}")
+    return records
+
+
+def load_history(history_path: Path = DEFAULT_HISTORY) -> pd.DataFrame:
+    """
+    Load the benchmark history as a table.
+
+    :param history_path: JSON-lines history file
+    :return: DataFrame with one row per recorded benchmark
+    """
+    return pd.read_json(history_path, lines=True)
+
+
+def main() -> int:
+    """
+    Main function to run the benchmark suite.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic corpus")
+    parser.add_argument('cases', nargs='*', default=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument('--files', type=int, default=1000, help="Synthetic corpus size")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--engine', default='praat', choices=sorted(EXTRACTION_ENGINES))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--work-dir', default=str(DEFAULT_WORK_DIR))
+    parser.add_argument('--history', default=str(DEFAULT_HISTORY))
+    parser.add_argument('--reference-csv', default='data/features/feature_extraction_results.csv',
+                        help="Existing feature CSV for the pitch benchmark")
+    parser.add_argument('--reference-audio', default='data/raw/subset', help="Recordings of --reference-csv")
+    args = parser.parse_args()
+
+    try:
+        print(f"Benchmarking {len(args.cases)} case(s) on {args.files:,} synthetic files")
+        run_benchmarks(args.cases, n_files=args.files, jobs=args.jobs, engine=args.engine,
+                       repeat=args.repeat, work_dir=Path(args.work_dir), history_path=Path(args.history),
+                       reference_csv=Path(args.reference_csv), reference_audio=Path(args.reference_audio))
+    except Exception as e:
+        print(f"Error during benchmarking: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
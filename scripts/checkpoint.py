@@ -0,0 +1,144 @@
+"""
+Extraction Checkpoints
+Lets a long extraction run commit its results in batches and resume after a
+crash instead of starting over. Each batch writes its tables (features,
+segments, per-file status) to <output>.checkpoint/ under temporary names,
+renames them into place and only then records the batch in the checkpoint
+manifest, which is itself replaced atomically; a batch that was being
+written when the run died is simply not in the manifest and is redone.
+
+Rows are keyed by their first two columns (Folder, File). Once every
+recording is committed the batches are merged, in recording order, into the
+final CSVs (written to temporary files and renamed), so the outputs are
+never half-written, and the checkpoint directory is removed.
+"""
+
+import csv
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+MANIFEST_NAME = 'manifest.json'
+# Recordings per checkpoint batch
+DEFAULT_CHECKPOINT_EVERY = 200
+
+# Table rows of one batch: output suffix (e.g. ".csv") -> (header, rows)
+BatchTables = Dict[str, Tuple[Sequence[str], List[Sequence[Any]]]]
+
+
+def checkpoint_dir(output_file: str) -> Path:
+    """
+    Checkpoint directory of an output CSV.
+
+    :param output_file: Feature CSV
+    :return: <output>.checkpoint next to it
+    """
+    output_path = Path(output_file)
+    return output_path.with_name(f"{output_path.name}.checkpoint")
+
+
+def _write_atomic(path: Path, header: Sequence[str], rows: List[Sequence[Any]]) -> None:
+    """
+    Write a CSV to a temporary file, flush it to disk and rename it into place.
+
+    :param path: Destination
+    :param header: Column names
+    :param rows: Rows
+    :return: None
+    """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ExtractionCheckpoint:
+    """
+    Committed batches of one extraction run.
+    """
+
+    def __init__(self, output_file: str, settings: Dict[str, Any], resume: bool = True):
+        """
+        Open the checkpoint of an output, starting over when its settings differ or resume is off.
+
+        :param output_file: Feature CSV the run writes
+        :param settings: Options the results depend on (engine, analysis options)
+        :param resume: Reuse the batches committed by an earlier run
+        """
+        self.output_file = output_file
+        self.root = checkpoint_dir(output_file)
+        self.settings = json.loads(json.dumps(settings))
+        self.batches: List[Dict[str, Any]] = []
+        manifest = self.root / MANIFEST_NAME
+        if resume and manifest.exists():
+            with open(manifest) as f:
+                previous = json.load(f)
+            if previous.get('settings') == self.settings:
+                self.batches = previous['batches']
+            else:
+                print(f"Checkpoint {self.root} was written with other settings; starting over")
+        if not self.batches:
+            shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def committed(self) -> Set[Tuple[str, str]]:
+        """
+        Recordings whose results are committed.
+
+        :return: (folder, file) pairs
+        """
+        return {(folder, file) for batch in self.batches for folder, file in batch['files']}
+
+    def commit(self, files: List[Tuple[str, str]], tables: BatchTables) -> None:
+        """
+        Store the results of a batch of recordings.
+
+        :param files: (folder, file) of the recordings in the batch
+        :param tables: Rows of each output table, keyed by suffix
+        :return: None
+        """
+        name = f"batch_{len(self.batches):05d}"
+        for suffix, (header, rows) in tables.items():
+            _write_atomic(self.root / f"{name}{suffix}", header, rows)
+        self.batches.append({'name': name, 'files': [list(key) for key in files], 'suffixes': sorted(tables)})
+        tmp_path = self.root / f".{MANIFEST_NAME}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'settings': self.settings, 'batches': self.batches}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.root / MANIFEST_NAME)
+
+    def merge(self, order: List[Tuple[str, str]],
+              destinations: Dict[str, Tuple[Path, Sequence[str]]]) -> Dict[str, int]:
+        """
+        Merge the committed batches into the final CSVs and remove the checkpoint.
+
+        :param order: (folder, file) of every recording, in output order (rows of others are dropped)
+        :param destinations: Output suffix -> (destination CSV, header)
+        :return: Output suffix -> rows written
+        """
+        position = {key: i for i, key in enumerate(order)}
+        written = {}
+        for suffix, (destination, header) in destinations.items():
+            rows: List[Tuple[int, List[str]]] = []
+            for batch in self.batches:
+                if suffix not in batch['suffixes']:
+                    continue
+                with open(self.root / f"{batch['name']}{suffix}", newline='') as f:
+                    reader = csv.reader(f)
+                    if next(reader) != list(header):
+                        raise ValueError(f"{batch['name']}{suffix} has different columns than {Path(destination).name}")
+                    rows.extend((position[(row[0], row[1])], row) for row in reader if (row[0], row[1]) in position)
+            # Stable sort: the rows of one recording (e.g. its segments) keep their order
+            rows.sort(key=lambda item: item[0])
+            _write_atomic(Path(destination), header, [row for _, row in rows])
+            written[suffix] = len(rows)
+        shutil.rmtree(self.root, ignore_errors=True)
+        return written
@@ -5,8 +5,10 @@ Creates a balanced subset by selecting random dogs and their sound files from ea
 
 Selection criteria:
 - 10 random males + 10 random females per breed
-- 3 random sound files per selected dog
+- 3 random sound files per selected dog (or, balancing on audio time, random
+  files until each dog has the same number of seconds)
 - Copies files to a new 'subset' directory
+- Optionally leaves out recordings found to be duplicates (scripts.fingerprint)
 """
 
 import pandas as pd
@@ -15,8 +17,12 @@ import os
 import shutil
 from pathlib import Path
 import random
+from scripts.ingest import read_metadata
+from scripts.instrumentation import add_counters, traced
+from scripts.wav_header import add_header_columns, probe_headers
 
-def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str, dogs_per_sex: int = 10, files_per_dog: int = 3, random_seed: int = 42) -> dict:
+@traced('create_subset')
+def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str, dogs_per_sex: int = 10, files_per_dog: int = 3, random_seed: int = 42, exploration_dir: str = "data/exploration", index_path: str = None, seconds_per_dog: float = None, duplicates_path: str = None) -> dict:
     """
     Create a balanced subset of the DogSpeak dataset.
     
@@ -26,6 +32,12 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
     :param dogs_per_sex: Number of dogs to select per sex per breed (default: 10)
     :param files_per_dog: Number of audio files to sample per dog (default: 3)
     :param random_seed: Random seed for reproducibility (default: 42)
+    :param exploration_dir: Directory for the subset metadata and report (default: data/exploration)
+    :param index_path: SQLite metadata index to query per breed, sex and dog instead of loading the whole CSV (default: None)
+    :param seconds_per_dog: Balance on audio time instead: draw each dog's files in random order until this
+                            many seconds are selected, replacing files_per_dog (default: None)
+    :param duplicates_path: duplicates.csv from scripts.fingerprint; recordings listed there as copies
+                            of another recording are not selected (default: None)
     :return: Dict summary of the subset creation
     """
     
@@ -36,12 +48,59 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
     print("Creating DogSpeak Balanced Subset")
     print("=" * 50)
     print(f"Target: {dogs_per_sex} males + {dogs_per_sex} females per breed")
-    print(f"Files per dog: {files_per_dog}")
+    if seconds_per_dog is None:
+        print(f"Files per dog: {files_per_dog}")
+    else:
+        print(f"Audio per dog: {seconds_per_dog:g} s")
     print(f"Random seed: {random_seed}")
+
+    # Recordings that duplicate an earlier recording, as (dog_id, filename)
+    excluded = set()
+    if duplicates_path:
+        from scripts.fingerprint import excluded_recordings
+
+        excluded = excluded_recordings(duplicates_path)
+        print(f"Excluding {len(excluded)} duplicate recordings listed in: {duplicates_path}")
     
-    # Load metadata
-    print(f"\nLoading metadata from: {metadata_path}")
-    df = pd.read_csv(metadata_path)
+    # Load metadata (from the index, queried per breed, sex and dog, or the whole CSV)
+    if index_path:
+        from scripts.metadata_index import DATASET_COLLECTION, MetadataIndex
+
+        print(f"\nQuerying metadata index: {index_path}")
+        index = MetadataIndex(Path(index_path))
+        index.update_metadata(Path(metadata_path), Path(audio_dir), probe=False)
+        columns = index.columns(DATASET_COLLECTION)
+        breeds = index.breeds(DATASET_COLLECTION)
+
+        # Dogs left without recordings once their duplicates are excluded
+        excluded_per_dog = pd.Series([dog_id for dog_id, _ in excluded], dtype=object).value_counts()
+        emptied = {row['dog_id'] for row in index.query("SELECT dog_id, files FROM dogs WHERE collection = ?",
+                                                        (DATASET_COLLECTION,))
+                   if row['files'] <= excluded_per_dog.get(row['dog_id'], 0)} if excluded else set()
+
+        def dogs_of(breed: str, sex: str) -> np.ndarray:
+            return np.array([dog_id for dog_id in index.dogs(DATASET_COLLECTION, breed, sex) if dog_id not in emptied],
+                            dtype=object)
+
+        def files_of(breed: str, dog_id: str) -> pd.DataFrame:
+            files = pd.DataFrame(index.recordings(DATASET_COLLECTION, breed=breed, dog_id=dog_id), columns=columns)
+            if excluded:
+                files = files[[(dog_id, filename) not in excluded for filename in files['filename']]]
+            return files
+    else:
+        print(f"\nLoading metadata from: {metadata_path}")
+        df = read_metadata(metadata_path)
+        add_counters(rows=len(df))
+        if excluded:
+            df = df[[key not in excluded for key in zip(df['dog_id'], df['filename'])]]
+        breeds = [str(breed) for breed in df['breed'].unique()]
+        breed_data = {breed: group for breed, group in df.groupby('breed', sort=False, observed=True)}
+
+        def dogs_of(breed: str, sex: str) -> np.ndarray:
+            return np.asarray(breed_data[breed][breed_data[breed]['sex'] == sex]['dog_id'].unique(), dtype=object)
+
+        def files_of(breed: str, dog_id: str) -> pd.DataFrame:
+            return breed_data[breed][breed_data[breed]['dog_id'] == dog_id]
     
     # Create output directory structure
     output_path = Path(output_dir)
@@ -52,20 +111,19 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
     
     # Initialize tracking variables
     subset_data = []
+    subset_paths = []
     selection_summary = {}
     total_files_copied = 0
     
     # Process each breed
-    breeds = df['breed'].unique()
     print(f"\nProcessing {len(breeds)} breeds: {', '.join(breeds)}")
     
     for breed in breeds:
         print(f"\nProcessing {breed.upper()}...")
-        breed_data = df[df['breed'] == breed]
         
         # Get unique dogs by sex
-        male_dogs = breed_data[breed_data['sex'] == 'male']['dog_id'].unique()
-        female_dogs = breed_data[breed_data['sex'] == 'female']['dog_id'].unique()
+        male_dogs = dogs_of(breed, 'male')
+        female_dogs = dogs_of(breed, 'female')
         
         print(f"   Available: {len(male_dogs)} male dogs, {len(female_dogs)} female dogs")
         
@@ -98,13 +156,21 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
         
         for dog_id in all_selected_dogs:
             # Get all files for this dog
-            dog_files = breed_data[breed_data['dog_id'] == dog_id]
+            dog_files = files_of(breed, dog_id)
             
-            # Select random files (or all if fewer than requested)
-            selected_files = dog_files.sample(
-                n=min(files_per_dog, len(dog_files)), 
-                random_state=random_seed
-            )
+            if seconds_per_dog is None:
+                # Select random files (or all if fewer than requested)
+                selected_files = dog_files.sample(
+                    n=min(files_per_dog, len(dog_files)), 
+                    random_state=random_seed
+                )
+            else:
+                # Take files in random order until the dog has seconds_per_dog of audio (read from the WAV headers)
+                shuffled = dog_files.sample(frac=1, random_state=random_seed)
+                headers = probe_headers(Path(audio_dir) / "dogspeak_released" / row['dog_id'] / row['filename']
+                                        for _, row in shuffled.iterrows())
+                cumulative = np.cumsum(np.nan_to_num([header['duration'] for header in headers]))
+                selected_files = shuffled.iloc[:int(np.searchsorted(cumulative, seconds_per_dog)) + 1]
             
             # Copy files and update metadata
             for _, row in selected_files.iterrows():
@@ -121,7 +187,9 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
                 # Copy file if source exists
                 if source_file.exists():
                     shutil.copy2(source_file, dest_file)
+                    add_counters(files=1, bytes=dest_file.stat().st_size)
                     subset_data.append(row)
+                    subset_paths.append(dest_file)
                     total_files_copied += 1
                     breed_summary['files_copied'] += 1
                 else:
@@ -129,14 +197,21 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
         
         selection_summary[breed] = breed_summary
         print(f"   Copied {breed_summary['files_copied']} files for {breed}")
+
+    if index_path:
+        index.close()
     
-    # Create new metadata file for subset
-    subset_df = pd.DataFrame(subset_data)
-    metadata_output = Path("data/exploration/metadata_subset.csv")
+    # Create new metadata file for subset, with the WAV header values of every copied file
+    subset_df = add_header_columns(pd.DataFrame(subset_data), subset_paths)
+    audio_per_breed = subset_df.groupby('breed')['duration'].sum() if len(subset_df) else pd.Series(dtype=float)
+    for breed, stats in selection_summary.items():
+        stats['audio_seconds'] = float(audio_per_breed.get(breed, 0.0))
+    total_audio = sum(stats['audio_seconds'] for stats in selection_summary.values())
+    metadata_output = Path(exploration_dir) / "metadata_subset.csv"
     subset_df.to_csv(metadata_output, index=False)
     
     # Create summary report
-    summary_output = Path("data/exploration/subset_creation_report.txt")
+    summary_output = Path(exploration_dir) / "subset_creation_report.txt"
     
     print(f"\nCreating summary report...")
     with open(summary_output, 'w') as f:
@@ -144,8 +219,13 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
         f.write("=" * 45 + "\n\n")
         f.write(f"Creation Date: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write(f"Random Seed: {random_seed}\n")
+        if duplicates_path:
+            f.write(f"Duplicate recordings excluded: {len(excluded)}\n")
         f.write(f"Target: {dogs_per_sex} males + {dogs_per_sex} females per breed\n")
-        f.write(f"Files per dog: {files_per_dog}\n\n")
+        if seconds_per_dog is None:
+            f.write(f"Files per dog: {files_per_dog}\n\n")
+        else:
+            f.write(f"Audio per dog: {seconds_per_dog:g} s\n\n")
         
         f.write("BREED SELECTION SUMMARY:\n")
         f.write("-" * 25 + "\n")
@@ -158,6 +238,7 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
             f.write(f"  Available dogs: {stats['available_males']} males, {stats['available_females']} females\n")
             f.write(f"  Selected dogs: {stats['selected_males']} males, {stats['selected_females']} females\n")
             f.write(f"  Files copied: {stats['files_copied']}\n")
+            f.write(f"  Audio: {stats['audio_seconds']:.1f} s\n")
             
             total_selected_males += stats['selected_males']
             total_selected_females += stats['selected_females']
@@ -166,40 +247,48 @@ def create_balanced_subset(metadata_path: str, audio_dir: str, output_dir: str,
         f.write(f"  Selected dogs: {total_selected_males} males + {total_selected_females} females = {total_selected_males + total_selected_females}\n")
         f.write(f"  Total files copied: {total_files_copied}\n")
         f.write(f"  Files per dog (average): {total_files_copied / (total_selected_males + total_selected_females):.1f}\n")
+        f.write(f"  Total audio: {total_audio:.1f} s\n")
     
     # Display final summary
     print(f"\nSubset creation completed!")
     print(f"Summary:")
     print(f"   Total dogs selected: {sum(s['selected_males'] + s['selected_females'] for s in selection_summary.values())}")
     print(f"   Total files copied: {total_files_copied}")
+    print(f"   Total audio: {total_audio:.1f} s")
     print(f"   Metadata file: {metadata_output}")
     print(f"   Audio files: {audio_output}")
     print(f"   Report: {summary_output}")
     
     return {
         'total_files': total_files_copied,
+        'total_duration': total_audio,
         'total_dogs': sum(s['selected_males'] + s['selected_females'] for s in selection_summary.values()),
         'breed_summary': selection_summary,
         'output_path': output_path
     }
 
-def main() -> int:
+def main(base_dir: str = ".", dogs_per_sex: int = 10, files_per_dog: int = 3, random_seed: int = 42,
+         use_index: bool = True, seconds_per_dog: float = None, exclude_duplicates: bool = False) -> int:
     """
     Main function to create the subset.
 
+    :param base_dir: Repository/data root containing data/raw/DogSpeak_Dataset
+    :param dogs_per_sex: Males and females per breed
+    :param files_per_dog: Audio files per selected dog
+    :param random_seed: Random selection for reproducibility
+    :param use_index: Select from the metadata index in data/ instead of loading metadata.csv
+    :param seconds_per_dog: Audio time per dog to balance on instead of files_per_dog
+    :param exclude_duplicates: Leave out the duplicates listed in data/exploration/duplicates.csv
     :return: Exit code
     """
 
     # Paths
-    base_dir = "/Users/nika/Downloads/NMSML"
     metadata_path = f"{base_dir}/data/raw/DogSpeak_Dataset/metadata.csv"
     audio_dir = f"{base_dir}/data/raw/DogSpeak_Dataset"
     output_dir = f"{base_dir}/data/raw/subset"
-    
-    # Parameters
-    DOGS_PER_SEX = 10  # males and females per breed
-    FILES_PER_DOG = 3  # audio files per selected dog
-    RANDOM_SEED = 42   # random selection for reproducibility
+    exploration_dir = f"{base_dir}/data/exploration"
+    index_path = f"{base_dir}/data/metadata_index.sqlite" if use_index else None
+    duplicates_path = f"{exploration_dir}/duplicates.csv" if exclude_duplicates else None
 
     try:
         # Check if source files exist
@@ -216,9 +305,13 @@ def main() -> int:
             metadata_path=metadata_path,
             audio_dir=audio_dir, 
             output_dir=output_dir,
-            dogs_per_sex=DOGS_PER_SEX,
-            files_per_dog=FILES_PER_DOG,
-            random_seed=RANDOM_SEED
+            dogs_per_sex=dogs_per_sex,
+            files_per_dog=files_per_dog,
+            random_seed=random_seed,
+            exploration_dir=exploration_dir,
+            index_path=index_path,
+            seconds_per_dog=seconds_per_dog,
+            duplicates_path=duplicates_path
         )
         
         print(f"\nSuccess! Balanced subset created with {results['total_files']} files from {results['total_dogs']} dogs.")
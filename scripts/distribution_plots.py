@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Distribution Plots from Precomputed Summaries
+Computes per-group quantiles and KDE grids in one vectorized pass and draws
+box/violin artists from those summaries instead of the raw rows.
+
+Seaborn's boxplot/violinplot recompute quartiles and KDEs per hue level and per
+axis from every row, so plot time grows with the size of the table. Here the
+summaries are computed once per (table, feature, grouping), cached, and the
+drawing cost depends only on the number of groups and the grid size.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
+import pickle
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.axes import Axes
+from matplotlib.artist import Artist
+
+# Number of points on each group's KDE grid
+GRID_SIZE = 256
+# Bandwidths to extend the grid beyond the data range (seaborn's default cut)
+KDE_CUT = 2.0
+# Upper bound on outliers kept per group so flier drawing stays bounded
+MAX_FLIERS = 200
+# Whisker reach as a multiple of the IQR (matplotlib/seaborn default)
+WHISKER_IQR = 1.5
+
+
+@dataclass
+class DistributionSummary:
+    """
+    Per-group summary of one feature, sufficient to draw box and violin plots.
+
+    Arrays are indexed by group position; ``groups`` holds the (x, hue) labels.
+    """
+    feature: str
+    groups: List[Tuple[str, str]]
+    x_levels: List[str]
+    hue_levels: List[str]
+    counts: np.ndarray
+    mean: np.ndarray
+    q1: np.ndarray
+    median: np.ndarray
+    q3: np.ndarray
+    whislo: np.ndarray
+    whishi: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    fliers: List[np.ndarray]
+    kde_grid: np.ndarray
+    kde_density: np.ndarray
+
+
+# In-memory cache keyed by (table fingerprint, feature, grouping)
+_SUMMARY_CACHE: Dict[Tuple[str, str, Tuple[str, str]], DistributionSummary] = {}
+
+
+def _ordered_levels(series: pd.Series) -> List[str]:
+    """
+    Return the level order seaborn would use: categories if categorical, else order of appearance.
+
+    :param series: Grouping column
+    :return: List of level labels
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        present = set(series.dropna().unique())
+        return [level for level in series.cat.categories if level in present]
+    return list(pd.unique(series.dropna()))
+
+
+def _table_fingerprint(df: pd.DataFrame, columns: Sequence[str]) -> str:
+    """
+    Fingerprint the columns a summary depends on.
+
+    :param df: Source table
+    :param columns: Columns to include in the fingerprint
+    :return: Hex digest
+    """
+    hashed = pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+def _grouped_quantiles(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                       q: np.ndarray) -> np.ndarray:
+    """
+    Linear-interpolated quantiles for every group of a group-sorted array.
+
+    :param sorted_values: Values sorted by (group, value)
+    :param starts: Start offset of each group in ``sorted_values``
+    :param counts: Number of values in each group
+    :param q: Quantile levels in [0, 1]
+    :return: Array of shape (n_groups, len(q))
+    """
+    pos = starts[:, None] + q[None, :] * (counts[:, None] - 1)
+    lower = np.floor(pos).astype(np.int64)
+    upper = np.minimum(lower + 1, (starts + counts - 1)[:, None])
+    frac = pos - lower
+    return sorted_values[lower] * (1 - frac) + sorted_values[upper] * frac
+
+
+def _binned_kde(values: np.ndarray, codes: np.ndarray, counts: np.ndarray, std: np.ndarray,
+                minimum: np.ndarray, maximum: np.ndarray,
+                grid_size: int = GRID_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gaussian KDE for all groups at once via linear binning and FFT smoothing.
+
+    Each group gets its own grid spanning [min - cut*bw, max + cut*bw] with a
+    Scott's-rule bandwidth. Rows are binned in one bincount over the combined
+    (group, bin) index, then every group is smoothed in one batched FFT.
+
+    :param values: Feature values
+    :param codes: Group code of each value
+    :param counts: Rows per group
+    :param std: Sample standard deviation per group
+    :param minimum: Minimum per group
+    :param maximum: Maximum per group
+    :param grid_size: Number of grid points per group
+    :return: Tuple of (grid, density), each of shape (n_groups, grid_size)
+    """
+    n_groups = len(counts)
+    bandwidth = std * np.power(np.maximum(counts, 1), -0.2)
+    # Degenerate groups (single value or zero spread) get a nominal bandwidth
+    span = maximum - minimum
+    fallback = np.where(span > 0, span, np.maximum(np.abs(maximum), 1.0)) * 0.1
+    bandwidth = np.where(np.isfinite(bandwidth) & (bandwidth > 0), bandwidth, fallback)
+
+    lo = minimum - KDE_CUT * bandwidth
+    hi = maximum + KDE_CUT * bandwidth
+    step = (hi - lo) / (grid_size - 1)
+    grid = lo[:, None] + step[:, None] * np.arange(grid_size)[None, :]
+
+    # Linear binning: split each value's unit weight between its two neighbouring bins
+    pos = (values - lo[codes]) / step[codes]
+    left = np.clip(np.floor(pos).astype(np.int64), 0, grid_size - 2)
+    right_weight = np.clip(pos - left, 0.0, 1.0)
+    flat_left = codes * grid_size + left
+    binned = np.bincount(flat_left, weights=1.0 - right_weight, minlength=n_groups * grid_size)
+    binned += np.bincount(flat_left + 1, weights=right_weight, minlength=n_groups * grid_size)
+    binned = binned.reshape(n_groups, grid_size)
+
+    # Smooth with a per-group Gaussian in the frequency domain; pad to avoid wrap-around
+    n_fft = 2 * grid_size
+    freqs = np.fft.rfftfreq(n_fft)
+    sigma_bins = bandwidth / step
+    transfer = np.exp(-2.0 * (np.pi * freqs[None, :] * sigma_bins[:, None]) ** 2)
+    smoothed = np.fft.irfft(np.fft.rfft(binned, n=n_fft, axis=1) * transfer, n=n_fft, axis=1)
+    density = np.clip(smoothed[:, :grid_size], 0.0, None) / (np.maximum(counts, 1) * step)[:, None]
+    return grid, density
+
+
+def compute_distribution_summaries(df: pd.DataFrame, features: Sequence[str], x: str = 'Breed',
+                                   hue: str = 'Sex', cache_dir: Optional[Path] = None
+                                   ) -> Dict[str, DistributionSummary]:
+    """
+    Compute box and violin summaries for several features in one pass over the group index.
+
+    Results are cached in memory (and in ``cache_dir`` if given) keyed by a
+    fingerprint of the grouping and feature columns, so repeated plots of the
+    same feature do not touch the rows again.
+
+    :param df: Table with one row per recording
+    :param features: Feature columns to summarize
+    :param x: Column used for the x-axis categories
+    :param hue: Column used for the hue split
+    :param cache_dir: Optional directory for persisting summaries between runs
+    :return: Dictionary mapping feature name to its summary
+    """
+    summaries: Dict[str, DistributionSummary] = {}
+    missing = []
+    for feature in features:
+        key = (_table_fingerprint(df, [x, hue, feature]), feature, (x, hue))
+        if key in _SUMMARY_CACHE:
+            summaries[feature] = _SUMMARY_CACHE[key]
+            continue
+        if cache_dir is not None:
+            cache_path = Path(cache_dir) / f"distribution_{key[0]}_{feature}.pkl"
+            if cache_path.exists():
+                with open(cache_path, 'rb') as f:
+                    _SUMMARY_CACHE[key] = summaries[feature] = pickle.load(f)
+                continue
+        missing.append((feature, key))
+
+    if not missing:
+        return summaries
+
+    # Build the group index once for all features
+    x_levels = _ordered_levels(df[x])
+    hue_levels = _ordered_levels(df[hue])
+    x_codes = pd.Categorical(df[x], categories=x_levels).codes.astype(np.int64)
+    hue_codes = pd.Categorical(df[hue], categories=hue_levels).codes.astype(np.int64)
+    valid_rows = (x_codes >= 0) & (hue_codes >= 0)
+    all_codes = x_codes * len(hue_levels) + hue_codes
+
+    for feature, key in missing:
+        values = df[feature].to_numpy(dtype=np.float64)
+        keep = valid_rows & np.isfinite(values)
+        codes_full = all_codes[keep]
+        values = values[keep]
+
+        # Only groups that have rows become boxes/violins (matches seaborn)
+        present, codes = np.unique(codes_full, return_inverse=True)
+        groups = [(x_levels[c // len(hue_levels)], hue_levels[c % len(hue_levels)]) for c in present]
+
+        order = np.lexsort((values, codes))
+        sorted_values = values[order]
+        sorted_codes = codes[order]
+        counts = np.bincount(codes, minlength=len(present))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        sums = np.bincount(codes, weights=values, minlength=len(present))
+        mean = sums / counts
+        sq_dev = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=len(present))
+        std = np.sqrt(sq_dev / np.maximum(counts - 1, 1))
+
+        q1, median, q3 = _grouped_quantiles(sorted_values, starts, counts,
+                                            np.array([0.25, 0.5, 0.75])).T
+        minimum = sorted_values[starts]
+        maximum = sorted_values[starts + counts - 1]
+
+        # Whiskers: most extreme values still within WHISKER_IQR * IQR of the box
+        iqr = q3 - q1
+        lo_fence = (q1 - WHISKER_IQR * iqr)[sorted_codes]
+        hi_fence = (q3 + WHISKER_IQR * iqr)[sorted_codes]
+        inside = (sorted_values >= lo_fence) & (sorted_values <= hi_fence)
+        whislo = np.minimum.reduceat(np.where(inside, sorted_values, np.inf), starts)
+        whishi = np.maximum.reduceat(np.where(inside, sorted_values, -np.inf), starts)
+        whislo = np.where(np.isfinite(whislo), whislo, q1)
+        whishi = np.where(np.isfinite(whishi), whishi, q3)
+
+        outlier_positions = np.flatnonzero(~inside)
+        outlier_groups = sorted_codes[outlier_positions]
+        fliers = []
+        for g, positions in enumerate(np.split(outlier_positions,
+                                               np.searchsorted(outlier_groups, np.arange(1, len(present))))):
+            if len(positions) > MAX_FLIERS:
+                positions = positions[np.linspace(0, len(positions) - 1, MAX_FLIERS).astype(np.int64)]
+            fliers.append(sorted_values[positions])
+
+        kde_grid, kde_density = _binned_kde(values, codes, counts, std, minimum, maximum)
+
+        summary = DistributionSummary(
+            feature=feature, groups=groups, x_levels=x_levels, hue_levels=hue_levels,
+            counts=counts, mean=mean, q1=q1, median=median, q3=q3,
+            whislo=whislo, whishi=whishi, minimum=minimum, maximum=maximum,
+            fliers=fliers, kde_grid=kde_grid, kde_density=kde_density
+        )
+        _SUMMARY_CACHE[key] = summaries[feature] = summary
+        if cache_dir is not None:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            with open(Path(cache_dir) / f"distribution_{key[0]}_{feature}.pkl", 'wb') as f:
+                pickle.dump(summary, f)
+
+    return summaries
+
+
+def _dodged_positions(summary: DistributionSummary, width: float = 0.8) -> Tuple[np.ndarray, float]:
+    """
+    Compute x positions for each group, dodging hue levels like seaborn.
+
+    :param summary: Distribution summary
+    :param width: Total width available per x category
+    :return: Tuple of (positions, width per element)
+    """
+    n_hue = len(summary.hue_levels)
+    element_width = width / n_hue
+    positions = np.array([
+        summary.x_levels.index(x_label) - width / 2 + element_width * (summary.hue_levels.index(hue_label) + 0.5)
+        for x_label, hue_label in summary.groups
+    ])
+    return positions, element_width
+
+
+def _label_by_hue(artists: Sequence[Artist], summary: DistributionSummary, colors: List) -> None:
+    """
+    Colour artists by hue level and label the first one of each level for the legend.
+
+    :param artists: One artist per group, in group order
+    :param summary: Distribution summary
+    :param colors: One colour per hue level
+    :return: None
+    """
+    seen = set()
+    for artist, (_, hue_level) in zip(artists, summary.groups):
+        artist.set_facecolor(colors[summary.hue_levels.index(hue_level)])
+        artist.set_edgecolor('0.25')
+        artist.set_label('_nolegend_' if hue_level in seen else hue_level)
+        seen.add(hue_level)
+
+
+def _finish_axes(ax: Axes, summary: DistributionSummary, colors: List, x_label: str, hue_label: str) -> None:
+    """
+    Set categorical ticks, axis labels and a hue legend on the axes.
+
+    :param ax: Matplotlib axes
+    :param summary: Distribution summary
+    :param colors: One colour per hue level
+    :param x_label: Label for the x axis
+    :param hue_label: Title for the hue legend
+    :return: None
+    """
+    ax.set_xticks(range(len(summary.x_levels)))
+    ax.set_xticklabels(summary.x_levels)
+    ax.set_xlim(-0.5, len(summary.x_levels) - 0.5)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(summary.feature)
+    ax.legend(title=hue_label)
+
+
+def draw_boxplot(ax: Axes, summary: DistributionSummary, x_label: str = 'Breed', hue_label: str = 'Sex') -> None:
+    """
+    Draw a grouped box plot from a precomputed summary.
+
+    :param ax: Matplotlib axes to draw on
+    :param summary: Distribution summary for one feature
+    :param x_label: Label for the x axis
+    :param hue_label: Title for the hue legend
+    :return: None
+    """
+    colors = sns.color_palette(n_colors=len(summary.hue_levels))
+    positions, element_width = _dodged_positions(summary)
+    box_stats = [
+        {'med': summary.median[g], 'q1': summary.q1[g], 'q3': summary.q3[g],
+         'whislo': summary.whislo[g], 'whishi': summary.whishi[g], 'fliers': summary.fliers[g]}
+        for g in range(len(summary.groups))
+    ]
+    artists = ax.bxp(box_stats, positions=positions, widths=element_width * 0.9,
+                     patch_artist=True, manage_ticks=False,
+                     medianprops={'color': '0.25'}, flierprops={'marker': 'd', 'markersize': 4})
+    _label_by_hue(artists['boxes'], summary, colors)
+    _finish_axes(ax, summary, colors, x_label, hue_label)
+
+
+def draw_violinplot(ax: Axes, summary: DistributionSummary, x_label: str = 'Breed', hue_label: str = 'Sex') -> None:
+    """
+    Draw a grouped violin plot (with an inner box) from a precomputed summary.
+
+    :param ax: Matplotlib axes to draw on
+    :param summary: Distribution summary for one feature
+    :param x_label: Label for the x axis
+    :param hue_label: Title for the hue legend
+    :return: None
+    """
+    colors = sns.color_palette(n_colors=len(summary.hue_levels))
+    positions, element_width = _dodged_positions(summary)
+    vpstats = [
+        {'coords': summary.kde_grid[g], 'vals': summary.kde_density[g],
+         'mean': summary.mean[g], 'median': summary.median[g],
+         'min': summary.minimum[g], 'max': summary.maximum[g]}
+        for g in range(len(summary.groups))
+    ]
+    artists = ax.violin(vpstats, positions=positions, widths=element_width * 0.95,
+                        showmeans=False, showextrema=False, showmedians=False)
+    _label_by_hue(artists['bodies'], summary, colors)
+    for body in artists['bodies']:
+        body.set_alpha(1.0)
+
+    # Inner box: whisker line, IQR bar and median point
+    ax.vlines(positions, summary.whislo, summary.whishi, color='0.25', linewidth=1)
+    ax.vlines(positions, summary.q1, summary.q3, color='0.25', linewidth=4)
+    ax.scatter(positions, summary.median, color='white', s=12, zorder=3)
+    _finish_axes(ax, summary, colors, x_label, hue_label)
+
+
+def clear_summary_cache() -> None:
+    """
+    Drop all in-memory distribution summaries.
+
+    :return: None
+    """
+    _SUMMARY_CACHE.clear()
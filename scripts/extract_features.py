@@ -0,0 +1,790 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction Driver
+Runs feature extraction over the subset folders so the extraction step can be
+scheduled by the pipeline runner. Two engines write the same CSV:
+- praat: the Praat script extract_features.praat
+- python: scripts.acoustic_analysis, optionally over several processes, with
+  recordings read ahead of the analysis by reader threads
+
+Undefined measurements are written as empty fields (NaN), not 0. Both
+engines commit their results in batches and resume an interrupted run after
+the last committed batch (scripts.checkpoint), and write the status (ok,
+unvoiced or failed), time and error of every recording to
+<output>_status.csv; a recording that fails gets an empty row instead of
+stopping the run. The python engine analyzes only detected bark segments and writes their boundaries to
+a <output>_segments.csv file next to the feature CSV; with several jobs it
+schedules the longest recordings first. It also appends the
+feature bank columns (HNR, jitter, shimmer, spectral centroid/rolloff,
+formant dispersion, MFCC means) after the Praat feature set. Its results are
+cached per recording content (SHA-256) and analysis settings, so identical
+copies are analyzed once and re-runs only analyze new recordings.
+
+run_sharded_extraction() spreads either engine over workers on several
+nodes through a work queue on a shared filesystem (scripts.work_queue).
+"""
+
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import time
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scripts.checkpoint import DEFAULT_CHECKPOINT_EVERY, ExtractionCheckpoint
+from scripts.instrumentation import add_counters, traced
+from scripts.prefetch import DEFAULT_PREFETCH_DEPTH, DEFAULT_READERS, PrefetchStats, prefetch_list
+from scripts.work_queue import DEFAULT_SHARD_SIZE, STALE_AFTER
+
+PRAAT_SCRIPT = Path(__file__).with_name("extract_features.praat")
+DEFAULT_PRAAT_BINARY = os.environ.get("PRAAT_BINARY", "praat")
+FEATURE_COLUMNS = ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']
+CSV_COLUMNS = ['Folder', 'File', 'Breed', 'Sex'] + FEATURE_COLUMNS
+SEGMENT_COLUMNS = ['Folder', 'File', 'segment', 'start_s', 'end_s']
+# Per-recording outcome written to <output>_status.csv (status: ok, unvoiced or failed)
+STATUS_COLUMNS = ['Folder', 'File', 'status', 'seconds', 'error']
+EXTRACTION_CACHE_FILE = "extraction_cache.sqlite"
+
+
+def list_recordings(input_directory: str, index_path: Optional[str] = None) -> List[Tuple[str, str, str, str, Path]]:
+    """
+    List the subset recordings in the order the Praat script visits them.
+
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :param index_path: SQLite metadata index to list them from (re-scanned only when a folder changed)
+    :return: (folder, file, breed, sex, path) per recording
+    """
+    if index_path:
+        from scripts.metadata_index import SUBSET_COLLECTION, MetadataIndex
+
+        with MetadataIndex(Path(index_path)) as index:
+            index.update_directory(Path(input_directory))
+            return [(r['folder'], r['filename'], r['folder'].rsplit('_', 1)[0], r['sex'],
+                     Path(input_directory) / r['path']) for r in index.recordings(SUBSET_COLLECTION)]
+
+    recordings = []
+    for folder in sorted(p for p in Path(input_directory).iterdir() if p.is_dir() and '_' in p.name):
+        breed, sex = folder.name.rsplit('_', 1)
+        for wav_file in sorted(folder.glob("*.wav")):
+            recordings.append((folder.name, wav_file.name, breed, sex, wav_file))
+    return recordings
+
+
+def recordings_from_metadata(metadata_path: str, input_directory: str) -> List[Tuple[str, str, str, str, Path]]:
+    """
+    List the subset recordings named in a metadata_subset.csv, in the order list_recordings() gives them.
+
+    :param metadata_path: metadata_subset.csv (filename, breed, sex, ...)
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :return: (folder, file, breed, sex, path) per recording
+    """
+    from scripts.ingest import read_metadata
+
+    df = read_metadata(Path(metadata_path))
+    rows = sorted((f"{breed}_{sex}", filename, breed, sex)
+                  for filename, breed, sex in zip(df['filename'], df['breed'].astype(str), df['sex'].astype(str)))
+    return [(folder, file, breed, sex, Path(input_directory) / folder / file) for folder, file, breed, sex in rows]
+
+
+def _indexed_values(paths: List[Path], input_directory: str, index_path: Optional[str],
+                    column: str) -> Dict[Path, Any]:
+    """
+    One probed value per recording from the metadata index, for files unchanged since they were probed.
+
+    A file rewritten in place keeps its path, so the indexed value is only
+    used while the file's current size and modification time still match the
+    indexed ones; the other files are left for the caller to read.
+
+    :param paths: Recording paths (as returned by list_recordings())
+    :param input_directory: Subset directory the paths are in
+    :param index_path: SQLite metadata index
+    :param column: Probed column, e.g. 'duration' or 'content_hash'
+    :return: Path -> value, for the paths with a current indexed value
+    """
+    if not index_path:
+        return {}
+    from scripts.metadata_index import SUBSET_COLLECTION, MetadataIndex
+
+    with MetadataIndex(Path(index_path)) as index:
+        indexed = {Path(input_directory) / r['path']: r for r in index.recordings(SUBSET_COLLECTION)
+                   if r[column] is not None}
+    known = {}
+    for path in paths:
+        record = indexed.get(path)
+        if record is None:
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if (stat.st_size, stat.st_mtime_ns) == (record['bytes'], record['mtime_ns']):
+            known[path] = record[column]
+    return known
+
+
+def recording_durations(paths: List[Path], input_directory: str, index_path: Optional[str] = None) -> List[float]:
+    """
+    Duration of every recording, from the metadata index where known and the WAV headers otherwise.
+
+    :param paths: Recording paths (as returned by list_recordings())
+    :param input_directory: Subset directory the paths are in
+    :param index_path: SQLite metadata index
+    :return: Durations in seconds (NaN when unreadable)
+    """
+    from scripts.wav_header import probe_headers
+
+    known: Dict[Path, float] = _indexed_values(paths, input_directory, index_path, 'duration')
+    missing = [path for path in paths if path not in known]
+    known.update(zip(missing, (header['duration'] for header in probe_headers(missing))))
+    return [known[path] for path in paths]
+
+
+def recording_hashes(paths: List[Path], input_directory: str, index_path: Optional[str] = None) -> List[Optional[str]]:
+    """
+    Content hash of every recording, from the metadata index where known and by hashing otherwise.
+
+    :param paths: Recording paths (as returned by list_recordings())
+    :param input_directory: Subset directory the paths are in
+    :param index_path: SQLite metadata index
+    :return: Hex SHA-256 digests (None when unreadable)
+    """
+    from scripts.fingerprint import hash_files
+
+    known: Dict[Path, str] = _indexed_values(paths, input_directory, index_path, 'content_hash')
+    missing = [path for path in paths if path not in known]
+    known.update(zip(missing, hash_files(missing)))
+    return [known[path] for path in paths]
+
+
+def duplicate_aliases(duplicates_path: str) -> Dict[str, str]:
+    """
+    Map the content hash of every listed duplicate to the content hash of the copy that is kept.
+
+    :param duplicates_path: duplicates.csv from scripts.fingerprint
+    :return: Content hash -> content hash of the kept recording
+    """
+    import pandas as pd
+
+    duplicates = pd.read_csv(duplicates_path, keep_default_na=False)
+    kept = dict(zip(duplicates.loc[duplicates['duplicate_of'] == "", 'path'],
+                    duplicates.loc[duplicates['duplicate_of'] == "", 'content_hash']))
+    return {digest: kept[group] for digest, group in zip(duplicates['content_hash'], duplicates['group'])
+            if group in kept and digest}
+
+
+class ExtractionCache:
+    """
+    SQLite cache of python engine results per recording content and analysis settings.
+
+    The settings key covers the engine options and the source of
+    scripts/acoustic_analysis.py, so changing either starts a fresh set of
+    entries instead of returning stale results.
+    """
+
+    def __init__(self, path: Path, **settings: Any) -> None:
+        """
+        Open (and create if needed) the cache.
+
+        :param path: SQLite file
+        :param settings: Analysis options the results depend on
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        source = Path(__file__).with_name("acoustic_analysis.py").read_bytes()
+        self.settings = hashlib.sha256(json.dumps(settings, sort_keys=True).encode() + source).hexdigest()
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (content_hash TEXT, settings TEXT, "
+                                "features TEXT, segments TEXT, PRIMARY KEY (content_hash, settings))")
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+
+        :return: None
+        """
+        self.connection.close()
+
+    def get(self, digests: List[str]) -> Dict[str, Tuple[Dict[str, float], List[Tuple[float, float]]]]:
+        """
+        Cached results of the given contents.
+
+        :param digests: Content hashes
+        :return: Content hash -> (features, segments) for the cached ones
+        """
+        found = {}
+        wanted = sorted(set(digests))
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT content_hash, features, segments FROM results "
+                f"WHERE settings = ? AND content_hash IN ({','.join('?' * len(batch))})", [self.settings, *batch])
+            for digest, features, segments in rows:
+                found[digest] = (json.loads(features), [tuple(segment) for segment in json.loads(segments)])
+        return found
+
+    def put(self, results: Dict[str, Tuple[Dict[str, float], List[Tuple[float, float]]]]) -> None:
+        """
+        Store results.
+
+        :param results: Content hash -> (features, segments)
+        :return: None
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO results (content_hash, settings, features, segments) VALUES (?, ?, ?, ?)",
+            [(digest, self.settings, json.dumps(features), json.dumps(segments))
+             for digest, (features, segments) in results.items()]
+        )
+        self.connection.commit()
+
+
+def segments_path(output_file: str) -> Path:
+    """
+    Path of the segment boundary file written next to a feature CSV.
+
+    :param output_file: Feature CSV
+    :return: Path to <output>_segments.csv
+    """
+    output_path = Path(output_file)
+    return output_path.with_name(f"{output_path.stem}_segments.csv")
+
+
+def status_path(output_file: str) -> Path:
+    """
+    Path of the per-recording status file written next to a feature CSV.
+
+    :param output_file: Feature CSV
+    :return: Path to <output>_status.csv
+    """
+    output_path = Path(output_file)
+    return output_path.with_name(f"{output_path.stem}_status.csv")
+
+
+def _format_value(value: float, column: str) -> str:
+    """
+    Format a feature like the Praat script (empty when undefined).
+
+    Frequencies keep one decimal as in the Praat output; the dimensionless
+    feature bank values keep four significant digits.
+
+    :param value: Feature value
+    :param column: Feature column name
+    :return: CSV field
+    """
+    if not math.isfinite(value):
+        return ""
+    return f"{value:.1f}" if column in FEATURE_COLUMNS else f"{value:.4g}"
+
+
+@dataclass
+class FileResult:
+    """
+    Outcome of analyzing one recording with the python engine.
+    """
+    features: Dict[str, float]
+    segments: List[Tuple[float, float]]
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        return file_status(self.error, self.features.get('F0_mean', math.nan))
+
+
+def file_status(error: Optional[str], f0_mean: float) -> str:
+    """
+    Status of a recording in the <output>_status.csv file.
+
+    :param error: Why the recording could not be analyzed (None when it was)
+    :param f0_mean: Its mean F0 (NaN when no voiced frame was found)
+    :return: "failed", "unvoiced" or "ok"
+    """
+    if error is not None:
+        return 'failed'
+    return 'ok' if math.isfinite(f0_mean) else 'unvoiced'
+
+
+def _status_row(folder: str, file: str, status: str, seconds: Optional[float], error: Optional[str]) -> List[str]:
+    return [folder, file, status, "" if seconds is None else f"{seconds:.3f}", error or ""]
+
+
+def _read_recording(path: Path) -> Tuple[Optional[Tuple[int, Any]], float, Optional[str]]:
+    """
+    Read and decode one recording (runs in the prefetch reader threads).
+
+    :param path: Path to the WAV file
+    :return: ((sample rate, samples) or None, seconds spent, error message or None)
+    """
+    from scipy.io import wavfile
+
+    started = time.perf_counter()
+    try:
+        audio = wavfile.read(path)
+    except Exception as e:
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+    return audio, time.perf_counter() - started, None
+
+
+def _analyze_recording(loaded: Tuple[Optional[Tuple[int, Any]], float, Optional[str]], feature_bank: bool = True,
+                       pitch_algorithm: str = 'ac') -> FileResult:
+    """
+    Analyze one decoded recording (top-level so it can run in worker processes).
+
+    :param loaded: Output of _read_recording()
+    :param feature_bank: Also compute the feature bank columns
+    :param pitch_algorithm: Pitch algorithm name
+    :return: Feature values, analyzed segments and the time spent reading and analyzing
+    """
+    from scripts.acoustic_analysis import analyze_samples
+
+    audio, seconds, error = loaded
+    if audio is None:
+        return FileResult({}, [], seconds, error)
+    started = time.perf_counter()
+    try:
+        features, segments = analyze_samples(audio[1], audio[0], feature_bank=feature_bank,
+                                             pitch_algorithm=pitch_algorithm)
+    except Exception as e:
+        return FileResult({}, [], seconds + time.perf_counter() - started, f"{type(e).__name__}: {e}")
+    return FileResult(features, [(float(start), float(end)) for start, end in segments],
+                      seconds + time.perf_counter() - started)
+
+
+def _listing_digest(recordings: List[Tuple[str, str, str, str, Path]]) -> str:
+    """
+    Fingerprint of a recording list (names, sizes and modification times), so a checkpoint
+    is only resumed over the same recordings.
+
+    :param recordings: (folder, file, breed, sex, path) per recording
+    :return: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for folder, file, _, _, path in recordings:
+        stat = Path(path).stat()
+        digest.update(f"{folder}/{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _report_status(status_file: Path) -> Dict[str, int]:
+    """
+    Print and count the recordings per status.
+
+    :param status_file: <output>_status.csv
+    :return: Status -> recordings
+    """
+    counts: Dict[str, int] = {}
+    with open(status_file, newline='') as f:
+        for row in csv.DictReader(f):
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+    print("Recordings: " + ", ".join(f"{counts[status]} {status}" for status in sorted(counts)))
+    if counts.get('failed'):
+        print(f"Failed recordings are listed with their error in {status_file}")
+    return counts
+
+
+@traced('extract_features')
+def run_python_extraction(input_directory: str, output_file: str, jobs: int = 1, feature_bank: bool = True,
+                          pitch_algorithm: str = 'ac', index_path: Optional[str] = None,
+                          cache_path: Optional[str] = None, duplicates_path: Optional[str] = None,
+                          readers: int = DEFAULT_READERS, prefetch_depth: int = DEFAULT_PREFETCH_DEPTH,
+                          checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY, resume: bool = True) -> Path:
+    """
+    Extract F0, F1 and F2 (and the feature bank) for every subset recording with the Python analysis.
+
+    Recordings are read and decoded by reader threads ahead of the analysis
+    (scripts.prefetch), so reading from slow storage overlaps with computing.
+    Results are committed every checkpoint_every recordings (scripts.checkpoint)
+    and an interrupted run resumes after the last committed batch. A recording
+    that cannot be read or analyzed gets an empty (NaN) feature row and a
+    "failed" status instead of stopping the run.
+
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :param output_file: CSV file to write the features to
+    :param jobs: Worker processes
+    :param feature_bank: Also write the feature bank columns
+    :param pitch_algorithm: Pitch algorithm from acoustic_analysis.PITCH_ALGORITHMS ("ac" or "yin")
+    :param index_path: SQLite metadata index to list the recordings from (see list_recordings())
+    :param cache_path: ExtractionCache file to reuse and store results in (identical recordings are
+                       analyzed once per run even without it)
+    :param duplicates_path: duplicates.csv from scripts.fingerprint; listed near-duplicates reuse the
+                            results of the copy that is kept
+    :param readers: Threads reading recordings ahead of the analysis
+    :param prefetch_depth: Recordings read but not yet analyzed at most (bounds the memory of the buffers)
+    :param checkpoint_every: Recordings per checkpoint batch
+    :param resume: Continue from the checkpoint of an interrupted run with the same settings and recordings
+    :return: Path to the written CSV
+    """
+    from scripts.acoustic_analysis import FEATURE_BANK_COLUMNS, PITCH_ALGORITHMS
+
+    if pitch_algorithm not in PITCH_ALGORITHMS:
+        raise ValueError(f"Unknown pitch algorithm: {pitch_algorithm} (choose from {sorted(PITCH_ALGORITHMS)})")
+    columns = FEATURE_COLUMNS + (FEATURE_BANK_COLUMNS if feature_bank else [])
+    analyze = partial(_analyze_recording, feature_bank=feature_bank, pitch_algorithm=pitch_algorithm)
+    recordings = list_recordings(input_directory, index_path)
+    add_counters(files=len(recordings), bytes=sum(r[4].stat().st_size for r in recordings))
+
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Running Python extraction on: {input_directory} ({len(recordings)} files, {jobs} job(s))")
+    checkpoint = ExtractionCheckpoint(output_file, {'engine': 'python', 'feature_bank': feature_bank,
+                                                    'pitch_algorithm': pitch_algorithm,
+                                                    'recordings': _listing_digest(recordings)}, resume)
+    committed = checkpoint.committed
+    pending = [r for r in recordings if (r[0], r[1]) not in committed]
+    if len(pending) < len(recordings):
+        print(f"Resuming after {len(recordings) - len(pending)} recordings committed to {checkpoint.root}")
+
+    paths = [r[4] for r in pending]
+    # One analysis per distinct content: unreadable files keep their path as key and are not cached
+    aliases = duplicate_aliases(duplicates_path) if duplicates_path else {}
+    keys = [aliases.get(digest, digest) if digest is not None else str(path)
+            for path, digest in zip(paths, recording_hashes(paths, input_directory, index_path))]
+    cache = ExtractionCache(Path(cache_path), feature_bank=feature_bank,
+                            pitch_algorithm=pitch_algorithm) if cache_path else None
+    results: Dict[str, FileResult] = {}
+    stats = PrefetchStats()
+    reused = 0
+    analyzed = 0.0
+    try:
+        for batch_start in range(0, len(pending), max(1, checkpoint_every)):
+            batch = range(batch_start, min(batch_start + max(1, checkpoint_every), len(pending)))
+            if cache:
+                cached = cache.get([keys[i] for i in batch if keys[i] not in results])
+                results.update({key: FileResult(features, segments) for key, (features, segments) in cached.items()})
+            first: Dict[str, int] = {}
+            for i in batch:
+                if keys[i] not in results:
+                    first.setdefault(keys[i], i)
+            todo = list(first.values())
+            reused += len(batch) - len(todo)
+
+            order = todo
+            if jobs > 1 and len(todo) > 1:
+                # Longest recordings first, so the last tasks to finish are short ones
+                durations = recording_durations([paths[i] for i in todo], input_directory, index_path)
+                order = [todo[j] for j in sorted(range(len(todo)),
+                                                 key=lambda j: 0.0 if math.isnan(durations[j]) else -durations[j])]
+            fresh = dict(zip((keys[i] for i in order),
+                             prefetch_list(_read_recording, analyze, [paths[i] for i in order], readers=readers,
+                                           workers=jobs, depth=prefetch_depth, stats=stats)))
+            if cache:
+                cache.put({key: (result.features, result.segments) for key, result in fresh.items()
+                           if result.error is None})
+            results.update(fresh)
+            analyzed += sum(end - start for result in fresh.values() for start, end in result.segments)
+
+            feature_rows, segment_rows, status_rows = [], [], []
+            for i in batch:
+                folder, file, breed, sex, _ = pending[i]
+                result = results[keys[i]]
+                feature_rows.append([folder, file, breed, sex]
+                                    + [_format_value(result.features.get(c, math.nan), c) for c in columns])
+                segment_rows.extend([folder, file, number, f"{start:.3f}", f"{end:.3f}"]
+                                    for number, (start, end) in enumerate(result.segments))
+                # Time is reported for the recording that was analyzed, not for reused results
+                status_rows.append(_status_row(folder, file, result.status,
+                                               result.seconds if first.get(keys[i]) == i else None, result.error))
+            checkpoint.commit([(pending[i][0], pending[i][1]) for i in batch], {
+                '.csv': (CSV_COLUMNS[:4] + columns, feature_rows),
+                '_segments.csv': (SEGMENT_COLUMNS, segment_rows),
+                '_status.csv': (STATUS_COLUMNS, status_rows),
+            })
+    finally:
+        if cache:
+            cache.close()
+    if reused:
+        print(f"Reused results for {reused} recordings (identical content or cached)")
+    if pending:
+        print(f"Prefetch: {stats.summary()}")
+
+    written = checkpoint.merge([(r[0], r[1]) for r in recordings], {
+        '.csv': (output_path, CSV_COLUMNS[:4] + columns),
+        '_segments.csv': (segments_path(output_file), SEGMENT_COLUMNS),
+        '_status.csv': (status_path(output_file), STATUS_COLUMNS),
+    })
+    add_counters(rows=written['.csv'])
+    _report_status(status_path(output_file))
+    print(f"Analyzed {analyzed:.1f} s of bark segments")
+    print(f"Features saved to: {output_path}")
+    print(f"Segments saved to: {segments_path(output_file)}")
+    return output_path
+
+
+# Praat progress line of one recording: "Processed: <file> (<seconds> s)"
+PRAAT_PROGRESS = re.compile(r'^Processed: (.+) \(([\d.]+) s\)$')
+
+
+def _stage_recordings(recordings: List[Tuple[str, str, str]], staging: Path) -> None:
+    """
+    Link recordings into a fresh <breed>_<sex> folder layout, so either engine runs on them unchanged.
+
+    :param recordings: (folder, file, path) per recording
+    :param staging: Directory to create the layout in (replaced)
+    :return: None
+    """
+    shutil.rmtree(staging, ignore_errors=True)
+    for folder, file, path in recordings:
+        (staging / folder).mkdir(parents=True, exist_ok=True)
+        (staging / folder / file).symlink_to(Path(path).resolve())
+
+
+def _run_praat_batch(recordings: List[Tuple[str, str, str, str, Path]], staging: Path, praat_binary: str,
+                     script_path: str) -> Tuple[Dict[Tuple[str, str], List[str]], Dict[Tuple[str, str], float],
+                                                Optional[str]]:
+    """
+    Run the Praat script over some recordings.
+
+    :param recordings: (folder, file, breed, sex, path) per recording
+    :param staging: Scratch directory for the input layout and the output CSV
+    :param praat_binary: Praat executable
+    :param script_path: Path to the Praat extraction script
+    :return: (feature rows Praat wrote, seconds per recording, error message when Praat failed)
+    """
+    _stage_recordings([(folder, file, path) for folder, file, _, _, path in recordings], staging / 'input')
+    output = staging / 'output.csv'
+    output.unlink(missing_ok=True)
+    completed = subprocess.run([praat_binary, "--run", str(script_path), str((staging / 'input').resolve()),
+                                str(output.resolve())], capture_output=True, text=True)
+
+    rows: Dict[Tuple[str, str], List[str]] = {}
+    if output.exists():
+        with open(output, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            # A line cut off by a crash has fewer fields and is dropped
+            rows = {(row[0], row[1]): row for row in reader if len(row) == len(CSV_COLUMNS)}
+    seconds: Dict[Tuple[str, str], float] = {}
+    folder = None
+    for line in completed.stdout.splitlines():
+        if line.startswith("Processing folder: "):
+            folder = line[len("Processing folder: "):].strip()
+        elif (match := PRAAT_PROGRESS.match(line.strip())) and folder is not None:
+            seconds[(folder, match.group(1))] = float(match.group(2))
+    error = None
+    if completed.returncode != 0:
+        messages = [line for line in completed.stderr.splitlines() if line.strip()]
+        error = f"praat exited with code {completed.returncode}" + (f": {messages[-1]}" if messages else "")
+    return rows, seconds, error
+
+
+@traced('extract_features')
+def run_praat_extraction(input_directory: str, output_file: str, praat_binary: str = DEFAULT_PRAAT_BINARY,
+                         script_path: str = str(PRAAT_SCRIPT), checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+                         resume: bool = True) -> Path:
+    """
+    Extract F0, F1 and F2 for every subset recording with Praat.
+
+    Praat runs on batches of checkpoint_every recordings, and every batch is
+    committed (scripts.checkpoint), so an interrupted run resumes after the
+    last committed batch. When Praat fails on a batch, the rows it wrote are
+    kept and the rest of the batch is run one recording at a time; a recording
+    Praat still fails on gets an empty (NaN) row and a "failed" status.
+
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :param output_file: CSV file to write the features to
+    :param praat_binary: Praat executable (default: $PRAAT_BINARY or "praat")
+    :param script_path: Path to the Praat extraction script
+    :param checkpoint_every: Recordings per Praat run and checkpoint batch
+    :param resume: Continue from the checkpoint of an interrupted run with the same recordings
+    :return: Path to the written CSV
+    """
+    if shutil.which(praat_binary) is None:
+        raise FileNotFoundError(f"Praat executable not found: {praat_binary} (set PRAAT_BINARY)")
+
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    recordings = list_recordings(input_directory)
+    add_counters(files=len(recordings), bytes=sum(r[4].stat().st_size for r in recordings))
+
+    print(f"Running Praat extraction on: {input_directory} ({len(recordings)} files)")
+    source = Path(script_path).read_bytes()
+    checkpoint = ExtractionCheckpoint(output_file, {'engine': 'praat', 'script': hashlib.sha256(source).hexdigest(),
+                                                    'recordings': _listing_digest(recordings)}, resume)
+    committed = checkpoint.committed
+    pending = [r for r in recordings if (r[0], r[1]) not in committed]
+    if len(pending) < len(recordings):
+        print(f"Resuming after {len(recordings) - len(pending)} recordings committed to {checkpoint.root}")
+
+    staging = checkpoint.root / 'praat'
+    for batch_start in range(0, len(pending), max(1, checkpoint_every)):
+        batch = pending[batch_start:batch_start + max(1, checkpoint_every)]
+        rows, seconds, error = _run_praat_batch(batch, staging, praat_binary, script_path)
+        errors: Dict[Tuple[str, str], str] = {}
+        if error is not None:
+            rest = [r for r in batch if (r[0], r[1]) not in rows]
+            print(f"Praat failed on a batch ({error}); running its remaining {len(rest)} recordings one by one")
+            for recording in rest:
+                single_rows, single_seconds, single_error = _run_praat_batch([recording], staging, praat_binary,
+                                                                             script_path)
+                rows.update(single_rows)
+                seconds.update(single_seconds)
+                if single_error is not None:
+                    errors[(recording[0], recording[1])] = single_error
+
+        feature_rows, status_rows = [], []
+        for folder, file, breed, sex, _ in batch:
+            row = rows.get((folder, file))
+            if row is None:
+                feature_rows.append([folder, file, breed, sex] + [""] * len(FEATURE_COLUMNS))
+                status_rows.append(_status_row(folder, file, 'failed', seconds.get((folder, file)),
+                                               errors.get((folder, file), error or "no output from Praat")))
+            else:
+                feature_rows.append(row)
+                f0_mean = float(row[CSV_COLUMNS.index('F0_mean')] or 'nan')
+                status_rows.append(_status_row(folder, file, file_status(None, f0_mean),
+                                               seconds.get((folder, file)), None))
+        checkpoint.commit([(r[0], r[1]) for r in batch], {'.csv': (CSV_COLUMNS, feature_rows),
+                                                           '_status.csv': (STATUS_COLUMNS, status_rows)})
+        print(f"Committed {batch_start + len(batch)} of {len(pending)} recordings")
+
+    written = checkpoint.merge([(r[0], r[1]) for r in recordings],
+                               {'.csv': (output_path, CSV_COLUMNS),
+                                '_status.csv': (status_path(output_file), STATUS_COLUMNS)})
+    add_counters(rows=written['.csv'])
+    _report_status(status_path(output_file))
+    print(f"Features saved to: {output_path}")
+    return output_path
+
+
+# Extraction engines: name -> callable(input_directory, output_file, **options)
+EXTRACTION_ENGINES: Dict[str, Callable[..., Path]] = {
+    'praat': run_praat_extraction,
+    'python': run_python_extraction,
+}
+
+
+def _extract_shard(items: List[Dict[str, str]], scratch: Path, shard: str, engine: str,
+                   options: Dict[str, Any]) -> List[Path]:
+    """
+    Extract one work queue shard (top-level so it can run in worker processes).
+
+    The shard's recordings are linked into a <breed>_<sex> folder layout, so
+    either engine runs on it unchanged.
+
+    :param items: Recordings as {"folder", "file", "path"}
+    :param scratch: Worker's private output directory
+    :param shard: Shard name
+    :param engine: Engine name from EXTRACTION_ENGINES
+    :param options: Engine options
+    :return: Output files (segments and status before features, so the features file marks a complete shard)
+    """
+    staging = scratch / f"{shard}_input"
+    _stage_recordings([(item['folder'], item['file'], item['path']) for item in items], staging)
+
+    output = scratch / f"{shard}.csv"
+    run_extraction(str(staging), str(output), engine=engine, **options)
+    shutil.rmtree(staging)
+    return [path for path in (segments_path(str(output)), status_path(str(output)), output) if path.exists()]
+
+
+@traced('extract_features.sharded')
+def run_sharded_extraction(input_directory: str, output_file: str, queue_dir: str, engine: str = 'praat',
+                           workers: int = 1, shard_size: int = DEFAULT_SHARD_SIZE, metadata_path: Optional[str] = None,
+                           index_path: Optional[str] = None, cache_path: Optional[str] = None,
+                           stale_after: float = STALE_AFTER, **options) -> Path:
+    """
+    Extract features as one of any number of workers sharing a work queue directory.
+
+    The first worker to arrive splits the recordings into shards (see work_queue);
+    every worker, on this or another node, then claims shards until all are done
+    and merges the shard outputs in order. The engine and its options are taken
+    from the queue, so all workers extract alike; the recording paths must be the
+    same on every node.
+
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :param output_file: CSV file to write the merged features to
+    :param queue_dir: Work queue directory on a filesystem shared by all workers
+    :param engine: Engine name from EXTRACTION_ENGINES
+    :param workers: Worker processes on this node
+    :param shard_size: Recordings per shard
+    :param metadata_path: metadata_subset.csv to take the recordings from (default: scan input_directory)
+    :param index_path: SQLite metadata index to list the recordings from (see list_recordings())
+    :param cache_path: ExtractionCache file of this node (python engine)
+    :param stale_after: Seconds without heartbeat before a claimed shard is given to another worker
+    :param options: Engine options (praat_binary for praat; feature_bank, pitch_algorithm, readers,
+                    prefetch_depth and duplicates_path for python)
+    :return: Path to the merged CSV
+    """
+    from scripts.work_queue import HEARTBEAT_INTERVAL, WorkQueue, run_workers
+
+    if engine not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine} (choose from {sorted(EXTRACTION_ENGINES)})")
+    settings = {'engine': engine, 'options': options, 'stale_after': stale_after}
+    if WorkQueue.exists(Path(queue_dir)):
+        queue = WorkQueue(Path(queue_dir))
+    else:
+        recordings = (recordings_from_metadata(metadata_path, input_directory) if metadata_path
+                      else list_recordings(input_directory, index_path))
+        items = [{'folder': folder, 'file': file, 'path': str(Path(path).resolve())}
+                 for folder, file, _, _, path in recordings]
+        queue = WorkQueue.create(Path(queue_dir), items, shard_size, settings)
+    if queue.settings != settings:
+        print(f"Using the settings the queue was created with: {queue.settings}")
+    settings = queue.settings
+
+    options = dict(settings['options'])
+    if settings['engine'] == 'python':
+        options.update(jobs=1, cache_path=cache_path)
+    status = queue.status()
+    print(f"Work queue {queue_dir}: {len(queue.shards)} shards of {queue.manifest['shard_size']} recordings "
+          f"({status['done']} done, {status['claimed']} claimed), {workers} worker(s) on this node")
+    run_workers(Path(queue_dir), partial(_extract_shard, engine=settings['engine'], options=options), workers,
+                stale_after=settings['stale_after'],
+                heartbeat_interval=min(HEARTBEAT_INTERVAL, settings['stale_after'] / 4))
+
+    output_path = queue.merge('.csv', Path(output_file))
+    if settings['engine'] == 'python':
+        queue.merge('_segments.csv', segments_path(output_file))
+    queue.merge('_status.csv', status_path(output_file))
+    with open(output_path) as f:
+        add_counters(rows=max(sum(1 for _ in f) - 1, 0))
+    print(f"Features saved to: {output_path}")
+    return output_path
+
+
+def run_extraction(input_directory: str, output_file: str, engine: str = 'praat', **options) -> Path:
+    """
+    Extract features with the selected engine.
+
+    :param input_directory: Subset directory containing the <breed>_<sex> folders
+    :param output_file: CSV file to write the features to
+    :param engine: Engine name from EXTRACTION_ENGINES
+    :param options: Engine-specific options (praat_binary for praat; jobs, feature_bank and
+                    pitch_algorithm for python; checkpoint_every and resume for both)
+    :return: Path to the written CSV
+    """
+    if engine not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine} (choose from {sorted(EXTRACTION_ENGINES)})")
+    return EXTRACTION_ENGINES[engine](input_directory, output_file, **options)
+
+
+def main(base_dir: str = ".", engine: str = "praat") -> int:
+    """
+    Main function to run feature extraction.
+
+    :param base_dir: Repository/data root containing data/raw/subset
+    :param engine: Extraction engine from EXTRACTION_ENGINES
+    :return: Exit code
+    """
+    input_directory = f"{base_dir}/data/raw/subset"
+    output_file = f"{base_dir}/data/features/feature_extraction_results.csv"
+
+    try:
+        run_extraction(input_directory, output_file, engine=engine)
+    except Exception as e:
+        print(f"Error during feature extraction: {e}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Feature Service
+Long-lived local HTTP service (TCP or Unix socket) that measures a single
+recording and scores it against breed x sex reference norms.
+
+The analysis modules are imported and their window/filter caches warmed at
+startup, and the reference distributions are computed once from the feature
+table, so a request only pays for the analysis of its own clip.
+
+Endpoints:
+- GET  /health                         service status and reference groups
+- GET  /norms                          reference mean, SD and n per breed x sex and feature
+- POST /analyze?breed=<b>&sex=<s>      WAV bytes in the body; returns features, segments and,
+                                       when breed and sex are given, z-scores and percentiles
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import socketserver
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from scripts.acoustic_analysis import (PITCH_ALGORITHMS, AnalysisContext, analyze_recording, detect_segments)
+from scripts.statistical_analysis import analysis_features, load_features
+
+DEFAULT_FEATURES_PATH = Path('data/features/feature_extraction_results.csv')
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Sample rates whose resampling filters and windows are prepared at startup
+WARM_SAMPLE_RATES = (16000, 22050, 44100, 48000)
+
+
+@dataclass
+class ReferenceNorms:
+    """
+    Per breed x sex reference distributions of every feature.
+    """
+    features: List[str]
+    # (breed, sex) -> feature -> sorted defined values
+    values: Dict[Tuple[str, str], Dict[str, np.ndarray]]
+
+    @classmethod
+    def from_table(cls, input_path: Path) -> 'ReferenceNorms':
+        """
+        Build the norms from a feature table.
+
+        :param input_path: Feature CSV (as written by the extraction)
+        :return: Reference norms
+        """
+        _, df_clean = load_features(input_path)
+        features = analysis_features(df_clean)
+        values = {}
+        for (breed, sex), group in df_clean.groupby(['Breed', 'Sex'], observed=True):
+            values[(str(breed), str(sex))] = {
+                feature: np.sort(group[feature].dropna().to_numpy(dtype=float)) for feature in features
+            }
+        return cls(features, values)
+
+    def groups(self) -> List[Dict[str, str]]:
+        """
+        Reference groups.
+
+        :return: List of {"breed", "sex"}
+        """
+        return [{'breed': breed, 'sex': sex} for breed, sex in sorted(self.values)]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        Mean, SD and n for every group and feature.
+
+        :return: One record per group and feature
+        """
+        records = []
+        for (breed, sex), by_feature in sorted(self.values.items()):
+            for feature, reference in by_feature.items():
+                records.append({'breed': breed, 'sex': sex, 'feature': feature, 'n': len(reference),
+                                'mean': float(reference.mean()) if len(reference) else None,
+                                'sd': float(reference.std(ddof=1)) if len(reference) > 1 else None})
+        return records
+
+    def score(self, features: Dict[str, float], breed: str, sex: str) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        z-score and percentile of each measured feature within one reference group.
+
+        Percentiles use the mid-rank of the value among the reference values.
+
+        :param features: Measured feature values
+        :param breed: Reference breed
+        :param sex: Reference sex
+        :return: feature -> {value, z, percentile, reference_mean, reference_sd, n}
+        """
+        key = (breed, sex)
+        if key not in self.values:
+            raise KeyError(f"No reference group for breed={breed!r}, sex={sex!r}")
+        scores = {}
+        for feature, reference in self.values[key].items():
+            value = features.get(feature, float('nan'))
+            n = len(reference)
+            defined = n > 1 and np.isfinite(value)
+            mean = float(reference.mean()) if n else float('nan')
+            sd = float(reference.std(ddof=1)) if n > 1 else float('nan')
+            rank = (np.searchsorted(reference, value, 'left') + np.searchsorted(reference, value, 'right')) / 2
+            scores[feature] = {
+                'value': _json_float(value),
+                'z': _json_float((value - mean) / sd) if defined and sd > 0 else None,
+                'percentile': _json_float(100.0 * rank / n) if defined else None,
+                'reference_mean': _json_float(mean),
+                'reference_sd': _json_float(sd),
+                'n': n,
+            }
+        return scores
+
+
+def _json_float(value: float) -> Optional[float]:
+    """
+    Float for JSON output, None when undefined.
+
+    :param value: Value
+    :return: Finite float or None
+    """
+    return float(value) if value is not None and np.isfinite(value) else None
+
+
+class FeatureService:
+    """
+    Measurement and scoring state shared by all requests.
+    """
+
+    def __init__(self, norms: Optional[ReferenceNorms], pitch_algorithm: str = 'ac', feature_bank: bool = True) -> None:
+        """
+        Create the service state and warm the analysis caches.
+
+        :param norms: Reference norms (None to only measure)
+        :param pitch_algorithm: Pitch algorithm from PITCH_ALGORITHMS
+        :param feature_bank: Also measure the feature bank
+        """
+        if pitch_algorithm not in PITCH_ALGORITHMS:
+            raise ValueError(f"Unknown pitch algorithm: {pitch_algorithm}")
+        self.norms = norms
+        self.pitch_algorithm = pitch_algorithm
+        self.feature_bank = feature_bank
+        self.warm_up()
+
+    def warm_up(self) -> None:
+        """
+        Run the analysis once per common sample rate so windows, filters and FFT sizes are memoized.
+
+        :return: None
+        """
+        for rate in WARM_SAMPLE_RATES:
+            t = np.arange(int(0.3 * rate)) / rate
+            tone = 0.5 * np.sin(2 * np.pi * 440.0 * t) * np.hanning(len(t))
+            self.measure(AnalysisContext(tone, rate))
+
+    def measure(self, ctx: AnalysisContext) -> Tuple[Dict[str, float], np.ndarray]:
+        """
+        Segment and measure one recording.
+
+        :param ctx: Analysis context
+        :return: (features, segments)
+        """
+        segments = detect_segments(ctx)
+        return analyze_recording(ctx, segments, self.feature_bank, self.pitch_algorithm), segments
+
+    def analyze(self, wav_bytes: bytes, breed: Optional[str] = None, sex: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Measure a WAV recording and optionally score it against a reference group.
+
+        :param wav_bytes: Contents of a WAV file
+        :param breed: Reference breed
+        :param sex: Reference sex
+        :return: JSON-serializable response
+        """
+        start = time.perf_counter()
+        from scipy.io import wavfile
+        sample_rate, samples = wavfile.read(io.BytesIO(wav_bytes))
+        ctx = AnalysisContext(samples, sample_rate)
+        features, segments = self.measure(ctx)
+        response: Dict[str, Any] = {
+            'duration_s': ctx.duration,
+            'sample_rate': ctx.sample_rate,
+            'features': {name: _json_float(value) for name, value in features.items()},
+            'segments': [[float(a), float(b)] for a, b in segments],
+        }
+        if breed is not None and sex is not None:
+            if self.norms is None:
+                raise KeyError("No reference norms loaded")
+            response['reference'] = {'breed': breed, 'sex': sex}
+            response['scores'] = self.norms.score(features, breed, sex)
+        response['elapsed_ms'] = 1000.0 * (time.perf_counter() - start)
+        return response
+
+
+class FeatureRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a FeatureService (set as the server's `service` attribute).
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self) -> str:
+        """
+        Client address for logging (Unix socket clients have none).
+
+        :return: Address string
+        """
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Log requests only when the server is verbose.
+
+        :return: None
+        """
+        if getattr(self.server, 'verbose', False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        """
+        Send a JSON response.
+
+        :param status: HTTP status code
+        :param payload: JSON-serializable body
+        :return: None
+        """
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        """
+        Serve /health and /norms.
+
+        :return: None
+        """
+        service: FeatureService = self.server.service
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok', 'pitch_algorithm': service.pitch_algorithm,
+                                  'groups': service.norms.groups() if service.norms else []})
+        elif path == '/norms' and service.norms is not None:
+            self._send_json(200, service.norms.summary())
+        else:
+            self._send_json(404, {'error': f"Not found: {path}"})
+
+    def do_POST(self) -> None:
+        """
+        Serve /analyze.
+
+        :return: None
+        """
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if url.path != '/analyze':
+            self._send_json(404, {'error': f"Not found: {url.path}"})
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            self._send_json(200, self.server.service.analyze(body, query.get('breed'), query.get('sex')))
+        except KeyError as e:
+            self._send_json(404, {'error': str(e.args[0])})
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid WAV data: {e}"})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded HTTP server on a Unix domain socket.
+    """
+    daemon_threads = True
+
+
+def create_server(service: FeatureService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  socket_path: Optional[str] = None, verbose: bool = False) -> socketserver.BaseServer:
+    """
+    Create (but do not start) the HTTP server for a service.
+
+    :param service: Feature service
+    :param host: TCP host (ignored with socket_path)
+    :param port: TCP port, 0 for any free port (ignored with socket_path)
+    :param socket_path: Unix socket path to listen on instead of TCP
+    :param verbose: Log every request
+    :return: Server; call serve_forever() to run it
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, FeatureRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), FeatureRequestHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix domain socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0) -> None:
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request_analysis(wav_path: Path, breed: Optional[str] = None, sex: Optional[str] = None,
+                     host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                     socket_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Send a WAV file to a running service.
+
+    :param wav_path: WAV file
+    :param breed: Reference breed
+    :param sex: Reference sex
+    :param host: Service host
+    :param port: Service port
+    :param socket_path: Service Unix socket (instead of host/port)
+    :return: Decoded JSON response
+    """
+    query = urlencode([(key, value) for key, value in (('breed', breed), ('sex', sex)) if value is not None])
+    connection = _UnixHTTPConnection(socket_path) if socket_path else http.client.HTTPConnection(host, port)
+    try:
+        connection.request('POST', '/analyze' + (f'?{query}' if query else ''), body=Path(wav_path).read_bytes(),
+                           headers={'Content-Type': 'audio/wav'})
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Service error {response.status}: {payload.get('error')}")
+    return payload
+
+
+def serve(features_path: Optional[Path] = DEFAULT_FEATURES_PATH, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          socket_path: Optional[str] = None, pitch_algorithm: str = 'ac', verbose: bool = False) -> None:
+    """
+    Load the reference norms and serve until interrupted.
+
+    :param features_path: Feature table for the reference norms (None or missing to only measure)
+    :param host: TCP host
+    :param port: TCP port
+    :param socket_path: Unix socket path (instead of TCP)
+    :param pitch_algorithm: Pitch algorithm from PITCH_ALGORITHMS
+    :param verbose: Log every request
+    :return: None
+    """
+    norms = None
+    if features_path is not None and Path(features_path).exists():
+        norms = ReferenceNorms.from_table(features_path)
+        print(f"Loaded reference norms for {len(norms.values)} groups and {len(norms.features)} features")
+    else:
+        print(f"No feature table at {features_path}; serving measurements without scores")
+    server = create_server(FeatureService(norms, pitch_algorithm), host, port, socket_path, verbose)
+    print(f"Serving on {socket_path or f'http://{host}:{server.server_address[1]}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main() -> int:
+    """
+    Main function to run the feature service.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Local feature service with breed x sex reference norms")
+    parser.add_argument('--features', default=str(DEFAULT_FEATURES_PATH), help="Feature table for the norms")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--pitch-algorithm', default='ac', choices=sorted(PITCH_ALGORITHMS))
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        serve(Path(args.features), args.host, args.port, args.socket, args.pitch_algorithm, args.verbose)
+    except Exception as e:
+        print(f"Error running the feature service: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+Duplicate Recording Detection
+Finds recordings that were copied twice or appear under several dog IDs, so
+they can be left out of the subset and extracted only once.
+
+Every recording gets two fingerprints:
+- exact: the SHA-256 of the file contents
+- spectral: landmark hashes of spectrogram peak pairs (frequency of both
+  peaks and their time distance), which survive re-encoding, gain changes,
+  added noise and trimming
+
+Near-duplicates are found through an inverted index from landmark hash to
+the recordings containing it: each recording is only compared with the
+recordings it shares hashes with, and a pair counts as a duplicate when
+enough of those shared hashes agree on one time offset. Hashes that occur in
+very many recordings carry no information and are skipped, which keeps the
+search sub-quadratic. Fingerprints are stored per content hash, so unchanged
+and identical files are only analyzed once.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from scripts.instrumentation import add_counters, traced
+
+FINGERPRINT_STORE_FILE = "fingerprints.sqlite"
+DEFAULT_STORE_PATH = Path(".cache") / FINGERPRINT_STORE_FILE
+DUPLICATES_FILE = "duplicates.csv"
+DUPLICATE_COLUMNS = ['filename', 'dog_id', 'breed', 'sex', 'path', 'content_hash', 'group', 'duplicate_of',
+                     'match', 'similarity']
+
+FINGERPRINT_RATE = 11025
+FFT_LENGTH = 1024
+HOP_LENGTH = 256
+PEAK_FREQUENCY_SPAN = 15
+PEAK_TIME_SPAN = 9
+PEAK_MARGIN_DB = 10.0
+PEAKS_PER_SECOND = 30
+FAN_OUT = 5
+MAX_TARGET_FRAMES = 63
+TIME_TOLERANCE = 1
+DISTANCE_MASK = 0x3F
+# A near-duplicate needs DEFAULT_THRESHOLD of the smaller recording's hashes (so trimmed copies
+# still match) and at least MIN_MATCHES hashes at one offset. Calibrated on synthetic corpora
+# (6,848 recordings, 6.05M pairs, 448 planted copies): unrelated pairs of similar barks reach up
+# to 15 matching hashes at one offset, so fewer than 16 gave false positives (1,060 pairs at 5,
+# none at 16). Shorter or heavily noised copies with fewer matching hashes are missed.
+DEFAULT_THRESHOLD = 0.15
+MIN_MATCHES = 16
+MAX_POSTINGS = 200
+QUERY_BLOCK = 200_000
+HASH_THREADS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    bytes INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    content_hash TEXT PRIMARY KEY,
+    duration REAL,
+    hashes BLOB,
+    times BLOB
+);
+"""
+
+
+@dataclass
+class Fingerprint:
+    """
+    Exact and spectral fingerprint of one recording.
+
+    hashes are the landmark hashes and times the frame of each hash's anchor
+    peak (at HOP_LENGTH / FINGERPRINT_RATE seconds per frame).
+    """
+    content_hash: str
+    duration: float
+    hashes: np.ndarray
+    times: np.ndarray
+
+
+def spectral_peaks(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prominent local maxima of the log spectrogram.
+
+    A bin is a peak when it is the maximum of its PEAK_FREQUENCY_SPAN x
+    PEAK_TIME_SPAN neighbourhood and PEAK_MARGIN_DB above the median level;
+    the strongest PEAKS_PER_SECOND per second of audio are kept.
+
+    :param samples: Mono float samples
+    :param sample_rate: Sample rate in Hz
+    :return: Frame indices and frequency bins of the peaks, in time order
+    """
+    from scipy.ndimage import maximum_filter
+    from scipy.signal import resample_poly
+
+    from scripts.acoustic_analysis import get_window
+
+    if sample_rate != FINGERPRINT_RATE:
+        divisor = np.gcd(int(sample_rate), FINGERPRINT_RATE)
+        samples = resample_poly(samples, FINGERPRINT_RATE // divisor, int(sample_rate) // divisor)
+    if len(samples) < FFT_LENGTH:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FFT_LENGTH)[::HOP_LENGTH]
+    spectrum = np.abs(np.fft.rfft(frames * get_window('hann', FFT_LENGTH), axis=1))
+    level = 20.0 * np.log10(spectrum + 1e-10)
+
+    local_max = maximum_filter(level, size=(PEAK_TIME_SPAN, PEAK_FREQUENCY_SPAN), mode='constant', cval=-np.inf)
+    frame_index, bins = np.nonzero((level == local_max) & (level > np.median(level) + PEAK_MARGIN_DB))
+    keep = max(1, int(PEAKS_PER_SECOND * len(samples) / FINGERPRINT_RATE))
+    if len(frame_index) > keep:
+        strongest = np.sort(np.argsort(level[frame_index, bins])[-keep:])
+        frame_index, bins = frame_index[strongest], bins[strongest]
+    return frame_index.astype(np.int32), bins.astype(np.int32)
+
+
+def landmark_hashes(frame_index: np.ndarray, bins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pair every peak with the next FAN_OUT peaks and hash each pair.
+
+    A hash packs the anchor bin, the target bin (9 bits each) and their frame
+    distance (6 bits) into 24 bits.
+
+    :param frame_index: Frame of each peak, in time order
+    :param bins: Frequency bin of each peak
+    :return: Landmark hashes and the frame of their anchor peak
+    """
+    hashes, times = [], []
+    for step in range(1, FAN_OUT + 1):
+        anchor, target = frame_index[:-step], frame_index[step:]
+        distance = target - anchor
+        valid = (distance > 0) & (distance <= MAX_TARGET_FRAMES)
+        packed = ((bins[:-step][valid] >> 1).astype(np.uint32) << 15) \
+            | ((bins[step:][valid] >> 1).astype(np.uint32) << 6) | distance[valid].astype(np.uint32)
+        hashes.append(packed)
+        times.append(anchor[valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(times).astype(np.int32)
+
+
+def fingerprint_bytes(data: bytes, digest: Optional[str] = None) -> Fingerprint:
+    """
+    Fingerprint a WAV file's contents.
+
+    :param data: Contents of the WAV file
+    :param digest: SHA-256 of the contents, if already known
+    :return: Fingerprint
+    """
+    from scipy.io import wavfile
+
+    from scripts.acoustic_analysis import as_mono_float
+
+    sample_rate, samples = wavfile.read(io.BytesIO(data))
+    samples = as_mono_float(samples)
+    hashes, times = landmark_hashes(*spectral_peaks(samples, sample_rate))
+    return Fingerprint(digest or hashlib.sha256(data).hexdigest(), len(samples) / sample_rate, hashes, times)
+
+
+def _fingerprint_path(path: Path) -> Optional[Fingerprint]:
+    """
+    Fingerprint one file (top-level so it can run in worker processes).
+
+    :param path: WAV file
+    :return: Fingerprint, or None when the file cannot be read
+    """
+    try:
+        return fingerprint_bytes(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _hash_path(path: Path) -> Optional[str]:
+    """
+    Content hash of one file, or None when it cannot be read.
+
+    :param path: File
+    :return: Hex SHA-256 digest
+    """
+    from scripts.metadata_index import content_hash
+
+    try:
+        return content_hash(path)
+    except OSError:
+        return None
+
+
+def hash_files(paths: List[Path], threads: int = HASH_THREADS) -> List[Optional[str]]:
+    """
+    Content hashes of many files, read on a thread pool.
+
+    :param paths: Files
+    :param threads: Hashing threads
+    :return: Hex SHA-256 digest per file (None for missing or unreadable files)
+    """
+    if len(paths) < 2 or threads <= 1:
+        return [_hash_path(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as pool:
+        return list(pool.map(_hash_path, paths))
+
+
+class FingerprintStore:
+    """
+    SQLite store of content hashes per file and fingerprints per content hash.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH) -> None:
+        """
+        Open (and create if needed) the store.
+
+        :param path: SQLite file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+
+        :return: None
+        """
+        self.connection.close()
+
+    def __enter__(self) -> 'FingerprintStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def content_hashes(self, paths: List[Path], threads: int = HASH_THREADS) -> List[Optional[str]]:
+        """
+        Content hash of every file, re-hashing only files whose size or modification time changed.
+
+        :param paths: Files
+        :param threads: Hashing threads
+        :return: Hex SHA-256 digest per file (None for missing or unreadable files)
+        """
+        known = {row[0]: row[1:] for row in self.connection.execute("SELECT path, bytes, mtime_ns, content_hash FROM files")}
+        digests: List[Optional[str]] = [None] * len(paths)
+        stale = []
+        for i, path in enumerate(paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = known.get(str(path))
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                digests[i] = cached[2]
+            else:
+                stale.append((i, stat))
+
+        fresh = hash_files([paths[i] for i, _ in stale], threads)
+        for (i, stat), digest in zip(stale, fresh):
+            digests[i] = digest
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO files (path, bytes, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            [(str(paths[i]), stat.st_size, stat.st_mtime_ns, digest)
+             for (i, stat), digest in zip(stale, fresh) if digest is not None]
+        )
+        self.connection.commit()
+        add_counters(bytes=sum(stat.st_size for _, stat in stale))
+        return digests
+
+    def fingerprints(self, paths: List[Path], jobs: int = 1) -> List[Optional[Fingerprint]]:
+        """
+        Fingerprint of every file, analyzing each distinct content only once.
+
+        :param paths: WAV files
+        :param jobs: Worker processes for the spectral fingerprints
+        :return: Fingerprint per file (None for missing or unreadable files)
+        """
+        digests = self.content_hashes(paths)
+        stored = {row[0] for row in self.connection.execute("SELECT content_hash FROM fingerprints")}
+        todo: Dict[str, Path] = {}
+        for path, digest in zip(paths, digests):
+            if digest is not None and digest not in stored and digest not in todo:
+                todo[digest] = path
+
+        if todo:
+            print(f"Fingerprinting {len(todo)} new recordings ({jobs} job(s))")
+            if jobs > 1:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    computed = list(pool.map(_fingerprint_path, todo.values(),
+                                             chunksize=max(1, len(todo) // (jobs * 8))))
+            else:
+                computed = [_fingerprint_path(path) for path in todo.values()]
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints (content_hash, duration, hashes, times) VALUES (?, ?, ?, ?)",
+                [(digest, fingerprint.duration, fingerprint.hashes.tobytes(), fingerprint.times.tobytes())
+                 for digest, fingerprint in zip(todo, computed) if fingerprint is not None]
+            )
+            self.connection.commit()
+            add_counters(files=len(todo))
+
+        wanted = sorted({digest for digest in digests if digest is not None})
+        loaded: Dict[str, Fingerprint] = {}
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT content_hash, duration, hashes, times FROM fingerprints "
+                f"WHERE content_hash IN ({','.join('?' * len(batch))})", batch)
+            for digest, duration, hashes, times in rows:
+                loaded[digest] = Fingerprint(digest, duration, np.frombuffer(hashes, dtype=np.uint32),
+                                             np.frombuffer(times, dtype=np.int32))
+        return [loaded.get(digest) if digest is not None else None for digest in digests]
+
+
+def find_near_duplicates(fingerprints: List[Fingerprint], threshold: float = DEFAULT_THRESHOLD,
+                         min_matches: int = MIN_MATCHES,
+                         max_postings: int = MAX_POSTINGS) -> List[Tuple[int, int, float]]:
+    """
+    Pairs of recordings whose landmark hashes largely match at one time offset.
+
+    The hashes of all recordings are sorted once into an inverted index
+    (hash -> recordings and anchor frames). Recordings are then queried in
+    blocks: their hashes are looked up in the index, every hit in another
+    recording votes for the pair and the time offset between the two anchors,
+    and a pair's score is the largest vote count over TIME_TOLERANCE
+    neighbouring offsets. Hashes held by more than max_postings recordings
+    are ignored.
+
+    :param fingerprints: Fingerprints of distinct recordings
+    :param threshold: Minimum fraction of the smaller recording's hashes that must match
+    :param min_matches: Minimum number of matching hashes (see MIN_MATCHES)
+    :param max_postings: Skip hashes occurring in more recordings than this
+    :return: (i, j, similarity) with i < j, sorted
+    """
+    n = len(fingerprints)
+    counts = np.array([len(fingerprint.hashes) for fingerprint in fingerprints], dtype=np.int64)
+    if n < 2 or counts.sum() == 0:
+        return []
+    hashes = np.concatenate([fingerprint.hashes for fingerprint in fingerprints])
+    times = np.concatenate([fingerprint.times for fingerprint in fingerprints]).astype(np.int64)
+    owners = np.repeat(np.arange(n, dtype=np.int64), counts)
+
+    order = np.argsort(hashes, kind='stable')
+    index_hashes, index_owners, index_times = hashes[order], owners[order], times[order]
+    keys, starts, postings = np.unique(index_hashes, return_index=True, return_counts=True)
+    # Postings lists of informative hashes (shared, but not by everything)
+    useful = postings <= max_postings
+
+    # Peaks at an onset straddling two frames move by one frame between copies,
+    # so hashes are also looked up with their peak distance one frame off
+    distance = (hashes & DISTANCE_MASK).astype(np.int64)
+    variants = [(step, (distance + step > 0) & (distance + step <= MAX_TARGET_FRAMES))
+                for step in range(-TIME_TOLERANCE, TIME_TOLERANCE + 1)]
+
+    offset_bias = 1 << 20
+    pairs: List[Tuple[int, int, float]] = []
+    entry_ends = np.cumsum(counts)
+    first = 0
+    while first < n:
+        # Query a block of recordings holding about QUERY_BLOCK hashes
+        lo = int(entry_ends[first - 1]) if first else 0
+        last = max(int(np.searchsorted(entry_ends, lo + QUERY_BLOCK, side='right')), first + 1)
+        hi = int(entry_ends[last - 1])
+        first = last
+
+        query_owner, query_time, slot = [], [], []
+        for step, valid in variants:
+            variant = (hashes[lo:hi].astype(np.int64) + step)[valid[lo:hi]]
+            found = np.minimum(np.searchsorted(keys, variant), len(keys) - 1)
+            hit = (keys[found] == variant) & useful[found]
+            query_owner.append(owners[lo:hi][valid[lo:hi]][hit])
+            query_time.append(times[lo:hi][valid[lo:hi]][hit])
+            slot.append(found[hit])
+        query_owner, query_time, slot = map(np.concatenate, (query_owner, query_time, slot))
+        if not len(slot):
+            continue
+
+        # Expand every query hash into all entries of its postings list
+        length = postings[slot]
+        expanded = np.repeat(np.arange(len(slot)), length)
+        position = starts[slot][expanded] + (np.arange(len(expanded)) - np.repeat(np.cumsum(length) - length, length))
+        other = index_owners[position]
+        later = other > query_owner[expanded]
+        a, b = query_owner[expanded][later], other[later]
+        offset = index_times[position][later] - query_time[expanded][later]
+        votes = ((a * n + b) << 21) + np.clip(offset + offset_bias, 1, (1 << 21) - 2)
+        if not len(votes):
+            continue
+
+        # Votes per pair and offset, pooled over neighbouring offsets (for pairs
+        # with enough votes in total; most pairs share one or two hashes by chance)
+        voted, tally = np.unique(votes, return_counts=True)
+        pair = voted >> 21
+        boundaries = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        total = np.add.reduceat(tally, boundaries)
+        candidate = np.repeat(total >= min_matches, np.diff(np.r_[boundaries, len(pair)]))
+        voted, tally = voted[candidate], tally[candidate]
+        if not len(voted):
+            continue
+        spread = np.concatenate([voted + step for step in range(-TIME_TOLERANCE, TIME_TOLERANCE + 1)])
+        voted, inverse = np.unique(spread, return_inverse=True)
+        tally = np.bincount(inverse, weights=np.tile(tally, 2 * TIME_TOLERANCE + 1))
+        pair = voted >> 21
+        boundaries = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        best = np.maximum.reduceat(tally, boundaries)
+        pair = pair[boundaries]
+        i, j = pair // n, pair % n
+        similarity = np.minimum(best / np.maximum(np.minimum(counts[i], counts[j]), 1), 1.0)
+        keep = (best >= min_matches) & (similarity >= threshold)
+        pairs.extend(zip(i[keep].tolist(), j[keep].tolist(), similarity[keep].tolist()))
+
+    add_counters(rows=len(hashes))
+    return sorted(pairs)
+
+
+def duplicate_groups(n: int, pairs: List[Tuple[int, int]]) -> np.ndarray:
+    """
+    Connected components of the duplicate pairs (union-find).
+
+    :param n: Number of items
+    :param pairs: (i, j) duplicate pairs
+    :return: Group label per item (the smallest index in its group)
+    """
+    parent = np.arange(n)
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = root(i), root(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([root(i) for i in range(n)])
+
+
+@traced('fingerprint')
+def detect_duplicates(metadata_path: str, audio_dir: str, output_path: str,
+                      store_path: Path = DEFAULT_STORE_PATH, jobs: int = 1, threshold: float = DEFAULT_THRESHOLD,
+                      index_path: Optional[str] = None, min_matches: int = MIN_MATCHES) -> Dict[str, Any]:
+    """
+    Find exact and near-duplicate recordings of the full dataset and write them to a CSV.
+
+    The CSV lists every recording that belongs to a duplicate group. The
+    first recording of a group (in metadata order) is kept; the others name
+    it in duplicate_of, with match "exact" (same contents) or "near" (same
+    audio by the spectral fingerprint) and the similarity of the match.
+
+    :param metadata_path: Path to metadata.csv
+    :param audio_dir: Dataset root containing dogspeak_released/<dog_id>/
+    :param output_path: Duplicates CSV to write
+    :param store_path: Fingerprint store (SQLite), reused between runs
+    :param jobs: Worker processes for fingerprinting
+    :param threshold: Minimum fraction of matching landmark hashes for a near-duplicate
+    :param index_path: SQLite metadata index to list the recordings from instead of metadata.csv
+    :param min_matches: Minimum number of matching landmark hashes for a near-duplicate
+    :return: Dict summary (recordings, duplicate groups and recordings, cross-dog groups)
+    """
+    import pandas as pd
+
+    if index_path:
+        from scripts.metadata_index import DATASET_COLLECTION, MetadataIndex
+
+        with MetadataIndex(Path(index_path)) as index:
+            index.update_metadata(Path(metadata_path), Path(audio_dir), probe=False)
+            recordings = pd.DataFrame(index.recordings(DATASET_COLLECTION), columns=index.columns(DATASET_COLLECTION))
+    else:
+        recordings = pd.read_csv(metadata_path)
+    recordings['path'] = "dogspeak_released/" + recordings['dog_id'] + "/" + recordings['filename']
+    print(f"Fingerprinting {len(recordings)} recordings from: {audio_dir}")
+
+    with FingerprintStore(store_path) as store:
+        fingerprints = store.fingerprints([Path(audio_dir) / path for path in recordings['path']], jobs=jobs)
+    readable = [i for i, fingerprint in enumerate(fingerprints) if fingerprint is not None]
+    recordings['content_hash'] = [fingerprint.content_hash if fingerprint is not None else None
+                                  for fingerprint in fingerprints]
+
+    # Exact duplicates share a content hash; only one recording per content is compared spectrally
+    distinct: Dict[str, int] = {}
+    for i in readable:
+        distinct.setdefault(fingerprints[i].content_hash, i)
+    representatives = list(distinct.values())
+    near = find_near_duplicates([fingerprints[i] for i in representatives], threshold, min_matches)
+    print(f"Compared {len(representatives)} distinct recordings: {len(readable) - len(representatives)} exact copies, "
+          f"{len(near)} near-duplicate pairs")
+
+    content_group = duplicate_groups(len(representatives), [(i, j) for i, j, _ in near])
+    best_match = {}
+    for i, j, similarity in near:
+        best_match[j] = max(best_match.get(j, 0.0), similarity)
+        best_match[i] = max(best_match.get(i, 0.0), similarity)
+    slot_of = {digest: slot for slot, digest in enumerate(distinct)}
+
+    rows = []
+    canonical: Dict[int, int] = {}
+    for i in readable:
+        slot = slot_of[fingerprints[i].content_hash]
+        group = int(content_group[slot])
+        canonical.setdefault(group, i)
+        rows.append((i, group, slot))
+    members: Dict[int, int] = {}
+    for _, group, _ in rows:
+        members[group] = members.get(group, 0) + 1
+
+    table = []
+    for i, group, slot in rows:
+        if members[group] < 2:
+            continue
+        keep = canonical[group]
+        if i == keep:
+            duplicate_of, match, similarity = "", "", float('nan')
+        elif fingerprints[i].content_hash == fingerprints[keep].content_hash:
+            duplicate_of, match, similarity = recordings['path'].iat[keep], "exact", 1.0
+        else:
+            duplicate_of, match, similarity = recordings['path'].iat[keep], "near", best_match.get(slot, float('nan'))
+        row = recordings.iloc[i]
+        table.append([row['filename'], row['dog_id'], row['breed'], row['sex'], row['path'], row['content_hash'],
+                      recordings['path'].iat[keep], duplicate_of, match, similarity])
+
+    duplicates = pd.DataFrame(table, columns=DUPLICATE_COLUMNS)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    duplicates.to_csv(output_path, index=False)
+
+    cross_dog = int((duplicates.groupby('group')['dog_id'].nunique() > 1).sum()) if len(duplicates) else 0
+    summary = {
+        'recordings': len(recordings),
+        'unreadable': len(recordings) - len(readable),
+        'duplicate_groups': int(duplicates['group'].nunique()) if len(duplicates) else 0,
+        'duplicates': int((duplicates['duplicate_of'] != "").sum()) if len(duplicates) else 0,
+        'exact': int((duplicates['match'] == "exact").sum()) if len(duplicates) else 0,
+        'near': int((duplicates['match'] == "near").sum()) if len(duplicates) else 0,
+        'cross_dog_groups': cross_dog,
+    }
+    print(f"Found {summary['duplicates']} duplicate recordings ({summary['exact']} exact, {summary['near']} near) "
+          f"in {summary['duplicate_groups']} groups, {cross_dog} of them under several dog IDs")
+    print(f"Duplicates saved to: {output_path}")
+    return summary
+
+
+def excluded_recordings(duplicates_path: str) -> Set[Tuple[str, str]]:
+    """
+    Recordings to leave out because an earlier copy of them is kept.
+
+    :param duplicates_path: CSV written by detect_duplicates()
+    :return: (dog_id, filename) of every duplicate that is not the kept copy
+    """
+    import pandas as pd
+
+    duplicates = pd.read_csv(duplicates_path, keep_default_na=False)
+    duplicates = duplicates[duplicates['duplicate_of'] != ""]
+    return set(zip(duplicates['dog_id'], duplicates['filename']))
+
+
+def main() -> int:
+    """
+    Main function to find duplicate recordings in the full dataset.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Find exact and near-duplicate recordings")
+    parser.add_argument('--base-dir', default=".", help="Data root containing data/raw/DogSpeak_Dataset")
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--min-matches', type=int, default=MIN_MATCHES)
+    args = parser.parse_args()
+
+    dataset = Path(args.base_dir) / "data" / "raw" / "DogSpeak_Dataset"
+    try:
+        detect_duplicates(str(dataset / "metadata.csv"), str(dataset),
+                          str(Path(args.base_dir) / "data" / "exploration" / DUPLICATES_FILE),
+                          store_path=Path(args.base_dir) / DEFAULT_STORE_PATH, jobs=args.jobs,
+                          threshold=args.threshold, min_matches=args.min_matches)
+    except Exception as e:
+        print(f"Error during duplicate detection: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
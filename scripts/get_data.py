@@ -1,56 +1,341 @@
+"""
+DogSpeak Dataset Download
+Gets the DogSpeak dataset from the Hugging Face Hub, either whole (the
+original load_dataset() call) or as a streamed, filtered pull.
+
+The streamed pull reads metadata.csv as a stream, keeps only the rows that
+match the breed, sex and dog filters and the requested columns, and only
+then fetches the audio of those rows, a bounded number of files at a time,
+into the dataset layout (dogspeak_released/<dog_id>/<file>) or straight into
+the <breed>_<sex> subset layout the extraction reads. The transfer is
+proportional to the rows pulled, not to the dataset. The source is either
+the Hub repository (files are read through huggingface_hub's HfFileSystem)
+or a local directory with the same layout, e.g. a git clone or a synthetic
+corpus from scripts.synthesize_corpus. Files already present are skipped, so
+an interrupted pull continues where it stopped, and the pulled rows are
+merged into an existing metadata.csv rather than replacing it.
+"""
+
+import argparse
+import csv
+import io
 import os
 import ssl
-import urllib3
-import requests
-from unittest.mock import patch
-
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# Create a custom session that ignores SSL
-class NoSSLSession(requests.Session):
-    def request(self, method: str, url: str, **kwargs) -> requests.Response:
-        """
-        Override request to disable SSL verification.
-        
-        :param method: HTTP method
-        :param url: URL to request
-        :param kwargs: Additional arguments
-        :return: HTTP response
-        """
-        kwargs['verify'] = False
-        return super().request(method, url, **kwargs)
-
-# Monkey patch requests to use our custom session
-original_session = requests.Session
-
-def patched_session() -> requests.Session:
-    """
-    Return a session that ignores SSL verification.
-
-    :return: requests.Session with SSL verification disabled
-    """
-    return NoSSLSession()
-
-# Apply the patch
-requests.Session = patched_session
-
-# Also patch the ssl context
-ssl._create_default_https_context = ssl._create_unverified_context
-
-print("Loading dataset with SSL verification disabled...")
-
-try:
-    from datasets import load_dataset
-    # To avoid rate limits, you can use a Hugging Face token:
-    # ds = load_dataset("ArlingtonCL2/DogSpeak_Dataset", use_auth_token="your_hf_token_here")
-    ds = load_dataset("ArlingtonCL2/DogSpeak_Dataset")
-    print("Dataset loaded successfully!")
-    print(f"Dataset info: {ds}")
-except Exception as e:
-    print(f"Failed to load dataset: {e}")
-    print("\nAlternative solution: Manual download")
-    print("You can manually download the dataset from:")
-    print("https://huggingface.co/datasets/ArlingtonCL2/DogSpeak_Dataset")
-    print("Or try using git clone with:")
-    print("git clone https://huggingface.co/datasets/ArlingtonCL2/DogSpeak_Dataset")
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from scripts.instrumentation import add_counters, traced
+
+DATASET_REPO = "ArlingtonCL2/DogSpeak_Dataset"
+METADATA_FILE = "metadata.csv"
+AUDIO_DIRNAME = "dogspeak_released"
+# Columns every pulled row keeps (needed to place and filter the audio)
+KEY_COLUMNS = ['filename', 'breed', 'sex', 'dog_id']
+# Audio files fetched at the same time
+DEFAULT_DOWNLOADS = 8
+LAYOUTS = ['dataset', 'subset']
+
+
+def disable_ssl_verification() -> None:
+    """
+    Monkey patch requests and ssl to skip certificate checks (for networks that intercept TLS).
+
+    :return: None
+    """
+    import requests
+    import urllib3
+
+    # Create a custom session that ignores SSL
+    class NoSSLSession(requests.Session):
+        def request(self, method: str, url: str, **kwargs) -> requests.Response:
+            """
+            Override request to disable SSL verification.
+
+            :param method: HTTP method
+            :param url: URL to request
+            :param kwargs: Additional arguments
+            :return: HTTP response
+            """
+            kwargs['verify'] = False
+            return super().request(method, url, **kwargs)
+
+    # Disable SSL warnings, make every new session ignore SSL and patch the ssl context
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    requests.Session = NoSSLSession
+    ssl._create_default_https_context = ssl._create_unverified_context
+
+
+class LocalSource:
+    """
+    Dataset files in a local directory laid out like the Hub repository.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.bytes_read = 0
+
+    def open_text(self, path: str) -> io.TextIOBase:
+        return open(self.root / path, newline='')
+
+    def read(self, path: str) -> bytes:
+        data = (self.root / path).read_bytes()
+        self.bytes_read += len(data)
+        return data
+
+    def __str__(self) -> str:
+        return str(self.root)
+
+
+class HubSource:
+    """
+    Dataset files read from the Hugging Face Hub on demand.
+    """
+
+    def __init__(self, repo_id: str = DATASET_REPO, revision: Optional[str] = None, token: Optional[str] = None):
+        from huggingface_hub import HfFileSystem
+
+        self.fs = HfFileSystem(token=token)
+        self.prefix = f"datasets/{repo_id}" + (f"@{revision}" if revision else "")
+        self.bytes_read = 0
+
+    def open_text(self, path: str) -> io.TextIOBase:
+        return io.TextIOWrapper(self.fs.open(f"{self.prefix}/{path}", 'rb'), encoding='utf-8', newline='')
+
+    def read(self, path: str) -> bytes:
+        data = self.fs.cat_file(f"{self.prefix}/{path}")
+        self.bytes_read += len(data)
+        return data
+
+    def __str__(self) -> str:
+        return f"hf://{self.prefix}"
+
+
+def stream_metadata(source: Any, breeds: Optional[Sequence[str]] = None, sexes: Optional[Sequence[str]] = None,
+                    dogs: Optional[Sequence[str]] = None, columns: Optional[Sequence[str]] = None,
+                    limit: Optional[int] = None) -> Iterator[Dict[str, str]]:
+    """
+    Stream the metadata rows that match the filters, with only the selected columns.
+
+    :param source: LocalSource or HubSource
+    :param breeds: Breeds to keep (None keeps all)
+    :param sexes: Sexes to keep ("female", "male")
+    :param dogs: Dog IDs (folder names) to keep
+    :param columns: Extra metadata columns to keep besides KEY_COLUMNS (None keeps all)
+    :param limit: Stop after this many rows
+    :return: Iterator of rows
+    """
+    wanted = {'breed': set(breeds or []), 'sex': set(sexes or []), 'dog_id': set(dogs or [])}
+    count = 0
+    with source.open_text(METADATA_FILE) as f:
+        reader = csv.DictReader(f)
+        missing = set(KEY_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{METADATA_FILE} of {source} lacks columns: {sorted(missing)}")
+        if columns is None:
+            keep = list(reader.fieldnames)
+        else:
+            keep = KEY_COLUMNS + [column for column in columns if column not in KEY_COLUMNS]
+        for row in reader:
+            if any(values and row[column] not in values for column, values in wanted.items()):
+                continue
+            yield {column: row.get(column, '') for column in keep}
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+
+def source_path(row: Dict[str, str]) -> str:
+    """
+    Path of a recording in the dataset repository.
+
+    :param row: Metadata row
+    :return: "dogspeak_released/<dog_id>/<filename>"
+    """
+    return f"{AUDIO_DIRNAME}/{row['dog_id']}/{row['filename']}"
+
+
+def local_path(row: Dict[str, str], output_dir: Path, layout: str) -> Path:
+    """
+    Where a pulled recording is written.
+
+    :param row: Metadata row
+    :param output_dir: Output directory
+    :param layout: "dataset" (dogspeak_released/<dog_id>) or "subset" (<breed>_<sex>)
+    :return: File path
+    """
+    if layout == 'subset':
+        return output_dir / f"{row['breed']}_{row['sex']}" / row['filename']
+    return output_dir / source_path(row)
+
+
+def merge_metadata(path: Path, rows: Sequence[Dict[str, str]]) -> int:
+    """
+    Add pulled rows to a metadata.csv, keeping the rows of recordings pulled before.
+
+    Rows are matched on (dog_id, filename): a pulled row updates the columns it
+    has and keeps the others, new rows are appended, and the columns are the
+    union of both (empty where a row has no value).
+
+    :param path: metadata.csv (created if missing)
+    :param rows: Pulled metadata rows
+    :return: Rows in the merged file
+    """
+    merged: Dict[Tuple[str, str], Dict[str, str]] = {}
+    fieldnames: List[str] = []
+    if path.exists():
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            merged = {(row['dog_id'], row['filename']): row for row in reader}
+    for row in rows:
+        fieldnames += [column for column in row if column not in fieldnames]
+        merged.setdefault((row['dog_id'], row['filename']), {}).update(row)
+
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(merged.values())
+    os.replace(tmp_path, path)
+    return len(merged)
+
+
+@traced('get_data.pull')
+def pull_dataset(source: Any, output_dir: str, layout: str = 'dataset', breeds: Optional[Sequence[str]] = None,
+                 sexes: Optional[Sequence[str]] = None, dogs: Optional[Sequence[str]] = None,
+                 columns: Optional[Sequence[str]] = None, limit: Optional[int] = None,
+                 downloads: int = DEFAULT_DOWNLOADS) -> Dict[str, Any]:
+    """
+    Pull the filtered recordings and their metadata into a local layout.
+
+    :param source: LocalSource or HubSource
+    :param output_dir: Directory to write to
+    :param layout: "dataset" (like the Hub repository) or "subset" (<breed>_<sex> folders for the extraction)
+    :param breeds: Breeds to pull (None pulls all)
+    :param sexes: Sexes to pull
+    :param dogs: Dog IDs to pull
+    :param columns: Extra metadata columns to keep (None keeps all)
+    :param limit: Pull at most this many recordings
+    :param downloads: Files fetched at the same time
+    :return: Summary: rows, files fetched, files already present, bytes fetched
+    """
+    from scripts.prefetch import prefetch_map
+
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout} (choose from {LAYOUTS})")
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    rows = list(stream_metadata(source, breeds, sexes, dogs, columns, limit))
+    # Files are written under a temporary name and renamed, so a present file is complete
+    todo = [row for row in rows if not local_path(row, output_path, layout).exists()]
+    print(f"Pulling {len(todo)} of {len(rows)} matching recordings from {source} into {output_path} "
+          f"({layout} layout, {downloads} at a time)")
+
+    def fetch(row: Dict[str, str]) -> bytes:
+        return source.read(source_path(row))
+
+    fetched = 0
+    for position, data in prefetch_map(fetch, lambda data: data, todo, readers=downloads, depth=2 * downloads):
+        destination = local_path(todo[position], output_path, layout)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(f".{destination.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, destination)
+        fetched += len(data)
+        add_counters(files=1, bytes=len(data))
+
+    total = merge_metadata(output_path / METADATA_FILE, rows) if rows else 0
+    print(f"Fetched {len(todo)} files ({fetched / 2**20:.1f} MiB); metadata of {total} recordings saved to "
+          f"{output_path / METADATA_FILE}")
+    return {'rows': len(rows), 'fetched': len(todo), 'present': len(rows) - len(todo), 'bytes': fetched}
+
+
+def load_full_dataset() -> int:
+    """
+    Download and load the whole dataset with datasets.load_dataset().
+
+    :return: Exit code
+    """
+    disable_ssl_verification()
+    print("Loading dataset with SSL verification disabled...")
+
+    try:
+        from datasets import load_dataset
+        # To avoid rate limits, you can use a Hugging Face token:
+        # ds = load_dataset("ArlingtonCL2/DogSpeak_Dataset", use_auth_token="your_hf_token_here")
+        ds = load_dataset(DATASET_REPO)
+        print("Dataset loaded successfully!")
+        print(f"Dataset info: {ds}")
+        return 0
+    except Exception as e:
+        print(f"Failed to load dataset: {e}")
+        print("\nAlternative solution: Manual download")
+        print("You can manually download the dataset from:")
+        print("https://huggingface.co/datasets/ArlingtonCL2/DogSpeak_Dataset")
+        print("Or try using git clone with:")
+        print("git clone https://huggingface.co/datasets/ArlingtonCL2/DogSpeak_Dataset")
+        return 1
+
+
+def add_pull_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the streamed pull options to a parser (shared with main.py).
+
+    :param parser: Argument parser
+    :return: None
+    """
+    parser.add_argument('--source', default=None, metavar='DIR',
+                        help="Local directory laid out like the dataset instead of the Hugging Face Hub")
+    parser.add_argument('--revision', default=None, help="Hub revision (branch, tag or commit)")
+    parser.add_argument('--token', default=os.environ.get('HF_TOKEN'), help="Hugging Face token (default: $HF_TOKEN)")
+    parser.add_argument('--layout', choices=LAYOUTS, default='dataset',
+                        help="dataset: dogspeak_released/<dog_id>; subset: <breed>_<sex> folders for extraction")
+    parser.add_argument('--breeds', nargs='+', default=None, help="Breeds to pull (default: all)")
+    parser.add_argument('--sexes', nargs='+', choices=['female', 'male'], default=None)
+    parser.add_argument('--dogs', nargs='+', default=None, metavar='DOG_ID', help="Dog IDs (folder names) to pull")
+    parser.add_argument('--columns', nargs='+', default=None,
+                        help="Metadata columns to keep besides filename, breed, sex and dog_id (default: all)")
+    parser.add_argument('--limit', type=int, default=None, help="Pull at most this many recordings")
+    parser.add_argument('--downloads', type=int, default=DEFAULT_DOWNLOADS, help="Files fetched at the same time")
+    parser.add_argument('--insecure', action='store_true', help="Skip SSL certificate checks")
+
+
+def pull_from_args(args: argparse.Namespace, output_dir: str) -> Dict[str, Any]:
+    """
+    Run pull_dataset() with parsed add_pull_arguments() options.
+
+    :param args: Parsed arguments
+    :param output_dir: Directory to write to
+    :return: pull_dataset() summary
+    """
+    if args.insecure:
+        disable_ssl_verification()
+    source = LocalSource(Path(args.source)) if args.source else HubSource(revision=args.revision, token=args.token)
+    return pull_dataset(source, output_dir, layout=args.layout, breeds=args.breeds, sexes=args.sexes,
+                        dogs=args.dogs, columns=args.columns, limit=args.limit, downloads=args.downloads)
+
+
+def main() -> int:
+    """
+    Download the whole dataset, or pull a filtered part of it with --stream.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Get the DogSpeak dataset from the Hugging Face Hub")
+    parser.add_argument('--stream', action='store_true', help="Pull only the filtered recordings (see below)")
+    parser.add_argument('--output', default='data/raw/DogSpeak_Dataset', help="Output directory of --stream")
+    add_pull_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.stream:
+        return load_full_dataset()
+    try:
+        pull_from_args(args, args.output)
+        return 0
+    except Exception as e:
+        print(f"Error during dataset pull: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,130 @@
+"""
+Typed Ingest Schema
+Reads the feature and metadata CSVs once into a fixed, compact schema:
+breed, sex, folder and dog IDs as categoricals and measurements as float32,
+so the string columns are stored once per distinct value instead of once
+per row and every consumer gets the same dtypes.
+
+Feature tables identify the dog only through the file name
+("<n>_<breed>_<S>_dog_<id>.wav"); the integer dog ID is parsed from all
+names in one vectorized regex pass (names without a "_<n>.wav" ending are
+then matched on "_dog_<n>" alone). metadata.csv has a dog_id column (the
+dataset folder name), which is kept as a categorical string.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# Categorical columns of each table
+FEATURE_CATEGORICAL = ['Folder', 'Breed', 'Sex']
+METADATA_CATEGORICAL = ['breed', 'sex', 'dog_id']
+# Columns of the feature table that are not measurements
+FEATURE_ID_COLUMNS = ['Folder', 'File', 'Breed', 'Sex']
+# Measurement dtype of the feature table
+FEATURE_DTYPE = 'float32'
+# Rows read to tell numeric extra columns from text ones
+SNIFF_ROWS = 1000
+
+# Dog number from a file name: the first "_<n>.wav", else the first "_dog_<n>"
+DOG_ID_PATTERN = r'_(\d+)\.wav'
+DOG_ID_FALLBACK_PATTERN = r'_dog_(\d+)'
+
+
+def parse_dog_ids(files: pd.Series) -> pd.Series:
+    """
+    Integer dog IDs parsed from feature table file names in one pass.
+
+    :param files: File names
+    :return: Categorical of integer IDs (missing when a name has no dog number)
+    """
+    files = files.astype(str)
+    numbers = files.str.extract(DOG_ID_PATTERN, expand=False)
+    missing = numbers.isna()
+    if missing.any():
+        numbers[missing] = files[missing].str.extract(DOG_ID_FALLBACK_PATTERN, expand=False)
+    return pd.to_numeric(numbers, errors='coerce').astype('Int64').astype('category').rename('dog_id')
+
+
+def _read_typed(path: Path, categorical: List[str], measurements: Optional[str] = None,
+                skip: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a CSV with categorical columns and, optionally, every other numeric column as one dtype.
+
+    :param path: CSV path
+    :param categorical: Columns to read as categoricals
+    :param measurements: dtype for the numeric columns (None keeps the parser's choice)
+    :param skip: Columns never converted to the measurement dtype
+    :return: DataFrame
+    """
+    sample = pd.read_csv(path, nrows=SNIFF_ROWS)
+    dtypes: Dict[str, str] = {column: 'category' for column in categorical if column in sample.columns}
+    if measurements is not None:
+        skip = set(skip or []) | set(dtypes)
+        dtypes.update({column: measurements for column in sample.columns
+                       if column not in skip and pd.api.types.is_numeric_dtype(sample[column])})
+    return pd.read_csv(path, dtype=dtypes)
+
+
+def read_feature_table(path: Path) -> pd.DataFrame:
+    """
+    Read a feature table (as written by the extraction) into the ingest schema.
+
+    :param path: Feature CSV
+    :return: DataFrame with categorical Folder/Breed/Sex/dog_id and float32 measurements
+    """
+    df = _read_typed(Path(path), FEATURE_CATEGORICAL, FEATURE_DTYPE, FEATURE_ID_COLUMNS)
+    df['dog_id'] = parse_dog_ids(df['File'])
+    return df
+
+
+def read_metadata(path: Path) -> pd.DataFrame:
+    """
+    Read a metadata.csv (filename, breed, sex, dog_id, ...) into the ingest schema.
+
+    :param path: metadata.csv
+    :return: DataFrame with categorical breed/sex/dog_id
+    """
+    return _read_typed(Path(path), METADATA_CATEGORICAL)
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """
+    Bytes held by a DataFrame, including its strings.
+
+    :param df: DataFrame
+    :return: Bytes
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def main() -> int:
+    """
+    Report the memory of a table read with default dtypes and with the ingest schema.
+
+    :return: Exit code
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Memory of a feature or metadata CSV in the ingest schema")
+    parser.add_argument('path', help="Feature CSV or metadata.csv")
+    parser.add_argument('--metadata', action='store_true', help="Read as metadata.csv")
+    args = parser.parse_args()
+
+    try:
+        plain = pd.read_csv(args.path)
+        if not args.metadata:
+            plain['dog_id'] = plain['File'].str.extract(r'_(\d+)\.wav')[0]
+        typed = read_metadata(args.path) if args.metadata else read_feature_table(args.path)
+        before, after = memory_usage(plain), memory_usage(typed)
+        print(f"{len(typed):,} rows: {before / 2**20:.1f} MiB with default dtypes, "
+              f"{after / 2**20:.1f} MiB typed ({before / max(after, 1):.1f}x smaller)")
+        return 0
+    except Exception as e:
+        print(f"Error during ingest: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Stage Instrumentation
+Records wall time, CPU time, peak memory and files/bytes/rows processed per
+pipeline stage, and writes them as a Chrome trace (JSON) that can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+
+CPU time is split into this process (cpu_s) and child processes that exited
+during the stage (child_cpu_s: subprocesses and process pools shut down inside
+it). Memory is the resident set size sampled while the stage runs (rss_peak_mb,
+Linux only) next to the process-lifetime peak so far (process_peak_rss_mb).
+Recording is always on and costs a few clock and getrusage reads per stage plus
+one background thread sampling RSS while stages run. The trace is written at
+exit when NMSML_TRACE is set to an output path (or after configure_tracing()
+was called). Set NMSML_TRACE_MEMORY=1 to also
+track per-stage Python allocation peaks with tracemalloc, which is slower.
+"""
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACE_ENV_VAR = "NMSML_TRACE"
+TRACE_MEMORY_ENV_VAR = "NMSML_TRACE_MEMORY"
+
+# Counters that get a per-second throughput in the trace
+THROUGHPUT_COUNTERS = ('rows', 'files', 'bytes')
+
+# Seconds between RSS samples while a stage runs
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Current RSS of this process (second field, in pages); not available on macOS
+STATM_PATH = Path('/proc/self/statm')
+
+
+@dataclass
+class StageRecord:
+    """
+    Measurements of one running stage; counters can be added while it runs.
+    """
+    name: str
+    args: Dict[str, Any] = field(default_factory=dict)
+    counters: Dict[str, float] = field(default_factory=dict)
+    rss_peak: Optional[int] = None
+
+    def add(self, **counters: float) -> None:
+        """
+        Increment counters such as rows, files or bytes.
+
+        :param counters: Counter increments
+        :return: None
+        """
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far (not of the current stage).
+
+    :return: Peak RSS in MB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _current_rss() -> Optional[int]:
+    """
+    Current resident set size of this process.
+
+    :return: RSS in bytes, or None where /proc is not available
+    """
+    try:
+        return int(STATM_PATH.read_text().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _children_cpu_s() -> float:
+    """
+    CPU time of child processes that have exited and been waited for.
+
+    :return: User plus system seconds
+    """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Tracer:
+    """
+    Collects stage events in Chrome trace format.
+    """
+
+    def __init__(self, track_memory: bool = False) -> None:
+        """
+        Initialize the tracer.
+
+        :param track_memory: Track per-stage Python allocation peaks with tracemalloc
+        """
+        self.events: List[Dict[str, Any]] = []
+        self.track_memory = track_memory
+        self.output_path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._running: List[StageRecord] = []
+        # Process whose sampler thread is running (a forked worker has to start its own)
+        self._sampler_pid: Optional[int] = None
+        self._origin = time.perf_counter()
+        self._origin_epoch_us = time.time() * 1e6
+        self._current: contextvars.ContextVar[Optional[StageRecord]] = contextvars.ContextVar(
+            'current_stage', default=None
+        )
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _timestamp_us(self, perf_time: float) -> float:
+        """
+        Convert a perf_counter reading to epoch microseconds, so traces from several processes line up.
+
+        :param perf_time: perf_counter value
+        :return: Timestamp in microseconds
+        """
+        return self._origin_epoch_us + (perf_time - self._origin) * 1e6
+
+    def _sample_rss(self) -> None:
+        """
+        Raise the RSS peak of every running stage to the current RSS.
+
+        :return: None
+        """
+        rss = _current_rss()
+        if rss is None:
+            return
+        with self._lock:
+            for record in self._running:
+                if record.rss_peak is None or rss > record.rss_peak:
+                    record.rss_peak = rss
+
+    def _sample_loop(self) -> None:
+        """
+        Sample RSS until no stage is running.
+
+        :return: None
+        """
+        while True:
+            self._sample_rss()
+            with self._lock:
+                if not self._running:
+                    self._sampler_pid = None
+                    return
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+    @contextmanager
+    def stage(self, name: str, **args: Any) -> Iterator[StageRecord]:
+        """
+        Measure a block of work as one stage.
+
+        :param name: Stage name shown in the trace viewer
+        :param args: Static annotations (e.g. input path) stored with the event
+        :return: Context manager yielding the StageRecord for adding counters
+        """
+        record = StageRecord(name=name, args=dict(args))
+        token = self._current.set(record)
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        with self._lock:
+            if self._sampler_pid not in (None, os.getpid()):
+                # Forked while the parent ran stages: those are not running here
+                self._running = []
+            self._running.append(record)
+            start_sampler = self._sampler_pid != os.getpid()
+            if start_sampler:
+                self._sampler_pid = os.getpid()
+        if start_sampler:
+            threading.Thread(target=self._sample_loop, name='rss-sampler', daemon=True).start()
+        else:
+            self._sample_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        child_cpu_start = _children_cpu_s()
+        status = 'ok'
+        try:
+            yield record
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            child_cpu = _children_cpu_s() - child_cpu_start
+            self._current.reset(token)
+            self._sample_rss()
+            with self._lock:
+                self._running.remove(record)
+
+            event_args: Dict[str, Any] = dict(record.args)
+            event_args.update(record.counters)
+            event_args['status'] = status
+            event_args['wall_s'] = round(wall, 6)
+            event_args['cpu_s'] = round(cpu, 6)
+            event_args['child_cpu_s'] = round(child_cpu, 6)
+            if record.rss_peak is not None:
+                event_args['rss_peak_mb'] = round(record.rss_peak / (1024 * 1024), 1)
+            event_args['process_peak_rss_mb'] = round(_peak_rss_mb(), 1)
+            if self.track_memory:
+                event_args['py_alloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+            for counter in THROUGHPUT_COUNTERS:
+                if counter in record.counters and wall > 0:
+                    event_args[f'{counter}_per_s'] = round(record.counters[counter] / wall, 2)
+
+            event = {
+                'name': name,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': round(self._timestamp_us(wall_start), 1),
+                'dur': round(wall * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': event_args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def add(self, **counters: float) -> None:
+        """
+        Add counters to the innermost running stage (no-op outside a stage).
+
+        :param counters: Counter increments
+        :return: None
+        """
+        record = self._current.get()
+        if record is not None:
+            record.add(**counters)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        Remove and return the recorded events (used to ship worker events to the parent).
+
+        :return: List of trace events
+        """
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def extend(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Add events recorded elsewhere (e.g. in a worker process).
+
+        :param events: Trace events
+        :return: None
+        """
+        with self._lock:
+            self.events.extend(events)
+
+    def write(self, path: Optional[Path] = None) -> Optional[Path]:
+        """
+        Write the trace as Chrome trace JSON.
+
+        :param path: Output path (default: the configured output path)
+        :return: Path written, or None if no path is configured
+        """
+        path = Path(path) if path is not None else self.output_path
+        if path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e['ts'])
+        process_names = [
+            {'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f'nmsml[{pid}]'}}
+            for pid in sorted({e['pid'] for e in events})
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': process_names + events, 'displayTimeUnit': 'ms'}, f, indent=1)
+        return path
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Return the process-wide tracer, creating it from the environment on first use.
+
+    :return: Tracer instance
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(track_memory=os.environ.get(TRACE_MEMORY_ENV_VAR, '') not in ('', '0'))
+        if os.environ.get(TRACE_ENV_VAR):
+            _tracer.output_path = Path(os.environ[TRACE_ENV_VAR])
+        atexit.register(_tracer.write)
+    return _tracer
+
+
+def configure_tracing(output_path: Path, track_memory: bool = False) -> Tracer:
+    """
+    Enable writing the trace to a file at exit.
+
+    The path is also exported through NMSML_TRACE so subprocesses record too.
+
+    :param output_path: Trace file to write
+    :param track_memory: Track per-stage Python allocation peaks with tracemalloc
+    :return: Tracer instance
+    """
+    os.environ[TRACE_ENV_VAR] = str(output_path)
+    if track_memory:
+        os.environ[TRACE_MEMORY_ENV_VAR] = '1'
+    tracer = get_tracer()
+    tracer.output_path = Path(output_path)
+    if track_memory and not tracer.track_memory:
+        tracer.track_memory = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return tracer
+
+
+def trace_stage(name: str, **args: Any):
+    """
+    Measure a block of work as one stage on the process-wide tracer.
+
+    :param name: Stage name
+    :param args: Static annotations stored with the event
+    :return: Context manager yielding the StageRecord
+    """
+    return get_tracer().stage(name, **args)
+
+
+def add_counters(**counters: float) -> None:
+    """
+    Add counters (rows, files, bytes, ...) to the innermost running stage.
+
+    :param counters: Counter increments
+    :return: None
+    """
+    get_tracer().add(**counters)
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator that measures every call of a function as one stage.
+
+    :param name: Stage name
+    :return: Decorator
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Metadata Index
+Persistent SQLite index of the DogSpeak metadata and the recordings on disk.
+
+Each collection (the full dataset from metadata.csv, or a subset directory of
+<breed>_<sex> folders) is loaded once into the `recordings` table, indexed on
+breed, sex and dog_id, together with each file's size, modification time,
+duration, sample rate, channels, bit depth and content hash. A per-dog aggregate table is rebuilt
+whenever a collection changes, so breed/sex/dog summaries read a few
+thousand rows instead of every recording. Later runs only check whether the
+source CSV or the folders changed, so "dogs per breed/sex" or "files of
+dog_X" are answered by queries instead of re-reading CSVs or rescanning
+directories. Rows keep the source order, so selections made from the index
+match selections made from the CSV.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from scripts.instrumentation import add_counters, traced
+from scripts.wav_header import read_wav_header
+
+DEFAULT_INDEX_PATH = Path('data') / 'metadata_index.sqlite'
+DATASET_COLLECTION = 'dataset'
+SUBSET_COLLECTION = 'subset'
+# Metadata columns stored as indexed columns; any others are kept in `extra`
+CORE_COLUMNS = ['filename', 'breed', 'sex', 'dog_id']
+HASH_CHUNK_SIZE = 1 << 20
+DEFAULT_PROBE_THREADS = 8
+# Bumped whenever the tables change; older index files are rebuilt from their sources
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    name TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    source TEXT,
+    signature TEXT,
+    columns TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS recordings (
+    collection TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    breed TEXT,
+    sex TEXT,
+    dog_id TEXT,
+    folder TEXT,
+    path TEXT NOT NULL,
+    extra TEXT,
+    status TEXT,
+    bytes INTEGER,
+    mtime_ns INTEGER,
+    duration REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    bit_depth INTEGER,
+    content_hash TEXT,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS recordings_breed_sex ON recordings (collection, breed, sex);
+CREATE INDEX IF NOT EXISTS recordings_sex ON recordings (collection, sex);
+CREATE INDEX IF NOT EXISTS recordings_dog_id ON recordings (collection, dog_id);
+CREATE INDEX IF NOT EXISTS recordings_path ON recordings (collection, path);
+CREATE TABLE IF NOT EXISTS dogs (
+    collection TEXT NOT NULL,
+    dog_id TEXT,
+    breed TEXT,
+    sex TEXT,
+    files INTEGER,
+    duration REAL,
+    bytes INTEGER,
+    first_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS dogs_breed_sex ON dogs (collection, breed, sex);
+"""
+
+# Columns filled in by probing a file
+FILE_COLUMNS = ['status', 'bytes', 'mtime_ns', 'duration', 'sample_rate', 'channels', 'bit_depth', 'content_hash']
+
+
+def parse_dog_id(filename: str) -> str:
+    """
+    Dog ID from a subset file name such as "3_husky_M_dog_12.wav".
+
+    :param filename: WAV file name
+    :return: "dog_<n>", or "unknown" when the name has no dog part
+    """
+    if "_dog_" not in filename:
+        return "unknown"
+    return f"dog_{filename.split('_dog_')[-1].replace('.wav', '')}"
+
+
+def content_hash(path: Path) -> str:
+    """
+    SHA-256 of a file's contents.
+
+    :param path: File
+    :return: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_file(path: Path, stat: Optional[os.stat_result] = None, hash_file: bool = True) -> Dict[str, Any]:
+    """
+    File statistics, WAV header values and content hash of one recording.
+
+    :param path: WAV file
+    :param stat: Result of os.stat(path) if already known
+    :param hash_file: Also hash the contents (otherwise only the header is read)
+    :return: Values for FILE_COLUMNS
+    """
+    values = dict.fromkeys(FILE_COLUMNS)
+    try:
+        stat = stat or os.stat(path)
+    except FileNotFoundError:
+        values['status'] = 'missing'
+        return values
+    values.update({'status': 'ok', 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    try:
+        values.update(read_wav_header(path))
+    except (OSError, ValueError, struct.error):
+        values['status'] = 'unreadable'
+    if hash_file:
+        values['content_hash'] = content_hash(path)
+    return values
+
+
+def _stat_or_none(path: Path) -> Optional[os.stat_result]:
+    """
+    os.stat() that returns None for missing files.
+
+    :param path: File
+    :return: Stat result or None
+    """
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def directory_signature(directory: Path) -> str:
+    """
+    Change signature of a subset directory from the modification times of its folders.
+
+    Adding, removing or renaming files changes the modification time of the
+    folder they are in, so this detects changes without listing the files.
+
+    :param directory: Directory containing <breed>_<sex> folders
+    :return: Signature string
+    """
+    folders = sorted(p for p in Path(directory).iterdir() if p.is_dir())
+    entries = [(p.name, p.stat().st_mtime_ns) for p in [Path(directory)] + folders]
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+
+def file_signature(path: Path) -> str:
+    """
+    Change signature of a source file from its size and modification time.
+
+    :param path: File
+    :return: Signature string
+    """
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class MetadataIndex:
+    """
+    Connection to a metadata index file.
+    """
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH) -> None:
+        """
+        Open (and create if needed) an index.
+
+        :param path: SQLite file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.connection.executescript("DROP TABLE IF EXISTS recordings; DROP TABLE IF EXISTS dogs; "
+                                          "DROP TABLE IF EXISTS collections;")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the connection.
+
+        :return: None
+        """
+        self.connection.close()
+
+    def __enter__(self) -> 'MetadataIndex':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def collection(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Stored information about a collection.
+
+        :param name: Collection name
+        :return: Dict of the collections row, None if not indexed
+        """
+        row = self.connection.execute("SELECT * FROM collections WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def _replace_rows(self, name: str, root: Path, source: str, signature: str, columns: List[str],
+                      records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Replace the rows of a collection, keeping file values of unchanged paths.
+
+        :param name: Collection name
+        :param root: Directory that row paths are relative to
+        :param source: Description of where the rows came from
+        :param signature: Change signature of the source
+        :param columns: Source column order
+        :param records: Rows with CORE_COLUMNS, folder, path and extra
+        :return: Number of rows
+        """
+        known = {row['path']: tuple(row[c] for c in FILE_COLUMNS) for row in self.connection.execute(
+            f"SELECT path, {', '.join(FILE_COLUMNS)} FROM recordings WHERE collection = ?", (name,))}
+        rows = []
+        for position, record in enumerate(records):
+            rows.append((name, position, record['filename'], record['breed'], record['sex'], record['dog_id'],
+                         record['folder'], record['path'], record['extra'])
+                        + known.get(record['path'], (None,) * len(FILE_COLUMNS)))
+        with self.connection:
+            self.connection.execute("DELETE FROM recordings WHERE collection = ?", (name,))
+            self.connection.executemany(
+                f"INSERT INTO recordings (collection, id, {', '.join(CORE_COLUMNS)}, folder, path, extra, "
+                f"{', '.join(FILE_COLUMNS)}) VALUES ({', '.join('?' * (9 + len(FILE_COLUMNS)))})", rows)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?, ?, ?)",
+                (name, str(root), source, signature, json.dumps(columns), datetime.now().isoformat()))
+            self._refresh_dogs(name)
+        add_counters(rows=len(rows))
+        return len(rows)
+
+    @traced('metadata_index.update_metadata')
+    def update_metadata(self, metadata_path: Path, audio_root: Path, name: str = DATASET_COLLECTION,
+                        probe: bool = True, verify: bool = False, threads: int = DEFAULT_PROBE_THREADS,
+                        hash_files: bool = True) -> int:
+        """
+        Index a metadata.csv (dataset layout: dogspeak_released/<dog_id>/<filename>).
+
+        The CSV is only re-read when its size or modification time changed.
+
+        :param metadata_path: metadata.csv
+        :param audio_root: Dataset directory containing dogspeak_released
+        :param name: Collection name
+        :param probe: Fill in the file values of recordings not probed yet
+        :param verify: Re-check every file and re-probe the ones that changed
+        :param threads: Probing threads
+        :param hash_files: Also hash the probed files (see probe())
+        :return: Number of recordings in the collection
+        """
+        signature = file_signature(metadata_path)
+        stored = self.collection(name)
+        if stored is None or stored['signature'] != signature or stored['root'] != str(audio_root):
+            with open(metadata_path, newline='') as f:
+                reader = csv.DictReader(f)
+                columns = list(reader.fieldnames or [])
+                extra_columns = [c for c in columns if c not in CORE_COLUMNS]
+                records = [{
+                    **{c: row.get(c) for c in CORE_COLUMNS},
+                    'folder': row.get('dog_id'),
+                    'path': f"dogspeak_released/{row.get('dog_id')}/{row.get('filename')}",
+                    'extra': json.dumps({c: row[c] for c in extra_columns}) if extra_columns else None,
+                } for row in reader]
+            add_counters(files=1, bytes=os.path.getsize(metadata_path))
+            print(f"Indexing {len(records):,} recordings from {metadata_path}")
+            self._replace_rows(name, audio_root, str(metadata_path), signature, columns, records)
+        if probe or verify:
+            self.probe(name, verify, threads, hash_files)
+        return self.count(name)
+
+    @traced('metadata_index.update_directory')
+    def update_directory(self, directory: Path, name: str = SUBSET_COLLECTION, probe: bool = True,
+                         verify: bool = False, threads: int = DEFAULT_PROBE_THREADS,
+                         hash_files: bool = True) -> int:
+        """
+        Index a directory of <breed>_<sex> folders (subset layout).
+
+        The folders are only listed again when one of them changed.
+
+        :param directory: Subset directory
+        :param name: Collection name
+        :param probe: Fill in the file values of recordings not probed yet
+        :param verify: Re-check every file and re-probe the ones that changed
+        :param threads: Probing threads
+        :param hash_files: Also hash the probed files (see probe())
+        :return: Number of recordings in the collection
+        """
+        directory = Path(directory)
+        signature = directory_signature(directory)
+        stored = self.collection(name)
+        if stored is None or stored['signature'] != signature or stored['root'] != str(directory):
+            records = []
+            for folder in sorted(p for p in directory.iterdir() if p.is_dir() and '_' in p.name):
+                breed, sex = folder.name.rsplit('_', 1)
+                for wav_file in sorted(folder.glob("*.wav")):
+                    records.append({'filename': wav_file.name, 'breed': breed.replace('_', ' '), 'sex': sex,
+                                    'dog_id': parse_dog_id(wav_file.name), 'folder': folder.name,
+                                    'path': f"{folder.name}/{wav_file.name}", 'extra': None})
+            self._replace_rows(name, directory, str(directory), signature, CORE_COLUMNS, records)
+        if probe or verify:
+            self.probe(name, verify, threads, hash_files)
+        return self.count(name)
+
+    def probe(self, name: str, verify: bool = False, threads: int = DEFAULT_PROBE_THREADS,
+              hash_files: bool = True) -> int:
+        """
+        Fill in size, modification time, WAV header values and hash of a collection's files.
+
+        :param name: Collection name
+        :param verify: Also re-check probed files and re-probe those whose size or time changed
+        :param threads: Probing threads (file opens and hashing release the GIL)
+        :param hash_files: Also hash the contents; without it only headers are read, and files
+                           probed that way are hashed by a later probe with hash_files
+        :return: Number of files probed
+        """
+        root = Path(self.collection(name)['root'])
+        if verify:
+            condition = ""
+        elif hash_files:
+            condition = "AND (status IS NULL OR (status != 'missing' AND content_hash IS NULL))"
+        else:
+            condition = "AND status IS NULL"
+        rows = self.connection.execute(
+            f"SELECT id, path, bytes, mtime_ns FROM recordings WHERE collection = ? {condition}", (name,)).fetchall()
+        if not rows:
+            return 0
+
+        def check(row: sqlite3.Row) -> Optional[Tuple[int, Dict[str, Any]]]:
+            path = root / row['path']
+            stat = _stat_or_none(path)
+            if verify and stat is not None and (stat.st_size, stat.st_mtime_ns) == (row['bytes'], row['mtime_ns']):
+                return None
+            return row['id'], probe_file(path, stat, hash_files)
+
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+            updates = [result for result in pool.map(check, rows) if result is not None]
+        with self.connection:
+            self.connection.executemany(
+                f"UPDATE recordings SET {', '.join(f'{c} = ?' for c in FILE_COLUMNS)} "
+                f"WHERE collection = ? AND id = ?",
+                [tuple(values[c] for c in FILE_COLUMNS) + (name, row_id) for row_id, values in updates])
+            if updates:
+                self._refresh_dogs(name)
+        add_counters(files=len(updates), bytes=sum(v['bytes'] or 0 for _, v in updates))
+        if updates:
+            print(f"Probed {len(updates):,} files in {name}")
+        return len(updates)
+
+    def _refresh_dogs(self, name: str) -> None:
+        """
+        Rebuild the per-dog aggregates of a collection (inside the caller's transaction).
+
+        :param name: Collection name
+        :return: None
+        """
+        self.connection.execute("DELETE FROM dogs WHERE collection = ?", (name,))
+        self.connection.execute(
+            "INSERT INTO dogs SELECT collection, dog_id, breed, sex, COUNT(*), SUM(duration), SUM(bytes), MIN(id) "
+            "FROM recordings WHERE collection = ? GROUP BY dog_id, breed, sex", (name,))
+
+    def count(self, name: str) -> int:
+        """
+        Number of recordings in a collection.
+
+        :param name: Collection name
+        :return: Row count
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM recordings WHERE collection = ?", (name,)).fetchone()[0]
+
+    def columns(self, name: str) -> List[str]:
+        """
+        Metadata columns of a collection in their source order.
+
+        :param name: Collection name
+        :return: Column names
+        """
+        return json.loads(self.collection(name)['columns'])
+
+    def breeds(self, name: str) -> List[str]:
+        """
+        Breeds in order of first appearance.
+
+        :param name: Collection name
+        :return: Breed names
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT breed FROM dogs WHERE collection = ? GROUP BY breed ORDER BY MIN(first_id)", (name,))]
+
+    def dogs(self, name: str, breed: Optional[str] = None, sex: Optional[str] = None) -> List[str]:
+        """
+        Dog IDs in order of first appearance.
+
+        :param name: Collection name
+        :param breed: Only dogs of this breed
+        :param sex: Only dogs of this sex
+        :return: Dog IDs
+        """
+        where, params = self._filters(name, breed=breed, sex=sex)
+        return [row[0] for row in self.connection.execute(
+            f"SELECT dog_id FROM dogs WHERE {where} GROUP BY dog_id ORDER BY MIN(first_id)", params)]
+
+    def recordings(self, name: str, breed: Optional[str] = None, sex: Optional[str] = None,
+                   dog_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Recordings in source order, with their metadata columns restored.
+
+        :param name: Collection name
+        :param breed: Only this breed
+        :param sex: Only this sex
+        :param dog_id: Only this dog
+        :return: One dict per recording: metadata columns plus folder, path and the file values
+        """
+        where, params = self._filters(name, breed=breed, sex=sex, dog_id=dog_id)
+        records = []
+        for row in self.connection.execute(f"SELECT * FROM recordings WHERE {where} ORDER BY id", params):
+            record = {c: row[c] for c in CORE_COLUMNS}
+            if row['extra']:
+                record.update(json.loads(row['extra']))
+            record.update({c: row[c] for c in ['folder', 'path'] + FILE_COLUMNS})
+            records.append(record)
+        return records
+
+    def breed_sex_summary(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Files, dogs and audio time per breed and sex, breeds in order of first appearance.
+
+        :param name: Collection name
+        :return: One dict per breed and sex with files, dogs, duration and bytes
+        """
+        return [dict(row) for row in self.connection.execute(
+            "SELECT breed, sex, SUM(files) AS files, COUNT(DISTINCT dog_id) AS dogs, "
+            "SUM(duration) AS duration, SUM(bytes) AS bytes FROM dogs WHERE collection = ? "
+            "GROUP BY breed, sex ORDER BY MIN(first_id)", (name,))]
+
+    def dog_file_counts(self, name: str) -> List[int]:
+        """
+        Number of recordings per dog.
+
+        :param name: Collection name
+        :return: Counts, one per dog
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT SUM(files) FROM dogs WHERE collection = ? GROUP BY dog_id", (name,))]
+
+    def distinct_dogs(self, name: str, sex: Optional[str] = None) -> int:
+        """
+        Number of distinct dogs.
+
+        :param name: Collection name
+        :param sex: Only dogs of this sex
+        :return: Count
+        """
+        where, params = self._filters(name, sex=sex)
+        return self.connection.execute(f"SELECT COUNT(DISTINCT dog_id) FROM dogs WHERE {where}", params).fetchone()[0]
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        """
+        Run an arbitrary read query.
+
+        :param sql: SQL statement
+        :param params: Statement parameters
+        :return: Result rows as dicts
+        """
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    @staticmethod
+    def _filters(name: str, **equal: Optional[str]) -> Tuple[str, List[Any]]:
+        """
+        WHERE clause for a collection and optional column equalities.
+
+        :param name: Collection name
+        :param equal: Column -> value (None values are ignored)
+        :return: (clause, parameters)
+        """
+        clauses, params = ["collection = ?"], [name]
+        for column, value in equal.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return " AND ".join(clauses), params
+
+
+def main() -> int:
+    """
+    Main function to build or refresh the metadata index.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Build or refresh the SQLite metadata index")
+    parser.add_argument('--index', default=str(DEFAULT_INDEX_PATH), help="Index file")
+    parser.add_argument('--metadata', default="data/raw/DogSpeak_Dataset/metadata.csv")
+    parser.add_argument('--subset', default="data/raw/subset")
+    parser.add_argument('--verify', action='store_true', help="Re-check all files and re-probe changed ones")
+    parser.add_argument('--threads', type=int, default=DEFAULT_PROBE_THREADS)
+    args = parser.parse_args()
+
+    try:
+        with MetadataIndex(Path(args.index)) as index:
+            metadata_path = Path(args.metadata)
+            if metadata_path.exists():
+                count = index.update_metadata(metadata_path, metadata_path.parent, verify=args.verify,
+                                              threads=args.threads)
+                print(f"{DATASET_COLLECTION}: {count:,} recordings")
+            if Path(args.subset).is_dir():
+                count = index.update_directory(Path(args.subset), verify=args.verify, threads=args.threads)
+                print(f"{SUBSET_COLLECTION}: {count:,} recordings")
+    except Exception as e:
+        print(f"Error updating the metadata index: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
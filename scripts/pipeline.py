@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner
+Models the analysis chain (duplicates -> subset -> extraction -> statistical
+analysis) as a DAG of stages with declared inputs, parameters and outputs.
+
+Each stage is fingerprinted from the content of its inputs and its parameters.
+A stage whose fingerprint matches the last successful run (and whose outputs
+still exist) is skipped, so changing one parameter only re-executes the stages
+it actually invalidates. Stages whose dependencies are satisfied run
+concurrently in a process pool.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from scripts.instrumentation import get_tracer, trace_stage
+
+PIPELINE_STATE_FILE = "pipeline_state.json"
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    ``func`` is called as ``func(**params)`` and must be a module-level function
+    so it can run in a worker process.
+    """
+    name: str
+    func: Callable[..., Any]
+    inputs: List[Path] = field(default_factory=list)
+    outputs: List[Path] = field(default_factory=list)
+    params: Dict[str, Any] = field(default_factory=dict)
+    deps: List[str] = field(default_factory=list)
+
+
+def _hash_file(path: Path, memo: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Content hash of a file, reusing the memoized digest when size and mtime are unchanged.
+
+    :param path: File to hash
+    :param memo: Digest memo keyed by path, updated in place
+    :return: Hex digest
+    """
+    stat = path.stat()
+    key = str(path.resolve())
+    cached = memo.get(key)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    memo[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return memo[key]['sha256']
+
+
+def _hash_directory(path: Path) -> str:
+    """
+    Cheap fingerprint of a directory tree from relative paths, sizes and mtimes.
+
+    Audio directories can hold thousands of files, so their contents are not read.
+
+    :param path: Directory to fingerprint
+    :return: Hex digest
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = Path(root) / name
+            stat = file_path.stat()
+            digest.update(f"{file_path.relative_to(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def fingerprint_path(path: Path, memo: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Fingerprint a declared input.
+
+    :param path: File or directory
+    :param memo: File digest memo
+    :return: Hex digest, or "missing" if the path does not exist
+    """
+    path = Path(path)
+    if path.is_dir():
+        return _hash_directory(path)
+    if path.is_file():
+        return _hash_file(path, memo)
+    return "missing"
+
+
+def stage_fingerprint(stage: Stage, memo: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Fingerprint a stage from its name, parameters and input contents.
+
+    :param stage: Stage to fingerprint
+    :param memo: File digest memo
+    :return: Hex digest
+    """
+    payload = {
+        'name': stage.name,
+        'params': stage.params,
+        'inputs': {str(p): fingerprint_path(p, memo) for p in stage.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Pipeline:
+    """
+    DAG of stages with fingerprint-based skipping and concurrent execution.
+    """
+
+    def __init__(self, stages: List[Stage], cache_dir: Path) -> None:
+        """
+        Initialize the pipeline.
+
+        :param stages: Stages in any order; dependencies are referenced by name
+        :param cache_dir: Directory holding the pipeline state file
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {unknown}")
+        self.cache_dir = Path(cache_dir)
+        self.state_path = self.cache_dir / PIPELINE_STATE_FILE
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        """
+        Load the persisted stage fingerprints and file digests.
+
+        :return: State dictionary
+        """
+        if self.state_path.exists():
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {'stages': {}, 'files': {}}
+
+    def _save_state(self) -> None:
+        """
+        Persist the state atomically.
+
+        :return: None
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def required_stages(self, targets: Optional[List[str]] = None, stop_at: Optional[Set[str]] = None) -> Set[str]:
+        """
+        Collect the targets and all their ancestors.
+
+        :param targets: Stage names to build (default: the final stages nothing depends on)
+        :param stop_at: Stages whose ancestors are not needed (their outputs are used as-is)
+        :return: Set of stage names
+        """
+        stop_at = stop_at or set()
+        required: Set[str] = set()
+        if not targets:
+            upstream = {dep for stage in self.stages.values() for dep in stage.deps}
+            targets = [name for name in self.stages if name not in upstream]
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in required:
+                required.add(name)
+                if name not in stop_at:
+                    pending.extend(self.stages[name].deps)
+        return required
+
+    def _is_current(self, stage: Stage, fingerprint: str) -> bool:
+        """
+        Check whether a stage's last successful run matches its fingerprint.
+
+        :param stage: Stage to check
+        :param fingerprint: Current fingerprint
+        :return: True if the stage can be skipped
+        """
+        previous = self.state['stages'].get(stage.name, {})
+        return previous.get('fingerprint') == fingerprint and all(Path(p).exists() for p in stage.outputs)
+
+    def _resolve_sources(self) -> Tuple[Set[str], Dict[str, List[Path]]]:
+        """
+        Work out which stages can run here and which must reuse provided outputs.
+
+        A source input is one no stage produces. A stage is runnable if its own
+        source inputs exist and every dependency is either runnable or external.
+        A stage that is not runnable but whose outputs all exist is external:
+        this is the case for a checkout that ships the extracted features but not
+        the raw audio, where the subset and extraction outputs are used as-is.
+
+        :return: Tuple of (external stage names, missing source paths per blocked stage)
+        """
+        produced = {Path(p) for stage in self.stages.values() for p in stage.outputs}
+        missing: Dict[str, List[Path]] = {}
+        external: Set[str] = set()
+
+        def visit(name: str) -> bool:
+            if name not in missing:
+                stage = self.stages[name]
+                own = [Path(p) for p in stage.inputs if Path(p) not in produced and not Path(p).exists()]
+                upstream = [p for dep in stage.deps if not visit(dep) for p in missing[dep]]
+                missing[name] = own + upstream
+                if missing[name] and stage.outputs and all(Path(p).exists() for p in stage.outputs):
+                    external.add(name)
+            return not missing[name] or name in external
+
+        for name in self.stages:
+            visit(name)
+        blocked = {name: paths for name, paths in missing.items() if paths and name not in external}
+        return external, blocked
+
+    def run(self, targets: Optional[List[str]] = None, jobs: int = 1, force: bool = False,
+            dry_run: bool = False) -> Dict[str, str]:
+        """
+        Run the stages needed for the targets, skipping those that are up to date.
+
+        :param targets: Stage names to build (default: the final stages)
+        :param jobs: Maximum number of stages to run concurrently
+        :param force: Re-run every required stage regardless of fingerprints
+        :param dry_run: Only report which stages would run
+        :return: Dictionary mapping stage name to "ran", "skipped", "external" or "stale"
+        """
+        external, blocked = self._resolve_sources()
+        if force:
+            external = set()
+        required = self.required_stages(targets, stop_at=external)
+        blocked = {name: paths for name, paths in blocked.items() if name in required}
+        if blocked and not dry_run:
+            details = '; '.join(f"{name}: {', '.join(map(str, paths))}" for name, paths in sorted(blocked.items()))
+            raise FileNotFoundError(f"Missing pipeline inputs ({details})")
+        status: Dict[str, str] = {}
+        done: Set[str] = set()
+        running: Dict[Future, Stage] = {}
+        memo = self.state.setdefault('files', {})
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and not dry_run else None
+
+        def ready() -> List[Stage]:
+            return [self.stages[name] for name in sorted(required - done - set(status))
+                    if all(dep in done or dep not in required for dep in self.stages[name].deps)]
+
+        try:
+            while len(done) < len(required):
+                for stage in ready():
+                    if stage.name in external:
+                        print(f"[pipeline] {stage.name}: inputs unavailable, using existing outputs")
+                        status[stage.name] = 'external'
+                        done.add(stage.name)
+                        continue
+
+                    fingerprint = stage_fingerprint(stage, memo)
+                    # In a dry run upstream stages did not actually run, so their staleness propagates
+                    upstream_stale = any(status.get(dep) == 'stale' for dep in stage.deps)
+                    if not force and not upstream_stale and self._is_current(stage, fingerprint):
+                        print(f"[pipeline] {stage.name}: up to date, skipping")
+                        status[stage.name] = 'skipped'
+                        done.add(stage.name)
+                        continue
+                    if dry_run:
+                        print(f"[pipeline] {stage.name}: would run")
+                        status[stage.name] = 'stale'
+                        done.add(stage.name)
+                        continue
+
+                    print(f"[pipeline] {stage.name}: running")
+                    if executor is None:
+                        started = time.perf_counter()
+                        with trace_stage(f'pipeline.{stage.name}'):
+                            stage.func(**stage.params)
+                        self._record(stage, time.perf_counter() - started, memo)
+                        status[stage.name] = 'ran'
+                        done.add(stage.name)
+                    else:
+                        future = executor.submit(_timed_call, stage.name, stage.func, stage.params)
+                        running[future] = stage
+                        status[stage.name] = 'running'
+
+                if not running:
+                    if len(done) < len(required) and not ready():
+                        raise RuntimeError("Pipeline has a dependency cycle")
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    elapsed, events = future.result()
+                    get_tracer().extend(events)
+                    self._record(stage, elapsed, memo)
+                    status[stage.name] = 'ran'
+                    done.add(stage.name)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if not dry_run:
+                self._save_state()
+
+        return status
+
+    def _record(self, stage: Stage, elapsed: float, memo: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Store the post-run fingerprint of a finished stage.
+
+        The fingerprint is recomputed after the run because a stage may declare
+        one of its own outputs as an input (e.g. a directory it refreshes).
+
+        :param stage: Finished stage
+        :param elapsed: Wall time in seconds
+        :param memo: File digest memo
+        :return: None
+        """
+        self.state['stages'][stage.name] = {
+            'fingerprint': stage_fingerprint(stage, memo),
+            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration_s': round(elapsed, 3),
+        }
+        self._save_state()
+        print(f"[pipeline] {stage.name}: done in {elapsed:.2f}s")
+
+
+def _timed_call(name: str, func: Callable[..., Any], params: Dict[str, Any]) -> Tuple[float, List[Dict[str, Any]]]:
+    """
+    Call a stage function in a worker process and time it.
+
+    Worker processes exit without running atexit hooks, so the trace events
+    recorded here are returned to the parent instead of written.
+
+    :param name: Stage name
+    :param func: Stage function
+    :param params: Keyword arguments
+    :return: Tuple of (wall time in seconds, trace events recorded in the worker)
+    """
+    started = time.perf_counter()
+    with trace_stage(f'pipeline.{name}'):
+        func(**params)
+    return time.perf_counter() - started, get_tracer().drain()
+
+
+def script_inputs(*modules: str) -> List[Path]:
+    """
+    Source files of scripts modules and of every scripts module they import.
+
+    Imports inside functions count too, since a stage can reach them, so a stage
+    declaring these files is re-run whenever code it may execute changes.
+
+    :param modules: Module names under scripts/ (e.g. "extract_features")
+    :return: Paths of the modules and of their transitive scripts imports, sorted by name
+    """
+    import ast
+
+    scripts_dir = Path(__file__).parent
+    found: Set[str] = set()
+    pending = list(modules)
+    while pending:
+        name = pending.pop()
+        if name in found:
+            continue
+        found.add(name)
+        for node in ast.walk(ast.parse((scripts_dir / f"{name}.py").read_text())):
+            if isinstance(node, ast.ImportFrom) and node.module and node.module.split('.')[0] == 'scripts':
+                parts = node.module.split('.')
+                imported = parts[1:2] or [alias.name for alias in node.names]
+            elif isinstance(node, ast.Import):
+                imported = [alias.name.split('.')[1] for alias in node.names if alias.name.startswith('scripts.')]
+            else:
+                continue
+            pending += [module for module in imported if (scripts_dir / f"{module}.py").exists()]
+    return [scripts_dir / f"{name}.py" for name in sorted(found)]
+
+
+# --- Stage functions for the default pipeline ---
+
+def duplicates_stage(metadata_path: str, audio_dir: str, output_path: str, store_path: str,
+                     index_path: Optional[str] = None, jobs: int = 1, threshold: float = 0.15,
+                     min_matches: int = 16) -> None:
+    """
+    Find exact and near-duplicate recordings of the full dataset.
+
+    :param metadata_path: Path to the full dataset metadata.csv
+    :param audio_dir: Root of the full dataset
+    :param output_path: duplicates.csv to write
+    :param store_path: Fingerprint store reused between runs
+    :param index_path: SQLite metadata index to list the recordings from
+    :param jobs: Worker processes for fingerprinting
+    :param threshold: Minimum fraction of matching landmark hashes for a near-duplicate
+    :param min_matches: Minimum number of matching landmark hashes for a near-duplicate
+    :return: None
+    """
+    from scripts.fingerprint import detect_duplicates
+
+    detect_duplicates(metadata_path, audio_dir, output_path, store_path=Path(store_path), jobs=jobs,
+                      threshold=threshold, min_matches=min_matches, index_path=index_path)
+
+
+def subset_stage(metadata_path: str, audio_dir: str, output_dir: str, exploration_dir: str,
+                 dogs_per_sex: int, files_per_dog: int, random_seed: int, index_path: Optional[str] = None,
+                 seconds_per_dog: Optional[float] = None, duplicates_path: Optional[str] = None) -> None:
+    """
+    Recreate the balanced subset from scratch.
+
+    The subset directory is cleared first so files selected under previous
+    parameters do not leak into extraction.
+
+    :param metadata_path: Path to the full dataset metadata.csv
+    :param audio_dir: Root of the full dataset
+    :param output_dir: Subset directory
+    :param exploration_dir: Directory for metadata_subset.csv and the report
+    :param dogs_per_sex: Dogs per sex per breed
+    :param files_per_dog: Files per dog
+    :param random_seed: Random seed
+    :param index_path: SQLite metadata index to select from
+    :param seconds_per_dog: Balance on audio time per dog instead of files_per_dog
+    :param duplicates_path: duplicates.csv of recordings to leave out
+    :return: None
+    """
+    from scripts.create_subset import create_balanced_subset
+
+    if Path(output_dir).exists():
+        shutil.rmtree(output_dir)
+    Path(exploration_dir).mkdir(parents=True, exist_ok=True)
+    create_balanced_subset(metadata_path, audio_dir, output_dir, dogs_per_sex=dogs_per_sex,
+                           files_per_dog=files_per_dog, random_seed=random_seed,
+                           exploration_dir=exploration_dir, index_path=index_path,
+                           seconds_per_dog=seconds_per_dog, duplicates_path=duplicates_path)
+
+
+def extract_stage(input_directory: str, output_file: str, engine: str, praat_binary: str, jobs: int = 1,
+                  feature_bank: bool = True, pitch_algorithm: str = 'ac', index_path: Optional[str] = None,
+                  cache_path: Optional[str] = None, queue_dir: Optional[str] = None, shard_size: int = 200,
+                  readers: int = 4, prefetch_depth: int = 16, checkpoint_every: int = 200,
+                  duplicates_path: Optional[str] = None) -> None:
+    """
+    Run the feature extraction.
+
+    :param input_directory: Subset directory
+    :param output_file: Feature CSV to write
+    :param engine: Extraction engine ("praat" or "python")
+    :param praat_binary: Praat executable (praat engine)
+    :param jobs: Worker processes (python engine)
+    :param feature_bank: Also write the feature bank columns (python engine)
+    :param pitch_algorithm: Pitch algorithm, "ac" or "yin" (python engine)
+    :param index_path: SQLite metadata index to list the recordings from (python engine)
+    :param cache_path: Extraction result cache (python engine)
+    :param queue_dir: Shared work queue directory; jobs then counts the workers of this node (see
+                      extract_features.run_sharded_extraction())
+    :param shard_size: Recordings per work queue shard
+    :param readers: Threads reading recordings ahead of the analysis (python engine)
+    :param prefetch_depth: Recordings read but not yet analyzed at most (python engine)
+    :param checkpoint_every: Recordings per committed batch; a failed run resumes after the last one
+    :param duplicates_path: duplicates.csv; near-duplicates reuse the result of their kept copy (python engine)
+    :return: None
+    """
+    from scripts.extract_features import run_extraction, run_sharded_extraction
+
+    if engine == 'praat':
+        options = {'praat_binary': praat_binary}
+    else:
+        options = {'feature_bank': feature_bank, 'pitch_algorithm': pitch_algorithm, 'readers': readers,
+                   'prefetch_depth': prefetch_depth, 'duplicates_path': duplicates_path}
+    if queue_dir:
+        run_sharded_extraction(input_directory, output_file, queue_dir, engine=engine, workers=jobs,
+                               shard_size=shard_size, index_path=index_path,
+                               cache_path=cache_path if engine == 'python' else None, **options)
+        return
+    options['checkpoint_every'] = checkpoint_every
+    if engine == 'python':
+        options.update(jobs=jobs, index_path=index_path, cache_path=cache_path)
+    run_extraction(input_directory, output_file, engine=engine, **options)
+
+
+def analysis_section_stage(section: str, input_path: str, output_dir: str, **lme_options: Any) -> None:
+    """
+    Produce one statistical analysis report section.
+
+    :param section: Section name
+    :param input_path: Feature CSV
+    :param output_dir: Analysis output directory
+    :param lme_options: engine, formula and random_effects of the 'lme' section (e.g. --set lme.engine=sparse)
+    :return: None
+    """
+    from scripts.statistical_analysis import run_section
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    run_section(section, Path(input_path), Path(output_dir), lme_options)
+
+
+def report_stage(output_dir: str, formats: List[str]) -> None:
+    """
+    Render the report from the stored section results.
+
+    :param output_dir: Analysis output directory
+    :param formats: Report formats (e.g. --set 'report.formats=["markdown"]')
+    :return: None
+    """
+    from scripts.statistical_analysis import render_report
+
+    render_report(Path(output_dir), formats)
+
+
+FIGURE_FILES = ['vocal_dimorphism_analysis.png', 'f0_analysis_complete.png',
+                'effect_sizes_heatmap_complete.png', 'f0_range_analysis.png']
+
+# Default parameters per stage; overridable with "stage.param=value"
+DEFAULT_PARAMS: Dict[str, Dict[str, Any]] = {
+    'duplicates': {'threshold': 0.15, 'min_matches': 16},
+    'subset': {'dogs_per_sex': 10, 'files_per_dog': 3, 'random_seed': 42},
+    'extract': {'engine': 'praat', 'praat_binary': os.environ.get('PRAAT_BINARY', 'praat')},
+    'report': {'formats': ['markdown', 'html']},
+}
+
+
+def build_default_pipeline(base_dir: Path, cache_dir: Optional[Path] = None,
+                           overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Pipeline:
+    """
+    Build the duplicates -> subset -> extract -> analysis -> report pipeline for a data root.
+
+    :param base_dir: Repository/data root containing the data/ directory
+    :param cache_dir: Directory for pipeline state, fingerprints and extraction results (default: <base_dir>/.cache)
+    :param overrides: Parameter overrides keyed by stage name
+    :return: Configured pipeline
+    """
+    from scripts.extract_features import EXTRACTION_CACHE_FILE, segments_path
+    from scripts.fingerprint import DUPLICATES_FILE, FINGERPRINT_STORE_FILE
+    from scripts.report_layout import HTML_REPORT_NAME, REPORT_NAME, SECTIONS, manifest_path
+
+    base = Path(base_dir)
+    scripts_dir = Path(__file__).parent
+    raw_dir = base / 'data' / 'raw'
+    exploration_dir = base / 'data' / 'exploration'
+    subset_dir = raw_dir / 'subset'
+    features_csv = base / 'data' / 'features' / 'feature_extraction_results.csv'
+    segments_csv = segments_path(str(features_csv))
+    analysis_dir = base / 'data' / 'statistical_analysis'
+    index_path = base / 'data' / 'metadata_index.sqlite'
+    duplicates_csv = exploration_dir / DUPLICATES_FILE
+    cache_dir = Path(cache_dir) if cache_dir is not None else base / '.cache'
+
+    params = {name: dict(values) for name, values in DEFAULT_PARAMS.items()}
+    for name, values in (overrides or {}).items():
+        params.setdefault(name, {}).update(values)
+
+    stages = [
+        Stage(
+            name='duplicates',
+            func=duplicates_stage,
+            inputs=[raw_dir / 'DogSpeak_Dataset' / 'metadata.csv', raw_dir / 'DogSpeak_Dataset']
+            + script_inputs('fingerprint'),
+            outputs=[duplicates_csv],
+            params={'metadata_path': str(raw_dir / 'DogSpeak_Dataset' / 'metadata.csv'),
+                    'audio_dir': str(raw_dir / 'DogSpeak_Dataset'),
+                    'output_path': str(duplicates_csv),
+                    'store_path': str(cache_dir / FINGERPRINT_STORE_FILE),
+                    'index_path': str(index_path),
+                    **params.get('duplicates', {})},
+        ),
+        Stage(
+            name='subset',
+            func=subset_stage,
+            inputs=[raw_dir / 'DogSpeak_Dataset' / 'metadata.csv', raw_dir / 'DogSpeak_Dataset', duplicates_csv]
+            + script_inputs('create_subset'),
+            outputs=[exploration_dir / 'metadata_subset.csv', exploration_dir / 'subset_creation_report.txt',
+                     subset_dir],
+            params={'metadata_path': str(raw_dir / 'DogSpeak_Dataset' / 'metadata.csv'),
+                    'audio_dir': str(raw_dir / 'DogSpeak_Dataset'),
+                    'output_dir': str(subset_dir),
+                    'exploration_dir': str(exploration_dir),
+                    'index_path': str(index_path),
+                    'duplicates_path': str(duplicates_csv),
+                    **params.get('subset', {})},
+            deps=['duplicates'],
+        ),
+        Stage(
+            name='extract',
+            func=extract_stage,
+            inputs=[subset_dir, scripts_dir / 'extract_features.praat'] + script_inputs('extract_features')
+            + ([duplicates_csv] if params['extract']['engine'] == 'python' else []),
+            outputs=[features_csv] + ([segments_csv] if params['extract']['engine'] == 'python' else []),
+            params={'input_directory': str(subset_dir), 'output_file': str(features_csv),
+                    'index_path': str(index_path), 'cache_path': str(cache_dir / EXTRACTION_CACHE_FILE),
+                    'duplicates_path': str(duplicates_csv), **params.get('extract', {})},
+            deps=['subset'],
+        ),
+    ]
+
+    for section in SECTIONS:
+        outputs = [manifest_path(section, analysis_dir)]
+        if section == 'figures':
+            outputs += [analysis_dir / name for name in FIGURE_FILES]
+        stages.append(Stage(
+            name=section,
+            func=analysis_section_stage,
+            inputs=[features_csv] + script_inputs('statistical_analysis'),
+            outputs=outputs,
+            params={'section': section, 'input_path': str(features_csv), 'output_dir': str(analysis_dir),
+                    **params.get(section, {})},
+            deps=['extract'],
+        ))
+
+    report_files = {'markdown': REPORT_NAME, 'html': HTML_REPORT_NAME}
+    stages.append(Stage(
+        name='report',
+        func=report_stage,
+        inputs=[manifest_path(section, analysis_dir) for section in SECTIONS] + script_inputs('statistical_analysis'),
+        outputs=[analysis_dir / report_files[fmt] for fmt in params['report']['formats'] if fmt in report_files],
+        params={'output_dir': str(analysis_dir), **params['report']},
+        deps=list(SECTIONS),
+    ))
+
+    return Pipeline(stages, cache_dir)
@@ -16,6 +16,8 @@ from datetime import datetime
 import logging
 from typing import Dict, Optional, List, Tuple, Any
 import re
+from scripts.instrumentation import add_counters, traced
+from scripts.wav_header import add_header_columns
 
 # Set up logging
 logging.basicConfig(
@@ -57,6 +59,7 @@ def extract_id_from_url(drive_url: str) -> Tuple[Optional[str], str]:
     
     return None, 'unknown'
 
+@traced('populate_repo.download')
 def download_file_from_google_drive(file_id: str, destination: str) -> bool:
     """
     Download a file from Google Drive using its file ID.
@@ -126,6 +129,7 @@ def save_response_content(response: requests.Response, destination: str) -> None
             if chunk:  # filter out keep-alive new chunks
                 f.write(chunk)
                 downloaded += len(chunk)
+                add_counters(bytes=len(chunk))
                 
                 if total_size:
                     progress = (downloaded / total_size) * 100
@@ -133,6 +137,7 @@ def save_response_content(response: requests.Response, destination: str) -> None
     
     print()  # New line after progress
 
+@traced('populate_repo.extract')
 def extract_and_organize_subset(zip_path: str, base_dir: str) -> Optional[Dict[str, Any]]:
     """
     Extract the downloaded zip file and organize it in the expected structure.
@@ -165,6 +170,7 @@ def extract_and_organize_subset(zip_path: str, base_dir: str) -> Optional[Dict[s
             temp_extract.mkdir(exist_ok=True)
             
             zip_ref.extractall(temp_extract)
+            add_counters(files=len(zip_ref.namelist()), bytes=os.path.getsize(zip_path))
             
             # Find the actual data directory in the extracted files
             extracted_items = list(temp_extract.iterdir())
@@ -261,6 +267,7 @@ def analyze_subset_structure(subset_dir: Path) -> Dict[str, Any]:
     
     return summary
 
+@traced('populate_repo.metadata')
 def create_metadata_from_structure(subset_dir: Path, base_path: Path) -> Optional[Path]:
     """
     Create metadata CSV from the subset directory structure.
@@ -273,6 +280,7 @@ def create_metadata_from_structure(subset_dir: Path, base_path: Path) -> Optiona
     logger.info("Creating metadata from directory structure...")
     
     metadata_records: List[Dict[str, str]] = []
+    wav_paths: List[Path] = []
     
     # Scan all folders and files
     for folder in subset_dir.iterdir():
@@ -302,10 +310,13 @@ def create_metadata_from_structure(subset_dir: Path, base_path: Path) -> Optiona
                             'sex': sex,
                             'dog_id': dog_id
                         })
+                        wav_paths.append(wav_file)
     
     # Create DataFrame and save
     if metadata_records:
-        df = pd.DataFrame(metadata_records)
+        # Duration, sample rate, channels and bit depth from the WAV headers
+        df = add_header_columns(pd.DataFrame(metadata_records), wav_paths)
+        add_counters(rows=len(df))
         
         # Ensure exploration directory exists
         exploration_dir = base_path / "data" / "exploration"
@@ -364,29 +375,28 @@ def create_download_report(base_path: Path, summary: Dict[str, Any], source_info
     logger.info(f"Report saved to: {report_path}")
     return report_path
 
-def main() -> int:
+# Google Drive URL of the pre-created subset - can be either file or folder
+GDRIVE_URL = "https://drive.google.com/file/d/1nbywuZJZBiMv-qktTR--dqhCmxC9Z6CN/view?usp=sharing"
+
+def main(base_dir: str = ".", drive_url: str = GDRIVE_URL) -> int:
     """
     Main function to download and setup subset from Google Drive.
 
+    :param base_dir: Repository/data root to populate
+    :param drive_url: Google Drive sharing URL of the subset
     :return: Exit code (0 for success, 1 for failure)
     """
     
-    # Configuration
-    base_dir = "/Users/nika/Downloads/NMSML"
-    
-    # Google Drive URL - can be either file or folder
-    GDRIVE_URL = "https://drive.google.com/file/d/1nbywuZJZBiMv-qktTR--dqhCmxC9Z6CN/view?usp=sharing"
-    
     try:
         logger.info("DogSpeak Subset Downloader from Google Drive")
         logger.info("=" * 50)
         
         # Extract ID and determine type from URL
-        drive_id, url_type = extract_id_from_url(GDRIVE_URL)
+        drive_id, url_type = extract_id_from_url(drive_url)
         
         if not drive_id:
             logger.error("Could not extract ID from Google Drive URL")
-            logger.error(f"URL provided: {GDRIVE_URL}")
+            logger.error(f"URL provided: {drive_url}")
             return 1
         
         logger.info(f"Drive ID: {drive_id}")
@@ -434,7 +444,7 @@ def main() -> int:
             logger.info("MANUAL DOWNLOAD INSTRUCTIONS for folder:")
             logger.info("=" * 40)
             logger.info("1. Go to the Google Drive folder:")
-            logger.info(f"   {GDRIVE_URL}")
+            logger.info(f"   {drive_url}")
             logger.info("2. Select all files (Ctrl+A or Cmd+A)")
             logger.info("3. Right-click and choose 'Download'")
             logger.info("4. Save the downloaded zip file as 'dogspeak_subset.zip'")
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo Power Analysis
+Estimates how often a study with a given number of dogs per sex and
+recordings per dog would detect the sex and sex x breed effects, before
+committing to another extraction run.
+
+The dog-level and residual variance components and the breed x sex cell
+means are taken from the LME model (feature ~ Sex * Breed + (1 | dog_id))
+fitted to the existing feature table. For every cell of a dogs-per-sex x
+files-per-dog grid, thousands of synthetic datasets are generated from those
+values in vectorized NumPy and tested in closed form: in a balanced design
+where sex and breed vary only between dogs, the random-intercept test of
+these terms is the t/F test on dog means with 2 x breeds x (dogs - 1)
+degrees of freedom, so no model has to be fitted per dataset. Grid cells
+run in a process pool.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.instrumentation import add_counters, traced
+from scripts.report_layout import OUTPUT_DIR
+
+DEFAULT_DOGS_PER_SEX = [5, 10, 15, 20, 30, 40]
+DEFAULT_FILES_PER_DOG = [1, 2, 3, 5, 8]
+DEFAULT_SIMULATIONS = 2000
+DEFAULT_ALPHA = 0.05
+TARGET_POWER = 0.8
+# Samples drawn per simulation batch (bounds memory for large grid cells)
+BATCH_SAMPLES = 4_000_000
+POWER_CSV = 'power_analysis.csv'
+POWER_REPORT = 'power_analysis_report.md'
+JOINT_INTERACTION = 'Sex x Breed (joint)'
+
+
+@dataclass
+class VarianceComponents:
+    """
+    Simulation parameters of one feature.
+
+    cell_means holds the fitted mean of every breed (rows, in model level
+    order; the first is the reference) for female and male (columns).
+    """
+    feature: str
+    breeds: List[str]
+    cell_means: np.ndarray
+    dog_variance: float
+    residual_variance: float
+
+    def terms(self) -> List[str]:
+        """
+        Names of the tested terms, as in the LME summaries.
+
+        :return: Sex term, per-breed interaction terms and the joint interaction test
+        """
+        return (['Sex[T.male]'] + [f'Sex[T.male]:Breed[T.{breed}]' for breed in self.breeds[1:]]
+                + [JOINT_INTERACTION])
+
+
+def fit_variance_components(df_model: pd.DataFrame, features: List[str]) -> List[VarianceComponents]:
+    """
+    Fit feature ~ Sex * Breed + (1 | dog_id) per feature and keep what the simulation needs.
+
+    :param df_model: Model frame (see statistical_analysis.to_model_frame())
+    :param features: Features to fit
+    :return: Variance components of every feature whose model converged
+    """
+    from scripts.balanced_lme import RandomInterceptDesign, fit_random_intercept
+
+    breeds = [str(breed) for breed in df_model['Breed'].cat.categories]
+    design = RandomInterceptDesign.from_frame(df_model)
+    components = []
+    for feature in features:
+        try:
+            result = fit_random_intercept(df_model, feature, design)
+        except Exception as e:
+            print(f"   {feature}: model did not fit ({e}), skipped")
+            continue
+        params = result.fe_params
+        cell_means = np.empty((len(breeds), 2))
+        for b, breed in enumerate(breeds):
+            breed_effect = params.get(f'Breed[T.{breed}]', 0.0)
+            cell_means[b, 0] = params['Intercept'] + breed_effect
+            cell_means[b, 1] = (cell_means[b, 0] + params.get('Sex[T.male]', 0.0)
+                                + params.get(f'Sex[T.male]:Breed[T.{breed}]', 0.0))
+        components.append(VarianceComponents(feature, breeds, cell_means, float(result.cov_re.iloc[0, 0]),
+                                             float(result.scale)))
+        print(f"   {feature}: dog variance {components[-1].dog_variance:.4g}, "
+              f"residual variance {components[-1].residual_variance:.4g}")
+    return components
+
+
+def random_intercept_tests(dog_means: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Closed-form tests of the sex and sex x breed terms on balanced dog means.
+
+    :param dog_means: datasets x breeds x sexes (female, male) x dogs array of per-dog mean values
+    :return: t statistics (datasets x terms, for Sex[T.male] and each interaction with the reference
+             breed), the joint interaction F statistic per dataset, and the residual degrees of freedom
+    """
+    _, n_breeds, _, n_dogs = dog_means.shape
+    cell = dog_means.mean(axis=3)
+    df_resid = 2 * n_breeds * (n_dogs - 1)
+    pooled = ((dog_means - cell[..., None]) ** 2).sum(axis=(1, 2, 3)) / df_resid
+    sex_difference = cell[:, :, 1] - cell[:, :, 0]
+    difference_se = np.sqrt(2.0 * pooled / n_dogs)
+    t = np.empty((dog_means.shape[0], n_breeds))
+    t[:, 0] = sex_difference[:, 0] / difference_se
+    t[:, 1:] = (sex_difference[:, 1:] - sex_difference[:, :1]) / (np.sqrt(2.0) * difference_se[:, None])
+    spread = ((sex_difference - sex_difference.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+    f = spread / max(n_breeds - 1, 1) / difference_se ** 2
+    return t, f, df_resid
+
+
+def simulate_power(components: VarianceComponents, dogs_per_sex: int, files_per_dog: int, n_simulations: int,
+                   alpha: float = DEFAULT_ALPHA, seed: Optional[np.random.SeedSequence] = None) -> Dict[str, float]:
+    """
+    Share of simulated datasets in which each term is significant.
+
+    Every dataset draws a random intercept per dog and a residual per
+    recording around the fitted cell means, for all datasets of a batch at once.
+
+    :param components: Simulation parameters of the feature
+    :param dogs_per_sex: Dogs per breed and sex
+    :param files_per_dog: Recordings per dog
+    :param n_simulations: Number of synthetic datasets
+    :param alpha: Significance level
+    :param seed: Random seed sequence
+    :return: Term name -> power
+    """
+    from scipy import stats
+
+    rng = np.random.default_rng(seed)
+    n_breeds = len(components.breeds)
+    per_dataset = n_breeds * 2 * dogs_per_sex * files_per_dog
+    batch = max(1, BATCH_SAMPLES // per_dataset)
+    rejections = np.zeros(n_breeds + 1)
+    for start in range(0, n_simulations, batch):
+        n = min(batch, n_simulations - start)
+        dogs = rng.normal(0.0, np.sqrt(components.dog_variance), (n, n_breeds, 2, dogs_per_sex))
+        recordings = rng.normal(0.0, np.sqrt(components.residual_variance),
+                                (n, n_breeds, 2, dogs_per_sex, files_per_dog))
+        dog_means = components.cell_means[None, :, :, None] + dogs + recordings.mean(axis=4)
+        t, f, df_resid = random_intercept_tests(dog_means)
+        rejections[:n_breeds] += (2.0 * stats.t.sf(np.abs(t), df_resid) < alpha).sum(axis=0)
+        rejections[n_breeds] += (stats.f.sf(f, n_breeds - 1, df_resid) < alpha).sum()
+    return dict(zip(components.terms(), rejections / n_simulations))
+
+
+def _simulate_cell(task: Tuple[List[VarianceComponents], int, int, int, float, np.random.SeedSequence]
+                   ) -> List[Dict[str, Any]]:
+    """
+    Simulate one grid cell for every feature (top-level for worker processes).
+
+    :param task: (components, dogs_per_sex, files_per_dog, simulations, alpha, seed sequence)
+    :return: One row per feature x term
+    """
+    components, dogs_per_sex, files_per_dog, n_simulations, alpha, seed = task
+    rows = []
+    for feature_components, feature_seed in zip(components, seed.spawn(len(components))):
+        power = simulate_power(feature_components, dogs_per_sex, files_per_dog, n_simulations, alpha, feature_seed)
+        for term, value in power.items():
+            rows.append({'feature': feature_components.feature, 'dogs_per_sex': dogs_per_sex,
+                         'files_per_dog': files_per_dog,
+                         'recordings': 2 * len(feature_components.breeds) * dogs_per_sex * files_per_dog,
+                         'term': term, 'power': value,
+                         'mc_se': float(np.sqrt(value * (1.0 - value) / n_simulations))})
+    return rows
+
+
+@traced('power_analysis')
+def run_power_analysis(input_path: Path, output_dir: Path = OUTPUT_DIR,
+                       dogs_per_sex: List[int] = DEFAULT_DOGS_PER_SEX,
+                       files_per_dog: List[int] = DEFAULT_FILES_PER_DOG,
+                       n_simulations: int = DEFAULT_SIMULATIONS, alpha: float = DEFAULT_ALPHA,
+                       features: Optional[List[str]] = None, seed: int = 42, jobs: int = 1) -> pd.DataFrame:
+    """
+    Estimate power over a study design grid from the variance components of the existing data.
+
+    :param input_path: Feature CSV to fit the variance components on
+    :param output_dir: Directory for the power table and report
+    :param dogs_per_sex: Dogs per breed and sex to evaluate
+    :param files_per_dog: Recordings per dog to evaluate
+    :param n_simulations: Synthetic datasets per grid cell and feature
+    :param alpha: Significance level
+    :param features: Features to evaluate (default: the core acoustic features)
+    :param seed: Random seed
+    :param jobs: Worker processes (grid cells run in parallel)
+    :return: Power table, one row per feature x grid cell x term
+    """
+    from scripts.statistical_analysis import ACOUSTIC_FEATURES, load_features, to_model_frame
+
+    if min(dogs_per_sex) < 2:
+        raise ValueError("dogs_per_sex must be at least 2 to estimate the dog-level variance")
+    _, df_clean = load_features(Path(input_path))
+    add_counters(rows=len(df_clean))
+    print(f"Fitting variance components on {len(df_clean)} recordings from: {input_path}")
+    components = fit_variance_components(to_model_frame(df_clean), features or ACOUSTIC_FEATURES)
+    if not components:
+        raise ValueError("No feature model could be fitted")
+
+    cells = [(dogs, files) for dogs in dogs_per_sex for files in files_per_dog]
+    seeds = np.random.SeedSequence(seed).spawn(len(cells))
+    tasks = [(components, dogs, files, n_simulations, alpha, cell_seed)
+             for (dogs, files), cell_seed in zip(cells, seeds)]
+    print(f"Simulating {n_simulations} datasets x {len(components)} features for {len(cells)} designs "
+          f"({jobs} job(s))")
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_simulate_cell, tasks))
+    else:
+        results = [_simulate_cell(task) for task in tasks]
+
+    table = pd.DataFrame([row for rows in results for row in rows])
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_dir / POWER_CSV, index=False)
+    write_power_report(table, components, output_dir / POWER_REPORT, n_simulations, alpha)
+    print(f"Power table saved to: {output_dir / POWER_CSV}")
+    print(f"Report saved to: {output_dir / POWER_REPORT}")
+    return table
+
+
+def smallest_design(table: pd.DataFrame, target: float = TARGET_POWER) -> Optional[pd.Series]:
+    """
+    Design with the fewest recordings that reaches the target power.
+
+    :param table: Power rows of one feature and term
+    :param target: Required power
+    :return: The row of that design, or None if no design reaches it
+    """
+    reached = table[table['power'] >= target]
+    if reached.empty:
+        return None
+    return reached.sort_values(['recordings', 'dogs_per_sex']).iloc[0]
+
+
+def write_power_report(table: pd.DataFrame, components: List[VarianceComponents], path: Path, n_simulations: int,
+                       alpha: float) -> None:
+    """
+    Write the power grid per feature as a markdown report.
+
+    :param table: Power table from run_power_analysis()
+    :param components: Fitted variance components
+    :param path: Markdown file
+    :param n_simulations: Synthetic datasets per grid cell
+    :param alpha: Significance level
+    :return: None
+    """
+    with open(path, 'w') as md_file:
+        md_file.write("# Power Analysis: Dogs per Sex x Files per Dog\n\n")
+        md_file.write(f"**Simulations:** {n_simulations} synthetic datasets per design, alpha = {alpha}\n\n")
+        md_file.write("Variance components and cell means come from `feature ~ Sex * Breed + (1 | dog_id)` fitted "
+                      "to the current feature table. Power of the sex term (male vs female in the reference "
+                      f"breed, {components[0].breeds[0]}) and of the joint sex x breed interaction test; rows "
+                      "are dogs per sex, columns files per dog.\n\n")
+        for feature_components in components:
+            feature = feature_components.feature
+            rows = table[table['feature'] == feature]
+            md_file.write(f"## {feature}\n\n")
+            md_file.write(f"Dog variance {feature_components.dog_variance:.4g}, residual variance "
+                          f"{feature_components.residual_variance:.4g}\n\n")
+            for term in ['Sex[T.male]', JOINT_INTERACTION]:
+                grid = rows[rows['term'] == term].pivot(index='dogs_per_sex', columns='files_per_dog',
+                                                        values='power')
+                md_file.write(f"### {term}\n\n")
+                md_file.write("| Dogs per sex | " + " | ".join(f"{files} files" for files in grid.columns) + " |\n")
+                md_file.write("|---" * (len(grid.columns) + 1) + "|\n")
+                for dogs, values in grid.iterrows():
+                    md_file.write(f"| {dogs} | " + " | ".join(f"{value:.2f}" for value in values) + " |\n")
+                best = smallest_design(rows[rows['term'] == term])
+                if best is None:
+                    md_file.write(f"\nNo design in the grid reaches {TARGET_POWER:.0%} power.\n\n")
+                else:
+                    md_file.write(f"\nSmallest design with {TARGET_POWER:.0%} power: {best['dogs_per_sex']} dogs "
+                                  f"per sex x {best['files_per_dog']} files per dog "
+                                  f"({best['recordings']} recordings).\n\n")
+
+
+def main() -> int:
+    """
+    Main function to run the power analysis on the feature table.
+
+    :return: Exit code
+    """
+    from scripts.statistical_analysis import INPUT_PATH
+
+    parser = argparse.ArgumentParser(description="Monte Carlo power analysis over dogs per sex x files per dog")
+    parser.add_argument('--input', default=str(INPUT_PATH), help="Feature CSV")
+    parser.add_argument('--output', default=str(OUTPUT_DIR), help="Output directory")
+    parser.add_argument('--dogs-per-sex', type=int, nargs='+', default=DEFAULT_DOGS_PER_SEX)
+    parser.add_argument('--files-per-dog', type=int, nargs='+', default=DEFAULT_FILES_PER_DOG)
+    parser.add_argument('--simulations', type=int, default=DEFAULT_SIMULATIONS)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        run_power_analysis(Path(args.input), Path(args.output), args.dogs_per_sex, args.files_per_dog,
+                           args.simulations, args.alpha, seed=args.seed, jobs=args.jobs)
+    except Exception as e:
+        print(f"Error during power analysis: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
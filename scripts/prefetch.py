@@ -0,0 +1,165 @@
+"""
+Prefetching Read/Compute Pipeline
+Overlaps reading input files with processing them: reader threads load and
+decode upcoming files while the compute workers (processes, or the calling
+thread) analyze the ones already in memory, so neither the disk (often a
+network mount) nor the CPUs wait for the other.
+
+At most `depth` items are read but not yet processed at any time; readers
+block until a slot is freed, which bounds the memory held in decoded buffers
+(backpressure). Reading releases the GIL, so threads are enough to keep
+several reads in flight next to the compute processes.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+# Reader threads and decoded items held in memory by default
+DEFAULT_READERS = 4
+DEFAULT_PREFETCH_DEPTH = 16
+
+
+@dataclass
+class PrefetchStats:
+    """
+    Where the pipeline waited, to tune readers and depth.
+
+    read_seconds: time spent reading (summed over reader threads)
+    starved_seconds: time the compute side waited for the next read item (with
+        compute processes: time a worker was free while no read item was ready)
+    blocked_seconds: time readers waited for a free slot (the queue was full)
+    """
+    read_seconds: float = 0.0
+    starved_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (f"read {self.read_seconds:.1f} s, compute waited {self.starved_seconds:.1f} s for data, "
+                f"readers waited {self.blocked_seconds:.1f} s for queue space")
+
+
+def prefetch_map(read: Callable[[Any], Any], compute: Callable[[Any], Any], items: Sequence[Any],
+                 readers: int = DEFAULT_READERS, workers: int = 1, depth: int = DEFAULT_PREFETCH_DEPTH,
+                 stats: Optional[PrefetchStats] = None) -> Iterator[Tuple[int, Any]]:
+    """
+    Apply compute(read(item)) to every item, reading ahead of the computation.
+
+    :param read: Loads one item (runs in reader threads)
+    :param compute: Processes what read() returned (top-level function when workers > 1)
+    :param items: Items in the order they should be read
+    :param readers: Reader threads
+    :param workers: Compute processes (1 computes in the calling thread)
+    :param depth: Items read but not yet processed at most (raised to workers + 1 so no worker idles)
+    :param stats: Filled in with the waiting times when given
+    :return: (item position, result) pairs, in completion order
+    """
+    stats = stats if stats is not None else PrefetchStats()
+    depth = max(depth, workers + 1)
+    slots = threading.Semaphore(depth)
+    # Read items (or read errors) in the order they finished; None stops the dispatcher
+    ready: 'queue.Queue[Optional[Tuple[int, Any, Optional[BaseException]]]]' = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    results: 'queue.Queue[Tuple[int, Any, Optional[BaseException]]]' = queue.Queue() if pool is not None else ready
+    idle_workers = threading.Semaphore(workers)
+
+    def finished(position: int, future: Future) -> None:
+        if future.cancelled():
+            return
+        slots.release()
+        idle_workers.release()
+        results.put((position, future.result() if future.exception() is None else None, future.exception()))
+
+    def load(position: int, item: Any) -> None:
+        started = time.perf_counter()
+        try:
+            data = read(item)
+        except BaseException as e:
+            ready.put((position, None, e))
+            return
+        finally:
+            with lock:
+                stats.read_seconds += time.perf_counter() - started
+        ready.put((position, data, None))
+
+    def dispatch() -> None:
+        # Hands read items to idle workers, so only a free worker waiting for data counts as starved
+        for _ in range(len(items)):
+            idle_workers.acquire()
+            started = time.perf_counter()
+            entry = ready.get()
+            stats.starved_seconds += time.perf_counter() - started
+            if entry is None or stop.is_set():
+                return
+            position, data, error = entry
+            if error is not None:
+                slots.release()
+                idle_workers.release()
+                results.put(entry)
+                continue
+            pool.submit(compute, data).add_done_callback(lambda future, position=position: finished(position, future))
+
+    def feed(read_pool: ThreadPoolExecutor) -> None:
+        for position, item in enumerate(items):
+            started = time.perf_counter()
+            slots.acquire()
+            stats.blocked_seconds += time.perf_counter() - started
+            if stop.is_set():
+                return
+            read_pool.submit(load, position, item)
+
+    read_pool = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix='prefetch-reader')
+    feeder = threading.Thread(target=feed, args=(read_pool,), daemon=True)
+    feeder.start()
+    dispatcher = threading.Thread(target=dispatch, daemon=True) if pool is not None else None
+    if dispatcher is not None:
+        dispatcher.start()
+    try:
+        for _ in range(len(items)):
+            started = time.perf_counter()
+            position, value, error = results.get()
+            if pool is None:
+                stats.starved_seconds += time.perf_counter() - started
+            if error is not None:
+                if pool is None:
+                    slots.release()
+                raise error
+            if pool is None:
+                value = compute(value)
+                slots.release()
+            yield position, value
+    finally:
+        # Unblock the feeder and the dispatcher and drop what is still queued
+        stop.set()
+        for _ in range(depth):
+            slots.release()
+        feeder.join()
+        if dispatcher is not None:
+            idle_workers.release()
+            ready.put(None)
+            dispatcher.join()
+        read_pool.shutdown(wait=True, cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def prefetch_list(read: Callable[[Any], Any], compute: Callable[[Any], Any], items: Sequence[Any],
+                  **options: Any) -> List[Any]:
+    """
+    prefetch_map() results in item order.
+
+    :param read: Loads one item
+    :param compute: Processes a loaded item
+    :param items: Items
+    :param options: readers, workers, depth and stats (see prefetch_map())
+    :return: Results, one per item
+    """
+    results: List[Any] = [None] * len(items)
+    for position, value in prefetch_map(read, compute, items, **options):
+        results[position] = value
+    return results
@@ -0,0 +1,42 @@
+"""
+Statistical Analysis Report Layout
+Section names and result paths of the analysis report, kept free of heavy
+imports so the pipeline can be built without loading the statistics stack.
+"""
+
+from pathlib import Path
+
+# Output directory for the report, its results store and the figures
+OUTPUT_DIR = Path('data/statistical_analysis')
+REPORT_NAME = 'statistical_analysis_report.md'
+HTML_REPORT_NAME = 'statistical_analysis_report.html'
+RESULTS_DIRNAME = 'results'
+MANIFEST_NAME = 'manifest.json'
+
+# Report sections in document order; each can be produced independently
+SECTIONS = ['overview', 'descriptives', 'assumptions', 'lme', 'effect_sizes', 'figures', 'summary']
+
+# Formats the report can be rendered to from the results store
+REPORT_FORMATS = ['markdown', 'html', 'console']
+
+
+def results_path(section: str, output_dir: Path = OUTPUT_DIR) -> Path:
+    """
+    Directory holding the stored results of one report section.
+
+    :param section: Section name
+    :param output_dir: Analysis output directory
+    :return: Path to the section's results directory
+    """
+    return Path(output_dir) / RESULTS_DIRNAME / section
+
+
+def manifest_path(section: str, output_dir: Path = OUTPUT_DIR) -> Path:
+    """
+    Manifest of one section's stored results (written last, so its presence means the section is complete).
+
+    :param section: Section name
+    :param output_dir: Analysis output directory
+    :return: Path to the manifest
+    """
+    return results_path(section, output_dir) / MANIFEST_NAME
@@ -0,0 +1,309 @@
+"""
+Report Writers
+Markdown, HTML and console output of the analysis report. The section
+renderers in statistical_analysis describe the report with a few block
+elements (headings, lines, bullets, tables, code, images, rules); each
+writer turns them into its format, and ReportWriters sends every element to
+several writers so the report is rendered from the results store in one pass.
+"""
+
+import html
+import re
+import sys
+from typing import List, Optional, Sequence, TextIO
+
+# Inline markdown used by the renderers: **bold**, *italic* and `code`
+INLINE_PATTERNS = [
+    (re.compile(r'\*\*(.+?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'`(.+?)`'), r'<code>\1</code>'),
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'<em>\1</em>'),
+]
+
+HTML_STYLE = """body { font-family: sans-serif; max-width: 70em; margin: 2em auto; line-height: 1.4; }
+table { border-collapse: collapse; margin: 0.5em 0; }
+th, td { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: left; }
+pre { background: #f6f6f6; padding: 0.8em; overflow-x: auto; }
+img { max-width: 100%; }"""
+
+
+class MarkdownWriter:
+    """
+    Writes the report as markdown to a file (console output is the same text on stdout).
+    """
+
+    def __init__(self, file: TextIO):
+        """
+        Write to an open text file.
+
+        :param file: Open text file to write to
+        """
+        self.file = file
+
+    def line(self, text: str = '') -> None:
+        """
+        Write one line of text.
+
+        :param text: Line (inline markdown allowed)
+        :return: None
+        """
+        self.file.write(text + '\n')
+
+    def heading(self, text: str, level: int) -> None:
+        """
+        Write a heading.
+
+        :param text: Heading text
+        :param level: Heading level (1 = top)
+        :return: None
+        """
+        self.line(f"{'#' * level} {text}")
+
+    def bullet(self, text: str, indent: int = 0) -> None:
+        """
+        Write a bullet point.
+
+        :param text: Item text
+        :param indent: Nesting level
+        :return: None
+        """
+        self.line(f"{'   ' * indent}- {text}")
+
+    def numbered(self, number: int, text: str) -> None:
+        """
+        Write a numbered list item.
+
+        :param number: Item number
+        :param text: Item text
+        :return: None
+        """
+        self.line(f"{number}. {text}")
+
+    def table(self, header: Sequence[str], rows: Sequence[Sequence[str]]) -> None:
+        """
+        Write a table.
+
+        :param header: Column names
+        :param rows: Rows of formatted cells
+        :return: None
+        """
+        self.line("| " + " | ".join(header) + " |")
+        self.line("|" + "|".join('-' * (len(cell) + 2) for cell in header) + "|")
+        for row in rows:
+            self.line("| " + " | ".join(row) + " |")
+
+    def code(self, text: str) -> None:
+        """
+        Write a preformatted block.
+
+        :param text: Block contents
+        :return: None
+        """
+        self.line("```")
+        self.line(text)
+        self.line("```")
+
+    def image(self, alt: str, path: str) -> None:
+        """
+        Write an image reference.
+
+        :param alt: Alternative text
+        :param path: Image path relative to the report
+        :return: None
+        """
+        self.line(f"![{alt}]({path})")
+
+    def rule(self, spaced: bool = True) -> None:
+        """
+        Write a horizontal rule.
+
+        :param spaced: Follow it with a blank line
+        :return: None
+        """
+        self.line("---\n" if spaced else "---")
+
+    def close(self) -> None:
+        """
+        Finish the report (nothing to close in markdown).
+
+        :return: None
+        """
+        pass
+
+
+class ConsoleWriter(MarkdownWriter):
+    """
+    Prints the markdown report to stdout.
+    """
+
+    def __init__(self, file: Optional[TextIO] = None):
+        """
+        Write to stdout, or to another stream.
+
+        :param file: Stream to write to (default: stdout)
+        """
+        super().__init__(file or sys.stdout)
+
+
+def inline_html(text: str) -> str:
+    """
+    Escape text for HTML and convert its inline markdown.
+
+    :param text: Markdown text
+    :return: HTML fragment
+    """
+    text = html.escape(text, quote=False)
+    for pattern, replacement in INLINE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class HtmlWriter:
+    """
+    Writes the report as a standalone HTML page.
+    """
+
+    def __init__(self, file: TextIO, title: str = 'Statistical Analysis Report'):
+        """
+        Start the page: doctype, title and style sheet.
+
+        :param file: Open text file to write to
+        :param title: Page title
+        """
+        self.file = file
+        self.open_list: Optional[str] = None
+        self.file.write(f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+                        f"<title>{html.escape(title)}</title>\n<style>\n{HTML_STYLE}\n</style>\n</head>\n<body>\n")
+
+    def _block(self, markup: str, list_tag: Optional[str] = None) -> None:
+        """
+        Write a block element, opening or closing the surrounding list as needed.
+
+        :param markup: HTML of the element
+        :param list_tag: List the element belongs to ("ul", "ol" or None)
+        :return: None
+        """
+        if self.open_list != list_tag:
+            if self.open_list:
+                self.file.write(f"</{self.open_list}>\n")
+            if list_tag:
+                self.file.write(f"<{list_tag}>\n")
+            self.open_list = list_tag
+        self.file.write(markup + '\n')
+
+    def line(self, text: str = '') -> None:
+        """
+        Write one line of text as a paragraph (blank lines only end lists).
+
+        :param text: Line (inline markdown allowed)
+        :return: None
+        """
+        # Blank lines only end lists
+        if text.strip():
+            self._block(f"<p>{inline_html(text)}</p>")
+        elif self.open_list:
+            self._block('')
+
+    def heading(self, text: str, level: int) -> None:
+        """
+        Write a heading.
+
+        :param text: Heading text
+        :param level: Heading level (1 = top)
+        :return: None
+        """
+        self._block(f"<h{level}>{inline_html(text)}</h{level}>")
+
+    def bullet(self, text: str, indent: int = 0) -> None:
+        """
+        Write a bullet point (nesting is flattened).
+
+        :param text: Item text
+        :param indent: Nesting level
+        :return: None
+        """
+        self._block(f"<li>{inline_html(text)}</li>", 'ul')
+
+    def numbered(self, number: int, text: str) -> None:
+        """
+        Write a numbered list item.
+
+        :param number: Item number
+        :param text: Item text
+        :return: None
+        """
+        self._block(f"<li value=\"{number}\">{inline_html(text)}</li>", 'ol')
+
+    def table(self, header: Sequence[str], rows: Sequence[Sequence[str]]) -> None:
+        """
+        Write a table.
+
+        :param header: Column names
+        :param rows: Rows of formatted cells
+        :return: None
+        """
+        head = ''.join(f"<th>{inline_html(cell)}</th>" for cell in header)
+        body = '\n'.join("<tr>" + ''.join(f"<td>{inline_html(cell)}</td>" for cell in row) + "</tr>" for row in rows)
+        self._block(f"<table>\n<thead><tr>{head}</tr></thead>\n<tbody>\n{body}\n</tbody>\n</table>")
+
+    def code(self, text: str) -> None:
+        """
+        Write a preformatted block.
+
+        :param text: Block contents
+        :return: None
+        """
+        self._block(f"<pre>{html.escape(text, quote=False)}</pre>")
+
+    def image(self, alt: str, path: str) -> None:
+        """
+        Write an image.
+
+        :param alt: Alternative text
+        :param path: Image path relative to the report
+        :return: None
+        """
+        self._block(f"<p><img src=\"{html.escape(path)}\" alt=\"{html.escape(alt)}\"></p>")
+
+    def rule(self, spaced: bool = True) -> None:
+        """
+        Write a horizontal rule.
+
+        :param spaced: Ignored (spacing comes from the style sheet)
+        :return: None
+        """
+        self._block("<hr>")
+
+    def close(self) -> None:
+        """
+        Close any open list and the page.
+
+        :return: None
+        """
+        self._block('')
+        self.file.write("</body>\n</html>\n")
+
+
+class ReportWriters:
+    """
+    Sends every report element to each of several writers.
+    """
+
+    def __init__(self, writers: List[object]):
+        """
+        Fan out to several writers.
+
+        :param writers: Writers to send every element to
+        """
+        self.writers = writers
+
+    def __getattr__(self, name: str):
+        """
+        Forward a writer method to every writer.
+
+        :param name: Method name, e.g. "heading"
+        :return: Function calling that method on each writer
+        """
+        def call(*args, **kwargs) -> None:
+            for writer in self.writers:
+                getattr(writer, name)(*args, **kwargs)
+        return call
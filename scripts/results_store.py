@@ -0,0 +1,114 @@
+"""
+Analysis Results Store
+Structured results of every report section (values and tables), persisted
+under <output_dir>/results/<section>/ so the report, dashboards or other
+tools can read them without rerunning the analysis or parsing markdown.
+
+Each section directory holds one file per table (Parquet when pyarrow is
+installed, CSV otherwise) and a manifest.json with the JSON values and the
+table file names. The manifest is written last and atomically, so a section
+whose manifest exists is complete.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts.report_layout import OUTPUT_DIR, SECTIONS, manifest_path, results_path
+
+# Tables are stored as Parquet when an engine is available
+PARQUET_AVAILABLE = find_spec('pyarrow') is not None
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Convert numpy scalars and arrays for json.dump().
+
+    :param value: Value json cannot serialize
+    :return: Serializable equivalent
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot store {type(value).__name__} in the results manifest")
+
+
+@dataclass
+class SectionResults:
+    """
+    Results of one report section: JSON-serializable values and named tables.
+    """
+    section: str
+    values: Dict[str, Any] = field(default_factory=dict)
+    tables: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    created: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+
+    def save(self, output_dir: Path = OUTPUT_DIR) -> Path:
+        """
+        Write the tables and then the manifest.
+
+        :param output_dir: Analysis output directory
+        :return: Path to the manifest
+        """
+        directory = results_path(self.section, output_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        files = {}
+        for name, table in self.tables.items():
+            if PARQUET_AVAILABLE:
+                files[name] = f"{name}.parquet"
+                table.to_parquet(directory / files[name], index=False)
+            else:
+                files[name] = f"{name}.csv"
+                table.to_csv(directory / files[name], index=False)
+            stale = directory / (f"{name}.csv" if PARQUET_AVAILABLE else f"{name}.parquet")
+            stale.unlink(missing_ok=True)
+
+        path = manifest_path(self.section, output_dir)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'section': self.section, 'created': self.created, 'values': self.values, 'tables': files},
+                      f, indent=2, default=_json_default)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, section: str, output_dir: Path = OUTPUT_DIR, tables: Optional[List[str]] = None) -> 'SectionResults':
+        """
+        Read a section's stored results.
+
+        :param section: Section name
+        :param output_dir: Analysis output directory
+        :param tables: Tables to read (default: all)
+        :return: Section results
+        """
+        path = manifest_path(section, output_dir)
+        if not path.exists():
+            raise FileNotFoundError(f"No stored results for section '{section}' in {results_path(section, output_dir)}")
+        with open(path) as f:
+            manifest = json.load(f)
+        loaded = {}
+        for name, filename in manifest['tables'].items():
+            if tables is not None and name not in tables:
+                continue
+            table_path = path.parent / filename
+            loaded[name] = pd.read_parquet(table_path) if filename.endswith('.parquet') else pd.read_csv(table_path)
+        return cls(manifest['section'], manifest['values'], loaded, manifest['created'])
+
+
+def load_results(output_dir: Path = OUTPUT_DIR, sections: List[str] = SECTIONS) -> Dict[str, SectionResults]:
+    """
+    Read the stored results of several sections.
+
+    :param output_dir: Analysis output directory
+    :param sections: Sections to read
+    :return: Dictionary mapping section name to its results
+    """
+    return {section: SectionResults.load(section, output_dir) for section in sections}
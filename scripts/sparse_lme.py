@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Sparse Mixed-Effects Models
+Fits linear mixed models with any number of random-effect terms, such as
+random sex slopes per dog or per breed and crossed dog and breed effects,
+on sparse design matrices.
+
+The model y = X b + Z Lambda u + e with u ~ N(0, sigma^2 I) is fitted by
+penalized least squares as in lme4: for given relative covariance
+parameters theta, the fixed effects and spherical random effects solve
+
+    [ Lambda' Z'Z Lambda + I   Lambda' Z'X ] [u]   [Lambda' Z'y]
+    [ X'Z Lambda               X'X         ] [b] = [X'y        ]
+
+and the REML deviance follows from the determinant of that matrix and the
+penalized residual sum of squares. The system is sparse (one block per
+level of each grouping factor), so it is factorized with a sparse LU
+(SuperLU, in symmetric mode with a fill-reducing ordering computed once per
+model; scipy has no sparse Cholesky) and theta is optimized with Powell's
+derivative-free method. Model matrices are built on the distinct rows of
+the predictors only and expanded sparsely, so memory grows with the number
+of observations plus the number of levels.
+"""
+
+import argparse
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from scripts.balanced_lme import format_summary
+
+DEFAULT_RANDOM_EFFECTS = ['1 | dog_id']
+# Fixed-effect columns solved per block for their covariance (bounds the dense workspace)
+SOLVE_BLOCK = 64
+
+
+@dataclass
+class RandomTerm:
+    """
+    One random-effect term "expression | group" of the model.
+    """
+    expression: str
+    group: str
+    names: List[str]
+    codes: np.ndarray = field(repr=False)
+    levels: int
+    values: np.ndarray = field(repr=False)
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+
+def parse_random_effect(term: str) -> Tuple[str, str]:
+    """
+    Split a random-effect term such as "(1 + Sex | dog_id)".
+
+    :param term: Term with or without parentheses
+    :return: (expression, grouping factor)
+    """
+    parts = term.strip().strip('()').split('|')
+    if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+        raise ValueError(f"Random effect must look like 'expression | group': {term}")
+    return parts[0].strip(), parts[1].strip()
+
+
+def formula_variables(formula: str, data: pd.DataFrame) -> List[str]:
+    """
+    Data columns a right-hand-side formula refers to.
+
+    :param formula: Formula right-hand side
+    :param data: Model frame
+    :return: Column names in order of appearance
+    """
+    from patsy import ModelDesc
+
+    variables = []
+    for term in ModelDesc.from_formula(formula).rhs_termlist:
+        for factor in term.factors:
+            name = factor.name()
+            if name in data.columns and name not in variables:
+                variables.append(name)
+            elif name not in data.columns:
+                for token in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', name):
+                    if token in data.columns and token not in variables:
+                        variables.append(token)
+    return variables
+
+
+def model_matrix(formula: str, data: pd.DataFrame) -> Tuple[sparse.csr_matrix, List[str]]:
+    """
+    Sparse model matrix of a formula, built on the distinct predictor rows only.
+
+    :param formula: Formula right-hand side
+    :param data: Model frame
+    :return: rows x columns sparse matrix and column names
+    """
+    from patsy import dmatrix
+
+    variables = formula_variables(formula, data)
+    if not variables:
+        unique = pd.DataFrame(index=[0])
+        codes = np.zeros(len(data), dtype=np.int64)
+        matrix = dmatrix(formula, unique, return_type='dataframe')
+    else:
+        codes = data.groupby(variables, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+        first_rows = np.unique(codes, return_index=True)[1]
+        unique = data.iloc[first_rows]
+        matrix = dmatrix(formula, unique, return_type='dataframe', NA_action='raise')
+    expanded = sparse.csr_matrix(matrix.to_numpy(dtype=float))[codes]
+    expanded.eliminate_zeros()
+    return expanded, list(matrix.columns)
+
+
+@dataclass
+class SparseMixedResult:
+    """
+    Fitted sparse mixed model, with the attributes the reports read from statsmodels results.
+    """
+    dependent_var: str
+    exog_names: List[str]
+    coefficients: np.ndarray
+    covariance: np.ndarray = field(repr=False)
+    scale: float
+    terms: List[RandomTerm] = field(repr=False)
+    term_covariances: List[np.ndarray] = field(repr=False)
+    nobs: int
+    deviance: float
+    converged: bool
+    dropped: List[str]
+    random_modes: np.ndarray = field(repr=False)
+    method: str = 'REML (sparse)'
+
+    @property
+    def fe_params(self) -> pd.Series:
+        return pd.Series(self.coefficients, index=self.exog_names)
+
+    @property
+    def params(self) -> pd.Series:
+        return self.fe_params
+
+    @property
+    def bse(self) -> pd.Series:
+        return pd.Series(np.sqrt(np.diag(self.covariance)), index=self.exog_names)
+
+    @property
+    def tvalues(self) -> pd.Series:
+        return self.fe_params / self.bse
+
+    @property
+    def pvalues(self) -> pd.Series:
+        from scipy import stats
+
+        return pd.Series(2.0 * stats.norm.sf(np.abs(self.tvalues.to_numpy())), index=self.exog_names)
+
+    @property
+    def llf(self) -> float:
+        return -0.5 * self.deviance
+
+    @property
+    def cov_re(self) -> pd.DataFrame:
+        term = self.terms[0]
+        return pd.DataFrame(self.term_covariances[0], index=term.names, columns=term.names)
+
+    def variance_components(self) -> List[Tuple[str, float]]:
+        """
+        Variances and covariances of every random-effect term.
+
+        :return: (name, value) pairs
+        """
+        rows = []
+        for term, covariance in zip(self.terms, self.term_covariances):
+            for i, name in enumerate(term.names):
+                label = 'Var' if name == 'Intercept' else f'{name} Var'
+                rows.append((f'{term.group} {label}', float(covariance[i, i])))
+            for i in range(term.size):
+                for j in range(i):
+                    rows.append((f'{term.group} {term.names[j]} x {term.names[i]} Cov', float(covariance[i, j])))
+        return rows
+
+    def random_effects(self, term: int = 0) -> pd.DataFrame:
+        """
+        Conditional modes (BLUPs) of one random-effect term.
+
+        :param term: Index of the term
+        :return: levels x term columns DataFrame
+        """
+        offset = sum(t.levels * t.size for t in self.terms[:term])
+        selected = self.terms[term]
+        values = self.random_modes[offset:offset + selected.levels * selected.size]
+        return pd.DataFrame(values.reshape(selected.levels, selected.size), columns=selected.names)
+
+    def summary(self) -> str:
+        """
+        Text summary laid out like the statsmodels MixedLM summary.
+
+        :return: Summary table
+        """
+        sizes = np.bincount(self.terms[0].codes)
+        text = format_summary(self.dependent_var, self.method, self.nobs, sizes[sizes > 0], self.scale,
+                              self.exog_names, self.coefficients, self.bse.to_numpy(),
+                              self.variance_components(), self.converged)
+        if self.dropped:
+            text += f"\nDropped aliased fixed effects: {', '.join(self.dropped)}"
+        return text
+
+
+class SparseMixedModel:
+    """
+    Linear mixed model on sparse design matrices.
+
+    :param data: Model frame
+    :param dependent_var: Response column
+    :param formula: Fixed-effects formula right-hand side
+    :param random_effects: Random-effect terms, e.g. ['1 + Sex | dog_id', '1 | Breed']
+    """
+
+    def __init__(self, data: pd.DataFrame, dependent_var: str, formula: str = "Sex * Breed",
+                 random_effects: Optional[List[str]] = None):
+        random_effects = random_effects or DEFAULT_RANDOM_EFFECTS
+        parsed = [parse_random_effect(term) for term in random_effects]
+        used = [dependent_var] + formula_variables(formula, data)
+        for expression, group in parsed:
+            used += formula_variables(expression, data) + group.split(':')
+        data = data.dropna(subset=list(dict.fromkeys(used)))
+        if data.empty:
+            raise ValueError(f"No complete observations for {dependent_var}")
+
+        self.dependent_var = dependent_var
+        self.y = data[dependent_var].to_numpy(dtype=float)
+        self.nobs = len(self.y)
+        exog, names = model_matrix(formula, data)
+        exog, self.exog_names, self.dropped = self._drop_aliased(exog.tocsc(), names)
+        self.exog = exog
+
+        self.terms = []
+        blocks = []
+        for expression, group in parsed:
+            values, term_names = model_matrix(expression, data)
+            values = values.toarray()
+            codes, uniques = pd.factorize(pd.MultiIndex.from_frame(data[group.split(':')].astype(str))
+                                          if ':' in group else data[group], sort=True)
+            term = RandomTerm(expression, group, term_names, codes, len(uniques), values)
+            self.terms.append(term)
+            q = term.size
+            rows = np.repeat(np.arange(self.nobs), q)
+            columns = (codes[:, None] * q + np.arange(q)).ravel()
+            blocks.append(sparse.csc_matrix((values.ravel(), (rows, columns)), shape=(self.nobs, term.levels * q)))
+        z = sparse.hstack(blocks, format='csc')
+        z.eliminate_zeros()
+
+        # Cross products are all the optimization needs
+        self.ztz = (z.T @ z).tocsc()
+        self.ztx = (z.T @ self.exog).tocsc()
+        self.xtx = (self.exog.T @ self.exog).tocsc()
+        self.zty = z.T @ self.y
+        self.xty = self.exog.T @ self.y
+        self.yty = float(self.y @ self.y)
+        self.n_random = z.shape[1]
+        self._lambda_pattern()
+        self.ordering = None
+
+    @staticmethod
+    def _drop_aliased(exog: sparse.csc_matrix, names: List[str]) -> Tuple[sparse.csc_matrix, List[str], List[str]]:
+        """
+        Drop fixed-effect columns that are linear combinations of earlier ones (e.g. a breed with one sex).
+
+        :param exog: Fixed-effects design
+        :param names: Column names
+        :return: Reduced design, kept names and dropped names
+        """
+        from scipy.linalg import qr
+
+        cross = (exog.T @ exog).toarray()
+        _, r, pivot = qr(cross, pivoting=True)
+        diagonal = np.abs(np.diag(r))
+        rank = int((diagonal > diagonal.max() * 1e-10).sum()) if diagonal.size else 0
+        keep = np.sort(pivot[:rank])
+        dropped = [names[i] for i in sorted(pivot[rank:])]
+        return exog[:, keep], [names[i] for i in keep], dropped
+
+    def _lambda_pattern(self) -> None:
+        """
+        Positions of the theta parameters in the block-diagonal relative covariance factor Lambda.
+
+        :return: None
+        """
+        rows, columns, indices, lower = [], [], [], []
+        offset, theta_offset = 0, 0
+        for term in self.terms:
+            q = term.size
+            triangle = [(r, c) for c in range(q) for r in range(c, q)]
+            base = offset + np.arange(term.levels) * q
+            for t, (r, c) in enumerate(triangle):
+                rows.append(base + r)
+                columns.append(base + c)
+                indices.append(np.full(term.levels, theta_offset + t))
+            lower += [0.0 if r == c else None for r, c in triangle]
+            offset += term.levels * q
+            theta_offset += len(triangle)
+        self.lambda_rows = np.concatenate(rows)
+        self.lambda_columns = np.concatenate(columns)
+        self.lambda_index = np.concatenate(indices)
+        self.theta_bounds = [(bound, None) for bound in lower]
+        self.theta_start = np.array([1.0 if bound == 0.0 else 0.0 for bound in lower])
+
+    def _lambda(self, theta: np.ndarray) -> sparse.csc_matrix:
+        return sparse.csc_matrix((theta[self.lambda_index], (self.lambda_rows, self.lambda_columns)),
+                                 shape=(self.n_random, self.n_random))
+
+    def _solve(self, theta: np.ndarray) -> Tuple[object, np.ndarray, np.ndarray, sparse.csc_matrix]:
+        """
+        Factorize the penalized least-squares system for theta and solve it.
+
+        :param theta: Relative covariance parameters
+        :return: Factorization, solution [u, b], right-hand side and Lambda
+        """
+        from scipy.sparse.linalg import splu
+
+        lam = self._lambda(theta)
+        penalized = lam.T @ self.ztz @ lam + sparse.identity(self.n_random, format='csc')
+        cross = lam.T @ self.ztx
+        system = sparse.bmat([[penalized, cross], [cross.T, self.xtx]], format='csc')
+        rhs = np.concatenate([lam.T @ self.zty, self.xty])
+        if self.ordering is None:
+            # The sparsity pattern does not depend on theta, so the fill-reducing ordering is computed once
+            self.ordering = splu(system, permc_spec='MMD_AT_PLUS_A').perm_c
+            self.inverse_ordering = np.argsort(self.ordering)
+        system = system[self.ordering][:, self.ordering].tocsc()
+        factor = splu(system, permc_spec='NATURAL', diag_pivot_thresh=0.0, options={'SymmetricMode': True})
+        return factor, factor.solve(rhs[self.ordering])[self.inverse_ordering], rhs, lam
+
+    def deviance(self, theta: np.ndarray) -> float:
+        """
+        REML deviance (-2 x restricted log-likelihood) with the fixed effects and scale profiled out.
+
+        :param theta: Relative covariance parameters
+        :return: Deviance
+        """
+        try:
+            factor, solution, rhs, _ = self._solve(theta)
+        except RuntimeError:
+            return np.inf
+        penalized_rss = self.yty - solution @ rhs
+        n_free = self.nobs - self.exog.shape[1]
+        if penalized_rss <= 0:
+            return np.inf
+        log_determinant = np.log(np.abs(factor.U.diagonal())).sum()
+        return float(log_determinant + n_free * (1.0 + np.log(2.0 * np.pi * penalized_rss / n_free)))
+
+    def fit(self) -> SparseMixedResult:
+        """
+        Optimize theta and compute the fixed effects, their covariance and the variance components.
+
+        :return: Fitted model
+        """
+        from scipy.optimize import minimize
+
+        # Derivative-free, as finite-difference gradients of the deviance are too noisy near the optimum
+        optimum = minimize(self.deviance, self.theta_start, method='Powell', bounds=self.theta_bounds,
+                           options={'xtol': 1e-6, 'ftol': 1e-10})
+        theta = optimum.x
+        factor, solution, rhs, lam = self._solve(theta)
+        n_fixed = self.exog.shape[1]
+        scale = (self.yty - solution @ rhs) / (self.nobs - n_fixed)
+        covariance = np.empty((n_fixed, n_fixed))
+        for start in range(0, n_fixed, SOLVE_BLOCK):
+            stop = min(start + SOLVE_BLOCK, n_fixed)
+            unit = np.zeros((self.n_random + n_fixed, stop - start))
+            unit[self.n_random + np.arange(start, stop), np.arange(stop - start)] = 1.0
+            solved = factor.solve(unit[self.ordering])[self.inverse_ordering]
+            covariance[:, start:stop] = scale * solved[self.n_random:]
+
+        term_covariances, theta_offset = [], 0
+        for term in self.terms:
+            q = term.size
+            triangle = [(r, c) for c in range(q) for r in range(c, q)]
+            template = np.zeros((q, q))
+            for t, (r, c) in enumerate(triangle):
+                template[r, c] = theta[theta_offset + t]
+            term_covariances.append(scale * template @ template.T)
+            theta_offset += len(triangle)
+        return SparseMixedResult(self.dependent_var, self.exog_names, solution[self.n_random:], covariance,
+                                 float(scale), self.terms, term_covariances, self.nobs, float(optimum.fun),
+                                 bool(optimum.success), self.dropped, lam @ solution[:self.n_random])
+
+
+def fit_sparse_lme(data: pd.DataFrame, dependent_var: str, formula: str = "Sex * Breed",
+                   random_effects: Optional[List[str]] = None) -> SparseMixedResult:
+    """
+    Fit dependent_var ~ formula + random effects with the sparse engine.
+
+    :param data: Model frame
+    :param dependent_var: Response column
+    :param formula: Fixed-effects formula right-hand side
+    :param random_effects: Random-effect terms (default: a random intercept per dog)
+    :return: Fitted model
+    """
+    return SparseMixedModel(data, dependent_var, formula, random_effects).fit()
+
+
+def main() -> int:
+    """
+    Main function to fit the sparse model to every feature of a feature table.
+
+    :return: Exit code
+    """
+    from scripts.statistical_analysis import INPUT_PATH, analysis_features, load_features, to_model_frame
+
+    parser = argparse.ArgumentParser(description="Fit sparse mixed models to the feature table")
+    parser.add_argument('--input', default=str(INPUT_PATH), help="Feature CSV")
+    parser.add_argument('--formula', default="Sex * Breed", help="Fixed-effects formula right-hand side")
+    parser.add_argument('--random-effects', nargs='+', default=DEFAULT_RANDOM_EFFECTS,
+                        help="Random-effect terms, e.g. '1 + Sex | dog_id' '1 | Breed'")
+    parser.add_argument('--features', nargs='+', default=None, help="Features to fit (default: all)")
+    args = parser.parse_args()
+
+    try:
+        df, df_clean = load_features(Path(args.input))
+        df_model = to_model_frame(df_clean)
+        for feature in args.features or analysis_features(df_clean):
+            start = time.perf_counter()
+            result = fit_sparse_lme(df_model, feature, args.formula, args.random_effects)
+            print(result.summary())
+            print(f"({time.perf_counter() - start:.2f}s)\n")
+    except Exception as e:
+        print(f"Error during sparse model fit: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Subsampling Stability Analysis
+Checks whether the breed-level sex differences depend on which dogs and
+recordings happened to be drawn into the subset.
+
+Many balanced subsets are drawn from an existing feature table (e.g. one
+extracted for every dog of the dataset) with the same rule create_subset uses
+(dogs_per_sex random dogs per breed and sex, files_per_dog random recordings
+per dog), but only as integer row indices: no audio is copied and nothing is
+re-extracted. Cohen's d and the t-test of every breed x feature are computed
+for all draws at once from the gathered rows; optionally the LME interaction
+terms are refitted per draw in a process pool. The report gives the
+distribution of each statistic over the draws.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.instrumentation import add_counters, traced
+from scripts.report_layout import OUTPUT_DIR
+
+DEFAULT_DRAWS = 1000
+DRAW_BATCH = 250
+SIGNIFICANCE_LEVEL = 0.05
+STABILITY_CSV = 'stability_summary.csv'
+STABILITY_REPORT = 'stability_report.md'
+
+
+@dataclass
+class SubsampleDesign:
+    """
+    Rows of a feature table grouped by breed x sex and dog.
+
+    rows_by_dog maps (breed, sex) to a dogs x files matrix of row numbers,
+    padded with -1 for dogs with fewer recordings.
+    """
+    breeds: List[str]
+    rows_by_dog: Dict[Tuple[str, str], np.ndarray]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SubsampleDesign':
+        """
+        Group the rows of a feature table.
+
+        :param df: Feature table with Breed, Sex and dog_id columns (rows numbered 0..n-1)
+        :return: Design
+        """
+        rows_by_dog = {}
+        for (breed, sex), group in df.groupby(['Breed', 'Sex'], sort=True, observed=True):
+            row_numbers = group.index.to_numpy()
+            dogs = [row_numbers[positions] for _, positions in sorted(group.groupby('dog_id', observed=True).indices.items())]
+            matrix = np.full((len(dogs), max(len(rows) for rows in dogs)), -1, dtype=np.int64)
+            for i, rows in enumerate(dogs):
+                matrix[i, :len(rows)] = rows
+            rows_by_dog[(breed, sex)] = matrix
+        return cls(sorted(df['Breed'].unique()), rows_by_dog)
+
+    def is_exhaustive(self, dogs_per_sex: int, files_per_dog: int) -> bool:
+        """
+        Whether every draw would select all rows (so all draws are identical).
+
+        :param dogs_per_sex: Dogs per breed and sex
+        :param files_per_dog: Recordings per dog
+        :return: True if no group has more dogs or recordings than are drawn
+        """
+        return all(matrix.shape[0] <= dogs_per_sex and matrix.shape[1] <= files_per_dog
+                   for matrix in self.rows_by_dog.values())
+
+
+def draw_subsets(design: SubsampleDesign, n_draws: int, dogs_per_sex: int = 10, files_per_dog: int = 3,
+                 seed: int = 42) -> Dict[Tuple[str, str], np.ndarray]:
+    """
+    Draw balanced subsets as row indices.
+
+    Per breed and sex, each draw selects min(dogs_per_sex, dogs) dogs without
+    replacement and min(files_per_dog, recordings) recordings of each selected
+    dog without replacement, via random sort keys for all draws at once.
+
+    :param design: Row grouping of the feature table
+    :param n_draws: Number of subsets
+    :param dogs_per_sex: Dogs per breed and sex
+    :param files_per_dog: Recordings per dog
+    :param seed: Random seed
+    :return: (breed, sex) -> n_draws x (dogs_per_sex * files_per_dog) row indices, -1 where a dog has
+             fewer recordings
+    """
+    rng = np.random.default_rng(seed)
+    draws = {}
+    for group, matrix in design.rows_by_dog.items():
+        n_dogs, max_files = matrix.shape
+        k = min(dogs_per_sex, n_dogs)
+        f = min(files_per_dog, max_files)
+        dogs = np.argsort(rng.random((n_draws, n_dogs)), axis=1)[:, :k]
+        rows = matrix[dogs]
+        # Missing recordings sort last, so a dog with fewer than f recordings contributes all it has
+        keys = np.where(rows >= 0, rng.random(rows.shape), np.inf)
+        picks = np.argsort(keys, axis=2)[:, :, :f]
+        draws[group] = np.take_along_axis(rows, picks, axis=2).reshape(n_draws, k * f)
+    return draws
+
+
+def subset_rows(draws: Dict[Tuple[str, str], np.ndarray], draw: int) -> np.ndarray:
+    """
+    Row indices of one drawn subset.
+
+    :param draws: Result of draw_subsets()
+    :param draw: Draw number
+    :return: Sorted row indices
+    """
+    rows = np.concatenate([indices[draw] for indices in draws.values()])
+    return np.sort(rows[rows >= 0])
+
+
+def _group_moments(values: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Count, mean and sample variance of every feature over the rows of each draw.
+
+    :param values: rows x features values (NaN for undefined)
+    :param indices: draws x rows row indices (-1 for none)
+    :return: draws x features arrays of count, mean and variance (ddof=1)
+    """
+    gathered = values[np.maximum(indices, 0)]
+    present = (indices >= 0)[:, :, None] & ~np.isnan(gathered)
+    gathered = np.where(present, gathered, 0.0)
+    count = present.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = gathered.sum(axis=1) / count
+        variance = (np.where(present, gathered - mean[:, None, :], 0.0) ** 2).sum(axis=1) / (count - 1)
+    return count, mean, variance
+
+
+def effect_size_draws(values: np.ndarray, design: SubsampleDesign,
+                      draws: Dict[Tuple[str, str], np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Cohen's d and the two-sample t-test (female vs male) of every breed and feature in every draw.
+
+    Matches statistical_analysis.cohens_d() and scipy.stats.ttest_ind() on the
+    drawn rows; undefined values are left out per feature as there.
+
+    :param values: rows x features values of the feature table
+    :param design: Row grouping of the feature table
+    :param draws: Result of draw_subsets()
+    :return: 'd', 't', 'p', 'n_female' and 'n_male' arrays of shape draws x breeds x features
+    """
+    from scipy import stats
+
+    n_draws = next(iter(draws.values())).shape[0]
+    shape = (n_draws, len(design.breeds), values.shape[1])
+    result = {name: np.full(shape, np.nan) for name in ['d', 't', 'p', 'n_female', 'n_male']}
+    for b, breed in enumerate(design.breeds):
+        if (breed, 'female') not in draws or (breed, 'male') not in draws:
+            continue
+        for start in range(0, n_draws, DRAW_BATCH):
+            batch = slice(start, start + DRAW_BATCH)
+            n1, m1, v1 = _group_moments(values, draws[(breed, 'female')][batch])
+            n2, m2, v2 = _group_moments(values, draws[(breed, 'male')][batch])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pooled = np.sqrt(((n1 - 1) * v1 + (n2 - 1) * v2) / (n1 + n2 - 2))
+                d = (m1 - m2) / pooled
+                t = d / np.sqrt(1.0 / n1 + 1.0 / n2)
+            defined = (n1 > 1) & (n2 > 1)
+            result['d'][batch, b] = np.where(defined, d, np.nan)
+            result['t'][batch, b] = np.where(defined, t, np.nan)
+            result['p'][batch, b] = np.where(defined, 2.0 * stats.t.sf(np.abs(t), n1 + n2 - 2), np.nan)
+            result['n_female'][batch, b] = n1
+            result['n_male'][batch, b] = n2
+    return result
+
+
+# Model frame shared with the LME worker processes
+_LME_FRAME: Optional[pd.DataFrame] = None
+
+
+def _init_lme_worker(frame: pd.DataFrame) -> None:
+    """
+    Keep the model frame in the worker so each task only sends row indices.
+
+    :param frame: Model frame
+    :return: None
+    """
+    global _LME_FRAME
+    _LME_FRAME = frame
+
+
+def _fit_interactions(task: Tuple[np.ndarray, List[str], List[str]]) -> np.ndarray:
+    """
+    Fit feature ~ Sex * Breed + (1 | dog_id) on one drawn subset (top-level for worker processes).
+
+    :param task: (row indices, features, interaction terms)
+    :return: features x terms interaction coefficients (NaN when a fit fails)
+    """
+    from scripts.balanced_lme import RandomInterceptDesign, fit_random_intercept
+
+    rows, features, terms = task
+    data = _LME_FRAME.iloc[rows]
+    design = RandomInterceptDesign.from_frame(data)
+    coefficients = np.full((len(features), len(terms)), np.nan)
+    for i, feature in enumerate(features):
+        try:
+            result = fit_random_intercept(data, feature, design)
+        except Exception:
+            continue
+        coefficients[i] = [result.params.get(term, np.nan) for term in terms]
+    return coefficients
+
+
+def lme_interaction_draws(df_model: pd.DataFrame, draws: Dict[Tuple[str, str], np.ndarray], features: List[str],
+                          n_draws: int, jobs: int = 1) -> Tuple[List[str], np.ndarray]:
+    """
+    Refit the LME model on the first n_draws subsets and collect the Sex x Breed interaction terms.
+
+    :param df_model: Model frame (see statistical_analysis.to_model_frame())
+    :param draws: Result of draw_subsets()
+    :param features: Features to model
+    :param n_draws: Number of draws to refit
+    :param jobs: Worker processes
+    :return: Interaction term names and a draws x features x terms coefficient array
+    """
+    levels = list(df_model['Breed'].cat.categories)
+    terms = [f"Sex[T.male]:Breed[T.{breed}]" for breed in levels[1:]]
+    tasks = [(subset_rows(draws, draw), features, terms) for draw in range(n_draws)]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_lme_worker, initargs=(df_model,)) as pool:
+            fits = list(pool.map(_fit_interactions, tasks))
+    else:
+        _init_lme_worker(df_model)
+        fits = [_fit_interactions(task) for task in tasks]
+    return terms, np.stack(fits) if fits else np.zeros((0, len(features), len(terms)))
+
+
+def summarize_draws(samples: np.ndarray, observed: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Distribution summary over the first axis (draws).
+
+    :param samples: draws x ... statistic values
+    :param observed: The statistic on the whole table, same shape as one draw
+    :return: Arrays of mean, sd, 2.5/50/97.5 percentiles and the share of draws agreeing in sign with the median
+    """
+    with np.errstate(invalid='ignore'):
+        median = np.nanmedian(samples, axis=0)
+        summary = {
+            'mean': np.nanmean(samples, axis=0),
+            'sd': np.nanstd(samples, axis=0, ddof=1),
+            'ci_low': np.nanpercentile(samples, 2.5, axis=0),
+            'median': median,
+            'ci_high': np.nanpercentile(samples, 97.5, axis=0),
+            'same_sign': np.nanmean(np.sign(samples) == np.sign(median), axis=0),
+        }
+    if observed is not None:
+        summary = {'observed': observed, **summary}
+    return summary
+
+
+@traced('stability')
+def run_stability(input_path: Path, output_dir: Path = OUTPUT_DIR, n_draws: int = DEFAULT_DRAWS,
+                  dogs_per_sex: int = 10, files_per_dog: int = 3, seed: int = 42, lme_draws: int = 0,
+                  lme_features: Optional[List[str]] = None, jobs: int = 1) -> pd.DataFrame:
+    """
+    Draw balanced subsets of a feature table and report how stable the effect sizes are.
+
+    :param input_path: Feature CSV (the larger its pool of dogs and recordings, the more the draws differ)
+    :param output_dir: Directory for the summary CSV and markdown report
+    :param n_draws: Number of subsets
+    :param dogs_per_sex: Dogs per breed and sex in each subset
+    :param files_per_dog: Recordings per dog in each subset
+    :param seed: Random seed
+    :param lme_draws: Also refit the LME model on this many of the subsets (0: effect sizes only)
+    :param lme_features: Features for the LME refits (default: the core acoustic features)
+    :param jobs: Worker processes for the LME refits
+    :return: Summary table, one row per statistic x breed x feature
+    """
+    from scripts.statistical_analysis import ACOUSTIC_FEATURES, analysis_features, load_features, to_model_frame
+
+    _, df_clean = load_features(Path(input_path))
+    df_clean = df_clean.reset_index(drop=True)
+    features = analysis_features(df_clean)
+    values = df_clean[features].to_numpy(dtype=np.float64)
+    design = SubsampleDesign.from_frame(df_clean)
+    add_counters(rows=len(df_clean))
+    print(f"Drawing {n_draws} subsets of {dogs_per_sex} dogs per sex x {files_per_dog} files per dog "
+          f"from {len(df_clean)} recordings ({len(design.breeds)} breeds)")
+    if design.is_exhaustive(dogs_per_sex, files_per_dog):
+        print("WARNING: the table holds no more dogs or recordings than one subset, so all draws are identical; "
+              "lower --dogs-per-sex/--files-per-dog or use a table extracted for more dogs")
+
+    draws = draw_subsets(design, n_draws, dogs_per_sex, files_per_dog, seed)
+    effects = effect_size_draws(values, design, draws)
+    everything = {group: matrix.reshape(1, -1) for group, matrix in design.rows_by_dog.items()}
+    observed = effect_size_draws(values, design, everything)
+
+    rows = []
+    for statistic, samples, reference in [("cohens_d", effects['d'], observed['d'][0]),
+                                          ("t", effects['t'], observed['t'][0])]:
+        summary = summarize_draws(samples, reference)
+        for b, breed in enumerate(design.breeds):
+            for f, feature in enumerate(features):
+                rows.append({'statistic': statistic, 'breed': breed, 'feature': feature,
+                             **{name: float(values_[b, f]) for name, values_ in summary.items()}})
+    with np.errstate(invalid='ignore'):
+        significant = np.nanmean(effects['p'] < SIGNIFICANCE_LEVEL, axis=0)
+    for row in rows:
+        row['significant'] = float(significant[design.breeds.index(row['breed']), features.index(row['feature'])]) \
+            if row['statistic'] == 'cohens_d' else np.nan
+
+    if lme_draws:
+        lme_features = lme_features or ACOUSTIC_FEATURES
+        print(f"Refitting the LME model on {min(lme_draws, n_draws)} subsets ({jobs} job(s))")
+        df_model = to_model_frame(df_clean)
+        terms, coefficients = lme_interaction_draws(df_model, draws, lme_features, min(lme_draws, n_draws), jobs)
+        summary = summarize_draws(coefficients)
+        for f, feature in enumerate(lme_features):
+            for t, term in enumerate(terms):
+                rows.append({'statistic': 'lme_interaction', 'breed': term.split('[T.')[-1].rstrip(']'),
+                             'feature': feature, 'observed': np.nan,
+                             **{name: float(values_[f, t]) for name, values_ in summary.items()},
+                             'significant': np.nan})
+
+    table = pd.DataFrame(rows)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_dir / STABILITY_CSV, index=False)
+    write_stability_report(table, output_dir / STABILITY_REPORT, n_draws, dogs_per_sex, files_per_dog, seed,
+                           min(lme_draws, n_draws))
+    print(f"Summary saved to: {output_dir / STABILITY_CSV}")
+    print(f"Report saved to: {output_dir / STABILITY_REPORT}")
+    return table
+
+
+def write_stability_report(table: pd.DataFrame, path: Path, n_draws: int, dogs_per_sex: int, files_per_dog: int,
+                           seed: int, lme_draws: int) -> None:
+    """
+    Write the stability summary as a markdown report.
+
+    :param table: Summary table from run_stability()
+    :param path: Markdown file
+    :param n_draws: Number of subsets
+    :param dogs_per_sex: Dogs per breed and sex in each subset
+    :param files_per_dog: Recordings per dog in each subset
+    :param seed: Random seed
+    :param lme_draws: Number of subsets the LME model was refitted on
+    :return: None
+    """
+    with open(path, 'w') as md_file:
+        md_file.write("# Subsampling Stability of Sex Differences\n\n")
+        md_file.write(f"**Draws:** {n_draws} balanced subsets of {dogs_per_sex} dogs per sex x {files_per_dog} "
+                      f"files per dog (seed {seed})\n\n")
+        md_file.write("Cohen's d (female vs male) over the draws: observed value on the whole table, median and "
+                      "95% interval, share of draws with the median's sign and share with p < 0.05.\n\n")
+        effects = table[table['statistic'] == 'cohens_d']
+        for breed, rows in effects.groupby('breed', sort=False):
+            md_file.write(f"## {breed.upper()}\n\n")
+            md_file.write("| Feature | Observed d | Median d | 95% interval | Same sign | p < 0.05 |\n")
+            md_file.write("|---------|------------|----------|--------------|-----------|----------|\n")
+            for _, row in rows.iterrows():
+                md_file.write(f"| {row['feature']} | {row['observed']:.3f} | {row['median']:.3f} | "
+                              f"[{row['ci_low']:.3f}, {row['ci_high']:.3f}] | {row['same_sign']:.0%} | "
+                              f"{row['significant']:.0%} |\n")
+            md_file.write("\n")
+
+        interactions = table[table['statistic'] == 'lme_interaction']
+        if len(interactions):
+            md_file.write(f"## LME interaction terms (Male x breed, {lme_draws} draws)\n\n")
+            md_file.write("| Feature | Breed | Median | 95% interval | Same sign |\n")
+            md_file.write("|---------|-------|--------|--------------|-----------|\n")
+            for _, row in interactions.iterrows():
+                md_file.write(f"| {row['feature']} | {row['breed']} | {row['median']:.3f} | "
+                              f"[{row['ci_low']:.3f}, {row['ci_high']:.3f}] | {row['same_sign']:.0%} |\n")
+            md_file.write("\n")
+
+
+def main() -> int:
+    """
+    Main function to run the stability analysis on the feature table.
+
+    :return: Exit code
+    """
+    from scripts.statistical_analysis import INPUT_PATH
+
+    parser = argparse.ArgumentParser(description="Effect size stability over repeated balanced subsampling")
+    parser.add_argument('--input', default=str(INPUT_PATH), help="Feature CSV")
+    parser.add_argument('--output', default=str(OUTPUT_DIR), help="Output directory")
+    parser.add_argument('--draws', type=int, default=DEFAULT_DRAWS)
+    parser.add_argument('--dogs-per-sex', type=int, default=10)
+    parser.add_argument('--files-per-dog', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--lme-draws', type=int, default=0, help="Also refit the LME model on this many draws")
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        run_stability(Path(args.input), Path(args.output), args.draws, args.dogs_per_sex, args.files_per_dog,
+                      args.seed, args.lme_draws, jobs=args.jobs)
+    except Exception as e:
+        print(f"Error during stability analysis: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
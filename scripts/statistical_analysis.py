@@ -1,261 +1,383 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
-from statsmodels.formula.api import mixedlm
 import statsmodels.api as sm
-from scipy.stats import shapiro, levene
+import contextlib
 import warnings
 import os
 from datetime import datetime
 from pathlib import Path
 warnings.filterwarnings('ignore')
-from typing import Optional, TextIO
+from typing import Callable, Dict, List, Optional, Tuple
+from scripts.ingest import read_feature_table
+from scripts.instrumentation import add_counters, trace_stage
+from scripts.assumption_tests import NORMALITY_TESTS, VARIANCE_TESTS, assumption_table
+from scripts.balanced_lme import RandomInterceptDesign, fit_random_intercept
+from scripts.sparse_lme import DEFAULT_RANDOM_EFFECTS, fit_sparse_lme
+from scripts.distribution_plots import compute_distribution_summaries, draw_boxplot, draw_violinplot
+from scripts.report_layout import (HTML_REPORT_NAME, OUTPUT_DIR, REPORT_FORMATS, REPORT_NAME, RESULTS_DIRNAME,
+                                   SECTIONS)
+from scripts.report_render import ConsoleWriter, HtmlWriter, MarkdownWriter, ReportWriters
+from scripts.results_store import SectionResults
 INPUT_PATH = Path('data/features/feature_extraction_results.csv')
-# Create output directory
-OUTPUT_DIR = Path('data/statistical_analysis')
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Initialize markdown file
-md_file_path = OUTPUT_DIR / 'statistical_analysis_report.md'
-md_file = open(md_file_path, 'w')
+ACOUSTIC_FEATURES = ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']
+# Non-feature columns of the feature table
+ID_COLUMNS = ['Folder', 'File', 'Breed', 'Sex', 'dog_id', 'breed_size']
 
-def print_and_write(text: str, file: Optional[TextIO] = None) -> None:
+# Create breed size categories based on typical breed sizes
+breed_sizes = {
+    'chihuahua': 'small',
+    'shiba inu': 'medium',
+    'husky': 'large',
+    'german shepherd': 'large',
+    'pitbull': 'medium-large'
+}
+
+def render_report_header(writer) -> None:
     """
-    Print to console and write to markdown file
+    Write the report header.
 
-    :param text: Text to print and write
-    :param file: Optional file object to write to
+    :param writer: Report writer (see report_render)
     :return: None
     """
-    print(text)
-    if file:
-        file.write(text + '\n')
-
-# Write markdown header
-md_file.write(f"""# Statistical Analysis Report: Vocal Dimorphism in Dog Breeds
-
-**Analysis Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-**Research Question:** Are there differences in the way vocal dimorphism is modulated in different dog breeds?
-
-**Data Source:** DogSpeak_Dataset from HuggingFace (ArlingtonCL2/DogSpeak_Dataset)
-
----
+    writer.heading("Statistical Analysis Report: Vocal Dimorphism in Dog Breeds", 1)
+    writer.line()
+    writer.line(f"**Analysis Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    writer.line()
+    writer.line("**Research Question:** Are there differences in the way vocal dimorphism is modulated in different dog breeds?")
+    writer.line()
+    writer.line("**Data Source:** DogSpeak_Dataset from HuggingFace (ArlingtonCL2/DogSpeak_Dataset)")
+    writer.line()
+    writer.rule()
+
+def load_features(input_path: Path = INPUT_PATH) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load the feature table and derive the cleaned analysis frame.
 
-""")
+    :param input_path: Path to feature_extraction_results.csv
+    :return: Tuple of (raw DataFrame, cleaned DataFrame without rows lacking F0)
+    """
+    # Categorical Breed/Sex/dog_id (parsed from the file name) and float32 features
+    df = read_feature_table(input_path)
+    # Older extractions wrote 0 for undefined measurements
+    df[ACOUSTIC_FEATURES] = df[ACOUSTIC_FEATURES].mask(df[ACOUSTIC_FEATURES] == 0)
 
-# Load the data
-df = pd.read_csv(INPUT_PATH)
+    # Recordings without any voiced frame have no F0
+    df_clean = df.dropna(subset=['F0_mean']).copy()
+    df_clean['breed_size'] = df_clean['Breed'].map(breed_sizes)
+    return df, df_clean
 
-# Data preprocessing
-print_and_write("## Dataset Overview", md_file)
-print_and_write("", md_file)
-print_and_write(f"- **Total samples:** {len(df)}", md_file)
-print_and_write(f"- **Breeds:** {list(df['Breed'].unique())}", md_file)
-print_and_write("", md_file)
-print_and_write("### Sex Distribution", md_file)
-for sex, count in df['Sex'].value_counts().items():
-    print_and_write(f"- {sex}: {count}", md_file)
+def analysis_features(df: pd.DataFrame) -> List[str]:
+    """
+    Features to model: the core acoustic features followed by any further numeric
+    columns in the table (e.g. the feature bank written by the Python extraction).
 
-print_and_write("", md_file)
-print_and_write("### Missing Values", md_file)
-missing_vals = df.isnull().sum()
-if missing_vals.sum() == 0:
-    print_and_write("- No missing values found", md_file)
-else:
-    for col, count in missing_vals.items():
-        if count > 0:
-            print_and_write(f"- {col}: {count}", md_file)
+    :param df: Feature DataFrame
+    :return: Feature column names
+    """
+    extra = [col for col in df.columns
+             if col not in ACOUSTIC_FEATURES and col not in ID_COLUMNS
+             and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().any()]
+    return ACOUSTIC_FEATURES + extra
 
-# Extract dog_id from filename for random effects
-df['dog_id'] = df['File'].str.extract(r'_(\d+)\.wav')[0]
-df['dog_id'] = df['dog_id'].fillna(df['File'].str.extract(r'_dog_(\d+)')[0])
+def to_model_frame(df_clean: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert grouping columns to categoricals for modeling.
 
-# Handle zero values (likely measurement errors)
-zero_f0_count = (df['F0_mean'] == 0).sum()
-print_and_write("", md_file)
-print_and_write(f"**Zero values in F0_mean:** {zero_f0_count}", md_file)
-df_clean = df[df['F0_mean'] > 0].copy()  # Remove rows with F0 = 0
-print_and_write(f"**Samples after removing F0=0:** {len(df_clean)}", md_file)
+    :param df_clean: Cleaned DataFrame
+    :return: Copy with categorical Sex, Breed and dog_id
+    """
+    df_model = df_clean.copy()
+    df_model['Sex'] = df_model['Sex'].astype('category')
+    df_model['Breed'] = df_model['Breed'].astype('category')
+    df_model['dog_id'] = df_model['dog_id'].astype('category')
+    return df_model
 
-# Create breed size categories based on typical breed sizes
-breed_sizes = {
-    'chihuahua': 'small',
-    'shiba inu': 'medium', 
-    'husky': 'large',
-    'german shepherd': 'large',
-    'pitbull': 'medium-large'
-}
+def compute_dataset_overview(df: pd.DataFrame, df_clean: pd.DataFrame) -> SectionResults:
+    """
+    Count samples, missing values and the undefined-F0 filtering.
 
-df_clean['breed_size'] = df_clean['Breed'].map(breed_sizes)
+    :param df: Raw feature DataFrame
+    :param df_clean: Cleaned DataFrame
+    :return: Section results
+    """
+    missing_vals = df.drop(columns=['dog_id']).isnull().sum()
+    return SectionResults('overview', values={
+        'total_samples': len(df),
+        'breeds': [str(breed) for breed in df['Breed'].unique()],
+        'sex_counts': {str(sex): int(count) for sex, count in df['Sex'].value_counts().items()},
+        'missing_values': {col: int(count) for col, count in missing_vals.items() if count > 0},
+        'undefined_f0': int(df['F0_mean'].isna().sum()),
+        'clean_samples': len(df_clean),
+        'breed_size_counts': {str(size): int(count) for size, count in df_clean['breed_size'].value_counts().items()},
+    })
+
+def render_dataset_overview(results: SectionResults, writer) -> None:
+    """
+    Report sample counts, missing values and the undefined-F0 filtering.
 
-print_and_write("", md_file)
-print_and_write("### Breed Size Distribution", md_file)
-for size, count in df_clean['breed_size'].value_counts().items():
-    print_and_write(f"- {size}: {count}", md_file)
+    :param results: Results of compute_dataset_overview()
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    values = results.values
+    writer.heading("Dataset Overview", 2)
+    writer.line()
+    writer.bullet(f"**Total samples:** {values['total_samples']}")
+    writer.bullet(f"**Breeds:** {values['breeds']}")
+    writer.line()
+    writer.heading("Sex Distribution", 3)
+    for sex, count in values['sex_counts'].items():
+        writer.bullet(f"{sex}: {count}")
+
+    writer.line()
+    writer.heading("Missing Values", 3)
+    if not values['missing_values']:
+        writer.bullet("No missing values found")
+    for col, count in values['missing_values'].items():
+        writer.bullet(f"{col}: {count}")
+
+    writer.line()
+    writer.line(f"**Undefined F0_mean (no voiced frames):** {values['undefined_f0']}")
+    writer.line(f"**Samples after removing undefined F0:** {values['clean_samples']}")
+
+    writer.line()
+    writer.heading("Breed Size Distribution", 3)
+    for size, count in values['breed_size_counts'].items():
+        writer.bullet(f"{size}: {count}")
+
+def compute_descriptive_statistics(df_clean: pd.DataFrame) -> SectionResults:
+    """
+    Descriptive statistics by breed and sex.
 
-# Descriptive statistics by breed and sex
-print_and_write("", md_file)
-print_and_write("---\n", md_file)
-print_and_write("## Descriptive Statistics", md_file)
-print_and_write("", md_file)
+    :param df_clean: Cleaned DataFrame
+    :return: Section results with one row per breed x sex and columns such as 'F0_mean_count'
+    """
+    desc_stats = df_clean.groupby(['Breed', 'Sex'], observed=True).agg({
+        'F0_mean': ['count', 'mean', 'std'],
+        'F0_min': ['mean', 'std'],
+        'F0_max': ['mean', 'std'],
+        'F1_mean': ['mean', 'std'],
+        'F2_mean': ['mean', 'std']
+    }).round(2)
+    desc_stats.columns = [f"{feature}_{statistic}" for feature, statistic in desc_stats.columns]
+    return SectionResults('descriptives', tables={'descriptives': desc_stats.reset_index()})
+
+def render_descriptive_statistics(results: SectionResults, writer) -> None:
+    """
+    Report descriptive statistics by breed and sex.
 
-desc_stats = df_clean.groupby(['Breed', 'Sex']).agg({
-    'F0_mean': ['count', 'mean', 'std'],
-    'F0_min': ['mean', 'std'],
-    'F0_max': ['mean', 'std'],
-    'F1_mean': ['mean', 'std'],
-    'F2_mean': ['mean', 'std']
-}).round(2)
+    :param results: Results of compute_descriptive_statistics()
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    desc_stats = results.tables['descriptives'].set_index(['Breed', 'Sex'])
+    desc_stats.columns = pd.MultiIndex.from_tuples([tuple(col.rsplit('_', 1)) for col in desc_stats.columns])
+
+    writer.line()
+    writer.rule()
+    writer.heading("Descriptive Statistics", 2)
+    writer.line()
+    writer.heading("Summary Statistics by Breed and Sex", 3)
+    writer.line()
+    writer.code(str(desc_stats))
+
+def compute_assumption_tests(df_clean: pd.DataFrame, features: Optional[List[str]] = None) -> SectionResults:
+    """
+    Normality and homogeneity-of-variance tests for every feature.
 
-print_and_write("### Summary Statistics by Breed and Sex", md_file)
-print_and_write("", md_file)
-print_and_write("```", md_file)
-print_and_write(str(desc_stats), md_file)
-print_and_write("```", md_file)
+    :param df_clean: Cleaned DataFrame
+    :param features: Features to test (default: analysis_features(df_clean))
+    :return: Section results with the tidy table of every test (see assumption_tests.assumption_table())
+    """
+    features = features if features is not None else analysis_features(df_clean)
+    return SectionResults('assumptions', values={'features': features},
+                          tables={'assumption_tests': assumption_table(df_clean, features)})
 
-# Statistical tests for assumptions
-print_and_write("", md_file)
-print_and_write("---\n", md_file)
-print_and_write("## Assumption Testing", md_file)
-print_and_write("", md_file)
+# Test for normality (Shapiro-Wilk, Anderson-Darling and Jarque-Bera for each group)
+def render_normality_by_group(table: pd.DataFrame, variable: str, writer) -> None:
+    """
+    Report normality of a variable by breed and sex.
 
-# Test for normality (Shapiro-Wilk for each group)
-def test_normality_by_group(data: pd.DataFrame, variable: str, md_file: Optional[TextIO] = None) -> None:
+    :param table: Tidy assumption test table
+    :param variable: Name of the variable
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    rows = table[(table['feature'] == variable) & table['Breed'].notna()]
+    groups = pd.MultiIndex.from_frame(rows[['Breed', 'Sex']].drop_duplicates())
+    results = rows.pivot(index=['Breed', 'Sex'], columns='test', values=['statistic', 'p_value']).reindex(groups)
+
+    writer.heading(f"Normality Test for {variable}", 3)
+    writer.line()
+    writer.table(["Breed", "Sex", "W-statistic", "p-value", "Anderson-Darling A²", "p-value", "Jarque-Bera", "p-value"],
+                 [[breed, sex] + [f"{result[(column, test)]:.3f}" for test in NORMALITY_TESTS
+                                  for column in ['statistic', 'p_value']]
+                  for (breed, sex), result in results.iterrows()])
+
+def render_assumption_tests(results: SectionResults, writer) -> None:
     """
-    Test normality of a variable by breed and sex using Shapiro-Wilk test.
+    Report normality and homogeneity-of-variance tests.
 
-    :param data: DataFrame containing the data
-    :param variable: Name of the variable to test
-    :param md_file: Optional markdown file to write results
+    :param results: Results of compute_assumption_tests()
+    :param writer: Report writer (see report_render)
     :return: None
     """
-    print_and_write(f"### Normality Test for {variable}", md_file)
-    print_and_write("", md_file)
-    print_and_write("| Breed | Sex | W-statistic | p-value |", md_file)
-    print_and_write("|-------|-----|-------------|---------|", md_file)
-    
-    for breed in data['Breed'].unique():
-        for sex in data['Sex'].unique():
-            group_data = data[(data['Breed'] == breed) & (data['Sex'] == sex)][variable]
-            if len(group_data) > 3:  # Need at least 3 samples
-                stat, p = shapiro(group_data)
-                print_and_write(f"| {breed} | {sex} | {stat:.3f} | {p:.3f} |", md_file)
-
-# Test normality for each acoustic feature
-for feature in ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']:
-    test_normality_by_group(df_clean, feature, md_file)
-    print_and_write("", md_file)
-
-# Test for homogeneity of variance (Levene's test)
-print_and_write("### Homogeneity of Variance Tests (Levene's Test)", md_file)
-print_and_write("", md_file)
-print_and_write("| Feature | Levene Statistic | p-value |", md_file)
-print_and_write("|---------|------------------|---------|", md_file)
-
-for feature in ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']:
-    groups = [df_clean[(df_clean['Breed'] == breed) & (df_clean['Sex'] == sex)][feature].values 
-              for breed in df_clean['Breed'].unique() 
-              for sex in df_clean['Sex'].unique()
-              if len(df_clean[(df_clean['Breed'] == breed) & (df_clean['Sex'] == sex)]) > 0]
-    
-    stat, p = levene(*groups)
-    print_and_write(f"| {feature} | {stat:.3f} | {p:.3f} |", md_file)
-
-# Linear Mixed-Effects Models
-print_and_write("", md_file)
-print_and_write("---\n", md_file)
-print_and_write("## Linear Mixed-Effects Models", md_file)
-print_and_write("", md_file)
-print_and_write("**Model Formula:** `feature ~ Sex * Breed + (1 | dog_id)`", md_file)
-print_and_write("", md_file)
-
-# Ensure proper data types
-df_clean['Sex'] = df_clean['Sex'].astype('category')
-df_clean['Breed'] = df_clean['Breed'].astype('category')
-df_clean['dog_id'] = df_clean['dog_id'].astype('category')
-
-# Function to fit and report LME model
-def fit_lme_model(data: pd.DataFrame, dependent_var: str, md_file: Optional[TextIO] = None) -> None:
-    """
-    Fit a linear mixed-effects model and report results.
-    
+    table = results.tables['assumption_tests']
+    features = results.values['features']
+
+    writer.line()
+    writer.rule()
+    writer.heading("Assumption Testing", 2)
+    writer.line()
+
+    # Test normality for each acoustic feature
+    for feature in features:
+        render_normality_by_group(table, feature, writer)
+        writer.line()
+
+    # Test for homogeneity of variance (Brown-Forsythe is scipy's median-centered levene default)
+    variance = table[table['Breed'].isna()].pivot(index='feature', columns='test', values=['statistic', 'p_value'])
+    writer.heading("Homogeneity of Variance Tests (Levene's Test)", 3)
+    writer.line()
+    writer.table(["Feature", "Levene Statistic (median)", "p-value", "Levene Statistic (mean)", "p-value"],
+                 [[feature] + [f"{variance.loc[feature, (column, test)]:.3f}" for test in VARIANCE_TESTS
+                               for column in ['statistic', 'p_value']]
+                  for feature in features])
+
+# Function to fit the LME model
+def fit_lme_model(data: pd.DataFrame, dependent_var: str, design: Optional[RandomInterceptDesign] = None,
+                  engine: str = 'auto', formula: str = "Sex * Breed", random_effects: Optional[List[str]] = None):
+    """
+    Fit a linear mixed-effects model.
+
+    With the 'auto' engine, a random intercept per dog is fitted in closed form when the design is
+    balanced (see balanced_lme) and by statsmodels otherwise; the 'sparse' engine (see sparse_lme)
+    fits any random-effect terms and is used for anything other than the per-dog intercept.
+
     :param data: DataFrame containing the data
     :param dependent_var: Name of the dependent variable
-    :param md_file: Optional markdown file to write results
+    :param design: Dog-level design of data, shared across features (built when None)
+    :param engine: 'auto' or 'sparse'
+    :param formula: Fixed-effects formula right-hand side
+    :param random_effects: Random-effect terms such as '1 + Sex | Breed' (default: '1 | dog_id')
     :return: Fitted model result
     """
-    print_and_write(f"### Model Results: {dependent_var}", md_file)
-    print_and_write("", md_file)
-    
     # Fit the model: feature ~ sex * breed + (1 | dog_id)
-    try:
-        model = mixedlm(f"{dependent_var} ~ Sex * Breed", 
-                       data=data, 
-                       groups=data["dog_id"])
-        result = model.fit()
-        
-        print_and_write("#### Full Model Summary", md_file)
-        print_and_write("```", md_file)
-        print_and_write(str(result.summary()), md_file)
-        print_and_write("```", md_file)
-        
+    random_effects = random_effects or DEFAULT_RANDOM_EFFECTS
+    if engine == 'sparse' or random_effects != DEFAULT_RANDOM_EFFECTS:
+        return fit_sparse_lme(data, dependent_var, formula, random_effects)
+    return fit_random_intercept(data, dependent_var, design, formula)
+
+def compute_lme_models(df_model: pd.DataFrame, features: Optional[List[str]] = None, engine: str = 'auto',
+                       formula: str = "Sex * Breed", random_effects: Optional[List[str]] = None) -> SectionResults:
+    """
+    Fit the linear mixed-effects model for every acoustic feature.
+
+    :param df_model: Model frame with categorical grouping columns
+    :param features: Features to model (default: analysis_features(df_model))
+    :param engine: 'auto' or 'sparse' (see fit_lme_model())
+    :param formula: Fixed-effects formula right-hand side
+    :param random_effects: Random-effect terms (default: '1 | dog_id')
+    :return: Section results with the coefficients and fit summary of every model and the model summaries
+    """
+    random_effects = random_effects or DEFAULT_RANDOM_EFFECTS
+    features = features if features is not None else analysis_features(df_model)
+    closed_form = engine == 'auto' and random_effects == DEFAULT_RANDOM_EFFECTS
+    design = RandomInterceptDesign.from_frame(df_model, formula) if closed_form else None
+
+    coefficients, models, summaries, errors = [], [], {}, {}
+    for feature in features:
+        try:
+            result = fit_lme_model(df_model, feature, design, engine, formula, random_effects)
+        except Exception as e:
+            errors[feature] = str(e)
+            continue
+        terms = result.params.index
+        coefficients.append(pd.DataFrame({
+            'feature': feature, 'term': terms, 'estimate': result.params.to_numpy(dtype=float),
+            'std_error': result.bse.reindex(terms).to_numpy(dtype=float),
+            'p_value': result.pvalues.reindex(terms).to_numpy(dtype=float),
+        }))
+        models.append({'feature': feature, 'nobs': int(result.nobs), 'residual_variance': float(result.scale)})
+        summaries[feature] = str(result.summary())
+
+    coefficient_columns = ['feature', 'term', 'estimate', 'std_error', 'p_value']
+    return SectionResults('lme', values={
+        'features': features, 'engine': engine, 'formula': formula, 'random_effects': random_effects,
+        'summaries': summaries, 'errors': errors,
+    }, tables={
+        'coefficients': pd.concat(coefficients, ignore_index=True) if coefficients
+        else pd.DataFrame(columns=coefficient_columns),
+        'models': pd.DataFrame(models, columns=['feature', 'nobs', 'residual_variance']),
+    })
+
+def render_lme_models(results: SectionResults, writer) -> None:
+    """
+    Report the linear mixed-effects model of every feature.
+
+    :param results: Results of compute_lme_models()
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    values = results.values
+    coefficients = results.tables['coefficients']
+    terms = ' + '.join(f'({term})' for term in values['random_effects'])
+    writer.line()
+    writer.rule()
+    writer.heading("Linear Mixed-Effects Models", 2)
+    writer.line()
+    writer.line(f"**Model Formula:** `feature ~ {values['formula']} + {terms}`")
+    writer.line()
+
+    for feature in values['features']:
+        writer.heading(f"Model Results: {feature}", 3)
+        writer.line()
+        if feature in values['errors']:
+            writer.line(f"**Error fitting model for {feature}:** {values['errors'][feature]}")
+            continue
+
+        writer.heading("Full Model Summary", 4)
+        writer.code(values['summaries'][feature])
+
         # Extract and display key results
-        print_and_write("", md_file)
-        print_and_write("#### Key Results", md_file)
-        print_and_write("", md_file)
-        
+        writer.line()
+        writer.heading("Key Results", 4)
+        writer.line()
+        model = coefficients[coefficients['feature'] == feature].set_index('term')
+
         # Main effects
-        sex_effect = result.params.get('Sex[T.male]', None)
-        if sex_effect is not None:
-            sex_pval = result.pvalues.get('Sex[T.male]', None)
-            print_and_write(f"**Sex effect (male vs female):** {sex_effect:.3f} (p={sex_pval:.3f})", md_file)
-        
-        print_and_write("", md_file)
-        print_and_write("**Breed Effects (vs reference breed):**", md_file)
+        if 'Sex[T.male]' in model.index:
+            sex = model.loc['Sex[T.male]']
+            writer.line(f"**Sex effect (male vs female):** {sex['estimate']:.3f} (p={sex['p_value']:.3f})")
+
+        writer.line()
+        writer.line("**Breed Effects (vs reference breed):**")
         # Breed effects (compared to reference breed)
-        for param in result.params.index:
+        for param, row in model.iterrows():
             if 'Breed[T.' in param and 'Sex[T.male]:' not in param:
                 breed_name = param.replace('Breed[T.', '').replace(']', '')
-                effect = result.params[param]
-                pval = result.pvalues[param]
-                print_and_write(f"- {breed_name}: {effect:.3f} (p={pval:.3f})", md_file)
-        
+                writer.bullet(f"{breed_name}: {row['estimate']:.3f} (p={row['p_value']:.3f})")
+
         # Interaction effects
-        print_and_write("", md_file)
-        print_and_write("**Interaction Effects (Sex × Breed):**", md_file)
-        for param in result.params.index:
+        writer.line()
+        writer.line("**Interaction Effects (Sex × Breed):**")
+        for param, row in model.iterrows():
             if 'Sex[T.male]:Breed[T.' in param:
                 breed_name = param.replace('Sex[T.male]:Breed[T.', '').replace(']', '')
-                effect = result.params[param]
-                pval = result.pvalues[param]
-                print_and_write(f"- Male × {breed_name}: {effect:.3f} (p={pval:.3f})", md_file)
-        
-        print_and_write("", md_file)
-        return result
-        
-    except Exception as e:
-        print_and_write(f"**Error fitting model for {dependent_var}:** {e}", md_file)
-        return None
-
-# Fit models for each acoustic feature
-f0_mean_model = fit_lme_model(df_clean, 'F0_mean', md_file)
-f0_min_model = fit_lme_model(df_clean, 'F0_min', md_file)
-f0_max_model = fit_lme_model(df_clean, 'F0_max', md_file)
-f1_model = fit_lme_model(df_clean, 'F1_mean', md_file) 
-f2_model = fit_lme_model(df_clean, 'F2_mean', md_file)
-
-# Effect size calculations (Cohen's d) for sex differences within each breed
-print_and_write("---\n", md_file)
-print_and_write("## Effect Sizes (Cohen's d) for Sex Differences", md_file)
-print_and_write("", md_file)
+                writer.bullet(f"Male × {breed_name}: {row['estimate']:.3f} (p={row['p_value']:.3f})")
+
+        writer.line()
 
 def cohens_d(group1: pd.Series, group2: pd.Series) -> float:
     """
     Calculate Cohen's d effect size
-    
+
     :param group1: First group data
     :param group2: Second group data
     :return: Cohen's d value
@@ -265,248 +387,432 @@ def cohens_d(group1: pd.Series, group2: pd.Series) -> float:
     pooled_std = np.sqrt(((n1-1)*s1**2 + (n2-1)*s2**2) / (n1+n2-2))
     return (group1.mean() - group2.mean()) / pooled_std
 
-for breed in df_clean['Breed'].unique():
-    print_and_write(f"### {breed.upper()}", md_file)
-    print_and_write("", md_file)
-    print_and_write("| Feature | Cohen's d | t-statistic | p-value |", md_file)
-    print_and_write("|---------|-----------|-------------|---------|", md_file)
-    
-    breed_data = df_clean[df_clean['Breed'] == breed]
-    
-    if len(breed_data[breed_data['Sex'] == 'female']) > 0 and len(breed_data[breed_data['Sex'] == 'male']) > 0:
-        for feature in ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']:
-            female_data = breed_data[breed_data['Sex'] == 'female'][feature]
-            male_data = breed_data[breed_data['Sex'] == 'male'][feature]
-            
-            if len(female_data) > 1 and len(male_data) > 1:
-                d = cohens_d(female_data, male_data)
-                # t-test for significance
-                t_stat, p_val = stats.ttest_ind(female_data, male_data)
-                
-                print_and_write(f"| {feature} | {d:.3f} | {t_stat:.3f} | {p_val:.3f} |", md_file)
-    
-    print_and_write("", md_file)
-
-# Visualization
-print_and_write("---\n", md_file)
-print_and_write("## Visualizations", md_file)
-print_and_write("", md_file)
-
-# Set up the plotting style
-plt.style.use('default')
-sns.set_palette("husl")
-
-# ORIGINAL FIGURE: F0_mean, F1_mean, F2_mean
-fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-fig.suptitle('Vocal Dimorphism Across Dog Breeds - Original Analysis', fontsize=16, fontweight='bold')
-
-features = ['F0_mean', 'F1_mean', 'F2_mean']
-feature_labels = ['Fundamental Frequency (F0 Mean)', 'First Formant (F1)', 'Second Formant (F2)']
-
-for i, (feature, label) in enumerate(zip(features, feature_labels)):
-    # Box plot by breed and sex
-    sns.boxplot(data=df_clean, x='Breed', y=feature, hue='Sex', ax=axes[0, i])
-    axes[0, i].set_title(f'{label} by Breed and Sex')
-    axes[0, i].set_xticklabels(axes[0, i].get_xticklabels(), rotation=45)
-    axes[0, i].legend(title='Sex')
-    
-    # Violin plot showing distributions
-    sns.violinplot(data=df_clean, x='Breed', y=feature, hue='Sex', ax=axes[1, i])
-    axes[1, i].set_title(f'{label} Distribution by Breed and Sex')
-    axes[1, i].set_xticklabels(axes[1, i].get_xticklabels(), rotation=45)
-    axes[1, i].legend(title='Sex')
-
-plt.tight_layout()
-plot1_path = OUTPUT_DIR / 'vocal_dimorphism_analysis.png'
-plt.savefig(plot1_path, dpi=300, bbox_inches='tight')
-
-print_and_write(f"![Vocal Dimorphism Analysis]({os.path.basename(plot1_path)})", md_file)
-print_and_write("", md_file)
-print_and_write("*Figure 1: Box plots (top row) and violin plots (bottom row) showing the distribution of acoustic features by breed and sex.*", md_file)
-print_and_write("", md_file)
-
-# NEW FIGURE: F0 measures (Mean, Min, Max)
-fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-fig.suptitle('F0 (Fundamental Frequency) Analysis Across Dog Breeds', fontsize=16, fontweight='bold')
-
-f0_features = ['F0_mean', 'F0_min', 'F0_max']
-f0_labels = ['F0 Mean', 'F0 Minimum', 'F0 Maximum']
-
-for i, (feature, label) in enumerate(zip(f0_features, f0_labels)):
-    # Box plot by breed and sex
-    sns.boxplot(data=df_clean, x='Breed', y=feature, hue='Sex', ax=axes[0, i])
-    axes[0, i].set_title(f'{label} by Breed and Sex')
-    axes[0, i].set_xticklabels(axes[0, i].get_xticklabels(), rotation=45)
-    axes[0, i].legend(title='Sex')
-    axes[0, i].set_ylabel('Frequency (Hz)')
-    
-    # Violin plot showing distributions
-    sns.violinplot(data=df_clean, x='Breed', y=feature, hue='Sex', ax=axes[1, i])
-    axes[1, i].set_title(f'{label} Distribution by Breed and Sex')
-    axes[1, i].set_xticklabels(axes[1, i].get_xticklabels(), rotation=45)
-    axes[1, i].legend(title='Sex')
-    axes[1, i].set_ylabel('Frequency (Hz)')
-
-plt.tight_layout()
-plot3_path = OUTPUT_DIR / 'f0_analysis_complete.png'
-plt.savefig(plot3_path, dpi=300, bbox_inches='tight')
-
-print_and_write(f"![F0 Analysis Complete]({os.path.basename(plot3_path)})", md_file)
-print_and_write("", md_file)
-print_and_write("*Figure 3: Box plots (top row) and violin plots (bottom row) showing all F0 measures (mean, minimum, maximum) by breed and sex. This provides a comprehensive view of fundamental frequency patterns.*", md_file)
-print_and_write("", md_file)
-
-# UPDATED EFFECT SIZE HEATMAP: Include all F0 measures
-fig, ax = plt.subplots(1, 1, figsize=(14, 8))
-
-effect_sizes = []
-breeds_list = []
-features_list = []
-
-for breed in df_clean['Breed'].unique():
-    breed_data = df_clean[df_clean['Breed'] == breed]
-    
-    if len(breed_data[breed_data['Sex'] == 'female']) > 0 and len(breed_data[breed_data['Sex'] == 'male']) > 0:
-        for feature in ['F0_mean', 'F0_min', 'F0_max', 'F1_mean', 'F2_mean']:
-            female_data = breed_data[breed_data['Sex'] == 'female'][feature]
-            male_data = breed_data[breed_data['Sex'] == 'male'][feature]
-            
-            if len(female_data) > 1 and len(male_data) > 1:
-                d = cohens_d(female_data, male_data)
-                effect_sizes.append(d)
-                breeds_list.append(breed)
-                features_list.append(feature)
-
-# Create effect size dataframe
-effect_df = pd.DataFrame({
-    'Breed': breeds_list,
-    'Feature': features_list,
-    'Effect_Size': effect_sizes
-})
-
-# Pivot for heatmap
-effect_pivot = effect_df.pivot(index='Breed', columns='Feature', values='Effect_Size')
-
-# Create heatmap with better formatting for more features
-sns.heatmap(effect_pivot, annot=True, cmap='RdBu_r', center=0, 
-            cbar_kws={'label': "Cohen's d (Female - Male)"}, ax=ax,
-            fmt='.2f', square=True)
-ax.set_title("Effect Sizes for Sex Differences Across Breeds and Features", fontweight='bold')
-ax.set_xlabel('Acoustic Features')
-ax.set_ylabel('Dog Breeds')
-plt.xticks(rotation=45)
-plt.yticks(rotation=0)
-plt.tight_layout()
-plot2_path = OUTPUT_DIR / 'effect_sizes_heatmap_complete.png'
-plt.savefig(plot2_path, dpi=300, bbox_inches='tight')
-
-print_and_write(f"![Effect Sizes Heatmap Complete]({os.path.basename(plot2_path)})", md_file)
-print_and_write("", md_file)
-print_and_write("*Figure 2: Heatmap showing Cohen's d effect sizes for sex differences across breeds and all acoustic features. Positive values indicate females have higher values than males.*", md_file)
-print_and_write("", md_file)
-
-# F0 RANGE ANALYSIS: Additional insight
-print_and_write("### F0 Range Analysis", md_file)
-print_and_write("", md_file)
-print_and_write("Understanding F0 range (F0_max - F0_min) can provide insights into vocal flexibility:", md_file)
-print_and_write("", md_file)
-
-# Calculate F0 range
-df_clean['F0_range'] = df_clean['F0_max'] - df_clean['F0_min']
-
-# F0 Range by breed and sex
-print_and_write("| Breed | Sex | Mean F0 Range (Hz) | Std F0 Range |", md_file)
-print_and_write("|-------|-----|-------------------|--------------|", md_file)
-
-for breed in sorted(df_clean['Breed'].unique()):
-    for sex in ['female', 'male']:
-        breed_sex_data = df_clean[(df_clean['Breed'] == breed) & (df_clean['Sex'] == sex)]
-        if len(breed_sex_data) > 0:
-            mean_range = breed_sex_data['F0_range'].mean()
-            std_range = breed_sex_data['F0_range'].std()
-            print_and_write(f"| {breed} | {sex} | {mean_range:.1f} | {std_range:.1f} |", md_file)
-
-print_and_write("", md_file)
-
-# F0 Range visualization
-fig, axes = plt.subplots(1, 2, figsize=(16, 6))
-fig.suptitle('F0 Range Analysis Across Dog Breeds', fontsize=16, fontweight='bold')
-
-# Box plot for F0 range
-sns.boxplot(data=df_clean, x='Breed', y='F0_range', hue='Sex', ax=axes[0])
-axes[0].set_title('F0 Range by Breed and Sex')
-axes[0].set_xticklabels(axes[0].get_xticklabels(), rotation=45)
-axes[0].set_ylabel('F0 Range (Hz)')
-axes[0].legend(title='Sex')
-
-# Scatter plot: F0 mean vs F0 range
-sns.scatterplot(data=df_clean, x='F0_mean', y='F0_range', hue='Sex', style='Breed', ax=axes[1], alpha=0.7)
-axes[1].set_title('F0 Mean vs F0 Range')
-axes[1].set_xlabel('F0 Mean (Hz)')
-axes[1].set_ylabel('F0 Range (Hz)')
-
-plt.tight_layout()
-plot4_path = OUTPUT_DIR / 'f0_range_analysis.png'
-plt.savefig(plot4_path, dpi=300, bbox_inches='tight')
-
-print_and_write(f"![F0 Range Analysis]({os.path.basename(plot4_path)})", md_file)
-print_and_write("", md_file)
-print_and_write("*Figure 4: F0 range analysis showing vocal flexibility. Left: F0 range by breed and sex. Right: Relationship between F0 mean and range.*", md_file)
-print_and_write("", md_file)
-
-# Summary and interpretation
-print_and_write("---\n", md_file)
-print_and_write("## Summary and Interpretation", md_file)
-print_and_write("", md_file)
-
-print_and_write("### Research Hypotheses Testing", md_file)
-print_and_write("", md_file)
-print_and_write("1. **Males will show lower F0 and Formant frequencies than females:**", md_file)
-print_and_write("   - Check the sign of Sex[T.male] coefficients in the models above", md_file)
-print_and_write("   - Negative coefficients support this hypothesis", md_file)
-print_and_write("", md_file)
-print_and_write("2. **Larger breeds will show larger acoustic differences:**", md_file)
-print_and_write("   - Compare effect sizes (Cohen's d) across breeds", md_file)
-print_and_write("   - Larger breeds (German Shepherd, Husky) should show larger effects", md_file)
-print_and_write("", md_file)
-print_and_write("3. **Small breeds will show smaller or no differences:**", md_file)
-print_and_write("   - Chihuahua should show smaller effect sizes", md_file)
-print_and_write("   - Look for non-significant interactions in small breeds", md_file)
-print_and_write("", md_file)
-print_and_write("4. **F0 range may show different patterns than mean F0:**", md_file)
-print_and_write("   - F0 range reflects vocal flexibility and dynamic range", md_file)
-print_and_write("   - May vary independently of average F0 values", md_file)
-print_and_write("", md_file)
-
-print_and_write("### Interpretation Guidelines", md_file)
-print_and_write("", md_file)
-print_and_write("- **Cohen's d:** 0.2 = small, 0.5 = medium, 0.8 = large effect", md_file)
-print_and_write("- **p < 0.05** indicates statistical significance", md_file)
-print_and_write("- **Interaction effects** show breed-specific sex differences", md_file)
-print_and_write("- **F0_min:** Lowest fundamental frequency in the vocalization", md_file)
-print_and_write("- **F0_max:** Highest fundamental frequency in the vocalization", md_file)
-print_and_write("- **F0_range:** F0_max - F0_min, indicates vocal flexibility", md_file)
-print_and_write("", md_file)
-
-print_and_write("### Model Specification", md_file)
-print_and_write("", md_file)
-print_and_write("The Linear Mixed-Effects Models account for:", md_file)
-print_and_write("- **Fixed effects:** Sex, Breed, and their interaction", md_file)
-print_and_write("- **Random effects:** Individual dog variation (dog_id)", md_file)
-print_and_write("- **Separate models** for F0_mean, F0_min, F0_max, F1_mean, and F2_mean", md_file)
-print_and_write("", md_file)
-
-print_and_write("---", md_file)
-print_and_write("", md_file)
-print_and_write("**Analysis completed successfully!** All results, figures, and this report have been saved to the `data/statistical_analysis/` directory.", md_file)
-
-# Close the markdown file
-md_file.close()
-
-print(f"\nAnalysis complete! All output saved to: {OUTPUT_DIR}")
-print(f"- Markdown report: {md_file_path}")
-print(f"- Figures:")
-print(f"  * Original analysis: {OUTPUT_DIR / 'vocal_dimorphism_analysis.png'}")
-print(f"  * Complete F0 analysis: {OUTPUT_DIR / 'f0_analysis_complete.png'}")
-print(f"  * Complete effect sizes: {OUTPUT_DIR / 'effect_sizes_heatmap_complete.png'}")
-print(f"  * F0 range analysis: {OUTPUT_DIR / 'f0_range_analysis.png'}")
\ No newline at end of file
+def compute_effect_sizes(df_model: pd.DataFrame, features: Optional[List[str]] = None) -> SectionResults:
+    """
+    Cohen's d and t-tests for sex differences within each breed.
+
+    :param df_model: Model frame with categorical grouping columns
+    :param features: Features to test (default: analysis_features(df_model))
+    :return: Section results with one row per breed x feature
+    """
+    features = features if features is not None else analysis_features(df_model)
+    breeds = [str(breed) for breed in df_model['Breed'].unique()]
+    rows = []
+    for breed in breeds:
+        breed_data = df_model[df_model['Breed'] == breed]
+
+        if len(breed_data[breed_data['Sex'] == 'female']) > 0 and len(breed_data[breed_data['Sex'] == 'male']) > 0:
+            for feature in features:
+                female_data = breed_data[breed_data['Sex'] == 'female'][feature].dropna()
+                male_data = breed_data[breed_data['Sex'] == 'male'][feature].dropna()
+
+                if len(female_data) > 1 and len(male_data) > 1:
+                    d = cohens_d(female_data, male_data)
+                    # t-test for significance
+                    t_stat, p_val = stats.ttest_ind(female_data, male_data)
+                    rows.append({'Breed': breed, 'feature': feature, 'cohens_d': d,
+                                 't_statistic': t_stat, 'p_value': p_val})
+
+    return SectionResults('effect_sizes', values={'breeds': breeds, 'features': features}, tables={
+        'effect_sizes': pd.DataFrame(rows, columns=['Breed', 'feature', 'cohens_d', 't_statistic', 'p_value']),
+    })
+
+def render_effect_sizes(results: SectionResults, writer) -> None:
+    """
+    Report Cohen's d and t-tests for sex differences within each breed.
+
+    :param results: Results of compute_effect_sizes()
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    effect_sizes = results.tables['effect_sizes']
+    writer.rule()
+    writer.heading("Effect Sizes (Cohen's d) for Sex Differences", 2)
+    writer.line()
+
+    for breed in results.values['breeds']:
+        writer.heading(breed.upper(), 3)
+        writer.line()
+        writer.table(["Feature", "Cohen's d", "t-statistic", "p-value"],
+                     [[row.feature, f"{row.cohens_d:.3f}", f"{row.t_statistic:.3f}", f"{row.p_value:.3f}"]
+                      for row in effect_sizes[effect_sizes['Breed'] == breed].itertuples()])
+        writer.line()
+
+def compute_visualizations(df_model: pd.DataFrame, output_dir: Path = OUTPUT_DIR) -> SectionResults:
+    """
+    Draw all figures and compute the F0 range table.
+
+    :param df_model: Model frame with categorical grouping columns
+    :param output_dir: Directory to save the figures to
+    :return: Section results with the figure file names and the F0 range by breed and sex
+    """
+    df_clean = df_model.copy()
+
+    # Set up the plotting style
+    plt.style.use('default')
+    sns.set_palette("husl")
+
+    # ORIGINAL FIGURE: F0_mean, F1_mean, F2_mean
+    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    fig.suptitle('Vocal Dimorphism Across Dog Breeds - Original Analysis', fontsize=16, fontweight='bold')
+
+    features = ['F0_mean', 'F1_mean', 'F2_mean']
+    feature_labels = ['Fundamental Frequency (F0 Mean)', 'First Formant (F1)', 'Second Formant (F2)']
+
+    # Quantiles and KDE grids for every plotted feature, computed once per (breed, sex)
+    distribution_summaries = compute_distribution_summaries(
+        df_clean, ACOUSTIC_FEATURES, x='Breed', hue='Sex'
+    )
+
+    for i, (feature, label) in enumerate(zip(features, feature_labels)):
+        # Box plot by breed and sex
+        draw_boxplot(axes[0, i], distribution_summaries[feature])
+        axes[0, i].set_title(f'{label} by Breed and Sex')
+        axes[0, i].set_xticklabels(axes[0, i].get_xticklabels(), rotation=45)
+        axes[0, i].legend(title='Sex')
+
+        # Violin plot showing distributions
+        draw_violinplot(axes[1, i], distribution_summaries[feature])
+        axes[1, i].set_title(f'{label} Distribution by Breed and Sex')
+        axes[1, i].set_xticklabels(axes[1, i].get_xticklabels(), rotation=45)
+        axes[1, i].legend(title='Sex')
+
+    plt.tight_layout()
+    plot1_path = output_dir / 'vocal_dimorphism_analysis.png'
+    plt.savefig(plot1_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    # NEW FIGURE: F0 measures (Mean, Min, Max)
+    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    fig.suptitle('F0 (Fundamental Frequency) Analysis Across Dog Breeds', fontsize=16, fontweight='bold')
+
+    f0_features = ['F0_mean', 'F0_min', 'F0_max']
+    f0_labels = ['F0 Mean', 'F0 Minimum', 'F0 Maximum']
+
+    for i, (feature, label) in enumerate(zip(f0_features, f0_labels)):
+        # Box plot by breed and sex
+        draw_boxplot(axes[0, i], distribution_summaries[feature])
+        axes[0, i].set_title(f'{label} by Breed and Sex')
+        axes[0, i].set_xticklabels(axes[0, i].get_xticklabels(), rotation=45)
+        axes[0, i].legend(title='Sex')
+        axes[0, i].set_ylabel('Frequency (Hz)')
+
+        # Violin plot showing distributions
+        draw_violinplot(axes[1, i], distribution_summaries[feature])
+        axes[1, i].set_title(f'{label} Distribution by Breed and Sex')
+        axes[1, i].set_xticklabels(axes[1, i].get_xticklabels(), rotation=45)
+        axes[1, i].legend(title='Sex')
+        axes[1, i].set_ylabel('Frequency (Hz)')
+
+    plt.tight_layout()
+    plot3_path = output_dir / 'f0_analysis_complete.png'
+    plt.savefig(plot3_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    # UPDATED EFFECT SIZE HEATMAP: Include all F0 measures
+    fig, ax = plt.subplots(1, 1, figsize=(14, 8))
+
+    effect_sizes = []
+    breeds_list = []
+    features_list = []
+
+    for breed in df_clean['Breed'].unique():
+        breed_data = df_clean[df_clean['Breed'] == breed]
+
+        if len(breed_data[breed_data['Sex'] == 'female']) > 0 and len(breed_data[breed_data['Sex'] == 'male']) > 0:
+            for feature in ACOUSTIC_FEATURES:
+                female_data = breed_data[breed_data['Sex'] == 'female'][feature].dropna()
+                male_data = breed_data[breed_data['Sex'] == 'male'][feature].dropna()
+
+                if len(female_data) > 1 and len(male_data) > 1:
+                    d = cohens_d(female_data, male_data)
+                    effect_sizes.append(d)
+                    breeds_list.append(breed)
+                    features_list.append(feature)
+
+    # Create effect size dataframe
+    effect_df = pd.DataFrame({
+        'Breed': breeds_list,
+        'Feature': features_list,
+        'Effect_Size': effect_sizes
+    })
+
+    # Pivot for heatmap
+    effect_pivot = effect_df.pivot(index='Breed', columns='Feature', values='Effect_Size')
+
+    # Create heatmap with better formatting for more features
+    sns.heatmap(effect_pivot, annot=True, cmap='RdBu_r', center=0,
+                cbar_kws={'label': "Cohen's d (Female - Male)"}, ax=ax,
+                fmt='.2f', square=True)
+    ax.set_title("Effect Sizes for Sex Differences Across Breeds and Features", fontweight='bold')
+    ax.set_xlabel('Acoustic Features')
+    ax.set_ylabel('Dog Breeds')
+    plt.xticks(rotation=45)
+    plt.yticks(rotation=0)
+    plt.tight_layout()
+    plot2_path = output_dir / 'effect_sizes_heatmap_complete.png'
+    plt.savefig(plot2_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    # F0 RANGE ANALYSIS: Additional insight
+    df_clean['F0_range'] = df_clean['F0_max'] - df_clean['F0_min']
+
+    # F0 Range by breed and sex
+    f0_range = []
+    for breed in sorted(df_clean['Breed'].unique()):
+        for sex in ['female', 'male']:
+            breed_sex_data = df_clean[(df_clean['Breed'] == breed) & (df_clean['Sex'] == sex)]
+            if len(breed_sex_data) > 0:
+                f0_range.append({'Breed': breed, 'Sex': sex, 'mean_range': breed_sex_data['F0_range'].mean(),
+                                 'std_range': breed_sex_data['F0_range'].std()})
+
+    # F0 Range visualization
+    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    fig.suptitle('F0 Range Analysis Across Dog Breeds', fontsize=16, fontweight='bold')
+
+    # Box plot for F0 range
+    draw_boxplot(axes[0], compute_distribution_summaries(df_clean, ['F0_range'])['F0_range'])
+    axes[0].set_title('F0 Range by Breed and Sex')
+    axes[0].set_xticklabels(axes[0].get_xticklabels(), rotation=45)
+    axes[0].set_ylabel('F0 Range (Hz)')
+    axes[0].legend(title='Sex')
+
+    # Scatter plot: F0 mean vs F0 range
+    sns.scatterplot(data=df_clean, x='F0_mean', y='F0_range', hue='Sex', style='Breed', ax=axes[1], alpha=0.7)
+    axes[1].set_title('F0 Mean vs F0 Range')
+    axes[1].set_xlabel('F0 Mean (Hz)')
+    axes[1].set_ylabel('F0 Range (Hz)')
+
+    plt.tight_layout()
+    plot4_path = output_dir / 'f0_range_analysis.png'
+    plt.savefig(plot4_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    figures = {'dimorphism': plot1_path, 'f0': plot3_path, 'effect_sizes': plot2_path, 'f0_range': plot4_path}
+    return SectionResults('figures', values={'figures': {name: os.path.basename(path) for name, path in figures.items()}},
+                          tables={'f0_range': pd.DataFrame(f0_range, columns=['Breed', 'Sex', 'mean_range', 'std_range'])})
+
+def render_visualizations(results: SectionResults, writer) -> None:
+    """
+    Report the figures and the F0 range table.
+
+    :param results: Results of compute_visualizations()
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    figures = results.values['figures']
+    writer.rule()
+    writer.heading("Visualizations", 2)
+    writer.line()
+
+    writer.image("Vocal Dimorphism Analysis", figures['dimorphism'])
+    writer.line()
+    writer.line("*Figure 1: Box plots (top row) and violin plots (bottom row) showing the distribution of acoustic features by breed and sex.*")
+    writer.line()
+
+    writer.image("F0 Analysis Complete", figures['f0'])
+    writer.line()
+    writer.line("*Figure 3: Box plots (top row) and violin plots (bottom row) showing all F0 measures (mean, minimum, maximum) by breed and sex. This provides a comprehensive view of fundamental frequency patterns.*")
+    writer.line()
+
+    writer.image("Effect Sizes Heatmap Complete", figures['effect_sizes'])
+    writer.line()
+    writer.line("*Figure 2: Heatmap showing Cohen's d effect sizes for sex differences across breeds and all acoustic features. Positive values indicate females have higher values than males.*")
+    writer.line()
+
+    writer.heading("F0 Range Analysis", 3)
+    writer.line()
+    writer.line("Understanding F0 range (F0_max - F0_min) can provide insights into vocal flexibility:")
+    writer.line()
+    writer.table(["Breed", "Sex", "Mean F0 Range (Hz)", "Std F0 Range"],
+                 [[row.Breed, row.Sex, f"{row.mean_range:.1f}", f"{row.std_range:.1f}"]
+                  for row in results.tables['f0_range'].itertuples()])
+    writer.line()
+
+    writer.image("F0 Range Analysis", figures['f0_range'])
+    writer.line()
+    writer.line("*Figure 4: F0 range analysis showing vocal flexibility. Left: F0 range by breed and sex. Right: Relationship between F0 mean and range.*")
+    writer.line()
+
+def compute_summary(df_clean: pd.DataFrame) -> SectionResults:
+    """
+    Record what the summary section describes: the features modelled.
+
+    :param df_clean: Cleaned DataFrame
+    :return: Section results with the modelled features
+    """
+    return SectionResults('summary', values={'features': analysis_features(df_clean)})
+
+def render_summary(results: SectionResults, writer) -> None:
+    """
+    Write the summary, interpretation guidelines and model specification.
+
+    :param results: Results of the 'summary' section (see compute_summary())
+    :param writer: Report writer (see report_render)
+    :return: None
+    """
+    writer.rule()
+    writer.heading("Summary and Interpretation", 2)
+    writer.line()
+
+    writer.heading("Research Hypotheses Testing", 3)
+    writer.line()
+    writer.numbered(1, "**Males will show lower F0 and Formant frequencies than females:**")
+    writer.bullet("Check the sign of Sex[T.male] coefficients in the models above", indent=1)
+    writer.bullet("Negative coefficients support this hypothesis", indent=1)
+    writer.line()
+    writer.numbered(2, "**Larger breeds will show larger acoustic differences:**")
+    writer.bullet("Compare effect sizes (Cohen's d) across breeds", indent=1)
+    writer.bullet("Larger breeds (German Shepherd, Husky) should show larger effects", indent=1)
+    writer.line()
+    writer.numbered(3, "**Small breeds will show smaller or no differences:**")
+    writer.bullet("Chihuahua should show smaller effect sizes", indent=1)
+    writer.bullet("Look for non-significant interactions in small breeds", indent=1)
+    writer.line()
+    writer.numbered(4, "**F0 range may show different patterns than mean F0:**")
+    writer.bullet("F0 range reflects vocal flexibility and dynamic range", indent=1)
+    writer.bullet("May vary independently of average F0 values", indent=1)
+    writer.line()
+
+    writer.heading("Interpretation Guidelines", 3)
+    writer.line()
+    writer.bullet("**Cohen's d:** 0.2 = small, 0.5 = medium, 0.8 = large effect")
+    writer.bullet("**p < 0.05** indicates statistical significance")
+    writer.bullet("**Interaction effects** show breed-specific sex differences")
+    writer.bullet("**F0_min:** Lowest fundamental frequency in the vocalization")
+    writer.bullet("**F0_max:** Highest fundamental frequency in the vocalization")
+    writer.bullet("**F0_range:** F0_max - F0_min, indicates vocal flexibility")
+    writer.line()
+
+    writer.heading("Model Specification", 3)
+    writer.line()
+    writer.line("The Linear Mixed-Effects Models account for:")
+    writer.bullet("**Fixed effects:** Sex, Breed, and their interaction")
+    writer.bullet("**Random effects:** Individual dog variation (dog_id)")
+    features = results.values['features']
+    modelled = features[0] if len(features) == 1 else f"{', '.join(features[:-1])}, and {features[-1]}"
+    writer.bullet(f"**Separate models** for {modelled}")
+    writer.line()
+
+    writer.rule(spaced=False)
+    writer.line()
+    writer.line("**Analysis completed successfully!** All results, figures, and this report have been saved to the `data/statistical_analysis/` directory.")
+
+# Renderer of each report section
+RENDERERS: Dict[str, Callable[[SectionResults, object], None]] = {
+    'overview': render_dataset_overview,
+    'descriptives': render_descriptive_statistics,
+    'assumptions': render_assumption_tests,
+    'lme': render_lme_models,
+    'effect_sizes': render_effect_sizes,
+    'figures': render_visualizations,
+    'summary': render_summary,
+}
+
+def compute_section(section: str, input_path: Path = INPUT_PATH, output_dir: Path = OUTPUT_DIR,
+                    lme_options: Optional[Dict[str, object]] = None) -> SectionResults:
+    """
+    Compute the results of one report section from the feature table.
+
+    :param section: Section name from SECTIONS
+    :param input_path: Path to the feature CSV
+    :param output_dir: Directory for figures
+    :param lme_options: engine, formula and random_effects for the 'lme' section (see compute_lme_models())
+    :return: Section results
+    """
+    with trace_stage(f'statistical_analysis.{section}'):
+        df, df_clean = load_features(input_path)
+        add_counters(rows=len(df_clean))
+        if section == 'summary':
+            return compute_summary(df_clean)
+        elif section == 'overview':
+            return compute_dataset_overview(df, df_clean)
+        elif section == 'descriptives':
+            return compute_descriptive_statistics(df_clean)
+        elif section == 'assumptions':
+            return compute_assumption_tests(df_clean)
+        elif section == 'lme':
+            return compute_lme_models(to_model_frame(df_clean), **(lme_options or {}))
+        elif section == 'effect_sizes':
+            return compute_effect_sizes(to_model_frame(df_clean))
+        elif section == 'figures':
+            return compute_visualizations(to_model_frame(df_clean), output_dir)
+        raise ValueError(f"Unknown report section: {section}")
+
+def run_section(section: str, input_path: Path = INPUT_PATH, output_dir: Path = OUTPUT_DIR,
+                lme_options: Optional[Dict[str, object]] = None) -> Path:
+    """
+    Compute one report section and save its results to the results store.
+
+    :param section: Section name from SECTIONS
+    :param input_path: Path to the feature CSV
+    :param output_dir: Analysis output directory
+    :param lme_options: Model options for the 'lme' section (see compute_lme_models())
+    :return: Path to the section's manifest
+    """
+    results = compute_section(section, Path(input_path), Path(output_dir), lme_options)
+    return results.save(Path(output_dir))
+
+def render_report(output_dir: Path = OUTPUT_DIR, formats: List[str] = REPORT_FORMATS,
+                  sections: List[str] = SECTIONS) -> List[Path]:
+    """
+    Render the report from the results store in one pass over the sections.
+
+    :param output_dir: Analysis output directory
+    :param formats: Any of 'markdown', 'html' and 'console'
+    :param sections: Sections to include, in document order
+    :return: Paths of the written report files
+    """
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown report formats: {sorted(unknown)}")
+    output_dir = Path(output_dir)
+    with trace_stage('statistical_analysis.render'), contextlib.ExitStack() as stack:
+        paths, writers = [], []
+        if 'markdown' in formats:
+            paths.append(output_dir / REPORT_NAME)
+            writers.append(MarkdownWriter(stack.enter_context(open(paths[-1], 'w'))))
+        if 'html' in formats:
+            paths.append(output_dir / HTML_REPORT_NAME)
+            writers.append(HtmlWriter(stack.enter_context(open(paths[-1], 'w'))))
+        if 'console' in formats:
+            writers.append(ConsoleWriter())
+
+        writer = ReportWriters(writers)
+        render_report_header(writer)
+        for section in sections:
+            RENDERERS[section](SectionResults.load(section, output_dir), writer)
+        writer.close()
+    return paths
+
+def main(input_path: Path = INPUT_PATH, output_dir: Path = OUTPUT_DIR,
+         lme_options: Optional[Dict[str, object]] = None, formats: List[str] = REPORT_FORMATS) -> int:
+    """
+    Run the full analysis, store its results and render the report.
+
+    :param input_path: Path to the feature CSV
+    :param output_dir: Analysis output directory
+    :param lme_options: Model options for the 'lme' section (see compute_lme_models())
+    :param formats: Report formats to render (see render_report()); empty to only store the results
+    :return: Exit code
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    for section in SECTIONS:
+        run_section(section, input_path, output_dir, lme_options)
+    report_paths = render_report(output_dir, formats) if formats else []
+
+    print(f"\nAnalysis complete! All output saved to: {output_dir}")
+    print(f"- Results: {output_dir / RESULTS_DIRNAME}")
+    for path in report_paths:
+        print(f"- Report: {path}")
+    print(f"- Figures:")
+    print(f"  * Original analysis: {output_dir / 'vocal_dimorphism_analysis.png'}")
+    print(f"  * Complete F0 analysis: {output_dir / 'f0_analysis_complete.png'}")
+    print(f"  * Complete effect sizes: {output_dir / 'effect_sizes_heatmap_complete.png'}")
+    print(f"  * F0 range analysis: {output_dir / 'f0_range_analysis.png'}")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Stream Tracker
+Incremental pitch and formant tracking over audio that arrives in chunks of
+any size, for monitoring a live input instead of analyzing finished files.
+
+Each analysis keeps only the samples its next frame still needs: a frame
+buffer holds at most one frame of overlap plus the newest samples, the
+formant branch resamples with an overlap-save polyphase filter, and the AC
+pitch path is decided by a fixed-lag Viterbi search, so latency and memory
+are bounded regardless of how long the stream runs. Frames are measured
+with the same candidate, YIN, Burg LPC and root-finding code as the batch
+analysis in acoustic_analysis. The running F0/F1/F2 summaries only count
+voiced frames: a formant frame is held until the pitch frame at its time is
+decided and dropped from the summary when that frame is unvoiced, standing
+in for the batch analysis' restriction to the detected bark segments (which
+needs the whole recording). They approach the batch values for the same
+recording; the per-update formant frames are not filtered.
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import signal
+from scipy.io import wavfile
+
+from scripts.acoustic_analysis import (FORMANT_WINDOW_LENGTH, MAX_FORMANT_FREQUENCY, MAX_FORMANTS,
+                                       PITCH_CEILING, PITCH_FLOOR, PREEMPHASIS_FROM, AnalysisContext,
+                                       as_mono_float, burg_lpc, get_window, lpc_formants, pitch_candidates,
+                                       pitch_transition_cost, preemphasis_coefficient, resampling_filter,
+                                       yin_analysis)
+
+# Frames the AC pitch path looks ahead before committing to a candidate
+VITERBI_LAG = 20
+# Largest number of frames analyzed at once (bounds the work arrays per push)
+MAX_BLOCK_FRAMES = 64
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class FrameBuffer:
+    """
+    Turns a sample stream into blocks of consecutive overlapping frames.
+
+    The buffer keeps the overlap the next frame needs plus room for
+    MAX_BLOCK_FRAMES further steps, so its size is fixed.
+    """
+
+    def __init__(self, frame_length: int, step: int, max_frames: int = MAX_BLOCK_FRAMES) -> None:
+        """
+        Create an empty frame buffer.
+
+        :param frame_length: Frame length in samples
+        :param step: Frame step in samples
+        :param max_frames: Most frames per emitted block
+        """
+        self.frame_length = frame_length
+        self.step = step
+        self._buffer = np.zeros(frame_length + (max_frames - 1) * step)
+        self._filled = 0
+        self.frames_emitted = 0
+
+    def push(self, samples: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Add samples and yield every block of complete frames.
+
+        A block holds frame_length + (k - 1) * step samples, i.e. exactly k
+        frames starting at its first sample. Blocks are views into the buffer
+        and are only valid until the generator is resumed.
+
+        :param samples: New samples
+        :return: Iterator of (index of the block's first frame, block samples)
+        """
+        position = 0
+        while position < len(samples):
+            take = min(len(self._buffer) - self._filled, len(samples) - position)
+            self._buffer[self._filled:self._filled + take] = samples[position:position + take]
+            self._filled += take
+            position += take
+            if self._filled < self.frame_length:
+                continue
+            n_frames = (self._filled - self.frame_length) // self.step + 1
+            yield self.frames_emitted, self._buffer[:self.frame_length + (n_frames - 1) * self.step]
+            self.frames_emitted += n_frames
+            consumed = n_frames * self.step
+            self._buffer[:self._filled - consumed] = self._buffer[consumed:self._filled]
+            self._filled -= consumed
+
+
+class StreamResampler:
+    """
+    Overlap-save version of AnalysisContext.resampled().
+
+    Output sample m sits at source position m * down / up; it is emitted once
+    the filter's half-length of later source samples has arrived, which makes
+    the streamed output equal to resampling the whole signal at once.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int) -> None:
+        """
+        Create a resampler (a pass-through when target_rate >= source_rate).
+
+        :param source_rate: Input sample rate
+        :param target_rate: Output sample rate
+        """
+        self.passthrough = target_rate >= source_rate
+        self.rate = source_rate if self.passthrough else target_rate
+        if self.passthrough:
+            return
+        self.up, self.down, self.coefficients = resampling_filter(source_rate, target_rate)
+        reach = len(self.coefficients) // (2 * self.up) + 2
+        # Source samples kept on either side of the emitted range, a multiple of down
+        self.margin = self.down * -(-reach // self.down)
+        self._pending = np.empty(0)
+        self._origin = 0
+        self._emitted = 0
+        self._received = 0
+
+    @property
+    def delay(self) -> float:
+        """
+        Extra latency in seconds introduced by the look-ahead.
+
+        :return: Delay
+        """
+        return 0.0 if self.passthrough else self.margin * self.down / (self.up * self.rate)
+
+    def _emit(self, end: int) -> np.ndarray:
+        """
+        Resample the pending samples and return outputs up to (excluding) index end.
+
+        :param end: Global index of the first output not to return
+        :return: New output samples
+        """
+        resampled = signal.resample_poly(self._pending, self.up, self.down, window=self.coefficients)
+        first = self._origin * self.up // self.down
+        output = resampled[self._emitted - first:end - first]
+        self._emitted = max(self._emitted, end)
+        return output
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Add source samples.
+
+        :param samples: New source samples
+        :return: Output samples that are now final
+        """
+        if self.passthrough:
+            return samples
+        self._pending = np.concatenate((self._pending, samples))
+        self._received += len(samples)
+        end = max((self._received - self.margin) * self.up // self.down, self._emitted)
+        if end == self._emitted:
+            return np.empty(0)
+        output = self._emit(end)
+        # Drop source samples no later output depends on, keeping the origin a multiple of down
+        drop = max((end * self.down // self.up - self.margin) // self.down * self.down - self._origin, 0)
+        self._pending = self._pending[drop:]
+        self._origin += drop
+        return output
+
+    def flush(self) -> np.ndarray:
+        """
+        Return the remaining output, treating the stream as ended.
+
+        :return: Final output samples
+        """
+        if self.passthrough or self._received == 0:
+            return np.empty(0)
+        return self._emit(-(-self._received * self.up // self.down))
+
+
+@dataclass
+class RunningSummary:
+    """
+    Running mean, minimum and maximum of the defined values of a track.
+    """
+    count: int = 0
+    total: float = 0.0
+    minimum: float = float('inf')
+    maximum: float = float('-inf')
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Add values (NaN values are ignored).
+
+        :param values: New values
+        :return: None
+        """
+        defined = values[np.isfinite(values)]
+        if len(defined):
+            self.count += len(defined)
+            self.total += float(defined.sum())
+            self.minimum = min(self.minimum, float(defined.min()))
+            self.maximum = max(self.maximum, float(defined.max()))
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean of the values so far.
+
+        :return: Mean, NaN if nothing is defined
+        """
+        return self.total / self.count if self.count else float('nan')
+
+
+@dataclass
+class StreamUpdate:
+    """
+    Frames decided by one push() or flush() call.
+    """
+    pitch_times: np.ndarray
+    f0: np.ndarray
+    formant_times: np.ndarray = field(default_factory=lambda: np.empty(0))
+    formants: np.ndarray = field(default_factory=lambda: np.empty((0, MAX_FORMANTS)))
+
+
+class StreamingTracker:
+    """
+    Incremental F0 and formant tracker over chunked audio.
+    """
+
+    def __init__(self, sample_rate: int, pitch_algorithm: str = 'ac', floor: float = PITCH_FLOOR,
+                 ceiling: float = PITCH_CEILING, formants: bool = True, viterbi_lag: int = VITERBI_LAG,
+                 reference_peak: Optional[float] = None) -> None:
+        """
+        Create a tracker.
+
+        :param sample_rate: Sample rate of the stream
+        :param pitch_algorithm: 'ac' (Praat-style candidates with a fixed-lag Viterbi path) or 'yin'
+        :param floor: Pitch floor in Hz
+        :param ceiling: Pitch ceiling in Hz
+        :param formants: Also track formants
+        :param viterbi_lag: Frames the AC path looks ahead before deciding a frame
+        :param reference_peak: Peak amplitude silence thresholds are relative to
+                               (default: the running peak of the stream)
+        """
+        if pitch_algorithm not in ('ac', 'yin'):
+            raise ValueError(f"Unknown pitch algorithm: {pitch_algorithm}")
+        self.sample_rate = int(sample_rate)
+        self.pitch_algorithm = pitch_algorithm
+        self.floor, self.ceiling = floor, ceiling
+        self.viterbi_lag = viterbi_lag
+        self.fixed_peak = reference_peak
+        self.peak = reference_peak or 0.0
+
+        # Same frame sizes as pitch_candidates() and yin_analysis()
+        self.time_step = 0.75 / floor
+        step = max(int(round(self.time_step * self.sample_rate)), 1)
+        if pitch_algorithm == 'ac':
+            length = int(round(3.0 / floor * self.sample_rate))
+        else:
+            length = 2 * int(np.ceil(self.sample_rate / floor)) + 2
+        self.pitch_frames = FrameBuffer(length, step)
+        self._history: List[Tuple[float, np.ndarray, np.ndarray]] = []
+        self._delta: Optional[np.ndarray] = None
+        self._last_frequencies: Optional[np.ndarray] = None
+
+        # Same resampling, pre-emphasis and window as formant_track()
+        self.resampler: Optional[StreamResampler] = None
+        if formants:
+            self.resampler = StreamResampler(self.sample_rate, int(2.0 * MAX_FORMANT_FREQUENCY))
+            rate = self.resampler.rate
+            self._emphasis = preemphasis_coefficient(rate, PREEMPHASIS_FROM)
+            self._last_sample: Optional[float] = None
+            self.formant_frames = FrameBuffer(int(round(2.0 * FORMANT_WINDOW_LENGTH * rate)),
+                                              max(int(round(FORMANT_WINDOW_LENGTH / 4.0 * rate)), 1))
+
+        self.summaries = {name: RunningSummary() for name in ('F0', 'F1', 'F2')}
+        # Decided pitch frames (time, voiced) and formant frames waiting for the pitch decision at their time
+        self._voicing_times = np.empty(0)
+        self._voicing = np.empty(0, dtype=bool)
+        self._pending_times = np.empty(0)
+        self._pending_formants = np.empty((0, MAX_FORMANTS))
+
+    @property
+    def latency(self) -> float:
+        """
+        Longest delay in seconds between a sample arriving and the frames covering it being emitted.
+
+        :return: Latency
+        """
+        lag = self.viterbi_lag if self.pitch_algorithm == 'ac' else 0
+        pitch = (self.pitch_frames.frame_length + lag * self.pitch_frames.step) / self.sample_rate
+        if self.resampler is None:
+            return pitch
+        return max(pitch, self.formant_frames.frame_length / self.resampler.rate + self.resampler.delay)
+
+    def _frame_times(self, first: int, n_frames: int, buffer: FrameBuffer, rate: float) -> np.ndarray:
+        """
+        Centre times of a block of frames.
+
+        :return: Times in seconds
+        """
+        return ((first + np.arange(n_frames)) * buffer.step + buffer.frame_length / 2) / rate
+
+    def _decide(self, final: bool = False) -> Tuple[List[float], List[float]]:
+        """
+        Commit AC path frames older than the Viterbi lag (or all frames when final).
+
+        :param final: The stream has ended
+        :return: (times, F0) of the committed frames
+        """
+        keep = 0 if final else self.viterbi_lag
+        n_decided = len(self._history) - keep
+        if n_decided <= 0:
+            return [], []
+        index = int(np.argmax(self._delta))
+        chosen = [0] * len(self._history)
+        for t in range(len(self._history) - 1, -1, -1):
+            chosen[t] = index
+            index = self._history[t][2][index]
+        times = [self._history[t][0] for t in range(n_decided)]
+        f0 = [self._history[t][1][chosen[t]] for t in range(n_decided)]
+        del self._history[:n_decided]
+        return times, [value if value > 0 else np.nan for value in f0]
+
+    def _track_pitch(self, first: int, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Measure a block of pitch frames.
+
+        :param first: Index of the block's first frame
+        :param block: Block samples
+        :return: (times, F0) of the frames decided so far
+        """
+        if self.fixed_peak is None:
+            self.peak = max(self.peak, float(np.abs(block).max()))
+        ctx = AnalysisContext(block, self.sample_rate, self.peak)
+        if self.pitch_algorithm == 'yin':
+            _, f0, _ = yin_analysis(ctx, self.floor, self.ceiling)
+            return self._frame_times(first, len(f0), self.pitch_frames, self.sample_rate), f0
+
+        _, frequencies, strengths = pitch_candidates(ctx, self.floor, self.ceiling)
+        times = self._frame_times(first, len(frequencies), self.pitch_frames, self.sample_rate)
+        decided_times, decided_f0 = [], []
+        for t in range(len(frequencies)):
+            if self._delta is None:
+                self._delta = strengths[t].copy()
+                backpointers = np.zeros(len(strengths[t]), dtype=np.intp)
+            else:
+                cost = pitch_transition_cost(self._last_frequencies, frequencies[t], self.time_step)
+                total = self._delta[:, None] - cost
+                backpointers = np.argmax(total, axis=0)
+                self._delta = total[backpointers, np.arange(total.shape[1])] + strengths[t]
+                # Only differences between path scores matter; keep them from drifting
+                self._delta -= self._delta[np.isfinite(self._delta)].max()
+            self._last_frequencies = frequencies[t].copy()
+            self._history.append((times[t], self._last_frequencies, backpointers))
+            new_times, new_f0 = self._decide()
+            decided_times += new_times
+            decided_f0 += new_f0
+        return np.array(decided_times), np.array(decided_f0)
+
+    def _track_formants(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Measure the formant frames completed by new resampled samples.
+
+        :param samples: New resampled samples
+        :return: (times, formants) of the completed frames
+        """
+        if len(samples) == 0:
+            return np.empty(0), np.empty((0, MAX_FORMANTS))
+        emphasized = samples.copy()
+        emphasized[1:] -= self._emphasis * samples[:-1]
+        if self._last_sample is not None:
+            emphasized[0] -= self._emphasis * self._last_sample
+        self._last_sample = float(samples[-1])
+
+        times, formants = [], []
+        buffer = self.formant_frames
+        for first, block in buffer.push(emphasized):
+            frames = np.lib.stride_tricks.sliding_window_view(block, buffer.frame_length)[::buffer.step]
+            windowed = frames * get_window('gaussian', buffer.frame_length)
+            times.append(self._frame_times(first, len(frames), buffer, self.resampler.rate))
+            formants.append(lpc_formants(burg_lpc(windowed, 2 * MAX_FORMANTS), self.resampler.rate))
+        if not times:
+            return np.empty(0), np.empty((0, MAX_FORMANTS))
+        return np.concatenate(times), np.concatenate(formants)
+
+    def _record(self, update: StreamUpdate, final: bool = False) -> StreamUpdate:
+        """
+        Add an update to the running summaries.
+
+        Formant frames are added once the pitch frame nearest to them is
+        decided, and only when it is voiced.
+
+        :param update: Decided frames
+        :param final: The stream has ended (release every held formant frame)
+        :return: The same update
+        """
+        self.summaries['F0'].update(update.f0)
+        if self.resampler is None:
+            return update
+        self._voicing_times = np.concatenate([self._voicing_times, update.pitch_times])
+        self._voicing = np.concatenate([self._voicing, np.isfinite(update.f0)])
+        times = np.concatenate([self._pending_times, update.formant_times])
+        formants = np.concatenate([self._pending_formants, update.formants])
+        if final or len(self._voicing_times) == 0:
+            ready = np.full(len(times), final)
+        else:
+            ready = times <= self._voicing_times[-1] + self.time_step / 2.0
+        if ready.any() and len(self._voicing_times):
+            # Nearest decided pitch frame of every released formant frame
+            released, last = times[ready], len(self._voicing_times) - 1
+            after = np.clip(np.searchsorted(self._voicing_times, released), 0, last)
+            before = np.clip(after - 1, 0, last)
+            nearest = np.where(released - self._voicing_times[before] <= self._voicing_times[after] - released,
+                               before, after)
+            voiced = formants[ready][self._voicing[nearest]]
+            self.summaries['F1'].update(voiced[:, 0])
+            self.summaries['F2'].update(voiced[:, 1])
+        self._pending_times, self._pending_formants = times[~ready], formants[~ready]
+        # Keep the pitch frames still needed by the held formant frames (and the newest one)
+        oldest = self._pending_times.min() if len(self._pending_times) else np.inf
+        keep = self._voicing_times >= oldest - self.time_step
+        keep[-1:] = True
+        self._voicing_times, self._voicing = self._voicing_times[keep], self._voicing[keep]
+        return update
+
+    def push(self, chunk: np.ndarray) -> StreamUpdate:
+        """
+        Add a chunk of audio.
+
+        :param chunk: Samples (integer PCM or float, mono or channels last)
+        :return: Frames decided by this chunk
+        """
+        samples = as_mono_float(chunk)
+        times, f0 = [np.empty(0)], [np.empty(0)]
+        for first, block in self.pitch_frames.push(samples):
+            block_times, block_f0 = self._track_pitch(first, block)
+            times.append(block_times)
+            f0.append(block_f0)
+        update = StreamUpdate(np.concatenate(times), np.concatenate(f0))
+        if self.resampler is not None:
+            update.formant_times, update.formants = self._track_formants(self.resampler.push(samples))
+        return self._record(update)
+
+    def flush(self) -> StreamUpdate:
+        """
+        Emit the frames still held back at the end of the stream.
+
+        :return: Remaining frames
+        """
+        times, f0 = self._decide(final=True) if self.pitch_algorithm == 'ac' else ([], [])
+        update = StreamUpdate(np.array(times), np.array(f0, dtype=float))
+        if self.resampler is not None:
+            update.formant_times, update.formants = self._track_formants(self.resampler.flush())
+        return self._record(update, final=True)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Running values of the batch summary features.
+
+        :return: F0_mean, F0_min, F0_max, F1_mean, F2_mean (NaN where undefined so far)
+        """
+        f0 = self.summaries['F0']
+        result = {
+            'F0_mean': f0.mean,
+            'F0_min': f0.minimum if f0.count else float('nan'),
+            'F0_max': f0.maximum if f0.count else float('nan'),
+        }
+        if self.resampler is not None:
+            result['F1_mean'] = self.summaries['F1'].mean
+            result['F2_mean'] = self.summaries['F2'].mean
+        return result
+
+
+def wav_chunks(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[int, Iterator[np.ndarray]]:
+    """
+    Read a WAV file in chunks without loading it into memory.
+
+    :param path: WAV file
+    :param chunk_size: Samples per chunk
+    :return: (sample rate, iterator of chunks)
+    """
+    sample_rate, samples = wavfile.read(path, mmap=True)
+    return sample_rate, (np.array(samples[i:i + chunk_size]) for i in range(0, len(samples), chunk_size))
+
+
+def raw_chunks(stream, dtype: str = 'int16', channels: int = 1,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Read raw interleaved PCM from a binary stream (e.g. stdin from a recorder).
+
+    :param stream: Binary file object
+    :param dtype: Sample type
+    :param channels: Number of interleaved channels
+    :param chunk_size: Frames per chunk
+    :return: Iterator of chunks
+    """
+    frame_bytes = np.dtype(dtype).itemsize * channels
+    leftover = b''
+    while True:
+        data = stream.read(chunk_size * frame_bytes)
+        if not data:
+            return
+        data = leftover + data
+        usable = len(data) // frame_bytes * frame_bytes
+        leftover = data[usable:]
+        chunk = np.frombuffer(data[:usable], dtype=dtype)
+        yield chunk.reshape(-1, channels) if channels > 1 else chunk
+
+
+def track_stream(chunks, sample_rate: int, on_update=None, **options) -> StreamingTracker:
+    """
+    Run a tracker over an iterable of chunks.
+
+    :param chunks: Iterable of sample arrays
+    :param sample_rate: Sample rate
+    :param on_update: Optional callable(tracker, update) called after every chunk and at the end
+    :param options: StreamingTracker options
+    :return: The tracker after flushing
+    """
+    tracker = StreamingTracker(sample_rate, **options)
+    for chunk in chunks:
+        update = tracker.push(chunk)
+        if on_update is not None:
+            on_update(tracker, update)
+    update = tracker.flush()
+    if on_update is not None:
+        on_update(tracker, update)
+    return tracker
+
+
+def track_file(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, on_update=None, **options) -> StreamingTracker:
+    """
+    Stream a WAV file through a tracker.
+
+    :param path: WAV file
+    :param chunk_size: Samples per chunk
+    :param on_update: Optional callable(tracker, update), see track_stream()
+    :param options: StreamingTracker options
+    :return: The tracker after flushing
+    """
+    sample_rate, chunks = wav_chunks(path, chunk_size)
+    return track_stream(chunks, sample_rate, on_update, **options)
+
+
+def main() -> int:
+    """
+    Main function to track pitch on a WAV file or raw PCM from stdin.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Streaming pitch and formant tracker")
+    parser.add_argument('source', help="WAV file, or - for raw PCM on stdin")
+    parser.add_argument('--sample-rate', type=int, default=44100, help="Sample rate of raw PCM input")
+    parser.add_argument('--dtype', default='int16', help="Sample type of raw PCM input")
+    parser.add_argument('--channels', type=int, default=1, help="Channels of raw PCM input")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--pitch-algorithm', default='ac', choices=['ac', 'yin'])
+    parser.add_argument('--frames', action='store_true', help="Print every voiced frame")
+    args = parser.parse_args()
+
+    def report(tracker: StreamingTracker, update: StreamUpdate) -> None:
+        if args.frames:
+            for time, f0 in zip(update.pitch_times, update.f0):
+                if np.isfinite(f0):
+                    print(f"{time:.3f}\t{f0:.1f}")
+
+    try:
+        if args.source == '-':
+            chunks = raw_chunks(sys.stdin.buffer, args.dtype, args.channels, args.chunk_size)
+            tracker = track_stream(chunks, args.sample_rate, report, pitch_algorithm=args.pitch_algorithm)
+        else:
+            tracker = track_file(Path(args.source), args.chunk_size, report, pitch_algorithm=args.pitch_algorithm)
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        print(f"Error tracking {args.source}: {e}")
+        return 1
+
+    print(f"Latency: {1000 * tracker.latency:.0f} ms")
+    for name, value in tracker.summary().items():
+        print(f"   {name}: {value:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Synthetic DogSpeak Corpus Generator
+Synthesizes harmonic bark-like WAV files with known F0 and formants, laid out
+like the real data, for benchmarking and for checking extraction accuracy.
+
+Layouts:
+- "subset": <output_dir>/<breed>_<sex>/<file>.wav (what create_subset produces)
+- "dataset": <output_dir>/dogspeak_released/<dog_id>/<file>.wav (the full dataset)
+
+Both layouts get a metadata.csv (filename, breed, sex, dog_id) and a
+ground_truth.csv in the feature table schema (Folder, File, Breed, Sex,
+F0_mean, F0_min, F0_max, F1_mean, F2_mean) holding the true values.
+Generation is deterministic per file, so any scale from 1k to 1M files can be
+produced in parallel chunks and reproduced exactly.
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy.io import wavfile
+
+from scripts.instrumentation import add_counters, traced
+
+SEX_CODES = {'female': 'F', 'male': 'M'}
+
+# Per breed x sex (F0 mean, F0 sd, F1 mean, F2 mean) in Hz, roughly matching
+# the group means of data/features/feature_extraction_results.csv
+DEFAULT_PROFILES: Dict[Tuple[str, str], Tuple[float, float, float, float]] = {
+    ('chihuahua', 'female'): (460.0, 110.0, 990.0, 1700.0),
+    ('chihuahua', 'male'): (410.0, 160.0, 860.0, 1620.0),
+    ('german shepherd', 'female'): (450.0, 150.0, 820.0, 1620.0),
+    ('german shepherd', 'male'): (430.0, 130.0, 720.0, 1530.0),
+    ('husky', 'female'): (440.0, 140.0, 790.0, 1660.0),
+    ('husky', 'male'): (380.0, 130.0, 680.0, 1470.0),
+    ('pitbull', 'female'): (390.0, 130.0, 730.0, 1580.0),
+    ('pitbull', 'male'): (360.0, 170.0, 780.0, 1770.0),
+    ('shiba inu', 'female'): (470.0, 150.0, 880.0, 1730.0),
+    ('shiba inu', 'male'): (470.0, 150.0, 850.0, 1670.0),
+}
+
+DEFAULT_SAMPLE_RATE = 16000
+CHUNK_SIZE = 256
+
+
+def _resonance_gain(freqs: np.ndarray, formants: np.ndarray, bandwidths: np.ndarray) -> np.ndarray:
+    """
+    Magnitude response of a cascade of second-order resonators at the given frequencies.
+
+    :param freqs: Frequencies in Hz (any shape)
+    :param formants: Formant centre frequencies in Hz
+    :param bandwidths: Formant bandwidths in Hz
+    :return: Gain with the same shape as freqs
+    """
+    gain = np.ones_like(freqs, dtype=np.float64)
+    for centre, bandwidth in zip(formants, bandwidths):
+        ratio = freqs / centre
+        gain /= np.sqrt((1.0 - ratio ** 2) ** 2 + (freqs * bandwidth / centre ** 2) ** 2)
+    return gain
+
+
+def synthesize_bark_file(rng: np.random.Generator, sample_rate: int, f0: float, f1: float, f2: float
+                         ) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Synthesize a recording of 1-4 barks with a harmonic source shaped by formant resonances.
+
+    :param rng: Random generator
+    :param sample_rate: Sample rate in Hz
+    :param f0: Target mean fundamental frequency in Hz
+    :param f1: First formant in Hz
+    :param f2: Second formant in Hz
+    :return: Tuple of (int16 samples, ground-truth values)
+    """
+    formants = np.array([f1, f2, max(f2 * 1.5, f2 + 800.0)])
+    bandwidths = np.array([90.0, 120.0, 200.0])
+    n_barks = int(rng.integers(1, 5))
+    nyquist_margin = 0.45 * sample_rate
+
+    pieces = [np.zeros(int(rng.uniform(0.05, 0.3) * sample_rate))]
+    voiced_f0 = []
+    for _ in range(n_barks):
+        n = int(rng.uniform(0.12, 0.3) * sample_rate)
+        t = np.arange(n) / sample_rate
+        # Each bark has its own pitch around the file's target and a short glide
+        bark_f0 = f0 * rng.uniform(0.92, 1.08)
+        glide = rng.uniform(-0.1, 0.1)
+        contour = bark_f0 * (1.0 + glide * (t / t[-1] - 0.5))
+        phase = 2.0 * np.pi * np.cumsum(contour) / sample_rate
+
+        n_harmonics = max(1, int(nyquist_margin // contour.max()))
+        k = np.arange(1, n_harmonics + 1)[:, None]
+        # Source spectrum falls 6 dB/octave; formants shape the harmonic amplitudes
+        amplitudes = _resonance_gain(k * contour[None, :], formants, bandwidths) / k
+        wave = (amplitudes * np.sin(k * phase[None, :])).sum(axis=0)
+
+        # Fast attack, exponential decay
+        envelope = np.minimum(t / 0.01, 1.0) * np.exp(-t / rng.uniform(0.08, 0.2))
+        wave *= envelope / (np.abs(wave).max() + 1e-12)
+        pieces.append(wave)
+        pieces.append(np.zeros(int(rng.uniform(0.05, 0.3) * sample_rate)))
+        voiced_f0.append(contour)
+
+    signal = np.concatenate(pieces)
+    signal += rng.normal(0.0, 10 ** (-45 / 20), len(signal))
+    samples = np.clip(signal * 0.8 * 32767, -32768, 32767).astype(np.int16)
+
+    contour_all = np.concatenate(voiced_f0)
+    truth = {
+        'F0_mean': float(contour_all.mean()),
+        'F0_min': float(contour_all.min()),
+        'F0_max': float(contour_all.max()),
+        'F1_mean': float(f1),
+        'F2_mean': float(f2),
+        'duration_s': len(samples) / sample_rate,
+    }
+    return samples, truth
+
+
+def corpus_plan(start: int, stop: int, files_per_dog: int = 5, profiles: Optional[Dict] = None
+                ) -> Iterator[Tuple[int, str, str, int]]:
+    """
+    Assign file indices to a breed, sex and dog.
+
+    Dogs are dealt round-robin over the breed x sex cells so every cell grows evenly.
+
+    :param start: First file index
+    :param stop: One past the last file index
+    :param files_per_dog: Recordings per dog
+    :param profiles: Breed x sex profiles (default: DEFAULT_PROFILES)
+    :return: Iterator of (file index, breed, sex, dog number)
+    """
+    cells = list((profiles or DEFAULT_PROFILES).keys())
+    for index in range(start, stop):
+        dog = index // files_per_dog
+        breed, sex = cells[dog % len(cells)]
+        yield index, breed, sex, dog
+
+
+def _generate_chunk(args: Tuple[int, int, int, str, str, int, int, Dict]) -> List[Dict[str, object]]:
+    """
+    Generate one chunk of files in a worker process.
+
+    :param args: Tuple of (start, stop, files per dog, output dir, layout, sample rate, seed, profiles)
+    :return: Metadata/ground-truth rows for the chunk
+    """
+    start, stop, files_per_dog, output_dir, layout, sample_rate, seed, profiles = args
+    rows = []
+    for index, breed, sex, dog in corpus_plan(start, stop, files_per_dog, profiles):
+        f0_mu, f0_sd, f1_mu, f2_mu = profiles[(breed, sex)]
+        # Dog-level values are seeded by dog so all of a dog's files share them
+        dog_rng = np.random.default_rng([seed, dog])
+        dog_f0 = float(np.clip(dog_rng.normal(f0_mu, f0_sd * 0.7), 120.0, 1000.0))
+        dog_f1 = float(np.clip(dog_rng.normal(f1_mu, 120.0), 350.0, 1500.0))
+        dog_f2 = float(np.clip(dog_rng.normal(f2_mu, 180.0), dog_f1 + 400.0, 3000.0))
+
+        rng = np.random.default_rng([seed, dog, index])
+        file_f0 = float(np.clip(rng.normal(dog_f0, f0_sd * 0.3), 100.0, 1100.0))
+        samples, truth = synthesize_bark_file(rng, sample_rate, file_f0, dog_f1, dog_f2)
+
+        dog_id = f"dog_{dog}"
+        filename = f"{index}_{breed}_{SEX_CODES[sex]}_{dog_id}.wav"
+        folder = f"{breed}_{sex}" if layout == 'subset' else f"dogspeak_released/{dog_id}"
+        path = Path(output_dir) / folder / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        wavfile.write(path, sample_rate, samples)
+
+        rows.append({'filename': filename, 'breed': breed, 'sex': sex, 'dog_id': dog_id,
+                     'Folder': f"{breed}_{sex}", 'bytes': path.stat().st_size, **truth})
+    return rows
+
+
+@traced('synthesize_corpus')
+def generate_corpus(output_dir: str, n_files: int = 1000, files_per_dog: int = 5, layout: str = 'subset',
+                    sample_rate: int = DEFAULT_SAMPLE_RATE, seed: int = 42, jobs: int = 1,
+                    profiles: Optional[Dict] = None) -> Dict[str, Path]:
+    """
+    Generate a synthetic corpus with metadata and ground truth.
+
+    :param output_dir: Root directory of the corpus
+    :param n_files: Number of recordings (1k to 1M)
+    :param files_per_dog: Recordings per dog
+    :param layout: "subset" (<breed>_<sex> folders) or "dataset" (dogspeak_released/<dog_id>)
+    :param sample_rate: Sample rate in Hz
+    :param seed: Random seed
+    :param jobs: Worker processes
+    :param profiles: Breed x sex profiles (default: DEFAULT_PROFILES)
+    :return: Dictionary with the metadata and ground-truth CSV paths
+    """
+    if layout not in ('subset', 'dataset'):
+        raise ValueError(f"Unknown layout: {layout}")
+    profiles = profiles or DEFAULT_PROFILES
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    metadata_path = output_path / 'metadata.csv'
+    truth_path = output_path / 'ground_truth.csv'
+
+    print(f"Synthesizing {n_files:,} files ({layout} layout) into: {output_path}")
+    chunks = [(i, min(i + CHUNK_SIZE, n_files), files_per_dog, str(output_path), layout, sample_rate, seed, profiles)
+              for i in range(0, n_files, CHUNK_SIZE)]
+
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    results = executor.map(_generate_chunk, chunks) if executor else map(_generate_chunk, chunks)
+
+    written = 0
+    with open(metadata_path, 'w', newline='') as meta_f, open(truth_path, 'w', newline='') as truth_f:
+        meta_writer = csv.writer(meta_f)
+        truth_writer = csv.writer(truth_f)
+        meta_writer.writerow(['filename', 'breed', 'sex', 'dog_id'])
+        truth_writer.writerow(['Folder', 'File', 'Breed', 'Sex', 'F0_mean', 'F0_min', 'F0_max',
+                               'F1_mean', 'F2_mean', 'duration_s'])
+        try:
+            for rows in results:
+                for row in rows:
+                    meta_writer.writerow([row['filename'], row['breed'], row['sex'], row['dog_id']])
+                    truth_writer.writerow([row['Folder'], row['filename'], row['breed'], row['sex'],
+                                           f"{row['F0_mean']:.1f}", f"{row['F0_min']:.1f}",
+                                           f"{row['F0_max']:.1f}", f"{row['F1_mean']:.1f}",
+                                           f"{row['F2_mean']:.1f}", f"{row['duration_s']:.3f}"])
+                    add_counters(files=1, bytes=row['bytes'])
+                written += len(rows)
+                if written % (CHUNK_SIZE * 40) == 0:
+                    print(f"   {written:,}/{n_files:,} files")
+        finally:
+            if executor:
+                executor.shutdown()
+
+    print(f"Done: {written:,} files, metadata: {metadata_path}, ground truth: {truth_path}")
+    return {'metadata': metadata_path, 'ground_truth': truth_path}
+
+
+def main() -> int:
+    """
+    Main function to generate a synthetic corpus.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Generate a synthetic DogSpeak-like corpus")
+    parser.add_argument('output_dir')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--files-per-dog', type=int, default=5)
+    parser.add_argument('--layout', choices=['subset', 'dataset'], default='subset')
+    parser.add_argument('--sample-rate', type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    try:
+        generate_corpus(args.output_dir, n_files=args.files, files_per_dog=args.files_per_dog,
+                        layout=args.layout, sample_rate=args.sample_rate, seed=args.seed, jobs=args.jobs)
+    except Exception as e:
+        print(f"Error generating corpus: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
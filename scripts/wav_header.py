@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+WAV Header Probe
+Reads duration, sample rate, channels and bit depth from the RIFF header of
+WAV files without decoding any samples, for many files at once.
+
+Only the chunk headers up to the `data` chunk are read (a few hundred bytes
+per file), so probing is bound by file-open latency; a thread pool overlaps
+those opens across files.
+"""
+
+import argparse
+import math
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+DEFAULT_PROBE_THREADS = 16
+HEADER_COLUMNS = ['duration', 'sample_rate', 'channels', 'bit_depth']
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_wav_header(path: Path) -> Dict[str, Any]:
+    """
+    Parse the format and data size of a RIFF/RIFX/RF64 WAV file.
+
+    :param path: WAV file
+    :return: duration (s), sample_rate, channels and bit_depth
+    """
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RIFX', b'RF64') or riff[8:12] != b'WAVE':
+            raise ValueError(f"Not a WAV file: {path}")
+        endian = '>' if riff[:4] == b'RIFX' else '<'
+        fmt = None
+        data_size = None
+        data_size_64 = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            chunk_id, size = head[:4], struct.unpack(endian + 'I', head[4:])[0]
+            if chunk_id == b'ds64':
+                body = f.read(size)
+                if len(body) < 16:
+                    raise ValueError(f"Truncated ds64 chunk: {path}")
+                data_size_64 = struct.unpack('<Q', body[8:16])[0]
+                f.seek(size & 1, os.SEEK_CUR)
+            elif chunk_id == b'fmt ':
+                body = f.read(size)
+                if len(body) < 16:
+                    raise ValueError(f"Truncated fmt chunk: {path}")
+                format_tag, channels, sample_rate, _, block_align, bit_depth = struct.unpack(endian + 'HHIIHH',
+                                                                                              body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 20:
+                    bit_depth = struct.unpack(endian + 'H', body[18:20])[0] or bit_depth
+                fmt = (channels, sample_rate, block_align, bit_depth)
+                f.seek(size & 1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                data_size = data_size_64 if size == 0xFFFFFFFF and data_size_64 is not None else size
+                # Streamed or truncated files may declare more data than they hold
+                data_size = min(data_size, os.fstat(f.fileno()).st_size - f.tell())
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+    if fmt is None or data_size is None:
+        raise ValueError(f"Missing fmt or data chunk: {path}")
+    channels, sample_rate, block_align, bit_depth = fmt
+    if sample_rate == 0 or block_align == 0:
+        raise ValueError(f"Invalid format chunk: {path}")
+    return {
+        'duration': (data_size // block_align) / sample_rate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'bit_depth': bit_depth,
+    }
+
+
+def _probe_one(path: Path) -> Dict[str, Any]:
+    """
+    read_wav_header() that reports unreadable files as NaN/None values.
+
+    :param path: WAV file
+    :return: Header values
+    """
+    try:
+        return read_wav_header(path)
+    except (OSError, ValueError, struct.error):
+        return {'duration': math.nan, 'sample_rate': None, 'channels': None, 'bit_depth': None}
+
+
+def probe_headers(paths: Iterable[Path], threads: int = DEFAULT_PROBE_THREADS) -> List[Dict[str, Any]]:
+    """
+    Read the headers of many WAV files in parallel.
+
+    :param paths: WAV files
+    :param threads: Probing threads
+    :return: Header values per file, in input order (NaN duration for missing or unreadable files)
+    """
+    paths = list(paths)
+    if len(paths) < 2 or threads <= 1:
+        return [_probe_one(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(threads, len(paths))) as pool:
+        return list(pool.map(_probe_one, paths))
+
+
+def add_header_columns(df, paths: Iterable[Path], threads: int = DEFAULT_PROBE_THREADS):
+    """
+    Add HEADER_COLUMNS to a metadata table.
+
+    :param df: DataFrame with one row per file
+    :param paths: The files of the rows, in row order
+    :param threads: Probing threads
+    :return: The DataFrame with the header columns added
+    """
+    headers = probe_headers(paths, threads)
+    for column in HEADER_COLUMNS:
+        df[column] = [header[column] for header in headers]
+    return df
+
+
+def main() -> int:
+    """
+    Main function to print the header values of WAV files.
+
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description="Read WAV header information without decoding samples")
+    parser.add_argument('paths', nargs='+', help="WAV files or directories (searched recursively)")
+    parser.add_argument('--threads', type=int, default=DEFAULT_PROBE_THREADS)
+    args = parser.parse_args()
+
+    files = []
+    for path in map(Path, args.paths):
+        files.extend(sorted(path.rglob('*.wav')) if path.is_dir() else [path])
+    total = 0.0
+    for path, header in zip(files, probe_headers(files, args.threads)):
+        print(f"{path}\t{header['duration']:.3f}\t{header['sample_rate']}\t{header['channels']}\t{header['bit_depth']}")
+        total += header['duration'] if not math.isnan(header['duration']) else 0.0
+    print(f"{len(files)} files, {total:.1f} s of audio")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,374 @@
+"""
+Shared Filesystem Work Queue
+Splits a list of work items into shards on a directory that every node can
+see (NFS, SMB, a cluster scratch volume) and lets any number of workers on
+any number of machines process them without a scheduler service.
+
+Every shard has one token file that moves between todo/, claimed/ and done/.
+Moves are os.rename() calls, which are atomic on one filesystem, so only one
+worker can claim a shard. A claimed token is named <shard>@<worker> and the
+worker touches it every few seconds as a heartbeat; a token that has not been
+touched for stale_after seconds is moved back to todo/ by whichever worker
+notices, and is claimed again. Ages are measured against the modification
+time of a file touched on the same filesystem, so clock differences between
+nodes do not matter.
+
+Outputs are written to a private directory and moved into outputs/ before
+the token is moved to done/, and merged in shard order once all shards are
+done. Processing a shard must be deterministic: if a stale worker is still
+running when its shard is re-queued, both copies write the same output.
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from scripts.instrumentation import add_counters
+
+# Queue state directory inside the queue directory
+STATE_DIRNAME = 'state'
+MANIFEST_NAME = 'manifest.json'
+# Items per shard
+DEFAULT_SHARD_SIZE = 200
+# Seconds between heartbeats, and without one before a claimed shard is re-queued
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = 120.0
+# Seconds between checks while other workers finish the last shards
+POLL_INTERVAL = 2.0
+
+
+def worker_name() -> str:
+    """
+    Name of this worker process, unique across nodes.
+
+    :return: "<host>-<pid>"
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class Claim:
+    """
+    A shard claimed by a worker.
+    """
+    shard: str
+    worker: str
+    token: Path
+
+
+class WorkQueue:
+    """
+    Shards, their state and their outputs under <queue_dir>/state.
+    """
+
+    def __init__(self, queue_dir: Path):
+        self.root = Path(queue_dir) / STATE_DIRNAME
+        with open(self.root / MANIFEST_NAME) as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+
+    @classmethod
+    def create(cls, queue_dir: Path, items: List[Dict[str, Any]], shard_size: int = DEFAULT_SHARD_SIZE,
+               settings: Optional[Dict[str, Any]] = None) -> 'WorkQueue':
+        """
+        Split items into shards, unless another worker already created the queue.
+
+        The queue is written to a temporary directory and renamed into place, so
+        workers started together agree on one set of shards.
+
+        :param queue_dir: Queue directory on the shared filesystem
+        :param items: JSON-serializable work items, in output order
+        :param shard_size: Items per shard
+        :param settings: Settings every worker must use (stored in the manifest)
+        :return: The queue
+        """
+        queue_dir = Path(queue_dir)
+        if cls.exists(queue_dir):
+            return cls(queue_dir)
+
+        building = queue_dir / f"{STATE_DIRNAME}.{worker_name()}.tmp"
+        shutil.rmtree(building, ignore_errors=True)
+        for name in ('shards', 'todo', 'claimed', 'done', 'outputs'):
+            (building / name).mkdir(parents=True)
+        shards = []
+        for start in range(0, len(items), max(1, shard_size)):
+            shard = f"shard_{len(shards):05d}"
+            with open(building / 'shards' / f"{shard}.json", 'w') as f:
+                json.dump(items[start:start + shard_size], f)
+            (building / 'todo' / shard).touch()
+            shards.append(shard)
+        with open(building / MANIFEST_NAME, 'w') as f:
+            json.dump({'shards': shards, 'items': len(items), 'shard_size': shard_size,
+                       'settings': settings or {}}, f, indent=2)
+        try:
+            os.rename(building, queue_dir / STATE_DIRNAME)
+        except OSError:
+            # Another worker created the queue first
+            shutil.rmtree(building, ignore_errors=True)
+        return cls(queue_dir)
+
+    @staticmethod
+    def exists(queue_dir: Path) -> bool:
+        return (Path(queue_dir) / STATE_DIRNAME / MANIFEST_NAME).exists()
+
+    @property
+    def shards(self) -> List[str]:
+        return self.manifest['shards']
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.manifest['settings']
+
+    def items(self, shard: str) -> List[Dict[str, Any]]:
+        """
+        Work items of a shard.
+
+        :param shard: Shard name
+        :return: Items
+        """
+        with open(self.root / 'shards' / f"{shard}.json") as f:
+            return json.load(f)
+
+    def output_dir(self) -> Path:
+        return self.root / 'outputs'
+
+    def scratch_dir(self, worker: str) -> Path:
+        """
+        Private directory of a worker for partial outputs.
+
+        :param worker: Worker name
+        :return: Directory (created)
+        """
+        path = self.root / 'outputs' / f".{worker}"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def now(self) -> float:
+        """
+        Current time on the shared filesystem.
+
+        :return: Modification time of a freshly touched file
+        """
+        clock = self.root / f"clock.{worker_name()}"
+        clock.touch()
+        return clock.stat().st_mtime
+
+    def claim(self, worker: str) -> Optional[Claim]:
+        """
+        Claim the first shard still to do.
+
+        :param worker: Worker name
+        :return: The claim, or None when no shard is left to claim
+        """
+        for shard in sorted(os.listdir(self.root / 'todo')):
+            token = self.root / 'claimed' / f"{shard}@{worker}"
+            try:
+                # Touch first: a re-queued token keeps its stale time, and requeue_stale()
+                # must not see it as stale the moment it lands in claimed/
+                os.utime(self.root / 'todo' / shard)
+                os.rename(self.root / 'todo' / shard, token)
+            except FileNotFoundError:
+                continue  # Claimed by another worker
+            return Claim(shard, worker, token)
+        return None
+
+    def heartbeat(self, claim: Claim) -> bool:
+        """
+        Mark a claim as alive.
+
+        :param claim: Claim
+        :return: False when the shard was re-queued in the meantime
+        """
+        try:
+            os.utime(claim.token)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, claim: Claim) -> bool:
+        """
+        Mark a claimed shard as done (its outputs must be in place).
+
+        :param claim: Claim
+        :return: False when the shard was re-queued in the meantime
+        """
+        try:
+            os.rename(claim.token, self.root / 'done' / claim.shard)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def release(self, claim: Claim) -> None:
+        """
+        Put a claimed shard back, e.g. after its worker failed.
+
+        :param claim: Claim
+        :return: None
+        """
+        try:
+            os.rename(claim.token, self.root / 'todo' / claim.shard)
+        except FileNotFoundError:
+            pass
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER) -> List[str]:
+        """
+        Move claimed shards without a recent heartbeat back to todo/.
+
+        :param stale_after: Seconds without heartbeat
+        :return: Re-queued shard names
+        """
+        now = self.now()
+        requeued = []
+        for name in os.listdir(self.root / 'claimed'):
+            token = self.root / 'claimed' / name
+            try:
+                if now - token.stat().st_mtime < stale_after:
+                    continue
+                shard = name.split('@', 1)[0]
+                if (self.root / 'done' / shard).exists():
+                    token.unlink()
+                    continue
+                os.rename(token, self.root / 'todo' / shard)
+            except FileNotFoundError:
+                continue  # Completed, released or re-queued by another worker
+            print(f"Re-queued {shard} (no heartbeat from {name.split('@', 1)[1]} for {stale_after:g} s)")
+            requeued.append(shard)
+        return requeued
+
+    def status(self) -> Dict[str, int]:
+        """
+        Number of shards in each state.
+
+        :return: {"todo", "claimed", "done"} counts
+        """
+        done = set(os.listdir(self.root / 'done'))
+        return {'todo': len(os.listdir(self.root / 'todo')),
+                'claimed': len({name.split('@', 1)[0] for name in os.listdir(self.root / 'claimed')} - done),
+                'done': len(done)}
+
+    def finished(self) -> bool:
+        return self.status()['done'] == len(self.shards)
+
+    def merge(self, suffix: str, destination: Path) -> Path:
+        """
+        Concatenate the per-shard CSV outputs <shard><suffix> in shard order under one header.
+
+        :param suffix: Output file suffix, e.g. ".csv"
+        :param destination: Merged CSV
+        :return: Path to the merged CSV
+        """
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(f".{destination.name}.{worker_name()}.tmp")
+        header = None
+        with open(tmp_path, 'w', newline='') as out:
+            for shard in self.shards:
+                with open(self.output_dir() / f"{shard}{suffix}", newline='') as f:
+                    first = f.readline()
+                    if header is None:
+                        header = first
+                        out.write(first)
+                    elif first != header:
+                        raise ValueError(f"{shard}{suffix} has different columns than the first shard")
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp_path, destination)
+        return destination
+
+
+class Heartbeat:
+    """
+    Touches a claim from a background thread while its shard is processed.
+    """
+
+    def __init__(self, queue: WorkQueue, claim: Claim, interval: float = HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.claim = claim
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.claim):
+                print(f"Lost the claim on {self.claim.shard}; its output is kept if it finishes first")
+                return
+
+    def __enter__(self) -> 'Heartbeat':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+# Shard processor: (items, scratch directory, shard name) -> output files written to the scratch directory
+ShardProcessor = Callable[[List[Dict[str, Any]], Path, str], List[Path]]
+
+
+def run_worker(queue_dir: Path, process: ShardProcessor, heartbeat_interval: float = HEARTBEAT_INTERVAL,
+               stale_after: float = STALE_AFTER, poll_interval: float = POLL_INTERVAL) -> int:
+    """
+    Claim and process shards until every shard of the queue is done.
+
+    :param queue_dir: Queue directory
+    :param process: Called with a shard's items, a scratch directory and the shard name; returns the output
+                    files it wrote there, which are moved into outputs/ under the same names
+    :param heartbeat_interval: Seconds between heartbeats
+    :param stale_after: Seconds without heartbeat before a claimed shard is re-queued
+    :param poll_interval: Seconds between checks while other workers finish the last shards
+    :return: Number of shards this worker completed
+    """
+    queue = WorkQueue(queue_dir)
+    worker = worker_name()
+    scratch = queue.scratch_dir(worker)
+    completed = 0
+    while True:
+        claim = queue.claim(worker)
+        if claim is None:
+            if queue.requeue_stale(stale_after):
+                continue
+            if queue.finished():
+                break
+            time.sleep(poll_interval)
+            continue
+
+        items = queue.items(claim.shard)
+        try:
+            with Heartbeat(queue, claim, heartbeat_interval):
+                outputs = process(items, scratch, claim.shard)
+        except BaseException:
+            queue.release(claim)
+            raise
+        for output in outputs:
+            os.replace(output, queue.output_dir() / Path(output).name)
+        if queue.complete(claim):
+            completed += 1
+            add_counters(files=len(items))
+            print(f"{worker}: {claim.shard} done ({len(items)} items)")
+    shutil.rmtree(scratch, ignore_errors=True)
+    (queue.root / f"clock.{worker}").unlink(missing_ok=True)
+    return completed
+
+
+def run_workers(queue_dir: Path, process: ShardProcessor, workers: int = 1, **options: Any) -> int:
+    """
+    Run several workers on this node (each its own process) until the queue is finished.
+
+    :param queue_dir: Queue directory
+    :param process: Shard processor (top-level function or partial, so it can be sent to processes)
+    :param workers: Local worker processes
+    :param options: heartbeat_interval, stale_after and poll_interval (see run_worker())
+    :return: Number of shards completed on this node
+    """
+    if workers <= 1:
+        return run_worker(queue_dir, process, **options)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_worker, queue_dir, process, **options) for _ in range(workers)]
+        return sum(future.result() for future in futures)
@@ -0,0 +1,80 @@
+"""
+Feature Service Tests
+Starts the service on a free localhost port and checks /health, /analyze
+(scored against a breed whose name contains a space) and an error response.
+
+Run with: python -m unittest discover tests
+"""
+
+import http.client
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+from scipy.io import wavfile
+
+from scripts.feature_service import FeatureService, ReferenceNorms, create_server, request_analysis
+from scripts.synthesize_corpus import synthesize_bark_file
+
+FEATURES_PATH = Path(__file__).resolve().parents[1] / 'data' / 'features' / 'feature_extraction_results.csv'
+SAMPLE_RATE = 22050
+
+
+class FeatureServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = FeatureService(ReferenceNorms.from_table(FEATURES_PATH), feature_bank=False)
+        cls.server = create_server(cls.service, port=0)
+        cls.host, cls.port = cls.server.server_address[:2]
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.wav_path = Path(cls.tmp.name) / 'bark.wav'
+        samples, _ = synthesize_bark_file(np.random.default_rng(0), SAMPLE_RATE, 450.0, 900.0, 1500.0)
+        wavfile.write(cls.wav_path, SAMPLE_RATE, samples)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        cls.tmp.cleanup()
+
+    def get(self, path):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def test_health(self):
+        status, payload = self.get('/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['status'], 'ok')
+        self.assertIn({'breed': 'german shepherd', 'sex': 'male'}, payload['groups'])
+
+    def test_analyze_scores_breed_with_space(self):
+        payload = request_analysis(self.wav_path, 'german shepherd', 'male', host=self.host, port=self.port)
+        self.assertEqual(payload['reference'], {'breed': 'german shepherd', 'sex': 'male'})
+        self.assertEqual(payload['sample_rate'], SAMPLE_RATE)
+        self.assertTrue(payload['segments'])
+        self.assertGreater(payload['features']['F0_mean'], 0)
+        reference = self.service.norms.values[('german shepherd', 'male')]['F0_mean']
+        self.assertEqual(payload['scores']['F0_mean']['n'], len(reference))
+
+    def test_unknown_group_is_an_error(self):
+        with self.assertRaisesRegex(RuntimeError, "Service error 404"):
+            request_analysis(self.wav_path, 'poodle', 'male', host=self.host, port=self.port)
+        status, payload = self.get('/missing')
+        self.assertEqual(status, 404)
+        self.assertIn('error', payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Dataset Pull Tests
+Pulls a synthetic corpus in the dataset layout through LocalSource into both
+output layouts with filters and a limit. A repeated pull must fetch nothing,
+and a pull with other filters must keep the metadata rows pulled before.
+
+Run with: python -m unittest discover tests
+"""
+
+import csv
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from scripts.get_data import LocalSource, pull_dataset
+from scripts.synthesize_corpus import generate_corpus
+
+
+def read_rows(path: Path) -> List[Dict[str, str]]:
+    """
+    Rows of a metadata CSV.
+
+    :param path: CSV path
+    :return: Rows as dictionaries
+    """
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class PullDatasetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.source_dir = Path(cls.tmp.name) / 'source'
+        generate_corpus(str(cls.source_dir), n_files=24, files_per_dog=2, layout='dataset', seed=5)
+        cls.rows = read_rows(cls.source_dir / 'metadata.csv')
+        cls.breed = Counter(row['breed'] for row in cls.rows).most_common(1)[0][0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_dataset_layout_with_filter_and_limit(self):
+        output = Path(self.tmp.name) / 'dataset'
+        source = LocalSource(self.source_dir)
+        summary = pull_dataset(source, str(output), layout='dataset', breeds=[self.breed], limit=3, downloads=2)
+        self.assertEqual(summary['rows'], 3)
+        self.assertEqual(summary['fetched'], 3)
+
+        pulled = read_rows(output / 'metadata.csv')
+        expected = [row for row in self.rows if row['breed'] == self.breed][:3]
+        self.assertEqual(pulled, expected)
+        relative = [Path('dogspeak_released') / row['dog_id'] / row['filename'] for row in pulled]
+        for path in relative:
+            self.assertEqual((output / path).read_bytes(), (self.source_dir / path).read_bytes())
+        self.assertEqual(sorted(output.rglob('*.wav')), sorted(output / path for path in relative))
+
+        # Everything is present already, so a second pull reads no audio
+        bytes_read = source.bytes_read
+        summary = pull_dataset(source, str(output), layout='dataset', breeds=[self.breed], limit=3, downloads=2)
+        self.assertEqual((summary['fetched'], summary['present'], summary['bytes']), (0, 3, 0))
+        self.assertEqual(source.bytes_read, bytes_read)
+        self.assertEqual(read_rows(output / 'metadata.csv'), pulled)
+
+    def test_subset_layout_keeps_earlier_rows(self):
+        output = Path(self.tmp.name) / 'subset'
+        source = LocalSource(self.source_dir)
+        females = [row for row in self.rows if row['sex'] == 'female']
+        summary = pull_dataset(source, str(output), layout='subset', sexes=['female'], downloads=2)
+        self.assertEqual(summary['fetched'], len(females))
+        for row in females:
+            self.assertTrue((output / f"{row['breed']}_female" / row['filename']).exists())
+
+        males = [row for row in self.rows if row['sex'] == 'male' and row['breed'] == self.breed][:2]
+        summary = pull_dataset(source, str(output), layout='subset', breeds=[self.breed], sexes=['male'], limit=2,
+                               downloads=2)
+        self.assertEqual(summary['fetched'], 2)
+        self.assertEqual(read_rows(output / 'metadata.csv'), females + males)
+        self.assertEqual(len(list(output.rglob('*.wav'))), len(females) + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
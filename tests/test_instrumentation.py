@@ -0,0 +1,60 @@
+"""
+Instrumentation Tests
+Each stage must report its own memory peak rather than the heaviest earlier
+stage's, and CPU time spent in a process pool must show up as child CPU.
+
+Run with: python -m unittest discover tests
+"""
+
+import sys
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scripts.instrumentation import RSS_SAMPLE_INTERVAL, Tracer
+
+# Size of the allocation made by the heavy stage
+ALLOCATION_MB = 200
+
+
+def burn_cpu(seconds: float) -> float:
+    """
+    Keep a worker busy for some CPU time.
+
+    :param seconds: CPU seconds to spend
+    :return: CPU seconds spent
+    """
+    started = time.process_time()
+    while time.process_time() - started < seconds:
+        pass
+    return time.process_time() - started
+
+
+class StageMeasurementTest(unittest.TestCase):
+    @unittest.skipUnless(sys.platform.startswith('linux'), "RSS is sampled from /proc")
+    def test_memory_peak_is_per_stage(self):
+        tracer = Tracer()
+        with tracer.stage('heavy'):
+            block = np.ones(ALLOCATION_MB * 1024 * 1024 // 8)
+            time.sleep(3 * RSS_SAMPLE_INTERVAL)
+            del block
+        with tracer.stage('light'):
+            pass
+        heavy, light = [event['args'] for event in tracer.drain()]
+        self.assertGreater(heavy['rss_peak_mb'], light['rss_peak_mb'] + ALLOCATION_MB / 2)
+        self.assertGreaterEqual(light['process_peak_rss_mb'], heavy['rss_peak_mb'] - 1)
+
+    def test_pool_cpu_is_reported_as_child_cpu(self):
+        tracer = Tracer()
+        with tracer.stage('pool'):
+            with ProcessPoolExecutor(max_workers=2) as pool:
+                spent = sum(pool.map(burn_cpu, [0.3, 0.3]))
+        args = tracer.drain()[0]['args']
+        self.assertGreaterEqual(args['child_cpu_s'], 0.9 * spent)
+        self.assertLess(args['cpu_s'], args['child_cpu_s'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Stream Tracker Tests
+Files fed through the streaming tracker in chunks must give running
+summaries close to the batch extraction of the same files.
+
+Run with: python -m unittest discover tests
+"""
+
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from scripts.extract_features import run_python_extraction
+from scripts.stream_tracker import track_file
+from scripts.synthesize_corpus import generate_corpus
+
+# Largest relative difference to the batch value
+F0_TOLERANCE = 0.02
+FORMANT_TOLERANCE = 0.08
+
+
+class StreamingSummaryTest(unittest.TestCase):
+    def test_summary_matches_batch_extraction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp) / 'subset'
+            generate_corpus(str(corpus), n_files=6, files_per_dog=2, seed=3)
+            features = Path(tmp) / 'features.csv'
+            run_python_extraction(str(corpus), str(features), feature_bank=False)
+            with open(features, newline='') as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), 6)
+
+            for row in rows:
+                path = corpus / row['Folder'] / row['File']
+                summary = track_file(path, chunk_size=1000).summary()
+                for name, tolerance in [('F0_mean', F0_TOLERANCE), ('F0_min', F0_TOLERANCE),
+                                        ('F0_max', F0_TOLERANCE), ('F1_mean', FORMANT_TOLERANCE),
+                                        ('F2_mean', FORMANT_TOLERANCE)]:
+                    batch = float(row[name])
+                    with self.subTest(file=row['File'], feature=name):
+                        self.assertLessEqual(abs(summary[name] - batch), tolerance * batch)
+                # Chunk boundaries must not change the result
+                for name, value in track_file(path, chunk_size=4096).summary().items():
+                    self.assertAlmostEqual(summary[name], value, delta=1e-9 * abs(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Work Queue Tests
+Sharded extraction with several local workers must produce the same CSVs as
+a single-process run, a shard whose worker stopped sending heartbeats must
+be re-queued and finished by another worker, and a shard being claimed must
+not look stale to a worker checking for stale claims at the same moment.
+
+Run with: python -m unittest discover tests
+"""
+
+import csv
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest import mock
+
+from scripts.extract_features import run_python_extraction, run_sharded_extraction, segments_path, status_path
+from scripts.synthesize_corpus import generate_corpus
+from scripts.work_queue import WorkQueue, run_worker
+
+
+def write_shard(items: List[Dict[str, Any]], scratch: Path, shard: str) -> List[Path]:
+    """
+    Shard processor that writes its items as a CSV.
+
+    :param items: Work items
+    :param scratch: Worker's private output directory
+    :param shard: Shard name
+    :return: The written CSV
+    """
+    output = scratch / f"{shard}.csv"
+    with open(output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['item'])
+        writer.writerows([item['item']] for item in items)
+    return [output]
+
+
+class ShardedExtractionTest(unittest.TestCase):
+    def test_workers_match_single_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp) / 'subset'
+            generate_corpus(str(corpus), n_files=12, files_per_dog=2)
+            single = Path(tmp) / 'single.csv'
+            sharded = Path(tmp) / 'sharded.csv'
+            run_python_extraction(str(corpus), str(single), feature_bank=False)
+            run_sharded_extraction(str(corpus), str(sharded), str(Path(tmp) / 'queue'), engine='python',
+                                   workers=3, shard_size=3, feature_bank=False)
+
+            for single_path, sharded_path in [(single, sharded),
+                                              (segments_path(str(single)), segments_path(str(sharded)))]:
+                self.assertEqual(Path(single_path).read_text(), Path(sharded_path).read_text())
+            with open(status_path(str(single)), newline='') as f:
+                single_status = [row[:3] for row in csv.reader(f)]
+            with open(status_path(str(sharded)), newline='') as f:
+                sharded_status = [row[:3] for row in csv.reader(f)]
+            # The seconds column is a timing and differs between runs
+            self.assertEqual(single_status, sharded_status)
+            self.assertEqual(len(single_status), 13)
+
+
+class StaleClaimTest(unittest.TestCase):
+    def test_stale_claim_is_requeued_and_finished(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            queue_dir = Path(tmp) / 'queue'
+            queue = WorkQueue.create(queue_dir, [{'item': i} for i in range(10)], shard_size=4)
+            self.assertEqual(len(queue.shards), 3)
+
+            # A worker claims the first shard and dies without sending heartbeats
+            claim = queue.claim('crashed-worker')
+            self.assertEqual(claim.shard, queue.shards[0])
+            self.assertEqual(queue.requeue_stale(stale_after=60.0), [])
+            last_heartbeat = queue.now() - 5.0
+            os.utime(claim.token, (last_heartbeat, last_heartbeat))
+
+            completed = run_worker(queue_dir, write_shard, heartbeat_interval=0.1, stale_after=1.0,
+                                   poll_interval=0.1)
+            self.assertEqual(completed, 3)
+            self.assertTrue(queue.finished())
+            self.assertFalse(queue.heartbeat(claim))
+            self.assertFalse(queue.complete(claim))
+
+            merged = queue.merge('.csv', Path(tmp) / 'merged.csv')
+            with open(merged, newline='') as f:
+                self.assertEqual([row[0] for row in csv.reader(f)], ['item'] + [str(i) for i in range(10)])
+
+    def test_claim_is_not_requeued_while_it_is_being_taken(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            queue_dir = Path(tmp) / 'queue'
+            queue = WorkQueue.create(queue_dir, [{'item': i} for i in range(4)], shard_size=4)
+            # A token re-queued from a stale claim keeps its old modification time
+            long_ago = queue.now() - 3600.0
+            os.utime(queue.root / 'todo' / queue.shards[0], (long_ago, long_ago))
+
+            # Another worker checks for stale claims right after the token is moved to claimed/
+            other = WorkQueue(queue_dir)
+            rename = os.rename
+            requeued = []
+
+            def rename_then_check(source, destination):
+                rename(source, destination)
+                if Path(destination).parent.name == 'claimed':
+                    requeued.extend(other.requeue_stale(stale_after=60.0))
+
+            with mock.patch('scripts.work_queue.os.rename', side_effect=rename_then_check):
+                claim = queue.claim('worker-a')
+            self.assertEqual(requeued, [])
+            self.assertEqual(claim.shard, queue.shards[0])
+            self.assertTrue(queue.heartbeat(claim))
+            self.assertEqual(queue.status(), {'todo': 0, 'claimed': 1, 'done': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()